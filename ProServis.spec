@@ -87,6 +87,7 @@ hidden_imports = [
     'PIL.ImageFont',
     
     # Veri İşleme
+    'numpy',  # CPC faturalama vektörel hesaplama (utils/database/cpc_billing.py)
     'pandas',
     'pandas.core',
     'pandas.io',
@@ -1,11 +1,16 @@
 import sys
 import os
+import multiprocessing
 from pathlib import Path
 from PyQt6.QtWidgets import QApplication, QMessageBox
 from datetime import datetime
 from dotenv import load_dotenv
 from time import perf_counter
 
+# Paketlenmiş (PyInstaller) sürümde PDF süreç havuzunun alt süreçleri
+# uygulamayı yeniden başlatmak yerine yalnızca kendilerine verilen işi çalıştırır.
+multiprocessing.freeze_support()
+
 # .env dosyasını yükle (varsayılan SMTP ayarları için)
 load_dotenv()
 
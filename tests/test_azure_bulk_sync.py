@@ -0,0 +1,93 @@
+"""Toplu MERGE/silme: hatalı kayıtların parti bölünerek tek tek raporlanması."""
+import sqlite3
+
+import pytest
+
+from utils.azure_bulk_sync import SQLiteMergeBackend, delete_records, merge_records
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(':memory:')
+    conn.execute("PRAGMA foreign_keys = ON")
+    conn.execute("CREATE TABLE customers (id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE, phone TEXT)")
+    conn.execute("CREATE TABLE devices (id INTEGER PRIMARY KEY, customer_id INTEGER REFERENCES customers (id))")
+    conn.executemany("INSERT INTO customers (id, name) VALUES (?, ?)", [(i, f"Eski {i}") for i in range(1, 11)])
+    conn.commit()
+    yield conn
+    conn.close()
+
+
+def names(conn):
+    return dict(conn.execute("SELECT id, name FROM customers"))
+
+
+def test_merge_updates_and_inserts(conn):
+    records = [{'id': 2, 'name': 'Güncel 2', 'phone': '1'}, {'id': 20, 'name': 'Yeni 20', 'phone': '2'}]
+
+    result = merge_records(SQLiteMergeBackend(conn), 'customers', records)
+
+    assert result['failed'] == 0
+    assert sorted(result['synced_ids']) == [2, 20]
+    assert names(conn)[2] == 'Güncel 2'
+    assert names(conn)[20] == 'Yeni 20'
+    assert not conn.in_transaction
+
+
+def test_merge_bisects_failing_batch_to_the_bad_records(conn):
+    records = [{'id': i, 'name': f"Müşteri {i}"} for i in range(11, 111)]
+    # Benzersiz ad kısıtını ihlal eden iki kayıt
+    records[17] = {'id': 28, 'name': 'Eski 3'}
+    records[80] = {'id': 91, 'name': 'Eski 7'}
+
+    result = merge_records(SQLiteMergeBackend(conn), 'customers', records, batch_size=32)
+
+    assert result['failed'] == 2
+    assert [error.split(':')[0] for error in result['errors']] == ['Record 28', 'Record 91']
+    assert result['success'] == 98
+    assert sorted(result['synced_ids']) == [i for i in range(11, 111) if i not in (28, 91)]
+    stored = names(conn)
+    assert 28 not in stored and 91 not in stored
+    assert stored[27] == 'Müşteri 27' and stored[92] == 'Müşteri 92'
+
+
+def test_merge_reports_unknown_columns_without_writing(conn):
+    result = merge_records(SQLiteMergeBackend(conn), 'customers', [{'id': 1, 'nickname': 'x'}])
+
+    assert result['failed'] == 1
+    assert 'nickname' in result['errors'][0]
+    assert names(conn)[1] == 'Eski 1'
+
+
+def test_merge_raises_retryable_errors_and_rolls_back(conn):
+    class FlakyBackend(SQLiteMergeBackend):
+        calls = 0
+
+        def merge(self, rows):
+            FlakyBackend.calls += 1
+            if FlakyBackend.calls == 2:
+                raise ConnectionError("bağlantı koptu")
+            super().merge(rows)
+
+    records = [{'id': i, 'name': f"Müşteri {i}"} for i in range(11, 21)]
+
+    with pytest.raises(ConnectionError):
+        merge_records(FlakyBackend(conn), 'customers', records, batch_size=5,
+                      retryable=lambda e: isinstance(e, ConnectionError))
+
+    # İlk parti de geri alınmıştır; çağrı bütünüyle yeniden denenebilir
+    assert max(names(conn)) == 10
+
+
+def test_delete_bisects_failing_batch_to_the_referenced_records(conn):
+    conn.executemany("INSERT INTO devices (id, customer_id) VALUES (?, ?)", [(1, 4), (2, 7)])
+    conn.commit()
+
+    result = delete_records(SQLiteMergeBackend(conn), 'customers', list(range(1, 12)), batch_size=4)
+
+    assert result['failed'] == 2
+    assert [error.split(':')[0] for error in result['errors']] == ['Record 4', 'Record 7']
+    # Hedefte olmayan id (11) hata sayılmaz
+    assert sorted(result['synced_ids']) == [1, 2, 3, 5, 6, 8, 9, 10, 11]
+    assert sorted(names(conn)) == [4, 7]
+    assert not conn.in_transaction
@@ -0,0 +1,29 @@
+"""Geçici hata tespiti: SQLSTATE ve sürücünün yerel hata numarası."""
+import pytest
+
+from utils.azure_pool import is_transient
+
+
+class OdbcError(Exception):
+    """pyodbc.Error gibi (sqlstate, mesaj) argümanları taşıyan hata."""
+
+
+@pytest.mark.parametrize('exc', [
+    OdbcError('08S01', '[08S01] [Microsoft][ODBC Driver 18 for SQL Server]Communication link failure (10054) (SQLExecDirectW)'),
+    OdbcError('42000', '[42000] [Microsoft][ODBC Driver 18 for SQL Server][SQL Server]Database is not currently '
+                       'available. (40613) (SQLDriverConnect)'),
+    OdbcError('40001', '[40001] Transaction was deadlocked (1205) (SQLExecDirectW)'),
+    TimeoutError(),
+])
+def test_transient_errors(exc):
+    assert is_transient(exc)
+
+
+@pytest.mark.parametrize('exc', [
+    OdbcError('23000', "[23000] [SQL Server]Violation of UNIQUE KEY constraint. The duplicate key value is (64). "
+                       "(2627) (SQLExecDirectW)"),
+    OdbcError('42S22', "[42S22] [SQL Server]Invalid column name 'col_233'. (207) (SQLExecDirectW)"),
+    ValueError("Error 64 (233)"),
+])
+def test_permanent_errors_with_matching_numbers_in_text(exc):
+    assert not is_transient(exc)
@@ -0,0 +1,122 @@
+"""Bulut tutarlılık kontrolü: özet ağacında tutmayan aralıklara inilmesi."""
+import sqlite3
+
+import pytest
+
+from utils.database.cloud_verify import (find_mismatches, local_range_hashes, register_functions, repair_range,
+                                         sqlite_row_expr)
+
+COLUMNS = [('id', 'int'), ('name', 'nvarchar'), ('price', 'float')]
+ROWS = 5000
+
+
+def make_db():
+    conn = sqlite3.connect(':memory:')
+    register_functions(conn)
+    conn.execute("CREATE TABLE customers (id INTEGER PRIMARY KEY, name TEXT, price REAL)")
+    conn.execute("CREATE TABLE sync_changes (table_name TEXT, record_id INTEGER)")
+    conn.executemany("INSERT INTO customers VALUES (?, ?, ?)",
+                     [(i, f"Müşteri {i}", i * 1.25 if i % 3 else None) for i in range(1, ROWS + 1)])
+    return conn
+
+
+@pytest.fixture
+def local():
+    conn = make_db()
+    yield conn
+    conn.close()
+
+
+@pytest.fixture
+def cloud():
+    conn = make_db()
+    yield conn
+    conn.close()
+
+
+def compare(local, cloud, lo=1, hi=ROWS + 10, **kwargs):
+    """Bulut tarafı da SQLite'tır; aralık toplamı parça özetlerinden hesaplanır."""
+    stats = {'queries': 0, 'hash_rows': 0}
+    calls = []
+
+    def cloud_hashes(range_lo, range_hi, width):
+        calls.append((range_lo, range_hi, width))
+        buckets = local_range_hashes(cloud, 'customers', COLUMNS, range_lo, range_hi, width)
+        total = (sum(c for c, _ in buckets.values()), sum(h for _, h in buckets.values()))
+        return total, buckets
+
+    mismatches = find_mismatches(lambda range_lo, range_hi, width: local_range_hashes(
+        local, 'customers', COLUMNS, range_lo, range_hi, width), cloud_hashes, lo, hi, stats, **kwargs)
+    return mismatches, stats, calls
+
+
+def test_identical_tables_need_a_single_query(local, cloud):
+    mismatches, stats, _ = compare(local, cloud)
+
+    assert mismatches == []
+    assert stats['queries'] == 1
+
+
+def test_descends_only_into_changed_ranges(local, cloud):
+    cloud.execute("UPDATE customers SET name = 'Bulutta değişti' WHERE id = 17")
+    cloud.execute("UPDATE customers SET price = 99.5 WHERE id = 3001")
+    cloud.execute("DELETE FROM customers WHERE id = 4200")
+    cloud.execute("INSERT INTO customers VALUES (5005, 'Bulutta yeni', NULL)")
+
+    mismatches, stats, calls = compare(local, cloud, fanout=16, leaf_rows=64)
+
+    changed = [17, 3001, 4200, 5005]
+    assert len(mismatches) == len(changed)
+    for (lo, hi, _), record_id in zip(mismatches, changed):
+        assert lo <= record_id <= hi
+        assert hi - lo + 1 <= 64
+    # Her yaprak için buluttaki satır sayısı da döner (indirme sonrası eksiksizlik kontrolü için)
+    for lo, hi, count in mismatches:
+        assert count == cloud.execute("SELECT COUNT(*) FROM customers WHERE id BETWEEN ? AND ?", (lo, hi)).fetchone()[0]
+    # Her seviyede yalnızca farklı parçalara inilir
+    assert stats['queries'] == len(calls) <= 1 + 2 * len(changed)
+    assert stats['queries'] < ROWS // 64
+
+
+def test_leaf_rows_stop_the_descent(local, cloud):
+    cloud.execute("UPDATE customers SET name = 'x' WHERE id = 2500")
+
+    mismatches, _, _ = compare(local, cloud, fanout=4, leaf_rows=ROWS)
+
+    assert mismatches == [(1254, 2506, 1253)]
+
+
+def test_repaired_ranges_match(local, cloud):
+    cloud.execute("UPDATE customers SET name = 'Bulutta değişti' WHERE id IN (17, 2222)")
+    cloud.execute("DELETE FROM customers WHERE id = 4200")
+    local.execute("UPDATE customers SET name = 'Yerel değişiklik' WHERE id = 2222")
+    names = [name for name, _ in COLUMNS]
+
+    mismatches, _, _ = compare(local, cloud)
+    for lo, hi, _ in mismatches:
+        rows = cloud.execute("SELECT id, name, price FROM customers WHERE id BETWEEN ? AND ?", (lo, hi))
+        repair_range(local, 'customers', names, rows, lo, hi, skip_ids={2222})
+
+    remaining, _, _ = compare(local, cloud)
+    # Gönderilmemiş yerel değişiklik korunur; aralığı farklı kalır
+    assert [lo <= 2222 <= hi for lo, hi, _ in remaining] == [True]
+    assert local.execute("SELECT name FROM customers WHERE id = 17").fetchone()[0] == 'Bulutta değişti'
+    assert local.execute("SELECT COUNT(*) FROM customers WHERE id = 4200").fetchone()[0] == 0
+
+
+@pytest.mark.parametrize('value, text', [
+    # SQL Server: CAST(ROUND(CAST(x AS DECIMAL(38, 10)), 4) AS DECIMAL(38, 4)); yarım değer sıfırdan uzağa
+    (1.00005, '1.0001'),
+    (2.67505, '2.6751'),
+    (-0.00005, '-0.0001'),
+    (0.00004999, '0.0000'),
+    (-0.0, '0.0000'),
+    (12.5, '12.5000'),
+    (3, '3.0000'),
+])
+def test_decimals_round_like_sql_server(value, text):
+    conn = sqlite3.connect(':memory:')
+    register_functions(conn)
+    conn.execute("CREATE TABLE t (price REAL)")
+    conn.execute("INSERT INTO t VALUES (?)", (value,))
+    assert conn.execute(f"SELECT {sqlite_row_expr([('price', 'float')])} FROM t").fetchone()[0] == text
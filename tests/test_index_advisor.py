@@ -0,0 +1,44 @@
+"""İndeks danışmanı: yakalanan sorguların özgün metinle yeniden oynatılması."""
+import sqlite3
+
+from utils.database.index_advisor import advise
+from utils.database.instrumentation import QueryStats
+
+
+def make_db():
+    conn = sqlite3.connect(':memory:')
+    conn.execute("CREATE TABLE service_records (id INTEGER PRIMARY KEY, device_id INTEGER, status TEXT, "
+                 "created_date TEXT, is_invoiced INTEGER)")
+    conn.execute("CREATE INDEX idx_service_uninvoiced ON service_records (device_id, created_date) "
+                 "WHERE is_invoiced = 0")
+    conn.execute("CREATE INDEX idx_service_status ON service_records (status)")
+    return conn
+
+
+def capture(tmp_path, sql, params, keep_samples=True):
+    stats = QueryStats(slow_threshold_ms=1e9, log_dir=str(tmp_path), keep_samples=keep_samples)
+    stats.record(sql, params, 0, 0.001)
+    return stats
+
+
+def test_partial_index_is_seen_through_original_sql(tmp_path):
+    stats = capture(tmp_path, "SELECT id FROM service_records WHERE device_id = ? AND is_invoiced = 0", (7,))
+    (stmt,) = stats.top()
+    assert stmt['sql'] == "SELECT id FROM service_records WHERE device_id = ? AND is_invoiced = ?"
+    assert advise(make_db(), [stmt]) == []
+
+
+def test_params_bind_to_their_own_placeholders(tmp_path):
+    sql = "SELECT id FROM service_records WHERE is_invoiced = 0 AND status = ? AND created_date >= 'x?'"
+    stats = capture(tmp_path, sql, ('Beklemede',))
+    (stmt,) = stats.top(redact=True)
+    assert stmt['sample_sql'] == sql.replace("'x?'", "'?'")
+    assert advise(make_db(), [stmt]) == []
+
+
+def test_samples_without_params(tmp_path):
+    stats = capture(tmp_path, "SELECT id FROM service_records WHERE device_id = ? AND is_invoiced = 0", (7,),
+                    keep_samples=False)
+    (stmt,) = stats.top()
+    assert stmt['sample_params'] == []
+    assert advise(make_db(), [stmt]) == []
@@ -0,0 +1,46 @@
+"""Tam metin araması: önek terimleri ve kod sütunlarında alt dize araması."""
+import sqlite3
+
+from utils.database.search import create_search_index, match_clause
+
+
+def make_db():
+    conn = sqlite3.connect(':memory:')
+    conn.execute("CREATE TABLE stock_items (id INTEGER PRIMARY KEY, name TEXT, part_number TEXT, "
+                 "compatible_models TEXT, supplier TEXT, item_type TEXT)")
+    conn.executemany("INSERT INTO stock_items (name, part_number, item_type) VALUES (?, ?, ?)", [
+        ("Kyocera Toner", "TK1150", "Toner"),
+        ("Işık Ünitesi", "DV_1150", "Yedek Parça"),
+        ("Drum Kit", "DK-170", "Yedek Parça"),
+    ])
+    create_search_index(conn, 'stock')
+    return conn
+
+
+def search(conn, text, columns=None):
+    clause, params = match_clause('stock', 'id', text, columns)
+    return [row[0] for row in conn.execute(f"SELECT part_number FROM stock_items WHERE {clause} ORDER BY id", params)]
+
+
+def test_prefix_and_turkish_folding():
+    conn = make_db()
+    assert search(conn, "kyo") == ["TK1150"]
+    assert search(conn, "isik") == ["DV_1150"]
+
+
+def test_part_number_matches_middle_of_code():
+    conn = make_db()
+    assert search(conn, "1150") == ["TK1150", "DV_1150"]
+    assert search(conn, "K-17") == ["DK-170"]
+
+
+def test_like_wildcards_are_literal():
+    conn = make_db()
+    assert search(conn, "V_1") == ["DV_1150"]
+    assert search(conn, "1%5") == []
+    assert match_clause('stock', 'id', "%") == ("", [])
+
+
+def test_no_substring_search_outside_code_columns():
+    conn = make_db()
+    assert search(conn, "1150", ['name']) == []
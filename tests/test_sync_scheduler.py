@@ -0,0 +1,89 @@
+"""Senkronizasyon zamanlaması: sessizlik bekleme (debounce) ve hatada katlanan bekleme."""
+import pytest
+
+from utils.sync_scheduler import (BURST_THRESHOLD, DEBOUNCE_SECONDS, MAX_DELAY_SECONDS, MAX_POLL_SECONDS,
+                                  MIN_POLL_SECONDS, RETRY_BASE_SECONDS, SyncPolicy)
+
+
+def test_nothing_due_without_changes():
+    assert SyncPolicy().due_at() is None
+
+
+def test_waits_for_quiet_period_after_last_change():
+    policy = SyncPolicy()
+    policy.on_change(100.0)
+    assert policy.due_at() == 100.0 + DEBOUNCE_SECONDS
+
+    policy.on_change(101.5)
+    assert policy.due_at() == 101.5 + DEBOUNCE_SECONDS
+
+
+def test_continuous_changes_are_sent_within_max_delay():
+    policy = SyncPolicy()
+    for second in range(30):
+        policy.on_change(100.0 + second)
+
+    assert policy.due_at() == 100.0 + MAX_DELAY_SECONDS
+
+
+def test_deep_queue_is_sent_immediately():
+    policy = SyncPolicy()
+    policy.on_change(100.0, BURST_THRESHOLD)
+
+    assert policy.due_at() == 100.0
+
+
+def test_slow_link_lengthens_quiet_period():
+    policy = SyncPolicy()
+    policy.on_sync_finished(0.0, duration=6.0, result={'success': 10, 'failed': 0}, remaining=0)
+    policy.on_change(100.0)
+
+    assert policy.debounce() == 6.0
+    assert policy.due_at() == 106.0
+
+    policy.last_duration = 60.0
+    assert policy.debounce() == MAX_DELAY_SECONDS
+
+
+@pytest.mark.parametrize('result', [None, {'success': 0, 'failed': 3, 'error': '3 kayıt başarısız'},
+                                    {'success': 0, 'failed': 0, 'error': 'bağlantı yok'}])
+def test_failures_back_off_exponentially_up_to_interval(result):
+    policy = SyncPolicy(max_interval=100.0)
+    delays = []
+    for attempt in range(5):
+        now = 1000.0 * attempt
+        policy.on_sync_finished(now, duration=0.1, result=result, remaining=3)
+        delays.append(policy.due_at() - now)
+
+    assert delays == [RETRY_BASE_SECONDS, 2 * RETRY_BASE_SECONDS, 4 * RETRY_BASE_SECONDS, 100.0, 100.0]
+    assert policy.pending == 3
+
+
+def test_success_clears_backoff_and_continues_with_remaining():
+    policy = SyncPolicy()
+    policy.on_sync_finished(0.0, duration=0.1, result=None, remaining=5)
+    assert policy.failures == 1
+
+    policy.on_sync_finished(50.0, duration=0.1, result={'success': 500, 'failed': 0}, remaining=5)
+
+    assert policy.failures == 0
+    assert policy.due_at() == 50.0 + DEBOUNCE_SECONDS
+
+
+def test_empty_queue_resets_failures():
+    policy = SyncPolicy()
+    policy.on_sync_finished(0.0, duration=0.1, result=None, remaining=5)
+    policy.on_sync_finished(20.0, duration=0.1, result=None, remaining=0)
+
+    assert policy.failures == 0
+    assert policy.due_at() is None
+
+
+def test_idle_polls_slow_down_until_next_change():
+    policy = SyncPolicy()
+    for _ in range(10):
+        policy.on_idle_poll()
+    assert policy.poll_interval == MAX_POLL_SECONDS
+
+    policy.on_change(0.0)
+    assert policy.poll_interval == MIN_POLL_SECONDS
@@ -0,0 +1,128 @@
+"""
+Azure senkronizasyonu ölçümü (çevrimdışı).
+
+Satır satır senkronizasyon (kayıt başına SELECT COUNT + UPDATE/INSERT,
+eklemelerde IDENTITY_INSERT ON/OFF) ile toplu MERGE yolunu
+(`utils.azure_bulk_sync.merge_records`) aynı kayıtlar üzerinde karşılaştırır.
+Hedef, Azure SQL emülatöründeki (utils/azure_emulator.py) bir tablodur;
+gecikme ve gidiş-dönüş sayımı emülatörden gelir (`executemany`, SQL
+Server'daki `fast_executemany` gibi tek gidiş-dönüş sayılır).
+
+Kayıtlardan sonuncusu benzersiz ad kısıtını bilerek ihlal eder: iki yolda da
+"1 hatalı" ve MERGE'te o kaydın kimliğiyle bir UNIQUE hatası görülmelidir.
+Bu, partinin bölünerek yalnızca hatalı kaydın raporlandığını gösterir.
+
+Kullanım:
+    python tools/azure_sync_benchmark.py --rows 3000 --rtt-ms 40
+"""
+import argparse
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.azure_bulk_sync import merge_records
+from utils.azure_emulator import AzureEmulator, EmulatedMergeBackend
+
+TABLE_DDL = """CREATE TABLE customers (
+    id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE, phone TEXT, email TEXT, address TEXT
+)"""
+
+
+def sync_row_by_row(conn, schema_name: str, table_name: str, records: list) -> dict:
+    """Eski `sync_table_data` akışı (kayıt başına 2-4 çağrı)."""
+    target = f'"{schema_name}"."{table_name}"'
+    cursor = conn.cursor()
+    success = failed = 0
+    for record in records:
+        record_id = record['id']
+        try:
+            cursor.execute(f"SELECT COUNT(*) FROM {target} WHERE id = ?", (record_id,))
+            columns = [k for k in record if k != 'id']
+            values = [record[k] for k in columns]
+            if cursor.fetchone()[0] > 0:
+                cursor.execute(f"UPDATE {target} SET {', '.join(f'{c} = ?' for c in columns)} WHERE id = ?",
+                               values + [record_id])
+            else:
+                cursor.execute(f"SET IDENTITY_INSERT [{schema_name}].[{table_name}] ON")
+                cursor.execute(f"INSERT INTO {target} (id, {', '.join(columns)}) VALUES ({', '.join('?' * (len(columns) + 1))})",
+                               [record_id] + values)
+                cursor.execute(f"SET IDENTITY_INSERT [{schema_name}].[{table_name}] OFF")
+            success += 1
+        except sqlite3.Error:
+            failed += 1
+    conn.commit()
+    return {'success': success, 'failed': failed}
+
+
+def make_records(count: int, existing: int) -> list:
+    """Yarısı mevcut kayıtların güncellemesi, yarısı yeni kayıt; bir kayıt bilerek hatalı."""
+    records = []
+    for i in range(count):
+        record_id = (i // 2) % existing + 1 if i % 2 == 0 else existing + i + 1
+        records.append({'id': record_id, 'name': f"Müşteri {record_id}", 'phone': f"0555{i:07d}",
+                        'email': f"m{record_id}@ornek.com", 'address': f"Adres {i}"})
+    # Benzersiz ad kısıtını ihlal eden kayıt: hata kimliğiyle raporlanmalı
+    records[-1] = dict(records[-1], name=records[0]['name'])
+    return records
+
+
+def create_target(emulator: AzureEmulator, schema_name: str, existing: int) -> None:
+    """Emülatörde `existing` kayıtlı customers tablosunu oluşturur (trafik sayılmaz)."""
+    source = sqlite3.connect(':memory:')
+    try:
+        source.execute(TABLE_DDL)
+        source.executemany("INSERT INTO customers (id, name) VALUES (?, ?)",
+                           [(i, f"Eski {i}") for i in range(1, existing + 1)])
+        emulator.create_schema(schema_name, ['customers'])
+        emulator.load_rows(schema_name, source, 'customers')
+    finally:
+        source.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Satır satır ve toplu MERGE senkronizasyonunu karşılaştırır.")
+    parser.add_argument('--rows', type=int, default=3000)
+    parser.add_argument('--existing', type=int, default=2000)
+    parser.add_argument('--rtt-ms', type=float, default=40.0, help="Taklit edilen gidiş-dönüş süresi")
+    parser.add_argument('--batch-size', type=int, default=500)
+    parser.add_argument('--skip-row-by-row', action='store_true')
+    args = parser.parse_args()
+
+    records = make_records(args.rows, args.existing)
+    work_dir = tempfile.mkdtemp(prefix='azure_sync_benchmark_')
+    try:
+        emulator = AzureEmulator(work_dir, rtt_ms=args.rtt_ms)
+
+        create_target(emulator, 'Benchmark_Merge', args.existing)
+        conn = emulator.connect()
+        emulator.stats.reset()
+        started = time.perf_counter()
+        result = merge_records(EmulatedMergeBackend(conn), 'customers', records, 'Benchmark_Merge',
+                               batch_size=args.batch_size)
+        merge_time = time.perf_counter() - started
+        conn.close()
+        print(f"MERGE:        {merge_time:8.2f} sn, {emulator.stats.snapshot()['round_trips']:6d} gidiş-dönüş, "
+              f"{result['success']} başarılı, {result['failed']} hatalı {result['errors'][:1]}")
+        print("              (1 hatalı kayıt beklenir: son kayıt benzersiz ad kısıtını bilerek ihlal eder)")
+
+        if not args.skip_row_by_row:
+            create_target(emulator, 'Benchmark_RowByRow', args.existing)
+            conn = emulator.connect()
+            emulator.stats.reset()
+            started = time.perf_counter()
+            result = sync_row_by_row(conn, 'Benchmark_RowByRow', 'customers', records)
+            row_time = time.perf_counter() - started
+            conn.close()
+            print(f"Satır satır:  {row_time:8.2f} sn, {emulator.stats.snapshot()['round_trips']:6d} gidiş-dönüş, "
+                  f"{result['success']} başarılı, {result['failed']} hatalı")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
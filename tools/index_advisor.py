@@ -0,0 +1,51 @@
+"""
+İndeks danışmanı komut satırı aracı.
+
+Sorgu ölçümünün JSON dökümündeki (DatabaseManager.dump_query_stats) sorguları
+verilen veritabanında EXPLAIN QUERY PLAN ile çalıştırır ve tam tablo taraması
+veya geçici B-ağacı kullanan sorguları listeler.
+
+Kullanım:
+    python tools/index_advisor.py query_stats_YYYYMMDD_HHMMSS.json --db teknik_servis_local.db
+"""
+import argparse
+import json
+import os
+import sqlite3
+import sys
+from pathlib import Path
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.database.index_advisor import advise, format_report
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Yakalanan sorguların planlarını inceler.")
+    parser.add_argument('stats', help="dump_query_stats() ile yazılan JSON dosyası")
+    parser.add_argument('--db', required=True, help="SQLite veritabanı dosyası")
+    parser.add_argument('--limit', type=int, default=30, help="Gösterilecek en fazla sorgu sayısı")
+    parser.add_argument('--json', action='store_true', help="Sonucu JSON olarak yazdır")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.db):
+        sys.exit(f"Veritabanı bulunamadı: {args.db}")
+    with open(args.stats, encoding='utf-8') as f:
+        statements = json.load(f).get('statements', [])
+
+    # Salt okunur açılır; danışman veritabanını değiştirmez
+    conn = sqlite3.connect(Path(args.db).resolve().as_uri() + "?mode=ro", uri=True)
+    try:
+        findings = advise(conn, statements)[:args.limit]
+    finally:
+        conn.close()
+
+    if args.json:
+        print(json.dumps(findings, ensure_ascii=False, indent=2))
+    else:
+        print(format_report(findings))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
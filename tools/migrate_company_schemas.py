@@ -0,0 +1,51 @@
+"""
+Firma şemalarına bekleyen şema migrasyonlarını uygular (bir kerelik, yönetici).
+
+Her firma şeması için `AzureSQLManager.migrate_company_schema` çalıştırılır;
+uygulanan adımlar şemadaki `_schema_version` tablosuna yazıldığından araç
+tekrar çalıştırıldığında yalnızca yeni adımlar uygulanır. Adımlar tabloları
+yeniden yazabilir (ör. ROWVERSION sütunu eklemek); yoğun olmayan bir saatte
+çalıştırın.
+
+Kullanım:
+    python tools/migrate_company_schemas.py --credentials-dir <dizin> [--company Firma_Adi]
+"""
+import argparse
+import logging
+import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.azure_sql_manager import AzureSQLManager
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Firma şemalarına bekleyen migrasyonları uygular.")
+    parser.add_argument('--credentials-dir', required=True, help="Şifreli Azure SQL bilgilerinin bulunduğu dizin")
+    parser.add_argument('--company', action='append',
+                        help="Yalnızca bu firma (şema adındaki 'Company_' öneki olmadan); tekrarlanabilir")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    manager = AzureSQLManager(Path(args.credentials_dir))
+    if not manager.load_credentials() or not manager.connect():
+        sys.exit("Azure SQL bağlantısı kurulamadı")
+
+    failed = 0
+    for company in args.company or manager.list_companies():
+        schema_name = f"Company_{company}"
+        try:
+            applied = manager.migrate_company_schema(schema_name)
+        except Exception as e:
+            failed += 1
+            print(f"{schema_name}: HATA {e}")
+            continue
+        print(f"{schema_name}: {applied} adım uygulandı")
+    manager.disconnect()
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,194 @@
+"""
+Bulut senkronizasyonu uçtan uca ölçümü (ağsız).
+
+Geçici bir dizinde uygulamanın yerel veritabanını oluşturur, müşteri, cihaz,
+stok ve teknisyen tablolarına N değişmiş kayıt ekler ve `SyncManager.force_sync`
+ile Azure SQL emülatörüne (utils/azure_emulator.py) gönderir. Emülatör şeması
+Azure'daki tanımlardan oluşturulur; yalnızca bulutta bulunan sütunlar gönderilir. Kayıtların
+`--update-ratio` kadarı bulutta zaten bulunur ve yerelde güncellenir, kalanı
+yeni eklenir.
+
+Raporlanan değerler: saniyede kayıt, gidiş-dönüş sayısı, gönderilen/alınan
+bayt, kayıt başına bayt ve tablo bazında süreler. Sonda bulut kayıt sayılarının
+yerelle aynı olduğu ve kuyrukta değişiklik kalmadığı kontrol edilir.
+
+Kullanım:
+    python tools/sync_benchmark.py --rows 5000 --rtt-ms 40 --bandwidth-kbps 20000
+"""
+import argparse
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+SCHEMA = 'Company_Benchmark'
+
+# (tablo, kayıtların payı); yabancı anahtar sırasıyla
+TABLE_SHARES = (
+    ('customers', 0.4),
+    ('devices', 0.3),
+    ('stock_items', 0.2),
+    ('technicians', 0.1),
+)
+
+# tablo -> (sütunlar, kayıt üretici(sıra no, müşteri id))
+TABLE_ROWS = {
+    'customers': (
+        ('name', 'phone', 'email', 'address', 'tax_id', 'tax_office', 'is_contract', 'contract_price'),
+        lambda i, _: (f"Müşteri {i}", f"0212 555 {i % 10000:04d}", f"musteri{i}@ornek.com.tr",
+                      f"Atatürk Cad. No:{i} Kadıköy/İstanbul", f"{i:010d}", 'Kadıköy', i % 2, 150.0 + i % 50),
+    ),
+    'devices': (
+        ('customer_id', 'model', 'type', 'serial_number', 'is_cpc', 'cpc_bw_price', 'cpc_color_price'),
+        lambda i, customer_id: (customer_id, 'TASKalfa 2554ci', 'Renkli', f"SN{i:08d}", i % 2, 0.35, 1.9),
+    ),
+    'stock_items': (
+        ('item_type', 'name', 'part_number', 'quantity', 'purchase_price', 'sale_price', 'location'),
+        lambda i, _: ('Toner', f"Toner TK-{i}", f"TK{i:06d}", i % 40, 450.0 + i % 100, 690.0 + i % 100,
+                      f"Raf {i % 30}"),
+    ),
+    'technicians': (
+        ('name', 'surname', 'phone', 'email'),
+        lambda i, _: (f"Teknisyen {i}", 'Yılmaz', f"0532 111 {i % 10000:04d}", f"teknisyen{i}@ornek.com.tr"),
+    ),
+}
+
+# Güncellenen kayıtlarda değiştirilen sütun
+UPDATE_COLUMNS = {'customers': 'phone', 'devices': 'type', 'stock_items': 'location', 'technicians': 'phone'}
+
+
+def insert_rows(conn: sqlite3.Connection, table: str, start: int, count: int) -> None:
+    columns, make_row = TABLE_ROWS[table]
+    customer_ids = [row[0] for row in conn.execute("SELECT id FROM customers ORDER BY id")] or [None]
+    rows = [make_row(i, customer_ids[i % len(customer_ids)]) for i in range(start, start + count)]
+    conn.executemany(f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)})",
+                     rows)
+
+
+def seed(conn: sqlite3.Connection, emulator, rows: int, update_ratio: float) -> dict:
+    """
+    Her tabloya payı kadar kayıt ekler; `update_ratio` kadarı önce buluta
+    kopyalanır (senkronize edilmiş sayılır), sonra yerelde güncellenir.
+
+    Returns:
+        {tablo: (güncellenen, eklenen)}
+    """
+    counts = {}
+    for table, share in TABLE_SHARES:
+        count = max(1, round(rows * share))
+        updated = round(count * update_ratio)
+        counts[table] = (updated, count - updated)
+
+    with conn:
+        for table, _ in TABLE_SHARES:
+            insert_rows(conn, table, 1, counts[table][0])
+    for table, _ in TABLE_SHARES:
+        emulator.load_rows(SCHEMA, conn, table)
+    with conn:
+        conn.execute("DELETE FROM sync_changes")
+        for table, _ in TABLE_SHARES:
+            updated, inserted = counts[table]
+            column = UPDATE_COLUMNS[table]
+            conn.execute(f"UPDATE {table} SET {column} = {column} || ' (güncel)'")
+            insert_rows(conn, table, updated + 1, inserted)
+    return counts
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="SyncManager.force_sync ölçümü (Azure SQL emülatörü ile).")
+    parser.add_argument('--rows', type=int, default=5000, help="Değişmiş kayıt sayısı (tüm tablolar)")
+    parser.add_argument('--rtt-ms', type=float, default=40.0, help="Gidiş-dönüş gecikmesi (ms)")
+    parser.add_argument('--bandwidth-kbps', type=float, default=None, help="Hat hızı (kbit/sn); verilmezse sınırsız")
+    parser.add_argument('--update-ratio', type=float, default=0.5,
+                        help="Bulutta zaten bulunan (güncellenen) kayıtların oranı")
+    parser.add_argument('--json', action='store_true', help="Sonucu JSON olarak yazdır")
+    parser.add_argument('--verbose', action='store_true', help="Uygulama loglarını göster")
+    args = parser.parse_args()
+
+    work_dir = Path(tempfile.mkdtemp(prefix='sync_benchmark_'))
+    # Uygulama veritabanı kullanıcının verisine dokunmadan geçici dizinde oluşturulur
+    os.environ['APPDATA'] = str(work_dir)
+
+    from utils.azure_emulator import AzureEmulator, EmulatedAzureSQLManager
+    from utils.database import db_manager
+    from utils.sync_manager import SyncManager
+
+    if not args.verbose:
+        logging.getLogger().setLevel(logging.WARNING)
+
+    try:
+        emulator = AzureEmulator(work_dir / 'azure', rtt_ms=args.rtt_ms, bandwidth_kbps=args.bandwidth_kbps)
+        sync_manager = SyncManager(db_manager.database_path, azure_manager=EmulatedAzureSQLManager(emulator, SCHEMA))
+
+        conn = sqlite3.connect(db_manager.database_path, timeout=30)
+        try:
+            emulator.create_schema(SCHEMA, [table for table, _ in TABLE_SHARES])
+            counts = seed(conn, emulator, args.rows, args.update_ratio)
+        finally:
+            conn.close()
+
+        pending = sync_manager.get_pending_changes_count()
+        emulator.stats.reset()
+        started = time.perf_counter()
+        sync_manager.force_sync()
+        seconds = time.perf_counter() - started
+        link = emulator.stats.snapshot()
+
+        conn = sqlite3.connect(db_manager.database_path)
+        try:
+            mismatched = [
+                table for table, _ in TABLE_SHARES
+                if conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                != emulator.query(SCHEMA, table, f'SELECT COUNT(*) FROM "{table}"')[0][0]
+            ]
+        finally:
+            conn.close()
+        left = sync_manager.get_pending_changes_count()
+
+        report = {
+            'rows': pending,
+            'updated': sum(updated for updated, _ in counts.values()),
+            'inserted': sum(inserted for _, inserted in counts.values()),
+            'rtt_ms': args.rtt_ms,
+            'bandwidth_kbps': args.bandwidth_kbps,
+            'seconds': round(seconds, 3),
+            'rows_per_second': round(pending / seconds, 1) if seconds else None,
+            'round_trips': link['round_trips'],
+            'bytes_sent': link['bytes_sent'],
+            'bytes_received': link['bytes_received'],
+            'bytes_per_row': round(link['bytes_sent'] / pending, 1) if pending else None,
+            'tables': sync_manager.get_table_stats(),
+            'pending_after': left,
+            'mismatched_tables': mismatched,
+            'ok': not left and not mismatched,
+        }
+    finally:
+        db_manager.close()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    else:
+        print(f"{report['rows']} kayıt ({report['updated']} güncelleme, {report['inserted']} ekleme), "
+              f"RTT {args.rtt_ms:g} ms, hat {args.bandwidth_kbps or 'sınırsız'} kbit/sn")
+        print(f"  Süre:            {report['seconds']:.2f} sn ({report['rows_per_second']} kayıt/sn)")
+        print(f"  Gidiş-dönüş:     {report['round_trips']}")
+        print(f"  Gönderilen:      {report['bytes_sent']:,} bayt ({report['bytes_per_row']} bayt/kayıt)")
+        print(f"  Alınan:          {report['bytes_received']:,} bayt")
+        for stats in report['tables']:
+            print(f"  {stats['table_name']:<20} {stats['records']:>7} kayıt  {stats['seconds']:.2f} sn"
+                  + (f"  {stats['failed']} hata" if stats['failed'] else ''))
+        print("  Sonuç:           " + ("tutarlı" if report['ok'] else
+                                      f"TUTARSIZ (kalan {left}, tablolar: {', '.join(mismatched) or '-'})"))
+    return 0 if report['ok'] else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,71 @@
+"""
+TCMB kur arşivi taklidi (çevrimdışı deneme için).
+
+Bir klasördeki XML dosyalarını TCMB'nin adres düzeninde sunar:
+    /YYYYMM/DDMMYYYY.xml   arşiv bülteni (dosya yoksa 404, tatil günü gibi)
+    /today.xml             klasördeki en yeni bülten
+
+Uygulamayı bu sunucuya yönlendirmek için PROSERVIS_TCMB_URL ortam değişkeni
+kullanılır; kur eşitlemesi (`DatabaseManager.sync_exchange_rates`) böylece
+ağa çıkmadan denenebilir.
+
+Kullanım:
+    python tools/tcmb_fixture_server.py --port 8765
+    PROSERVIS_TCMB_URL=http://127.0.0.1:8765 python main.py
+"""
+import argparse
+import os
+import re
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+DEFAULT_FIXTURES = Path(__file__).resolve().parent / 'tcmb_fixtures'
+
+_ARCHIVE_FILE = re.compile(r'^(\d{2})(\d{2})(\d{4})\.xml$')
+
+
+def latest_bulletin(directory: Path) -> Path | None:
+    """Klasördeki en yeni bülten dosyası (DDMMYYYY.xml adlarına göre)."""
+    def bulletin_date(path: Path) -> str:
+        day, month, year = _ARCHIVE_FILE.match(path.name).groups()
+        return f"{year}{month}{day}"
+    files = [p for p in directory.glob('*/*.xml') if _ARCHIVE_FILE.match(p.name)]
+    return max(files, key=bulletin_date) if files else None
+
+
+class FixtureHandler(SimpleHTTPRequestHandler):
+    """Bülten dosyalarını XML olarak sunar; today.xml en yeni bültene yönlendirilir."""
+
+    def translate_path(self, path: str) -> str:
+        if path.split('?', 1)[0].rstrip('/').endswith('/today.xml'):
+            latest = latest_bulletin(Path(self.directory))
+            if latest is not None:
+                return str(latest)
+        return super().translate_path(path)
+
+    def guess_type(self, path) -> str:
+        return 'application/xml'
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="TCMB kur arşivini yerel XML dosyalarıyla taklit eder.")
+    parser.add_argument('--dir', default=str(DEFAULT_FIXTURES), help="Bülten klasörü (YYYYMM/DDMMYYYY.xml)")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    args = parser.parse_args()
+
+    directory = os.path.abspath(args.dir)
+    server = ThreadingHTTPServer((args.host, args.port), partial(FixtureHandler, directory=directory))
+    print(f"TCMB taklit sunucusu: http://{args.host}:{server.server_port} ({directory})")
+    print(f"Uygulama için: PROSERVIS_TCMB_URL=http://{args.host}:{server.server_port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,7 +1,6 @@
 # -*- coding: utf-8 -*-
-import json
+import os
 from datetime import datetime
-from decimal import Decimal, InvalidOperation
 import logging
 logger = logging.getLogger(__name__)
 
@@ -9,11 +8,13 @@ from PyQt6.QtCore import Qt, QDate, pyqtSignal as Signal
 from PyQt6.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QGroupBox, QLabel, QComboBox,
     QDateEdit, QTableWidget, QTableWidgetItem, QLineEdit, QPushButton,
-    QMessageBox, QHeaderView, QCompleter, QFileDialog
+    QMessageBox, QHeaderView, QCompleter, QFileDialog, QProgressDialog
 )
 
-from utils.currency_converter import get_exchange_rates
+from utils.currency_converter import MissingRateError, get_exchange_rates
+from utils.database.cpc_billing import invoice_lines, pdf_items, serialize_details
 from utils.pdf_generator import create_professional_invoice_pdf
+from utils.workers import CpcBatchInvoiceThread
 
 class BillingTab(QWidget):
     """Sayaç okuma ve CPC faturalandırma işlemlerini yöneten sekme."""
@@ -88,10 +89,13 @@ class BillingTab(QWidget):
         layout = QHBoxLayout()
         self.save_meters_btn = QPushButton("💾 Sayaçları Kaydet")
         self.create_invoice_btn = QPushButton("📄 Faturaya Dönüştür")
+        self.batch_invoice_btn = QPushButton("🗂️ Toplu Faturalama (Ay Sonu)")
+        self.batch_invoice_btn.setToolTip("Seçili dönem için tüm CPC müşterilerinin faturalarını oluşturur ve PDF'lerini bir klasöre kaydeder.")
         
         layout.addStretch()
         layout.addWidget(self.save_meters_btn)
         layout.addWidget(self.create_invoice_btn)
+        layout.addWidget(self.batch_invoice_btn)
         return layout
 
     def _connect_signals(self):
@@ -99,6 +103,7 @@ class BillingTab(QWidget):
         self.customer_combo.activated.connect(self.populate_devices_for_customer)
         self.save_meters_btn.clicked.connect(self.save_meters)
         self.create_invoice_btn.clicked.connect(self.create_invoice)
+        self.batch_invoice_btn.clicked.connect(self.create_batch_invoices)
 
     def load_customers(self):
         """Müşteri listesini veritabanından yükler - sadece CPC cihazı olan müşteriler."""
@@ -107,7 +112,7 @@ class BillingTab(QWidget):
         self.customer_combo.clear()
         try:
             # Sadece CPC cihazı olan müşterileri getir (customer_devices tablosundan)
-            customers = self.db.fetch_all("""
+            customers = self.db.fetch_all_cached("""
                 SELECT DISTINCT c.id, c.name 
                 FROM customers c 
                 INNER JOIN customer_devices cd ON c.id = cd.customer_id 
@@ -286,47 +291,32 @@ class BillingTab(QWidget):
         end_date = self.end_date_edit.date().toString("yyyy-MM-dd")
 
         try:
-            logger.debug(f"DEBUG: get_billable_cpc_data çağrılıyor - customer_id: {customer_id}, start_date: {start_date}, end_date: {end_date}")
-            billable_data = self.db.get_billable_cpc_data(customer_id, start_date, end_date)
-            logger.debug(f"DEBUG: billable_data alındı - {len(billable_data) if billable_data else 0} kayıt")
+            logger.debug(f"DEBUG: calculate_cpc_billing çağrılıyor - customer_id: {customer_id}, start_date: {start_date}, end_date: {end_date}")
+            billing = self.db.calculate_cpc_billing([customer_id], start_date, end_date)
+            logger.debug(f"DEBUG: Faturalanacak cihaz sayısı: {len(billing)}")
 
-            if not billable_data:
+            if not len(billing):
                 QMessageBox.information(self, "Bilgi", "Seçilen tarih aralığında faturalandırılacak yeni sayaç okuması bulunamadı.")
                 return
 
             rates = get_exchange_rates()
             logger.debug(f"DEBUG-RATES: TCMB'den çekilen döviz kurları: {rates}")
             
-            # Kur kontrolü - eksik kurları belirle
-            missing_currencies = []
-            if not rates:
-                missing_currencies = ['TÜM KURLAR']
-            else:
-                if 'EUR' not in rates:
-                    missing_currencies.append('EUR')
-                if 'USD' not in rates:
-                    missing_currencies.append('USD')
-            
+            # Kur kontrolü - TCMB kuru bilinmeyen para birimiyle fatura kesilmez
+            missing_currencies = [code for code in ('USD', 'EUR') if code not in rates]
             if missing_currencies:
                 error_msg = f"Döviz kurları alınamadı!\n\n"
                 error_msg += f"Eksik kurlar: {', '.join(missing_currencies)}\n\n"
                 error_msg += f"Lütfen kontrol edin:\n"
                 error_msg += f"• İnternet bağlantınız aktif mi?\n"
                 error_msg += f"• TCMB web sitesine erişim var mı?\n\n"
-                error_msg += f"Not: Varsayılan kurlar kullanılacak ancak fatura tutarları yanlış olabilir."
+                error_msg += f"Kurlar alınana kadar fatura oluşturulamaz."
                 logger.warning(f"⚠️ UYARI: {error_msg}")
-                
-                # Kullanıcıya uyarı göster ama devam etmesine izin ver (varsayılan kurlarla)
-                reply = QMessageBox.warning(
-                    self, "Döviz Kuru Uyarısı", 
-                    error_msg + "\n\nYine de devam etmek istiyor musunuz?",
-                    QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No
-                )
-                if reply != QMessageBox.StandardButton.Yes:
-                    return
+                QMessageBox.critical(self, "Döviz Kuru Hatası", error_msg)
+                return
 
             logger.debug("DEBUG: _process_billing_data çağrılıyor")
-            invoice_details, grand_total_tl = self._process_billing_data(billable_data, rates, customer_id, start_date, end_date)
+            invoice_details, grand_total_tl = self._process_billing_data(billing, rates, customer_id, start_date, end_date)
 
             logger.debug(f"DEBUG: Fatura detayları oluşturuldu - {len(invoice_details)} kalem, toplam: {grand_total_tl} TL")
 
@@ -342,7 +332,7 @@ class BillingTab(QWidget):
             location_id = location_row['id']
 
             # Faturayı veritabanına kaydet
-            details_json = json.dumps([{k: str(v) for k, v in item.items()} for item in invoice_details], ensure_ascii=False, indent=4)
+            details_json = serialize_details(invoice_details)
             logger.debug(f"DEBUG-JSON: invoice_details (STRINGIFIED): {details_json}")
 
             invoice_id = self.db.create_cpc_invoice(
@@ -353,85 +343,20 @@ class BillingTab(QWidget):
                 details_json=details_json
             )
             
-            # Faturalandırılan kayıtları işaretle
-            if invoice_id:
-                for item in invoice_details:
-                    for record_id in item.get('record_ids', []):
-                        self.db.execute_query("UPDATE service_records SET is_invoiced = 1 WHERE id = ?", (record_id,))
-            
             # Fatura verilerini PDF'e yazdırmak için hazırla
             if invoice_id:
                 customer_info = self.db.get_customer_by_id(customer_id)
                 company_info = self.db.get_all_company_info()
                 
-                # PDF'e gönderilecek fatura kalemlerini formatla
-                pdf_items = []
-                def _norm(cur):
-                    c = str(cur or 'TL').strip().upper()
-                    if c in ('EURO','EUR','E'): return 'EUR'
-                    if c in ('DOLAR','USD','US$'): return 'USD'
-                    if c in ('TL','TRY','₺'): return 'TL'
-                    return c
-                for item in invoice_details:
-                    # Kiralama bedeli kalemi ise
-                    if item.get('is_rental', False):
-                        # Sadeleştirilmiş kiralama bedeli açıklaması
-                        model = item.get('model', '')
-                        serial_number = item.get('serial_number', '')
-                        rental_item = {
-                            "description": f"{model} ({serial_number}) - Aylık Kiralama",
-                            "quantity": item['quantity'],
-                            "unit_price": float(item.get('unit_price_tl', 0)),  # Sadece TL fiyat göster
-                            "unit_price_tl": float(item.get('unit_price_tl', 0)),
-                            "total": float(item.get('total_tl', 0)),
-                            "currency": 'TL'  # Her zaman TL göster
-                        }
-                        logger.debug(f"DEBUG: Kiralama bedeli PDF kalemi: {rental_item}")
-                        pdf_items.append(rental_item)
-                    else:
-                        # Normal CPC kalemi
-                        device_model = item['model']
-                        serial_number = item['serial_number']
-                        bw_usage = int(item['bw_usage'])
-                        color_usage = int(item['color_usage'])
-                        
-                        # Siyah-beyaz kullanım kalemi (eğer kullanım varsa)
-                        if bw_usage > 0:
-                            bw_unit_price_tl = float(item.get('cpc_bw_price_tl', 0))
-                            bw_total_tl = float(item.get('total_bw_cost_tl', 0))
-                            bw_item = {
-                                "description": f"{device_model} ({serial_number}) - S/B Baskı",
-                                "quantity": bw_usage,
-                                "unit_price": bw_unit_price_tl,  # Sadece TL fiyat
-                                "unit_price_tl": bw_unit_price_tl,
-                                "total": bw_total_tl,
-                                "currency": 'TL'  # Her zaman TL göster
-                            }
-                            logger.debug(f"DEBUG: S/B PDF kalemi: {bw_item}")
-                            pdf_items.append(bw_item)
-                        
-                        # Renkli kullanım kalemi (eğer kullanım varsa)
-                        if color_usage > 0:
-                            color_unit_price_tl = float(item.get('cpc_color_price_tl', 0))
-                            color_total_tl = float(item.get('total_color_cost_tl', 0))
-                            color_item = {
-                                "description": f"{device_model} ({serial_number}) - Renkli Baskı",
-                                "quantity": color_usage,
-                                "unit_price": color_unit_price_tl,  # Sadece TL fiyat
-                                "unit_price_tl": color_unit_price_tl,
-                                "total": color_total_tl,
-                                "currency": 'TL'  # Her zaman TL göster
-                            }
-                            logger.debug(f"DEBUG: Renkli PDF kalemi: {color_item}")
-                            pdf_items.append(color_item)
-
-                logger.debug(f"DEBUG-PDFITEMS: pdf_items={pdf_items}")
+                # PDF'e gönderilecek fatura kalemlerini formatla (tutarlar TL)
+                items = pdf_items(invoice_details)
+                logger.debug(f"DEBUG-PDFITEMS: pdf_items={items}")
                 pdf_data = {
                     'id': invoice_id,
                     'invoice_date': end_date,
                     'customer_info': customer_info,
                     'company_info': company_info,
-                    'items': pdf_items,
+                    'items': items,
                     'vat_rate': self.db.get_setting('default_vat_rate', 20),
                     'currency': 'TL',
                 }
@@ -443,6 +368,8 @@ class BillingTab(QWidget):
                 QMessageBox.information(self, "Başarılı", f"Fatura (ID: {invoice_id}) başarıyla oluşturuldu.")
                 self._redirect_to_invoicing_tab()
 
+        except MissingRateError as e:
+            QMessageBox.critical(self, "Döviz Kuru Hatası", str(e))
         except Exception as e:
             QMessageBox.critical(self, "Fatura Oluşturma Hatası", f"Fatura oluşturulurken beklenmedik bir hata oluştu: {str(e)}")
 
@@ -465,268 +392,88 @@ class BillingTab(QWidget):
             except Exception as e:
                 QMessageBox.critical(self, "PDF Hatası", f"PDF oluşturulurken bir hata oluştu: {e}")
 
-    def _process_billing_data(self, billable_data, rates, customer_id=None, start_date: str | None = None, end_date: str | None = None):
-        """Fatura verilerini işler, maliyetleri hesaplar ve TL'ye çevirir. Cihaz bazında toplulaştırır."""
-        # Cihaz bazında verileri toplulaştır
-        device_aggregates = {}
-        
-        if not customer_id and billable_data:
-            customer_id = billable_data[0].get('customer_id')
-            
-        logger.debug(f"DEBUG: Müşteri ID: {customer_id}")
-        
-        for data in billable_data:
-            device_id = data.get('device_id')
-            if not device_id:
-                continue
-                
-            bw_usage = Decimal(data.get('bw_usage', 0))
-            color_usage = Decimal(data.get('color_usage', 0))
-
-            if bw_usage <= 0 and color_usage <= 0:
-                continue
-
-            if device_id not in device_aggregates:
-                # İlk kez karşılaşılan cihaz - temel bilgileri kaydet
-                device_aggregates[device_id] = {
-                    'device_id': device_id,
-                    'model': data.get('model', ''),
-                    'serial_number': data.get('serial_number', ''),
-                    'color_type': data.get('color_type', ''),
-                    'cpc_bw_price': Decimal(data.get('cpc_bw_price', 0)),
-                    'cpc_color_price': Decimal(data.get('cpc_color_price', 0)),
-                    'cpc_bw_currency': data.get('cpc_bw_currency', 'TL'),
-                    'cpc_color_currency': data.get('cpc_color_currency', 'TL'),
-                    'total_bw_usage': Decimal('0'),
-                    'total_color_usage': Decimal('0'),
-                    'record_ids': []  # Faturalandırılan kayıt ID'lerini takip et
-                }
-            
-            # Kullanımları topla
-            device_aggregates[device_id]['total_bw_usage'] += bw_usage
-            device_aggregates[device_id]['total_color_usage'] += color_usage
-            device_aggregates[device_id]['record_ids'].append(data.get('record_id'))
-
-        # Toplulaştırılmış verileri işle
-        invoice_details = []
-        grand_total_tl = Decimal('0.00')
-
-        for device_id, device_data in device_aggregates.items():
-            try:
-                bw_usage = device_data['total_bw_usage']
-                color_usage = device_data['total_color_usage']
-                
-                cpc_bw_price = device_data['cpc_bw_price']
-                cpc_color_price = device_data['cpc_color_price']
-                
-                bw_currency = device_data['cpc_bw_currency']
-                color_currency = device_data['cpc_color_currency']
-                
-                logger.debug(f"DEBUG-CURRENCY: Cihaz {device_id} - Ham para birimleri: BW='{bw_currency}', Color='{color_currency}'")
-                
-                # Normalize currency codes: map common variants to ISO codes used in rates
-                def _normalize_currency(cur):
-                    if not cur:
-                        logger.debug(f"DEBUG-CURRENCY: Para birimi boş/None, varsayılan TL kullanılıyor")
-                        return 'TL'
-                    c = str(cur).strip().upper()
-                    original_c = c
-                    if c in ('EURO', 'EUR', 'E', '€'): 
-                        c = 'EUR'
-                    elif c in ('DOLAR', 'USD', 'US$', '$', 'DOLLAR'): 
-                        c = 'USD'
-                    elif c in ('TL', 'TRY', '₺', 'TÜRK LİRASI', 'TURK LIRASI'): 
-                        c = 'TL'
-                    else:
-                        # Bilinmeyen para birimi - logla ve varsayılan olarak TL kullan
-                        logger.debug(f"DEBUG-CURRENCY: Bilinmeyen para birimi '{original_c}', TL olarak işleniyor")
-                        c = 'TL'
-                    
-                    if original_c != c:
-                        logger.debug(f"DEBUG-CURRENCY: Para birimi normalize edildi: '{original_c}' -> '{c}'")
-                    return c
-                bw_currency = _normalize_currency(bw_currency)
-                color_currency = _normalize_currency(color_currency)
-                
-                logger.debug(f"DEBUG-CURRENCY: Normalize edilmiş para birimleri: BW='{bw_currency}', Color='{color_currency}'")
-                logger.debug(f"DEBUG-RATES: Mevcut döviz kurları: {rates}")
-                logger.debug(f"DEBUG-RATES: BW para birimi '{bw_currency}' için kur: {rates.get(bw_currency, 'BULUNAMADI')}")
-                logger.debug(f"DEBUG-RATES: Color para birimi '{color_currency}' için kur: {rates.get(color_currency, 'BULUNAMADI')}")
-                
-                bw_rate = Decimal(str(rates.get(bw_currency, 1.0)))
-                color_rate = Decimal(str(rates.get(color_currency, 1.0)))
-                
-                # Kur kontrolü - eğer döviz ise ama kur 1.0 ise uyarı ver
-                if bw_currency != 'TL' and bw_rate == Decimal('1.0'):
-                    logger.warning(f"⚠️ UYARI: {bw_currency} için kur bulunamadı, 1.0 kullanılıyor!")
-                if color_currency != 'TL' and color_rate == Decimal('1.0'):
-                    logger.warning(f"⚠️ UYARI: {color_currency} için kur bulunamadı, 1.0 kullanılıyor!")
-
-                logger.debug(f"DEBUG-CALC: ═══ Cihaz {device_id} Hesaplama Başlangıcı ═══")
-                logger.debug(f"DEBUG-CALC: BW Kullanım: {bw_usage} sayfa")
-                logger.debug(f"DEBUG-CALC: BW Birim Fiyat: {cpc_bw_price} {bw_currency}")
-                logger.debug(f"DEBUG-CALC: BW Kur: {bw_rate}")
-                logger.debug(f"DEBUG-CALC: Color Kullanım: {color_usage} sayfa")
-                logger.debug(f"DEBUG-CALC: Color Birim Fiyat: {cpc_color_price} {color_currency}")
-                logger.debug(f"DEBUG-CALC: Color Kur: {color_rate}")
-
-                # Toplam maliyetleri hesapla (orijinal para biriminde)
-                total_bw_cost = bw_usage * cpc_bw_price
-                total_color_cost = color_usage * cpc_color_price
-                
-                logger.debug(f"DEBUG-CALC: BW Toplam Maliyet ({bw_currency}): {total_bw_cost}")
-                logger.debug(f"DEBUG-CALC: Color Toplam Maliyet ({color_currency}): {total_color_cost}")
-
-                # TL'ye çevir
-                total_bw_cost_tl = total_bw_cost * bw_rate
-                total_color_cost_tl = total_color_cost * color_rate
-                
-                logger.debug(f"DEBUG-CALC: BW Toplam Maliyet (TL): {bw_currency} {total_bw_cost} × {bw_rate} = {total_bw_cost_tl} TL")
-                logger.debug(f"DEBUG-CALC: Color Toplam Maliyet (TL): {color_currency} {total_color_cost} × {color_rate} = {total_color_cost_tl} TL")
+    def create_batch_invoices(self):
+        """Seçili dönem için tüm CPC müşterilerini faturalar; yarım kalmış bir toplu çalıştırma varsa sürdürmeyi önerir."""
+        open_runs = self.db.get_open_cpc_billing_runs()
+        if open_runs:
+            run = open_runs[0]
+            reply = QMessageBox.question(
+                self, "Yarım Kalan Toplu Faturalama",
+                f"{run['period_start']} - {run['period_end']} dönemi için {run['created_at']} tarihinde başlatılan toplu "
+                f"faturalamada {run['open_items'] or 0}/{run['total_items']} PDF tamamlanmadı.\n\n"
+                f"Kaldığı yerden devam etmek ister misiniz?",
+                QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No | QMessageBox.StandardButton.Cancel
+            )
+            if reply == QMessageBox.StandardButton.Cancel:
+                return
+            if reply == QMessageBox.StandardButton.Yes:
+                self._start_batch_thread(run['period_start'], run['period_end'], run['output_dir'], run['id'])
+                return
 
-                # TL'ye çevrilmiş birim fiyatları da hesapla
-                cpc_bw_price_tl = (cpc_bw_price * bw_rate).quantize(Decimal('0.0001'))
-                cpc_color_price_tl = (cpc_color_price * color_rate).quantize(Decimal('0.0001'))
-                
-                logger.debug(f"DEBUG-CALC: BW Birim Fiyat (TL): {bw_currency} {cpc_bw_price} × {bw_rate} = {cpc_bw_price_tl} TL")
-                logger.debug(f"DEBUG-CALC: Color Birim Fiyat (TL): {color_currency} {cpc_color_price} × {color_rate} = {cpc_color_price_tl} TL")
-                logger.debug(f"DEBUG-CALC: ═══ Cihaz {device_id} Hesaplama Sonu ═══")
-
-                device_total_tl = total_bw_cost_tl + total_color_cost_tl
-                grand_total_tl += device_total_tl
-
-                detail = {
-                    'device_id': device_id,
-                    'model': device_data['model'],
-                    'serial_number': device_data['serial_number'],
-                    'color_type': device_data['color_type'],
-                    'bw_usage': bw_usage,
-                    'color_usage': color_usage,
-                    'cpc_bw_price': cpc_bw_price,
-                    'cpc_color_price': cpc_color_price,
-                    'cpc_bw_currency': bw_currency,
-                    'cpc_color_currency': color_currency,
-                    'total_bw_cost': total_bw_cost,
-                    'total_color_cost': total_color_cost,
-                    'total_bw_cost_tl': total_bw_cost_tl,
-                    'total_color_cost_tl': total_color_cost_tl,
-                    'cpc_bw_price_tl': cpc_bw_price_tl,
-                    'cpc_color_price_tl': cpc_color_price_tl,
-                    'device_total_tl': device_total_tl,
-                    'record_ids': device_data['record_ids']  # Faturalandırılacak kayıt ID'leri
-                }
-                invoice_details.append(detail)
-
-            except (InvalidOperation, TypeError) as e:
-                raise ValueError(f"Fatura verisi işlenirken geçersiz bir değerle karşılaşıldı: {e} (Cihaz ID: {device_id})")
-
-        # Cihazlara tanımlı aylık kiralama bedellerini ekle
-        if customer_id:
-            logger.debug(f"DEBUG: Müşteri için kiralama bedelleri aranıyor...")
-            rental_devices = self.db.fetch_all("""
-                SELECT id, device_model as model, serial_number, rental_fee, rental_currency 
-                FROM customer_devices 
-                WHERE customer_id = ? AND rental_fee > 0
-            """, (customer_id,))
-            
-            logger.debug(f"DEBUG: {len(rental_devices)} adet kiralama bedeli olan cihaz bulundu")
-            if rental_devices:
-                for i, rd in enumerate(rental_devices):
-                    logger.debug(f"DEBUG: Kiralama cihaz {i}: {rd}")
-            else:
-                logger.debug("DEBUG: rental_devices listesi boş")
+        start_date = self.start_date_edit.date().toString("yyyy-MM-dd")
+        end_date = self.end_date_edit.date().toString("yyyy-MM-dd")
+        reply = QMessageBox.question(
+            self, "Toplu Faturalama",
+            f"{start_date} - {end_date} dönemi için faturalanmamış sayaç okuması olan tüm CPC müşterilerine "
+            f"fatura oluşturulacak.\n\nDevam etmek istiyor musunuz?",
+            QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No
+        )
+        if reply != QMessageBox.StandardButton.Yes:
+            return
+        output_dir = QFileDialog.getExistingDirectory(self, "PDF'lerin Kaydedileceği Klasörü Seçin")
+        if not output_dir:
+            return
+        self._start_batch_thread(start_date, end_date, os.path.join(output_dir, f"cpc_faturalar_{end_date}"))
+
+    def _start_batch_thread(self, start_date, end_date, output_dir, run_id=None):
+        """Toplu faturalama worker'ını ilerleme diyaloğuyla başlatır."""
+        self.batch_invoice_btn.setEnabled(False)
+        self.batch_progress = QProgressDialog("Faturalar oluşturuluyor...", "İptal", 0, 0, self)
+        self.batch_progress.setWindowTitle("Toplu Faturalama")
+        self.batch_progress.setWindowModality(Qt.WindowModality.WindowModal)
+        self.batch_progress.setMinimumDuration(0)
+
+        self.batch_thread = CpcBatchInvoiceThread(self.db, start_date, end_date, output_dir, run_id, parent=self)
+        self.batch_progress.canceled.connect(self.batch_thread.cancel)
+        self.batch_thread.progress.connect(self._on_batch_progress)
+        self.batch_thread.task_finished.connect(self._on_batch_finished)
+        self.batch_thread.task_error.connect(self._on_batch_error)
+        self.batch_thread.start()
+
+    def _on_batch_progress(self, done, total, customer_name):
+        self.batch_progress.setMaximum(total)
+        self.batch_progress.setValue(done)
+        if customer_name:
+            self.batch_progress.setLabelText(f"PDF oluşturuldu: {customer_name} ({done}/{total})")
+
+    def _on_batch_finished(self, summary):
+        self.batch_progress.close()
+        self.batch_invoice_btn.setEnabled(True)
+        self.data_changed.emit()
+        message = f"{summary['done']} fatura PDF'i oluşturuldu."
+        if summary['failed']:
+            message += f"\n{summary['failed']} PDF oluşturulamadı; toplu faturalamayı tekrar başlatarak yeniden deneyebilirsiniz."
+        if summary['cancelled'] and not summary['finished']:
+            message += "\n\nİşlem iptal edildi. Faturalar kaydedildi; kalan PDF'ler için toplu faturalamayı tekrar başlatıp devam edebilirsiniz."
+        QMessageBox.information(self, "Toplu Faturalama", message)
+        self._redirect_to_invoicing_tab()
+
+    def _on_batch_error(self, error):
+        self.batch_progress.close()
+        self.batch_invoice_btn.setEnabled(True)
+        QMessageBox.critical(self, "Toplu Faturalama Hatası", f"Toplu faturalama tamamlanamadı: {error}")
+
+    def _process_billing_data(self, billing, rates, customer_id=None, start_date: str | None = None, end_date: str | None = None):
+        """Faturalama motorunun cihaz bazlı sonucunu TL'ye çevirip fatura kalemlerine dönüştürür, kiralama bedellerini ekler."""
+        billing.apply_rates(rates or {})
+
+        if not customer_id and len(billing):
+            customer_id = billing['customer_id'][0]
             
-            for device in rental_devices:
-                device_id, model, serial_number, rental_fee, rental_currency = device
-                rental_fee = Decimal(str(rental_fee))
-                
-                logger.debug(f"DEBUG-RENTAL: ═══ Kiralama Bedeli Hesaplama Başlangıcı ═══")
-                logger.debug(f"DEBUG-RENTAL: Cihaz: {model} ({serial_number})")
-                logger.debug(f"DEBUG-RENTAL: Ham kiralama bedeli: {rental_fee} {rental_currency}")
-                
-                if rental_fee > 0:
-                    # Para birimini normalize et (aynı _normalize_currency fonksiyonunu kullan)
-                    def _normalize_rental_currency(cur):
-                        if not cur:
-                            logger.debug(f"DEBUG-RENTAL: Kiralama para birimi boş/None, varsayılan TL kullanılıyor")
-                            return 'TL'
-                        c = str(cur).strip().upper()
-                        original_c = c
-                        if c in ('EURO', 'EUR', 'E', '€'): 
-                            c = 'EUR'
-                        elif c in ('DOLAR', 'USD', 'US$', '$', 'DOLLAR'): 
-                            c = 'USD'
-                        elif c in ('TL', 'TRY', '₺', 'TÜRK LİRASI', 'TURK LIRASI'): 
-                            c = 'TL'
-                        else:
-                            logger.debug(f"DEBUG-RENTAL: Bilinmeyen kiralama para birimi '{original_c}', TL olarak işleniyor")
-                            c = 'TL'
-                        
-                        if original_c != c:
-                            logger.debug(f"DEBUG-RENTAL: Kiralama para birimi normalize edildi: '{original_c}' -> '{c}'")
-                        return c
-                    
-                    rental_currency = _normalize_rental_currency(rental_currency)
-                    logger.debug(f"DEBUG-RENTAL: Normalize edilmiş para birimi: {rental_currency}")
-                    
-                    # Kiralama bedelini TL'ye çevir
-                    rental_rate = Decimal(str(rates.get(rental_currency, 1.0)))
-                    logger.debug(f"DEBUG-RENTAL: Döviz kuru ({rental_currency}): {rental_rate}")
-                    
-                    # Kur kontrolü
-                    if rental_currency != 'TL' and rental_rate == Decimal('1.0'):
-                        logger.warning(f"⚠️ UYARI: Kiralama bedeli için {rental_currency} kuru bulunamadı, 1.0 kullanılıyor!")
-                    
-                    rental_fee_tl = rental_fee * rental_rate
-                    logger.debug(f"DEBUG-RENTAL: Kiralama bedeli TL: {rental_currency} {rental_fee} × {rental_rate} = {rental_fee_tl} TL")
-                    
-                    # Prorata hesaplama: start/end tarihleri verildiyse, kiralama bedelinin fatura periyoduna göre hesaplanması
-                    rental_billed_tl = rental_fee_tl
-                    quantity_for_rental = 1.0
-                    if start_date and end_date:
-                        try:
-                            from datetime import datetime as _dt
-                            s = _dt.strptime(start_date, '%Y-%m-%d')
-                            e = _dt.strptime(end_date, '%Y-%m-%d')
-                            days = (e - s).days + 1
-                            
-                            # Tam ay kontrolü: 28-31 gün arası tam ay sayılır
-                            if 28 <= days <= 31:
-                                quantity_for_rental = 1.0
-                                rental_billed_tl = rental_fee_tl
-                                logger.debug(f"DEBUG-RENTAL: Tam ay ({days} gün), quantity=1, tutar={rental_billed_tl} TL")
-                            else:
-                                # Kısmi ay için prorata hesaplama (30 gün üzerinden)
-                                quantity_for_rental = float((Decimal(days) / Decimal(30)).quantize(Decimal('0.01')))
-                                rental_billed_tl = (rental_fee_tl * Decimal(days) / Decimal(30)).quantize(Decimal('0.01'))
-                                logger.debug(f"DEBUG-RENTAL: Prorata hesaplama: {days} gün / 30 gün = {quantity_for_rental}")
-                                logger.debug(f"DEBUG-RENTAL: Prorata kiralama bedeli: {rental_fee_tl} × {quantity_for_rental} = {rental_billed_tl} TL")
-                        except Exception as ex:
-                            logger.debug(f"DEBUG-RENTAL: Prorata hesaplama hatası: {ex}, tam aylık ücret kullanılıyor")
-                            rental_billed_tl = rental_fee_tl
-                            quantity_for_rental = 1.0
-                    
-                    grand_total_tl += rental_billed_tl
-                    logger.debug(f"DEBUG-RENTAL: Faturaya eklenen tutar: {rental_billed_tl} TL")
-                    logger.debug(f"DEBUG-RENTAL: ═══ Kiralama Bedeli Hesaplama Sonu ═══")
-                    
-                    # Kiralama bedeli kalemi olarak fatura detayına ekle
-                    rental_detail = {
-                        'device_id': device_id,
-                        'model': model,
-                        'serial_number': serial_number,
-                        'description': f"{model} ({serial_number}) - Aylık Kiralama Bedeli",
-                        'quantity': quantity_for_rental,
-                        'unit_price': rental_fee,
-                        'currency': rental_currency,
-                        'unit_price_tl': rental_fee_tl,
-                        'total_tl': float(rental_billed_tl),
-                        'is_rental': True  # Bu kalemin kiralama bedeli olduğunu belirt
-                    }
-                    invoice_details.append(rental_detail)
-                    logger.debug(f"DEBUG: Kiralama bedeli fatura detayına eklendi")
-
-        return invoice_details, grand_total_tl
+        logger.debug(f"DEBUG: Müşteri ID: {customer_id}")
+        rental_devices = self.db.get_rental_devices([customer_id]) if customer_id else []
+        logger.debug(f"DEBUG: {len(rental_devices)} adet kiralama bedeli olan cihaz bulundu")
+        return invoice_lines(billing.rows(), rental_devices, rates or {}, start_date, end_date)
 
     def _redirect_to_invoicing_tab(self):
         """Kullanıcıyı Faturalar sekmesine yönlendirir ve verileri yeniler."""
@@ -23,6 +23,7 @@ from utils.predefined_stock import (
     get_compatible_products_for_device
 )
 from utils.database import db_manager
+from utils.database.search import match_clause
 from utils.pdf_generator import generate_cpc_order_pdf
 
 class CPCTab(QWidget):
@@ -389,19 +390,20 @@ class CPCTab(QWidget):
             
     def filter_customers(self):
         """Müşteri filtrelemesi - CPC müşterilerini filtreler."""
-        filter_text = self.customer_filter.text().lower().strip()
+        filter_text = self.customer_filter.text().strip()
         
         try:
-            # Filtrelenmiş CPC müşterilerini getir
+            # Filtrelenmiş CPC müşterilerini getir (müşteri adında tam metin araması)
             if filter_text:
-                query = """
+                matches, params = match_clause('customer', 'c.id', filter_text, ['name'])
+                query = f"""
                     SELECT DISTINCT c.id, c.name
                     FROM customers c
                     JOIN customer_devices cd ON c.id = cd.customer_id
-                    WHERE cd.is_cpc = 1 AND LOWER(c.name) LIKE ?
+                    WHERE cd.is_cpc = 1 AND {matches or '0'}
                     ORDER BY c.name
                 """
-                customers = self.db.fetch_all(query, (f"%{filter_text}%",))
+                customers = self.db.fetch_all(query, params)
             else:
                 # Filtre boşsa tüm CPC müşterilerini göster
                 query = """
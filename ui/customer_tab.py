@@ -11,6 +11,8 @@ logger = logging.getLogger(__name__)
 from PyQt6.QtCore import pyqtSignal as Signal, Qt, QDate
 from .dialogs.device_dialog import DeviceDialog
 from utils.database import db_manager
+from utils.database.search import match_clause
+from utils.workers import get_db_task_runner
 import re
 
 def format_phone_number(phone):
@@ -1742,14 +1744,22 @@ class CustomerDeviceTab(QWidget):
 
     def refresh_customers(self):
         """Müşteri listesini veritabanından yeniler."""
+        try:
+            self._populate_customers(self._fetch_customers())
+        except Exception as e:
+            QMessageBox.warning(self, "Veri Hatası", f"Müşteriler yüklenemedi: {e}")
+
+    def _fetch_customers(self):
+        """Müşteri listesini okur (arka plan thread'inden de çağrılabilir)."""
+        return self.db.get_customer_list()
+
+    def _populate_customers(self, customers):
+        """Müşteri tablosunu verilen satırlarla doldurur."""
         from PyQt6.QtCore import QDate
         from PyQt6.QtGui import QColor
         
         self.customer_table.setRowCount(0)
         try:
-            customers = self.db.fetch_all(
-                "SELECT id, name, is_contract, contract_start_date, contract_end_date FROM customers ORDER BY name"
-            )
             current_date = QDate.currentDate()
             
             for row_data in customers:
@@ -1904,35 +1914,24 @@ class CustomerDeviceTab(QWidget):
         if len(search_text) < 2:  # En az 2 karakter girilmişse arama yap
             return set()
             
-        search_text = f'%{search_text.lower()}%'
-        query = """
-            SELECT DISTINCT c.id
-            FROM customers c
-            LEFT JOIN customer_devices cd ON c.id = cd.customer_id
-            WHERE 1=1
-        """
-        params = []
-        
-        if search_type == "all":
-            query += """
-                AND (LOWER(c.name) LIKE ? 
-                     OR LOWER(cd.device_model) LIKE ? 
-                     OR LOWER(cd.serial_number) LIKE ?)
-            """
-            params = [search_text, search_text, search_text]
-        elif search_type == "customer":
-            query += " AND LOWER(c.name) LIKE ?"
-            params = [search_text]
-        elif search_type == "device":
-            query += " AND LOWER(cd.device_model) LIKE ?"
-            params = [search_text]
-        elif search_type == "serial":
-            query += " AND LOWER(cd.serial_number) LIKE ?"
-            params = [search_text]
-            
-        query += " ORDER BY c.name"
-        
-        results = self.db.fetch_all(query, params)
+        # Tam metin dizinlerinde ara: müşteri adı ve/veya cihaz model/seri no
+        device_columns = {"all": ['device_model', 'serial_number'], "device": ['device_model'],
+                          "serial": ['serial_number']}.get(search_type)
+        parts, params = [], []
+        if search_type in ("all", "customer"):
+            matches, match_params = match_clause('customer', 'id', search_text, ['name'])
+            if matches:
+                parts.append(f"SELECT id FROM customers WHERE {matches}")
+                params += match_params
+        if device_columns:
+            matches, match_params = match_clause('device', 'id', search_text, device_columns)
+            if matches:
+                parts.append(f"SELECT customer_id FROM customer_devices WHERE {matches}")
+                params += match_params
+        if not parts:
+            return set()
+        
+        results = self.db.fetch_all(" UNION ".join(parts), params)
         return {row['id'] for row in results} if results else set()
         
     def filter_customers(self):
@@ -2020,9 +2019,16 @@ class CustomerDeviceTab(QWidget):
                 table.setItem(row_count, col_index, item)
             
     def refresh_data(self):
-        """Sekme verilerini yenilemek için ana arayüz tarafından çağrılır."""
+        """Sekme verilerini yenilemek için ana arayüz tarafından çağrılır; sorgu arka planda çalışır."""
+        get_db_task_runner().submit(
+            self, 'refresh', self._fetch_customers,
+            on_result=self._apply_refreshed_customers,
+            on_error=lambda e: QMessageBox.warning(self, "Veri Hatası", f"Müşteriler yüklenemedi: {e}")
+        )
+
+    def _apply_refreshed_customers(self, customers):
         current_customer_id = self.selected_customer_id
-        self.refresh_customers()
+        self._populate_customers(customers)
         if current_customer_id:
             # Eğer önceden bir müşteri seçiliyse, onu tekrar bul ve seç
             for row in range(self.customer_table.rowCount()):
@@ -25,8 +25,9 @@ except ImportError:
             pass
 
 from utils.database import db_manager
+from utils.database.dates import month_range
 from datetime import datetime
-from utils.currency_converter import get_exchange_rates
+from utils.workers import get_currency_service, get_db_task_runner
 from .custom_widgets import ClickableStatCard
 from .dialogs.monthly_report_dialog import MonthlyReportDialog
 
@@ -211,6 +212,8 @@ class DashboardTab(QWidget):
         self.expired_contracts_card.clicked.connect(self.show_expired_contracts)
         
         self.data_changed.connect(self.refresh_data)
+        # Yeni kurlar geldiğinde yalnızca kur etiketleri güncellenir
+        get_currency_service(self.db).rates_updated.connect(self._show_rates)
 
     def _start_timers(self):
         """Saat ve periyodik veri yenileme zamanlayıcılarını başlatır."""
@@ -234,85 +237,70 @@ class DashboardTab(QWidget):
             pass
 
     def refresh_data(self):
-        """Tüm gösterge paneli verilerini güvenli bir şekilde yeniler."""
-        try:
-            if not self.db or not self.db.get_connection():
-                raise ConnectionError("Veritabanı bağlantısı mevcut değil.")
-
-            # Finansal İstatistikler
-            fin_stats = self.db.get_dashboard_financial_stats()
-            self.invoiced_card.set_value(f"{fin_stats.get('total_invoiced', 0):,.2f} TL")
-            self.invoiced_card.set_subtitle(f"Toplam {fin_stats.get('invoice_count', 0)} adet fatura")
-            self.paid_card.set_value(f"{fin_stats.get('total_paid', 0):,.2f} TL")
-            self.pending_card.set_value(f"{fin_stats.get('pending_balance', 0):,.2f} TL")
-            
-            self.chart_view.update_data(fin_stats.get('total_invoiced', 0), fin_stats.get('total_paid', 0)) if CHARTS_AVAILABLE and hasattr(self.chart_view, 'update_data') else None
-
-            # Döviz Kurları (güvenli çekme)
-            try:
-                rates = get_exchange_rates()
-                self.usd_label.setText(f"USD: {rates.get('USD', 'N/A')} TL")
-                self.eur_label.setText(f"EUR: {rates.get('EUR', 'N/A')} TL")
-            except Exception as e:
-                logging.warning(f"Döviz kurları yüklenemedi: {e}")
-                self.usd_label.setText("USD: Yüklenemedi")
-                self.eur_label.setText("EUR: Yüklenemedi")
-            
-            # Operasyonel İstatistikler
-            ops_stats = self.db.get_dashboard_stats()
-            self.monthly_new_card.set_value(ops_stats.get('monthly_new', 0))
-            self.on_repair_card.set_value(ops_stats.get('on_repair', 0))
-            self.awaiting_part_card.set_value(ops_stats.get('awaiting_part', 0))
-            self.awaiting_approval_card.set_value(ops_stats.get('awaiting_approval', 0))
-            
-            # Müşteri İstatistikleri
-            customer_stats = self._get_customer_stats()
-            self.total_customers_card.set_value(customer_stats.get('total', 0))
-            self.contract_customers_card.set_value(customer_stats.get('contract', 0))
-            self.expiring_contracts_card.set_value(customer_stats.get('expiring_this_month', 0))
-            self.expired_contracts_card.set_value(customer_stats.get('expired', 0))
-
-        except ConnectionError as e:
+        """Tüm gösterge paneli verilerini arka planda okuyup güvenli bir şekilde yeniler."""
+        if not self.db or not self.db.get_connection():
             self.usd_label.setText("USD: Bağlantı Hatası")
             self.eur_label.setText("EUR: Bağlantı Hatası")
-            QMessageBox.warning(self, "Bağlantı Hatası", str(e))
-        except Exception as e:
-            QMessageBox.critical(self, "Veri Yenileme Hatası", f"Gösterge paneli verileri yenilenirken bir hata oluştu: {e}")
+            QMessageBox.warning(self, "Bağlantı Hatası", "Veritabanı bağlantısı mevcut değil.")
+            return
+        get_db_task_runner().submit(
+            self, 'refresh', self._load_dashboard_data,
+            on_result=self._apply_dashboard_data,
+            on_error=lambda e: QMessageBox.critical(self, "Veri Yenileme Hatası", f"Gösterge paneli verileri yenilenirken bir hata oluştu: {e}")
+        )
 
-    def _get_customer_stats(self):
-        """Müşteri istatistiklerini hesaplar."""
+    def _load_dashboard_data(self):
+        """Worker thread'inde çalışır; istatistikleri ve döviz kurlarını toplar."""
+        # Döviz Kurları: son bilinen kurlar, ağ beklenmez
         try:
-            from datetime import datetime
-            
-            # Toplam müşteri
-            total = self.db.fetch_one("SELECT COUNT(*) FROM customers")[0]
-            
-            # Sözleşmeli müşteri
-            contract = self.db.fetch_one("SELECT COUNT(*) FROM customers WHERE is_contract = 1")[0]
-            
-            # Bu ay sona erecek sözleşmeler
-            current_year_month = datetime.now().strftime("%Y-%m")
-            expiring_this_month = self.db.fetch_one(
-                "SELECT COUNT(*) FROM customers WHERE is_contract = 1 AND contract_end_date LIKE ?",
-                (f"{current_year_month}%",)
-            )[0]
-            
-            # Süresi dolan sözleşmeler
-            current_date = datetime.now().strftime("%Y-%m-%d")
-            expired = self.db.fetch_one(
-                "SELECT COUNT(*) FROM customers WHERE is_contract = 1 AND contract_end_date < ?",
-                (current_date,)
-            )[0]
-            
-            return {
-                'total': total,
-                'contract': contract,
-                'expiring_this_month': expiring_this_month,
-                'expired': expired
-            }
+            rates = get_currency_service(self.db).rates()
         except Exception as e:
-            logger.error(f"Müşteri istatistikleri hesaplanırken hata: {e}")
-            return {'total': 0, 'contract': 0, 'expiring_this_month': 0, 'expired': 0}
+            logging.warning(f"Döviz kurları yüklenemedi: {e}")
+            rates = None
+        # Tüm kart değerleri özet tablosundan tek sorguyla okunur
+        summary = self.db.get_dashboard_summary()
+        return {
+            'fin_stats': summary['financial'],
+            'rates': rates,
+            'ops_stats': summary['services'],
+            'customer_stats': summary['customers'],
+        }
+
+    def _apply_dashboard_data(self, data):
+        """Arka planda toplanan verileri kartlara yazar."""
+        # Finansal İstatistikler
+        fin_stats = data['fin_stats']
+        self.invoiced_card.set_value(f"{fin_stats.get('total_invoiced', 0):,.2f} TL")
+        self.invoiced_card.set_subtitle(f"Toplam {fin_stats.get('invoice_count', 0)} adet fatura")
+        self.paid_card.set_value(f"{fin_stats.get('total_paid', 0):,.2f} TL")
+        self.pending_card.set_value(f"{fin_stats.get('pending_balance', 0):,.2f} TL")
+        
+        self.chart_view.update_data(fin_stats.get('total_invoiced', 0), fin_stats.get('total_paid', 0)) if CHARTS_AVAILABLE and hasattr(self.chart_view, 'update_data') else None
+
+        self._show_rates(data['rates'])
+        
+        # Operasyonel İstatistikler
+        ops_stats = data['ops_stats']
+        self.monthly_new_card.set_value(ops_stats.get('monthly_new', 0))
+        self.on_repair_card.set_value(ops_stats.get('on_repair', 0))
+        self.awaiting_part_card.set_value(ops_stats.get('awaiting_part', 0))
+        self.awaiting_approval_card.set_value(ops_stats.get('awaiting_approval', 0))
+        
+        # Müşteri İstatistikleri
+        customer_stats = data['customer_stats']
+        self.total_customers_card.set_value(customer_stats.get('total', 0))
+        self.contract_customers_card.set_value(customer_stats.get('contract', 0))
+        self.expiring_contracts_card.set_value(customer_stats.get('expiring_this_month', 0))
+        self.expired_contracts_card.set_value(customer_stats.get('expired', 0))
+
+    def _show_rates(self, rates):
+        """Kur etiketlerini günceller."""
+        if rates is not None:
+            self.usd_label.setText(f"USD: {rates.get('USD', 'N/A')} TL")
+            self.eur_label.setText(f"EUR: {rates.get('EUR', 'N/A')} TL")
+        else:
+            self.usd_label.setText("USD: Yüklenemedi")
+            self.eur_label.setText("EUR: Yüklenemedi")
 
     def show_monthly_invoices(self):
         """Bu ay kesilen faturalar için bir rapor diyalogu gösterir."""
@@ -322,9 +310,6 @@ class DashboardTab(QWidget):
                 QMessageBox.information(self, "Bilgi", "Bu ay için kesilmiş fatura bulunmamaktadır.")
                 return
             
-            # Güncel kurları al
-            rates = get_exchange_rates()
-            
             headers = ["Fatura ID", "Tarih", "Müşteri", "Fatura Tipi", "Orijinal Tutar", "TL Karşılığı (+KDV)", "Durum"]
             
             # Güvenli format string - None ve string değerleri kontrol et
@@ -338,7 +323,7 @@ class DashboardTab(QWidget):
                 except (ValueError, TypeError):
                     return "0.00"
             
-            def convert_to_tl_with_tax(amount, currency, saved_rate):
+            def convert_to_tl_with_tax(amount, currency, saved_rate, invoice_date):
                 """Tutarı TL'ye çevirir ve %20 KDV ekler. Kaydedilmiş kur varsa onu kullanır."""
                 try:
                     amount_val = float(amount) if amount else 0.0
@@ -347,8 +332,8 @@ class DashboardTab(QWidget):
                         if saved_rate and saved_rate > 0:
                             rate = float(saved_rate)
                         else:
-                            # Yoksa güncel kuru kullan
-                            rate = float(rates.get(currency, 1.0))
+                            # Yoksa fatura tarihindeki kuru kullan
+                            rate = float(self.db.rates_on(invoice_date).get(currency, 1.0))
                         amount_tl = amount_val * rate
                     else:
                         amount_tl = amount_val
@@ -364,7 +349,7 @@ class DashboardTab(QWidget):
                 invoice['name'], 
                 invoice['invoice_type'], 
                 f"{safe_format_amount(invoice['total_amount'])} {invoice['currency']}", 
-                convert_to_tl_with_tax(invoice['total_amount'], invoice['currency'], invoice.get('exchange_rate')),
+                convert_to_tl_with_tax(invoice['total_amount'], invoice['currency'], invoice.get('exchange_rate'), invoice['invoice_date']),
                 invoice['status']
             ] for invoice in invoices]
             
@@ -434,11 +419,10 @@ class DashboardTab(QWidget):
     def show_expiring_contracts(self):
         """Bu ay sona erecek sözleşmeleri gösterir."""
         try:
-            from datetime import datetime
-            current_year_month = datetime.now().strftime("%Y-%m")
+            this_month, params = month_range('contract_end_date')
             customers = self.db.fetch_all(
-                "SELECT id, name, phone, contract_end_date FROM customers WHERE is_contract = 1 AND contract_end_date LIKE ? ORDER BY contract_end_date",
-                (f"{current_year_month}%",)
+                f"SELECT id, name, phone, contract_end_date FROM customers WHERE is_contract = 1 AND {this_month} ORDER BY contract_end_date",
+                params
             )
             if not customers:
                 QMessageBox.information(self, "Bilgi", "Bu ay sona erecek sözleşme bulunmamaktadır.")
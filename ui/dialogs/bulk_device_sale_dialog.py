@@ -105,7 +105,7 @@ class BulkDeviceSaleDialog(QDialog):
         # Eğer data None ise (validasyon hatası), dialog açık kalır
 
     def load_customers(self):
-        customers = self.db.fetch_all("SELECT id, name FROM customers ORDER BY name")
+        customers = self.db.fetch_all_cached("SELECT id, name FROM customers ORDER BY name")
         for cust_id, name in customers:
             self.customer_combo.addItem(name, cust_id)
         self.customer_combo.setCurrentIndex(-1)
@@ -147,14 +147,11 @@ class DataTransferDialog(QDialog):
         if not file_path:
             return
         try:
-            conn = self.db.get_connection()
-            cursor = conn.cursor()
             # Türkçe başlıklar
             db_columns = ["item_type", "name", "part_number", "description", "quantity", "supplier", "color_type", "compatible_models", "sale_price", "sale_currency", "purchase_price", "purchase_currency", "is_consignment"]
             turkish_columns = ["Ürün Tipi", "Ürün Adı", "Parça No", "Açıklama", "Adet", "Tedarikçi", "Renk Tipi", "Uyumlu Modeller", "Satış Fiyatı", "Satış Para Birimi", "Alış Fiyatı", "Alış Para Birimi", "Konsinye Mi"]
             sql = f'SELECT {", ".join(db_columns)} FROM stock_items'
-            rows = cursor.execute(sql).fetchall()
-            df = pd.DataFrame(rows, columns=turkish_columns)
+            df = pd.DataFrame.from_records((tuple(row) for row in self.db.iter_query(sql)), columns=turkish_columns)
             df.to_excel(file_path, index=False)
             QMessageBox.information(self, "Başarılı", f"Stok verileri başarıyla Excel'e aktarıldı:\n{file_path}")
         except Exception as e:
@@ -166,17 +163,13 @@ class DataTransferDialog(QDialog):
         if not file_path:
             return
         try:
-            conn = self.db.get_connection()
-            cursor = conn.cursor()
             db_columns = ["item_type", "name", "part_number", "description", "quantity", "supplier", "color_type", "compatible_models", "sale_price", "sale_currency", "purchase_price", "purchase_currency", "is_consignment"]
             turkish_columns = ["Ürün Tipi", "Ürün Adı", "Parça No", "Açıklama", "Adet", "Tedarikçi", "Renk Tipi", "Uyumlu Modeller", "Satış Fiyatı", "Satış Para Birimi", "Alış Fiyatı", "Alış Para Birimi", "Konsinye Mi"]
             sql = f'SELECT {", ".join(db_columns)} FROM stock_items'
-            rows = cursor.execute(sql).fetchall()
             with open(file_path, 'w', newline='', encoding='utf-8-sig') as csvfile:
                 writer = csv.writer(csvfile)
                 writer.writerow(turkish_columns)
-                for row in rows:
-                    writer.writerow(row)
+                writer.writerows(self.db.iter_query(sql))
             QMessageBox.information(self, "Başarılı", f"Stok verileri başarıyla CSV'ye aktarıldı:\n{file_path}")
         except Exception as e:
             QMessageBox.critical(self, "Hata", f"Stok dışa aktarma sırasında hata oluştu: {e}")
@@ -267,9 +260,8 @@ class DataTransferDialog(QDialog):
         conn = None
         try:
             conn = self.db.get_connection()
-            # SQLite optimizasyonları
-            conn.execute("PRAGMA busy_timeout = 30000")  # 30 saniye timeout
-            conn.execute("PRAGMA journal_mode = WAL")     # Write-Ahead Logging (eşzamanlı okuma/yazma)
+            # SQLite optimizasyonları (içe aktarma bitince ayarlardaki profile dönülür)
+            self.db.apply_performance_profile('bulk-import')
             cursor = conn.cursor()
             
             # Transaction başlat (IMMEDIATE = hemen write lock al)
@@ -488,6 +480,7 @@ class DataTransferDialog(QDialog):
                     pass
             QMessageBox.critical(self, "İçe Aktarma Hatası", f"Bir hata oluştu: {e}")
         finally:
+            self.db.apply_performance_profile()
             progress.close()
 
     def _process_import_data(self, df):
@@ -920,13 +913,10 @@ class DataTransferDialog(QDialog):
         
         try:
             import pandas as pd
-            customers_data = self.db.get_all_customers_and_devices()
-            
             # Yapılandırılmış veriyi düz liste haline getir
             data = []
-            customers_list = customers_data.get("customers", [])
             
-            for customer in customers_list:
+            for customer in self.db.iter_customers_with_devices():
                 devices = customer.get("devices", [])
                 
                 if not devices:
@@ -998,10 +988,7 @@ class DataTransferDialog(QDialog):
             start_time = datetime.now()
             logging.info("CSV export başlatıldı")
             
-            customers_data = self.db.get_all_customers_and_devices()
-            customers_list = customers_data.get("customers", [])
-            
-            if not customers_list:
+            if not self.db.fetch_one("SELECT 1 FROM customers LIMIT 1"):
                 QMessageBox.information(self, "Bilgi", "Dışa aktarılacak veri bulunamadı.")
                 return
             
@@ -1019,7 +1006,8 @@ class DataTransferDialog(QDialog):
                 writer = csv.writer(csvfile)
                 writer.writerow(headers)
                 
-                for customer in customers_list:
+                # Müşteriler tek tek okunup yazılır; tüm liste belleğe alınmaz
+                for customer in self.db.iter_customers_with_devices():
                     devices = customer.get("devices", [])
                     
                     if not devices:
@@ -61,7 +61,7 @@ class DeviceSaleDialog(QDialog):
     def _load_customers(self):
         """Veritabanından müşterileri yükler ve combobox'a ekler."""
         try:
-            customers = self.db.fetch_all("SELECT id, name FROM customers ORDER BY name")
+            customers = self.db.fetch_all_cached("SELECT id, name FROM customers ORDER BY name")
             for cust_id, name in customers:
                 self.customer_combo.addItem(name, cust_id)
             self.customer_combo.setCurrentIndex(-1)
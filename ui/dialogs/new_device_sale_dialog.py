@@ -85,7 +85,7 @@ class NewDeviceSaleDialog(QDialog):
     def load_customers(self):
         """Müşterileri ComboBox'a yükler."""
         try:
-            customers = self.db.fetch_all("SELECT id, name FROM customers ORDER BY name")
+            customers = self.db.fetch_all_cached("SELECT id, name FROM customers ORDER BY name")
             for cust_id, name in customers:
                 self.customer_combo.addItem(name, cust_id)
             self.customer_combo.setCurrentIndex(-1) # Başlangıçta seçim olmasın
@@ -555,7 +555,7 @@ class NewSaleInvoiceDialog(QDialog):
     def _load_customers(self):
         """Veritabanından müşterileri yükler."""
         try:
-            customers = self.db.fetch_all("SELECT id, name FROM customers ORDER BY name")
+            customers = self.db.fetch_all_cached("SELECT id, name FROM customers ORDER BY name")
             for cust_id, name in customers:
                 self.customer_combo.addItem(name, cust_id)
             self.customer_combo.setCurrentIndex(-1)
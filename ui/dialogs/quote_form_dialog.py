@@ -11,7 +11,7 @@ from utils.workers import EmailThread
 from utils.email_generator import generate_quote_html
 from utils.pdf_generator import create_quote_form_pdf
 from .stock_picker_dialog import StockPickerDialog
-from utils.currency_converter import get_exchange_rates
+from utils.currency_converter import MissingRateError, get_exchange_rates, require_rate
 from utils.database import db_manager
 
 class QuoteFormDialog(QDialog):
@@ -163,7 +163,7 @@ class QuoteFormDialog(QDialog):
             currency = self.quote_table.item(row, 4).text()
 
             line_total = qty * price
-            rate = Decimal(str(self.rates.get(currency, 1.0)))
+            rate = require_rate(self.rates, currency)
             total_tl = (line_total * rate).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
 
             self.quote_table.item(row, 5).setText(f"{total_tl:.2f}")
@@ -200,7 +200,16 @@ class QuoteFormDialog(QDialog):
                 return False
         
         try:
-            self.db.save_quote_items(self.service_id, items)
+            for item in items:
+                require_rate(self.rates, item['currency'])
+        except MissingRateError as e:
+            QMessageBox.warning(self, "Döviz Kuru Hatası", str(e))
+            return False
+
+        try:
+            if not self.db.save_quote_items(self.service_id, items):
+                QMessageBox.critical(self, "Kayıt Hatası", "Teklif kaydedilemedi.")
+                return False
             self.status_bar.showMessage("Fiyat teklifi kaydedildi.", 3000)
             return True
         except Exception as e:
@@ -190,7 +190,7 @@ class ServiceEditDialog(QDialog):
     def _load_combos(self):
         """ComboBox'ları veritabanından doldurur."""
         try:
-            self._all_customers = self.db.fetch_all("SELECT id, name FROM customers ORDER BY name")
+            self._all_customers = self.db.fetch_all_cached("SELECT id, name FROM customers ORDER BY name")
             self._update_customer_combo("")
 
             self.technician_combo.addItem("Atanmadı", None)
@@ -849,7 +849,7 @@ class ServiceEditDialog(QDialog):
             dialog = CustomerDialog(self.db, customer_id=None, parent=self)
             if dialog.exec():
                 # Müşteri eklendi - müşteri listesini yeniden yükle
-                self._all_customers = self.db.fetch_all("SELECT id, name FROM customers ORDER BY name")
+                self._all_customers = self.db.fetch_all_cached("SELECT id, name FROM customers ORDER BY name")
                 self._update_customer_combo("")
                 
                 # Yeni müşteriyi seç (son eklenen müşteri en yüksek ID'ye sahip)
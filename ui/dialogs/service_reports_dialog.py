@@ -11,6 +11,7 @@ from PyQt6.QtGui import QColor
 from datetime import datetime, timedelta
 import os
 from utils.database import db_manager
+from utils.database.dates import date_range
 from utils.pdf_generator import create_service_history_report_pdf
 
 class ServiceReportsDialog(QDialog):
@@ -231,9 +232,10 @@ class ServiceReportsDialog(QDialog):
     def generate_report(self):
         """Seçilen filtrelere göre raporu oluşturur."""
         try:
-            # Tarih aralığını al (saat ekleyerek)
-            start_date = self.start_date.date().toString("yyyy-MM-dd") + " 00:00:00"
-            end_date = self.end_date.date().toString("yyyy-MM-dd") + " 23:59:59"
+            # Tarih aralığını al (bitiş günü dahil, indeks dostu aralık)
+            period, period_params = date_range('sr.created_date',
+                                               self.start_date.date().toPyDate(),
+                                               self.end_date.date().toPyDate())
 
             # Durum filtrelerini al
             selected_statuses = []
@@ -267,11 +269,11 @@ class ServiceReportsDialog(QDialog):
                 JOIN customer_devices cd ON sr.device_id = cd.id
                 JOIN customers c ON cd.customer_id = c.id
                 LEFT JOIN users u ON sr.assigned_user_id = u.id
-                WHERE sr.created_date BETWEEN ? AND ?
+                WHERE {}
                 AND sr.status IN ({})
-            """.format(','.join(['?'] * len(selected_statuses)))
+            """.format(period, ','.join(['?'] * len(selected_statuses)))
 
-            params = [start_date, end_date] + selected_statuses
+            params = period_params + selected_statuses
 
             # Teknisyen filtresi (assigned_user_id kullan)
             if technician_id:
@@ -5,9 +5,9 @@ from PyQt6.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QGridLayout,
                              QMessageBox, QProgressBar, QGroupBox, QFrame)
 from PyQt6.QtCore import QThread, pyqtSignal, Qt
 from PyQt6.QtGui import QFont
-import pandas as pd
 from pathlib import Path
 import os
+import itertools
 from datetime import datetime
 
 class StockReportWorker(QThread):
@@ -67,25 +67,26 @@ class StockReportWorker(QThread):
             
             self.progress.emit(30)
             
+            # Satırlar parça parça okunur; dosyaya yazılırken belleğe toplanmaz
             if self.report_type == "Tüm Stok":
-                data = self.db.fetch_all(query)
+                rows = self.db.iter_query(query)
             else:
-                data = self.db.fetch_all(query, (self.report_type,))
+                rows = self.db.iter_query(query, (self.report_type,))
             
-            if not data:
+            first_row = next(rows, None)
+            if first_row is None:
                 self.finished.emit(False, "Rapor oluşturulacak veri bulunamadı.")
                 return
+            rows = itertools.chain([first_row], rows)
                 
             self.progress.emit(50)
             
-            # DataFrame oluştur - Column bilgilerini manuel olarak tanımlayalım
+            # Column bilgilerini manuel olarak tanımlayalım
             if self.report_type == "Tüm Stok":
                 columns = ['Tip', 'İsim/Model', 'Parça No', 'Miktar', 'Alış Fiyatı', 'Satış Fiyatı', 'Tedarikçi']
             else:
                 columns = ['İsim/Model', 'Parça No', 'Miktar', 'Alış Fiyatı', 'Satış Fiyatı', 'Tedarikçi']
             
-            df = pd.DataFrame(data, columns=columns)
-            
             self.progress.emit(70)
             
             # Dosya adı oluştur
@@ -97,10 +98,10 @@ class StockReportWorker(QThread):
             
             if self.export_format == "Excel":
                 file_path = desktop_path / f"{filename}.xlsx"
-                df.to_excel(file_path, index=False, engine='openpyxl')
+                self._create_excel_report(columns, rows, file_path)
             else:  # PDF
                 file_path = desktop_path / f"{filename}.pdf"
-                self._create_pdf_report(df, file_path)
+                self._create_pdf_report(columns, rows, file_path)
             
             self.progress.emit(100)
             self.finished.emit(True, f"Rapor başarıyla oluşturuldu:\n{file_path}")
@@ -108,7 +109,18 @@ class StockReportWorker(QThread):
         except Exception as e:
             self.finished.emit(False, f"Rapor oluşturulurken hata oluştu: {str(e)}")
     
-    def _create_pdf_report(self, df, file_path):
+    def _create_excel_report(self, columns, rows, file_path):
+        """Excel raporunu satır satır yazar (write-only modda bellek kullanımı sabittir)."""
+        from openpyxl import Workbook
+        
+        workbook = Workbook(write_only=True)
+        sheet = workbook.create_sheet()
+        sheet.append(columns)
+        for row in rows:
+            sheet.append(list(row))
+        workbook.save(str(file_path))
+    
+    def _create_pdf_report(self, columns, rows, file_path):
         """PDF raporu oluşturur."""
         from reportlab.lib import colors
         from reportlab.lib.pagesizes import A4, landscape
@@ -150,8 +162,8 @@ class StockReportWorker(QThread):
         story.append(Spacer(1, 0.3*inch))
         
         # Tablo verisi hazırla
-        data = [df.columns.tolist()]  # Header
-        for _, row in df.iterrows():
+        data = [list(columns)]  # Header
+        for row in rows:
             data.append([str(cell) for cell in row])
         
         # Tablo oluştur
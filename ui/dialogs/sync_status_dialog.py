@@ -17,6 +17,7 @@ from datetime import datetime
 import os
 
 from utils.sync_manager import SyncManager
+from utils.workers import get_db_task_runner
 
 
 class SyncStatusDialog(QDialog):
@@ -100,8 +101,12 @@ class SyncStatusDialog(QDialog):
         settings_layout.addWidget(self.auto_sync_check)
         
         interval_layout = QHBoxLayout()
-        interval_layout.addWidget(QLabel("Senkronizasyon aralığı (saniye):"))
+        interval_layout.addWidget(QLabel("En uzun bekleme (saniye):"))
         self.interval_spin = QSpinBox()
+        self.interval_spin.setToolTip(
+            "Değişiklikler birkaç saniye içinde otomatik gönderilir.\n"
+            "Bu süre, başarısız gönderimlerin yeniden denenmesi için beklenecek en uzun süredir."
+        )
         self.interval_spin.setRange(30, 3600)
         self.interval_spin.setValue(300)
         self.interval_spin.valueChanged.connect(self.on_interval_changed)
@@ -119,6 +124,11 @@ class SyncStatusDialog(QDialog):
         sync_now_btn.clicked.connect(self.sync_now)
         controls_layout.addWidget(sync_now_btn)
         
+        self.verify_btn = QPushButton("🔍 Tutarlılık Kontrolü")
+        self.verify_btn.setToolTip("Yerel veriyi buluttaki kopyayla karşılaştırır; yalnızca farklı kayıtlar indirilir.")
+        self.verify_btn.clicked.connect(self.verify_consistency)
+        controls_layout.addWidget(self.verify_btn)
+        
         clear_queue_btn = QPushButton("🗑️ Senkronize Edilenleri Temizle")
         clear_queue_btn.clicked.connect(self.clear_synced)
         controls_layout.addWidget(clear_queue_btn)
@@ -143,6 +153,20 @@ class SyncStatusDialog(QDialog):
         
         layout.addWidget(activity_group)
         
+        # Tablo bazında performans
+        stats_group = QGroupBox("📈 Tablo Performansı (Son Gönderim)")
+        stats_layout = QVBoxLayout(stats_group)
+        
+        self.stats_table = QTableWidget()
+        self.stats_table.setColumnCount(6)
+        self.stats_table.setHorizontalHeaderLabels([
+            "Tablo", "Kayıt", "Hatalı", "Süre (sn)", "Kayıt/sn", "Tarih/Saat"
+        ])
+        self.stats_table.setSelectionBehavior(QTableWidget.SelectionBehavior.SelectRows)
+        stats_layout.addWidget(self.stats_table)
+        
+        layout.addWidget(stats_group)
+        
         # Bekleyen değişiklikler detayı
         pending_group = QGroupBox("📋 Bekleyen Değişiklikler")
         pending_layout_widget = QVBoxLayout(pending_group)
@@ -186,8 +210,17 @@ class SyncStatusDialog(QDialog):
                 self.progress_bar.setVisible(True)
                 self.progress_bar.setRange(0, 0)  # Indeterminate
             else:
-                self.sync_status_label.setText("✅ Hazır")
-                self.sync_status_label.setStyleSheet("color: green;")
+                scheduler = status.get('scheduler') or {}
+                next_sync = scheduler.get('next_sync_in')
+                if scheduler.get('running') and next_sync is not None:
+                    text = f"⏳ {next_sync:.0f} sn içinde gönderilecek"
+                    if scheduler.get('failures'):
+                        text += f" ({scheduler['failures']}. yeniden deneme)"
+                    self.sync_status_label.setText(text)
+                    self.sync_status_label.setStyleSheet("color: orange;")
+                else:
+                    self.sync_status_label.setText("✅ Hazır")
+                    self.sync_status_label.setStyleSheet("color: green;")
                 self.progress_bar.setVisible(False)
             
             # Bekleyen değişiklikler
@@ -229,6 +262,9 @@ class SyncStatusDialog(QDialog):
             # Son aktiviteler
             self.refresh_activity_table(status.get('recent_history', []))
             
+            # Tablo performansı
+            self.refresh_stats_table(status.get('table_stats', []))
+            
             # Bekleyen değişiklikler detayı
             self.refresh_pending_table()
         
@@ -299,6 +335,31 @@ class SyncStatusDialog(QDialog):
         
         self.activity_table.resizeColumnsToContents()
     
+    def refresh_stats_table(self, stats: list):
+        """Tablo performansı tablosunu güncelle"""
+        self.stats_table.setRowCount(len(stats))
+        
+        for i, record in enumerate(stats):
+            self.stats_table.setItem(i, 0, QTableWidgetItem(record['table_name']))
+            self.stats_table.setItem(i, 1, QTableWidgetItem(str(record['records'])))
+            
+            failed_item = QTableWidgetItem(str(record['failed']))
+            if record['failed']:
+                failed_item.setForeground(QColor('red'))
+            self.stats_table.setItem(i, 2, failed_item)
+            
+            self.stats_table.setItem(i, 3, QTableWidgetItem(f"{record['seconds']:.1f}"))
+            self.stats_table.setItem(i, 4, QTableWidgetItem(f"{record['rows_per_second']:.0f}"))
+            
+            synced_at = record.get('synced_at') or ''
+            try:
+                date_str = datetime.fromisoformat(synced_at).strftime("%d.%m.%Y %H:%M")
+            except ValueError:
+                date_str = synced_at or "-"
+            self.stats_table.setItem(i, 5, QTableWidgetItem(date_str))
+        
+        self.stats_table.resizeColumnsToContents()
+    
     def refresh_pending_table(self):
         """Bekleyen değişiklikler tablosunu güncelle"""
         pending = self.sync_manager.get_pending_changes(limit=50)
@@ -409,6 +470,53 @@ class SyncStatusDialog(QDialog):
             
             self.refresh_status()
     
+    def verify_consistency(self):
+        """Yerel veriyi buluttaki kopyayla karşılaştır, farklı aralıkları onar"""
+        reply = QMessageBox.question(
+            self,
+            "Tutarlılık Kontrolü",
+            "Yerel veri buluttaki kopyayla karşılaştırılacak ve farklı kayıtlar\n"
+            "buluttan düzeltilecek. Gönderilmemiş yerel değişiklikler korunur.\n"
+            "Devam etmek istiyor musunuz?",
+            QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No
+        )
+        
+        if reply != QMessageBox.StandardButton.Yes:
+            return
+        
+        # Ağaç taraması tablo başına ağ gidiş-dönüşü gerektirir; pencere donmasın diye arka planda çalışır
+        self.verify_btn.setEnabled(False)
+        self.verify_btn.setText("🔍 Kontrol ediliyor...")
+        get_db_task_runner().submit(
+            self, 'verify', self.sync_manager.verify_cloud_consistency,
+            on_result=self._show_verify_result,
+            on_error=self._show_verify_error
+        )
+    
+    def _finish_verify(self):
+        self.verify_btn.setEnabled(True)
+        self.verify_btn.setText("🔍 Tutarlılık Kontrolü")
+    
+    def _show_verify_error(self, error: Exception):
+        self._finish_verify()
+        QMessageBox.critical(self, "Hata", f"Tutarlılık kontrolü başarısız:\n{error}")
+    
+    def _show_verify_result(self, reports):
+        self._finish_verify()
+        lines = []
+        for report in reports:
+            if report['status'] == 'error':
+                lines.append(f"❌ {report['table']}: {report['error']}")
+            elif report['status'] != 'ok':
+                lines.append(f"🔧 {report['table']}: {report['written']} kayıt düzeltildi, "
+                             f"{report['deleted']} kayıt silindi")
+        summary = f"{len(reports)} tablo kontrol edildi."
+        if lines:
+            QMessageBox.warning(self, "Tutarlılık Kontrolü", summary + "\n\n" + "\n".join(lines))
+        else:
+            QMessageBox.information(self, "Tutarlılık Kontrolü", summary + "\nYerel veri bulutla tutarlı.")
+        self.refresh_status()
+    
     def clear_synced(self):
         """Senkronize edilmiş kayıtları temizle"""
         reply = QMessageBox.question(
@@ -470,7 +578,8 @@ if __name__ == '__main__':
                 'pending_changes': 5,
                 'last_sync_time': datetime.now().isoformat(),
                 'sync_interval': 300,
-                'recent_history': []
+                'recent_history': [],
+                'table_stats': []
             }
         
         def get_pending_changes(self, limit=50):
@@ -11,6 +11,7 @@ logger = logging.getLogger(__name__)
 from PyQt6.QtCore import Qt, pyqtSignal as Signal
 
 from utils.database import db_manager
+from utils.workers import get_db_task_runner
 from utils.pdf_generator import create_professional_invoice_pdf, create_merged_invoice_pdf 
 from .dialogs.payment_dialog import PaymentDialog
 from .dialogs.invoice_preview_dialog import InvoicePreviewDialog
@@ -19,6 +20,25 @@ class InvoicingTab(QWidget):
     """Faturalandırma işlemlerini ve geçmişini yöneten sekme."""
     data_changed = Signal()
 
+    CUSTOMERS_QUERY = "SELECT id, name FROM customers ORDER BY name"
+    # Tüm faturalar PDF raporunda tek tabloya konan satır sayısı
+    REPORT_TABLE_CHUNK = 500
+    PENDING_SALES_QUERY = """
+        SELECT ps.id, ps.customer_id, c.name as customer_name, ps.sale_date, 
+               ps.total_amount, ps.currency, ps.items_json
+        FROM pending_sales ps
+        JOIN customers c ON ps.customer_id = c.id
+        WHERE ps.status = 'pending'
+        ORDER BY ps.sale_date DESC
+    """
+    ALL_INVOICES_QUERY = """
+        SELECT i.id, c.name, i.invoice_date, i.invoice_type, 
+               i.total_amount, i.currency, i.status
+        FROM invoices i
+        JOIN customers c ON i.customer_id = c.id
+        ORDER BY i.invoice_date DESC
+    """
+
     def __init__(self, db, parent=None):
         super().__init__(parent)
         self.db = db
@@ -230,10 +250,15 @@ class InvoicingTab(QWidget):
 
     def refresh_customers(self):
         """Müşteri listesini veritabanından yeniler."""
+        try:
+            self._populate_customers(self.db.fetch_all_cached(self.CUSTOMERS_QUERY))
+        except Exception as e:
+            QMessageBox.critical(self, "Veritabanı Hatası", f"Müşteriler yüklenirken bir hata oluştu: {e}")
+
+    def _populate_customers(self, customers):
         current_id = self.selected_customer_id
         self.customer_table.setRowCount(0)
         try:
-            customers = self.db.fetch_all("SELECT id, name FROM customers ORDER BY name")
             row_to_select = -1
             for i, (cust_id, name) in enumerate(customers):
                 self.customer_table.insertRow(i)
@@ -288,19 +313,15 @@ class InvoicingTab(QWidget):
 
     def refresh_uninvoiced_items(self):
         """Beklemede olan satışları yeniler."""
-        self.pending_sales_table.setRowCount(0)
-        
         try:
             # Beklemede olan tüm satışları getir
-            pending_sales = self.db.fetch_all("""
-                SELECT ps.id, ps.customer_id, c.name as customer_name, ps.sale_date, 
-                       ps.total_amount, ps.currency, ps.items_json
-                FROM pending_sales ps
-                JOIN customers c ON ps.customer_id = c.id
-                WHERE ps.status = 'pending'
-                ORDER BY ps.sale_date DESC
-            """)
-            
+            self._populate_uninvoiced_items(self.db.fetch_all(self.PENDING_SALES_QUERY))
+        except Exception as e:
+            QMessageBox.critical(self, "Veri Hatası", f"Beklemede satışlar yüklenirken hata: {e}")
+
+    def _populate_uninvoiced_items(self, pending_sales):
+        self.pending_sales_table.setRowCount(0)
+        try:
             for sale in pending_sales:
                 row = self.pending_sales_table.rowCount()
                 self.pending_sales_table.insertRow(row)
@@ -557,11 +578,25 @@ class InvoicingTab(QWidget):
                 QMessageBox.critical(self, "Silme Hatası", f"Fatura silinirken bir hata oluştu: {e}")
 
     def refresh_data(self):
-        """Tüm sekme verilerini yeniler."""
-        self.refresh_customers()
-        self.refresh_uninvoiced_items()
+        """Tüm sekme verilerini yeniler; listeler arka planda okunur."""
+        get_db_task_runner().submit(
+            self, 'refresh', self._load_tab_data,
+            on_result=self._apply_tab_data,
+            on_error=lambda e: QMessageBox.critical(self, "Veritabanı Hatası", f"Fatura verileri yüklenirken bir hata oluştu: {e}")
+        )
+
+    def _load_tab_data(self):
+        """Worker thread'inde çalışır; yalnızca veritabanı okur."""
+        return (self.db.fetch_all_cached(self.CUSTOMERS_QUERY),
+                self.db.fetch_all(self.PENDING_SALES_QUERY),
+                self.db.fetch_all(self.ALL_INVOICES_QUERY))
+
+    def _apply_tab_data(self, data):
+        customers, pending_sales, all_invoices = data
+        self._populate_customers(customers)
+        self._populate_uninvoiced_items(pending_sales)
         self.refresh_invoices()
-        self.refresh_all_invoices()
+        self._populate_all_invoices(all_invoices)
 
     def invoice_selected_pending_sales(self):
         """Seçili beklemede olan satışları faturalandır."""
@@ -740,18 +775,15 @@ class InvoicingTab(QWidget):
 
     def refresh_all_invoices(self):
         """Tüm faturaları müşteriden bağımsız olarak yeniler."""
-        self.all_invoices_table.setRowCount(0)
-        
         try:
             # Tüm faturaları getir (müşteri bilgisi ile)
-            invoices = self.db.fetch_all("""
-                SELECT i.id, c.name, i.invoice_date, i.invoice_type, 
-                       i.total_amount, i.currency, i.status
-                FROM invoices i
-                JOIN customers c ON i.customer_id = c.id
-                ORDER BY i.invoice_date DESC
-            """)
-            
+            self._populate_all_invoices(self.db.fetch_all(self.ALL_INVOICES_QUERY))
+        except Exception as e:
+            QMessageBox.critical(self, "Veri Hatası", f"Tüm faturalar yüklenirken bir hata oluştu: {e}")
+
+    def _populate_all_invoices(self, invoices):
+        self.all_invoices_table.setRowCount(0)
+        try:
             for invoice_data in invoices:
                 row = self.all_invoices_table.rowCount()
                 self.all_invoices_table.insertRow(row)
@@ -844,8 +876,8 @@ class InvoicingTab(QWidget):
             story.append(Paragraph(f"<b>Rapor Tarihi:</b> {datetime.now().strftime('%d.%m.%Y %H:%M')}", normal_style))
             story.append(Spacer(1, 1*cm))
             
-            # Tüm faturaları getir
-            invoices = self.db.fetch_all("""
+            # Tüm faturaları getir (satırlar parça parça okunur, listeye alınmaz)
+            invoices = self.db.iter_query("""
                 SELECT i.id, c.name, i.invoice_date, i.invoice_type, 
                        i.total_amount, i.currency, i.details_json, i.exchange_rate
                 FROM invoices i
@@ -853,9 +885,35 @@ class InvoicingTab(QWidget):
                 ORDER BY i.invoice_date DESC
             """)
             
-            # Tablo verileri hazırla
-            table_data = [['Fatura No', 'Müşteri', 'Tarih', 'Tip', 'İçerik', 'Tutar (TL)']]
+            # Tablo parça parça kurulur: her REPORT_TABLE_CHUNK satır ayrı bir tablodur.
+            # Tek dev tablo her sayfada baştan ölçülüp bölündüğünden bellek ve süre satır
+            # sayısıyla orantısız artar. Parçalar yine de doc.build() çağrılana
+            # kadar story listesinde tutulur.
+            header = ['Fatura No', 'Müşteri', 'Tarih', 'Tip', 'İçerik', 'Tutar (TL)']
+            col_widths = [2*cm, 4*cm, 2.5*cm, 2*cm, 5*cm, 2.5*cm]
+            base_style = [
+                ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+                ('ALIGN', (5, 0), (5, -1), 'RIGHT'),  # Tutar kolonunu sağa hizala
+                ('GRID', (0, 0), (-1, -1), 1, colors.black),
+            ]
+            chunk_style = TableStyle(base_style + [
+                ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#1976D2')),
+                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+                ('FONTNAME', (0, 0), (-1, 0), 'DejaVuSans-Bold'),
+                ('FONTSIZE', (0, 0), (-1, 0), 10),
+                ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+                ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+                ('FONTNAME', (0, 1), (-1, -1), 'DejaVuSans'),
+                ('FONTSIZE', (0, 1), (-1, -1), 8),
+            ])
+            
+            def add_chunk(rows):
+                table = Table([header] + rows, colWidths=col_widths, repeatRows=1)
+                table.setStyle(chunk_style)
+                story.append(table)
             
+            rows = []
+            row_count = 0
             total_sum_tl = 0.0
             
             for inv_data in invoices:
@@ -892,7 +950,7 @@ class InvoicingTab(QWidget):
                 
                 total_sum_tl += amount_tl
                 
-                table_data.append([
+                rows.append([
                     str(inv_id),
                     customer_name[:30],
                     date[:10] if date else '',
@@ -900,30 +958,22 @@ class InvoicingTab(QWidget):
                     content[:50],
                     f"{amount_tl:.2f}"
                 ])
-            
-            # Toplam satırı ekle
-            table_data.append(['', '', '', '', 'TOPLAM:', f"{total_sum_tl:.2f} TL"])
-            
-            # Tablo oluştur
-            table = Table(table_data, colWidths=[2*cm, 4*cm, 2.5*cm, 2*cm, 5*cm, 2.5*cm])
-            table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#1976D2')),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-                ('ALIGN', (5, 0), (5, -1), 'RIGHT'),  # Tutar kolonunu sağa hizala
-                ('FONTNAME', (0, 0), (-1, 0), 'DejaVuSans-Bold'),
-                ('FONTSIZE', (0, 0), (-1, 0), 10),
-                ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                ('BACKGROUND', (0, 1), (-1, -2), colors.beige),
-                ('GRID', (0, 0), (-1, -1), 1, colors.black),
-                ('FONTNAME', (0, 1), (-1, -1), 'DejaVuSans'),
-                ('FONTSIZE', (0, 1), (-1, -1), 8),
-                ('BACKGROUND', (0, -1), (-1, -1), colors.HexColor('#FFE082')),
-                ('FONTNAME', (0, -1), (-1, -1), 'DejaVuSans-Bold'),
-                ('FONTSIZE', (0, -1), (-1, -1), 10),
+                row_count += 1
+                if len(rows) >= self.REPORT_TABLE_CHUNK:
+                    add_chunk(rows)
+                    rows = []
+            
+            if rows or not row_count:
+                add_chunk(rows)
+            
+            # Toplam satırı
+            total_table = Table([['', '', '', '', 'TOPLAM:', f"{total_sum_tl:.2f} TL"]], colWidths=col_widths)
+            total_table.setStyle(TableStyle(base_style + [
+                ('BACKGROUND', (0, 0), (-1, -1), colors.HexColor('#FFE082')),
+                ('FONTNAME', (0, 0), (-1, -1), 'DejaVuSans-Bold'),
+                ('FONTSIZE', (0, 0), (-1, -1), 10),
             ]))
-            
-            story.append(table)
+            story.append(total_table)
             
             # PDF'i oluştur
             doc.build(story)
@@ -6,7 +6,7 @@ logger = logging.getLogger(__name__)
 import traceback
 from PyQt6.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QTabWidget,
                              QLabel, QStatusBar, QMessageBox, QHeaderView, QTableWidget, QTableWidgetItem,
-                             QSplitter, QGroupBox, QLineEdit, QPushButton)
+                             QSplitter, QGroupBox, QLineEdit, QPushButton, QProgressBar)
 from PyQt6.QtCore import Qt, pyqtSignal as Signal
 from PyQt6.QtGui import QPixmap, QIcon
 
@@ -21,7 +21,8 @@ from ui.cpc_tab import CPCTab
 from ui.ai_assistant_tab import AIAssistantTab
 from ui.settings_tab import SettingsTab
 from utils.workers import (PANDAS_AVAILABLE, OPENAI_AVAILABLE, GEMINI_AVAILABLE, 
-                             CurrencyRateThread)
+                             get_currency_service, get_db_task_runner)
+
 
 class MainWindow(QMainWindow):
     """Ana uygulama penceresi."""
@@ -70,6 +71,17 @@ class MainWindow(QMainWindow):
         self.status_bar = QStatusBar()
         self.setStatusBar(self.status_bar)
         
+        # Arka planda veritabanı sorgusu çalışırken gösterilen meşgul göstergesi
+        self.busy_indicator = QProgressBar()
+        self.busy_indicator.setRange(0, 0)
+        self.busy_indicator.setMaximumSize(120, 14)
+        self.busy_indicator.setTextVisible(False)
+        self.busy_indicator.hide()
+        self.status_bar.addPermanentWidget(self.busy_indicator)
+        self.db_tasks = get_db_task_runner()
+        self.db_tasks.busy_changed.connect(self.busy_indicator.setVisible)
+        self._previous_tab = None
+        
         # FIXED: Add parent to prevent memory leak
         self.main_widget = QWidget(self)
         self.setCentralWidget(self.main_widget)
@@ -326,10 +338,10 @@ class MainWindow(QMainWindow):
 
     def start_background_tasks(self):
         """Uygulama başlangıcında çalışacak arka plan görevlerini başlatır."""
-        self.currency_thread = CurrencyRateThread(self.db)
-        self.currency_thread.task_finished.connect(self.on_currency_rates_updated)
-        self.currency_thread.task_error.connect(self.on_currency_rates_error)
-        self.currency_thread.start()
+        self.currency_service = get_currency_service(self.db)
+        self.currency_service.rates_updated.connect(self.on_currency_rates_updated)
+        self.currency_service.refresh_failed.connect(self.on_currency_rates_error)
+        self.currency_service.start()
         self.status_bar.showMessage("Döviz kurları güncelleniyor...", 3000)
 
     def on_currency_rates_updated(self, rates):
@@ -393,6 +405,10 @@ class MainWindow(QMainWindow):
             return
             
         current_widget = self.tabs.widget(index)
+        # Bırakılan sekmenin henüz sonuçlanmamış sorgularına gerek kalmadı
+        if self._previous_tab is not None and self._previous_tab is not current_widget:
+            self.db_tasks.cancel(self._previous_tab)
+        self._previous_tab = current_widget
         if current_widget and hasattr(current_widget, 'refresh_data'):
             try:
                 current_widget.refresh_data()  # type: ignore
@@ -12,6 +12,7 @@ from .dialogs.service_dialog import ServiceEditDialog
 from .dialogs.device_history_dialog import DeviceHistoryDialog
 from .dialogs.customer_service_history_dialog import CustomerServiceHistoryDialog
 from utils.database import db_manager
+from utils.workers import get_db_task_runner
 
 class ServiceTab(QWidget):
     """Servis kayıtlarını yöneten sekme."""
@@ -201,8 +202,6 @@ class ServiceTab(QWidget):
         if not self.db or not self.db.get_connection():
             self.status_bar.showMessage("Veritabanı bağlantısı yok.", 5000)
             return
-            
-        self.service_table.setRowCount(0)
         
         try:
             base_query = """
@@ -215,7 +214,8 @@ class ServiceTab(QWidget):
                 LEFT JOIN technicians t ON sr.technician_id = t.id
             """
             
-            conditions = ["sr.problem_description != 'Periyodik Sayaç Okuma'"]
+            # Cihazı bulunmadığı için meter_readings'e taşınamayan periyodik okumalar listelenmez
+            conditions = ["sr.problem_description IS NOT 'Periyodik Sayaç Okuma'"]
             params = []
             
             if self.technician_user_id:
@@ -227,8 +227,22 @@ class ServiceTab(QWidget):
             
             base_query += " ORDER BY sr.id DESC"
             
-            records = self.db.fetch_all(base_query, tuple(params))
-            
+            # Sorgu arka planda çalışır; tablo sonuç geldiğinde doldurulur
+            get_db_task_runner().submit(
+                self, 'refresh', self.db.fetch_all, base_query, tuple(params),
+                on_result=self._populate_service_table, on_error=self._on_refresh_error
+            )
+        except Exception as e:
+            self._on_refresh_error(e)
+
+    def _on_refresh_error(self, error: Exception):
+        QMessageBox.critical(self, "Veritabanı Hatası", f"Servis kayıtları yüklenirken bir hata oluştu: {error}")
+        self.update_button_state()
+
+    def _populate_service_table(self, records):
+        """Arka planda okunan servis kayıtlarını tabloya yazar."""
+        self.service_table.setRowCount(0)
+        try:
             self.service_table.setRowCount(len(records))
             for row, data in enumerate(records):
                 status = data[5]  # Durum sütunu
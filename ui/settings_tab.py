@@ -279,7 +279,7 @@ class SettingsTab(QWidget):
         """Teknisyen tablosunu yeniler."""
         self.technician_table.setRowCount(0)
         try:
-            technicians = db_manager.fetch_all("SELECT id, name, surname, phone, email FROM technicians WHERE is_active = 1 ORDER BY name, surname")
+            technicians = db_manager.fetch_all_cached("SELECT id, name, surname, phone, email FROM technicians WHERE is_active = 1 ORDER BY name, surname")
             for row_data in technicians:
                 row_index = self.technician_table.rowCount()
                 self.technician_table.insertRow(row_index)
@@ -7,11 +7,12 @@ from utils.error_logger import log_error, log_warning, log_info
 from PyQt6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLineEdit, QPushButton, 
                              QTableWidget, QTableWidgetItem, QHeaderView, QSplitter,
                              QLabel, QFormLayout, QMessageBox, QGroupBox, QFrame, QTabWidget, QTextEdit)
-from PyQt6.QtCore import Qt, pyqtSignal as Signal
+from PyQt6.QtCore import Qt, QTimer, pyqtSignal as Signal
 from .dialogs.stock_dialogs import StockItemDialog, StockMovementDialog
 from .dialogs.bulk_device_sale_dialog import BulkDeviceSaleDialog
 from .dialogs.stock_history_dialog import StockHistoryDialog
 from utils.database import db_manager
+from utils.workers import get_db_task_runner
 from .stock.cpc_stock import CPCStockManager
 
 class StockTab(QWidget):
@@ -95,12 +96,15 @@ class StockTab(QWidget):
                     settings.setValue(f"emanet_col_width_{c}", self.emanet_table.columnWidth(c))
             header.sectionResized.connect(lambda idx, old, new: save_column_widths())
         layout.addWidget(self.emanet_table)
-        self.refresh_emanet_stock()
         return tab
 
     def refresh_emanet_stock(self):
         """Emanet stokları yeniler."""
-        self.emanet_table.setRowCount(0)        # Cihaz ve servis kayd? ile birlikte ar?za ve beklenen par?a bilgisini ?ek
+        self._populate_emanet_stock(self._fetch_emanet_stock())
+
+    def _fetch_emanet_stock(self):
+        """Serviste bekleyen emanet cihazları okur (arka plan thread'inden de çağrılabilir)."""
+        # Cihaz ve servis kayd? ile birlikte ar?za ve beklenen par?a bilgisini ?ek
         # Not: Yaln?zca serviste bekleyen cihazlar listelenir (teslimata kadar).
         query = '''
             SELECT s.id, s.name, s.part_number as serial_number, s.quantity,
@@ -122,7 +126,11 @@ class StockTab(QWidget):
               AND sr.status NOT IN ('Onarıldı', 'Teslim Edildi', 'İptal edildi')
             ORDER BY s.name
         '''
-        emanet_items = self.db.fetch_all(query)
+        return self.db.fetch_all(query)
+
+    def _populate_emanet_stock(self, emanet_items):
+        """Emanet stok tablosunu verilen satırlarla doldurur."""
+        self.emanet_table.setRowCount(0)
         for row_idx, item in enumerate(emanet_items):
             self.emanet_table.insertRow(row_idx)
             self.emanet_table.setItem(row_idx, 0, QTableWidgetItem(str(item['id'])))
@@ -676,7 +684,12 @@ class StockTab(QWidget):
 
     def _connect_signals(self):
         """Sinyalleri slotlara bağlar."""
-        self.filter_input.textChanged.connect(self.refresh_data)
+        # Her tuş vuruşunda sorgu atmamak için filtre kısa bir gecikmeyle uygulanır
+        self._filter_timer = QTimer(self)
+        self._filter_timer.setSingleShot(True)
+        self._filter_timer.setInterval(250)
+        self._filter_timer.timeout.connect(self.refresh_data)
+        self.filter_input.textChanged.connect(self._filter_timer.start)
         self.stock_table.itemSelectionChanged.connect(self.item_selected)
         self.stock_table.itemDoubleClicked.connect(self.stock_table_double_clicked)
         self.stock_table.cellChanged.connect(self.stock_table_cell_changed)
@@ -836,16 +849,25 @@ class StockTab(QWidget):
               QMessageBox.critical(self, "Hata", f"Detaylı geçmiş açılırken hata oluştu: {e}")
 
     def refresh_data(self):
-        """Stok listesini veritabanından yeniler."""
-        filter_text = self.filter_input.text()
+        """Stok listesini (emanet stoklarla birlikte) arka planda okuyup yeniler."""
+        get_db_task_runner().submit(
+            self, 'refresh', self._load_stock_data, self.filter_input.text(),
+            on_result=self._populate_stock_data,
+            on_error=lambda e: QMessageBox.critical(self, "Veritabanı Hatası", f"Stok verileri yüklenirken bir hata oluştu: {e}")
+        )
+
+    def _load_stock_data(self, filter_text: str):
+        """Worker thread'inde çalışır; yalnızca veritabanı okur."""
+        return self._fetch_emanet_stock(), self.db.get_stock_items(filter_text)
+
+    def _populate_stock_data(self, data):
+        """Arka planda okunan stok verilerini tablolara yazar."""
+        emanet_items, items = data
         current_id = self.selected_item_id
         self.stock_table.setRowCount(0)
-        
-        # Emanet stokları da yenile
-        self.refresh_emanet_stock()
+        self._populate_emanet_stock(emanet_items)
         
         try:
-            items = self.db.get_stock_items(filter_text)
             if not items:
                 return
 
@@ -1072,10 +1094,10 @@ class StockTab(QWidget):
                         # Manuel girilen kitleri ekle
                         self.add_manual_kits_to_stock(dialog)
                     
+                    # Yeni eklenen veya güncellenen öğe, tablo yenilendiğinde seçili hale gelir
+                    self.selected_item_id = saved_id
                     self.refresh_data()
                     self.data_changed.emit()
-                    # Yeni eklenen veya güncellenen öğeyi seçili hale getir
-                    self.select_item_in_table(saved_id)
                 else:
                     QMessageBox.critical(self, "Veritabanı Hatası", "Stok kartı kaydedilemedi.")
 
@@ -1091,22 +1113,163 @@ class StockTab(QWidget):
             toner_data = dialog.get_toner_data()
             color_type = dialog.color_type_combo.currentText() if hasattr(dialog, 'color_type_combo') else 'Siyah-Beyaz'
             added_toners = []
-            if color_type == 'Renkli':
-                renkler = [
-                    ('Siyah', 'K'),
-                    ('Mavi', 'C'),
-                    ('Kırmızı', 'M'),
-                    ('Sarı', 'Y')
-                ]
-                base_code = toner_data.get('black') or ''
-                muadil_code = toner_data.get('black_equivalent') or ''
-
-                # Orijinal tonerler (4 renkli set)
-                if base_code:
-                    for renk_ad, renk_suffix in renkler:
-                        toner_name = f"{base_code}-{renk_suffix}"
-                        part_number = f"{base_code}-{renk_suffix}"
-                        color_type_val = renk_ad
+            # Tüm tonerler tek işlemde (tek fsync) eklenir; hata olursa hiçbiri eklenmez
+            with self.db.transaction():
+                if color_type == 'Renkli':
+                    renkler = [
+                        ('Siyah', 'K'),
+                        ('Mavi', 'C'),
+                        ('Kırmızı', 'M'),
+                        ('Sarı', 'Y')
+                    ]
+                    base_code = toner_data.get('black') or ''
+                    muadil_code = toner_data.get('black_equivalent') or ''
+
+                    # Orijinal tonerler (4 renkli set)
+                    if base_code:
+                        for renk_ad, renk_suffix in renkler:
+                            toner_name = f"{base_code}-{renk_suffix}"
+                            part_number = f"{base_code}-{renk_suffix}"
+                            color_type_val = renk_ad
+                            existing = self.db.fetch_one(
+                                "SELECT id FROM stock_items WHERE item_type = 'Toner' AND (name = ? OR part_number = ?)",
+                                (toner_name, part_number)
+                            )
+                            if not existing:
+                                new_toner_data = {
+                                    'item_type': 'Toner',
+                                    'name': toner_name,
+                                    'part_number': part_number,
+                                    'description': f"{renk_ad} Toner - Orijinal - Otomatik eklendi",
+                                    'quantity': 0,
+                                    'purchase_price': 0.0,
+                                    'purchase_currency': 'TL',
+                                    'sale_price': 0.0,
+                                    'sale_currency': 'TL',
+                                    'supplier': '',
+                                    'is_consignment': 0,
+                                    'color_type': color_type_val
+                                }
+                                saved_id = self.db.save_stock_item(new_toner_data, None)
+                                if saved_id:
+                                    added_toners.append(f"{renk_ad} Orijinal: {toner_name}")
+                                    log_msg = f"Manuel toner eklendi: {renk_ad} Orijinal: {toner_name}"
+                                    logging.info(log_msg)
+                                    self.operation_logs.append(log_msg)
+
+                    # Muadil tonerler (4 renkli set)
+                    if muadil_code:
+                        # Eğer muadil kod zaten -K, -C gibi bitiyorsa, temel kodu çıkar
+                        ana_kod = muadil_code
+                        for suf in ['-K', '-C', '-M', '-Y']:
+                            if muadil_code.endswith(suf):
+                                ana_kod = muadil_code[:-2]
+                                break
+                        for renk_ad, renk_suffix in renkler:
+                            toner_name_muadil = f"{ana_kod}-{renk_suffix} (Muadil)"
+                            part_number_muadil = f"{ana_kod}-{renk_suffix} (Muadil)"  # 👈 Burada (Muadil) eklendi
+                            color_type_val = renk_ad
+                            existing_muadil = self.db.fetch_one(
+                                "SELECT id FROM stock_items WHERE item_type = 'Toner' AND (name = ? OR part_number = ?)",
+                                (toner_name_muadil, part_number_muadil)
+                            )
+                            if not existing_muadil:
+                                new_toner_data_muadil = {
+                                    'item_type': 'Toner',
+                                    'name': toner_name_muadil,
+                                    'part_number': part_number_muadil,
+                                    'description': f"{renk_ad} Toner - Muadil - Otomatik eklendi",
+                                    'quantity': 0,
+                                    'purchase_price': 0.0,
+                                    'purchase_currency': 'TL',
+                                    'sale_price': 0.0,
+                                    'sale_currency': 'TL',
+                                    'supplier': '',
+                                    'is_consignment': 0,
+                                    'color_type': color_type_val
+                                }
+                                saved_id = self.db.save_stock_item(new_toner_data_muadil, None)
+                                if saved_id:
+                                    added_toners.append(f"{renk_ad} Muadil: {toner_name_muadil}")
+                                    log_msg = f"Manuel toner eklendi: {renk_ad} Muadil: {toner_name_muadil}"
+                                    logging.info(log_msg)
+                                    self.operation_logs.append(log_msg)
+
+                    # Kullanıcı ayrı ayrı renk kodları girdiyse (manuel override)
+                    manual_colors = [
+                        ('cyan', 'Mavi'),
+                        ('magenta', 'Kirmizi'),
+                        ('yellow', 'Sari')
+                    ]
+                    for field, renk_ad in manual_colors:
+                        kod = toner_data.get(field)
+                        kod_muadil = toner_data.get(f"{field}_equivalent")
+                        # Orijinal
+                        if kod:
+                            toner_name = kod
+                            part_number = kod
+                            existing = self.db.fetch_one(
+                                "SELECT id FROM stock_items WHERE item_type = 'Toner' AND (name = ? OR part_number = ?)",
+                                (toner_name, part_number)
+                            )
+                            if not existing:
+                                new_toner_data = {
+                                    'item_type': 'Toner',
+                                    'name': toner_name,
+                                    'part_number': part_number,
+                                    'description': f"{renk_ad} Toner - Orijinal - Manuel girildi",
+                                    'quantity': 0,
+                                    'purchase_price': 0.0,
+                                    'purchase_currency': 'TL',
+                                    'sale_price': 0.0,
+                                    'sale_currency': 'TL',
+                                    'supplier': '',
+                                    'is_consignment': 0,
+                                    'color_type': renk_ad
+                                }
+                                saved_id = self.db.save_stock_item(new_toner_data, None)
+                                if saved_id:
+                                    added_toners.append(f"{renk_ad} Orijinal: {toner_name}")
+                                    log_msg = f"Manuel toner eklendi: {renk_ad} Orijinal: {toner_name}"
+                                    logging.info(log_msg)
+                                    self.operation_logs.append(log_msg)
+                        # Muadil
+                        if kod_muadil:
+                            toner_name = f"{kod_muadil} (Muadil)"
+                            part_number = f"{kod_muadil} (Muadil)"  # 👈 Burada da (Muadil) eklendi
+                            existing = self.db.fetch_one(
+                                "SELECT id FROM stock_items WHERE item_type = 'Toner' AND (name = ? OR part_number = ?)",
+                                (toner_name, part_number)
+                            )
+                            if not existing:
+                                new_toner_data = {
+                                    'item_type': 'Toner',
+                                    'name': toner_name,
+                                    'part_number': part_number,
+                                    'description': f"{renk_ad} Toner - Muadil - Manuel girildi",
+                                    'quantity': 0,
+                                    'purchase_price': 0.0,
+                                    'purchase_currency': 'TL',
+                                    'sale_price': 0.0,
+                                    'sale_currency': 'TL',
+                                    'supplier': '',
+                                    'is_consignment': 0,
+                                    'color_type': renk_ad
+                                }
+                                saved_id = self.db.save_stock_item(new_toner_data, None)
+                                if saved_id:
+                                    added_toners.append(f"{renk_ad} Muadil: {toner_name}")
+                                    log_msg = f"Manuel toner eklendi: {renk_ad} Muadil: {toner_name}"
+                                    logging.info(log_msg)
+                                    self.operation_logs.append(log_msg)
+
+                else:
+                    # Siyah-beyaz cihaz
+                    base_code = toner_data.get('black') or ''
+                    muadil_code = toner_data.get('black_equivalent') or ''
+                    if base_code:
+                        toner_name = base_code
+                        part_number = base_code
                         existing = self.db.fetch_one(
                             "SELECT id FROM stock_items WHERE item_type = 'Toner' AND (name = ? OR part_number = ?)",
                             (toner_name, part_number)
@@ -1116,7 +1279,7 @@ class StockTab(QWidget):
                                 'item_type': 'Toner',
                                 'name': toner_name,
                                 'part_number': part_number,
-                                'description': f"{renk_ad} Toner - Orijinal - Otomatik eklendi",
+                                'description': "Siyah Toner - Orijinal - Otomatik eklendi",
                                 'quantity': 0,
                                 'purchase_price': 0.0,
                                 'purchase_currency': 'TL',
@@ -1124,27 +1287,17 @@ class StockTab(QWidget):
                                 'sale_currency': 'TL',
                                 'supplier': '',
                                 'is_consignment': 0,
-                                'color_type': color_type_val
+                                'color_type': 'Siyah'
                             }
                             saved_id = self.db.save_stock_item(new_toner_data, None)
                             if saved_id:
-                                added_toners.append(f"{renk_ad} Orijinal: {toner_name}")
-                                log_msg = f"Manuel toner eklendi: {renk_ad} Orijinal: {toner_name}"
+                                added_toners.append(f"Siyah Orijinal: {toner_name}")
+                                log_msg = f"Manuel toner eklendi: Siyah Orijinal: {toner_name}"
                                 logging.info(log_msg)
                                 self.operation_logs.append(log_msg)
-
-                # Muadil tonerler (4 renkli set)
-                if muadil_code:
-                    # Eğer muadil kod zaten -K, -C gibi bitiyorsa, temel kodu çıkar
-                    ana_kod = muadil_code
-                    for suf in ['-K', '-C', '-M', '-Y']:
-                        if muadil_code.endswith(suf):
-                            ana_kod = muadil_code[:-2]
-                            break
-                    for renk_ad, renk_suffix in renkler:
-                        toner_name_muadil = f"{ana_kod}-{renk_suffix} (Muadil)"
-                        part_number_muadil = f"{ana_kod}-{renk_suffix} (Muadil)"  # 👈 Burada (Muadil) eklendi
-                        color_type_val = renk_ad
+                    if muadil_code:
+                        toner_name_muadil = f"{muadil_code} (Muadil)"
+                        part_number_muadil = f"{muadil_code} (Muadil)"  # 👈 Burada da düzeltildi
                         existing_muadil = self.db.fetch_one(
                             "SELECT id FROM stock_items WHERE item_type = 'Toner' AND (name = ? OR part_number = ?)",
                             (toner_name_muadil, part_number_muadil)
@@ -1154,7 +1307,7 @@ class StockTab(QWidget):
                                 'item_type': 'Toner',
                                 'name': toner_name_muadil,
                                 'part_number': part_number_muadil,
-                                'description': f"{renk_ad} Toner - Muadil - Otomatik eklendi",
+                                'description': "Siyah Toner - Muadil - Otomatik eklendi",
                                 'quantity': 0,
                                 'purchase_price': 0.0,
                                 'purchase_currency': 'TL',
@@ -1162,144 +1315,15 @@ class StockTab(QWidget):
                                 'sale_currency': 'TL',
                                 'supplier': '',
                                 'is_consignment': 0,
-                                'color_type': color_type_val
+                                'color_type': 'Siyah'
                             }
                             saved_id = self.db.save_stock_item(new_toner_data_muadil, None)
                             if saved_id:
-                                added_toners.append(f"{renk_ad} Muadil: {toner_name_muadil}")
-                                log_msg = f"Manuel toner eklendi: {renk_ad} Muadil: {toner_name_muadil}"
-                                logging.info(log_msg)
-                                self.operation_logs.append(log_msg)
-
-                # Kullanıcı ayrı ayrı renk kodları girdiyse (manuel override)
-                manual_colors = [
-                    ('cyan', 'Mavi'),
-                    ('magenta', 'Kirmizi'),
-                    ('yellow', 'Sari')
-                ]
-                for field, renk_ad in manual_colors:
-                    kod = toner_data.get(field)
-                    kod_muadil = toner_data.get(f"{field}_equivalent")
-                    # Orijinal
-                    if kod:
-                        toner_name = kod
-                        part_number = kod
-                        existing = self.db.fetch_one(
-                            "SELECT id FROM stock_items WHERE item_type = 'Toner' AND (name = ? OR part_number = ?)",
-                            (toner_name, part_number)
-                        )
-                        if not existing:
-                            new_toner_data = {
-                                'item_type': 'Toner',
-                                'name': toner_name,
-                                'part_number': part_number,
-                                'description': f"{renk_ad} Toner - Orijinal - Manuel girildi",
-                                'quantity': 0,
-                                'purchase_price': 0.0,
-                                'purchase_currency': 'TL',
-                                'sale_price': 0.0,
-                                'sale_currency': 'TL',
-                                'supplier': '',
-                                'is_consignment': 0,
-                                'color_type': renk_ad
-                            }
-                            saved_id = self.db.save_stock_item(new_toner_data, None)
-                            if saved_id:
-                                added_toners.append(f"{renk_ad} Orijinal: {toner_name}")
-                                log_msg = f"Manuel toner eklendi: {renk_ad} Orijinal: {toner_name}"
-                                logging.info(log_msg)
-                                self.operation_logs.append(log_msg)
-                    # Muadil
-                    if kod_muadil:
-                        toner_name = f"{kod_muadil} (Muadil)"
-                        part_number = f"{kod_muadil} (Muadil)"  # 👈 Burada da (Muadil) eklendi
-                        existing = self.db.fetch_one(
-                            "SELECT id FROM stock_items WHERE item_type = 'Toner' AND (name = ? OR part_number = ?)",
-                            (toner_name, part_number)
-                        )
-                        if not existing:
-                            new_toner_data = {
-                                'item_type': 'Toner',
-                                'name': toner_name,
-                                'part_number': part_number,
-                                'description': f"{renk_ad} Toner - Muadil - Manuel girildi",
-                                'quantity': 0,
-                                'purchase_price': 0.0,
-                                'purchase_currency': 'TL',
-                                'sale_price': 0.0,
-                                'sale_currency': 'TL',
-                                'supplier': '',
-                                'is_consignment': 0,
-                                'color_type': renk_ad
-                            }
-                            saved_id = self.db.save_stock_item(new_toner_data, None)
-                            if saved_id:
-                                added_toners.append(f"{renk_ad} Muadil: {toner_name}")
-                                log_msg = f"Manuel toner eklendi: {renk_ad} Muadil: {toner_name}"
+                                added_toners.append(f"Siyah Muadil: {toner_name_muadil}")
+                                log_msg = f"Manuel toner eklendi: Siyah Muadil: {toner_name_muadil}"
                                 logging.info(log_msg)
                                 self.operation_logs.append(log_msg)
 
-            else:
-                # Siyah-beyaz cihaz
-                base_code = toner_data.get('black') or ''
-                muadil_code = toner_data.get('black_equivalent') or ''
-                if base_code:
-                    toner_name = base_code
-                    part_number = base_code
-                    existing = self.db.fetch_one(
-                        "SELECT id FROM stock_items WHERE item_type = 'Toner' AND (name = ? OR part_number = ?)",
-                        (toner_name, part_number)
-                    )
-                    if not existing:
-                        new_toner_data = {
-                            'item_type': 'Toner',
-                            'name': toner_name,
-                            'part_number': part_number,
-                            'description': "Siyah Toner - Orijinal - Otomatik eklendi",
-                            'quantity': 0,
-                            'purchase_price': 0.0,
-                            'purchase_currency': 'TL',
-                            'sale_price': 0.0,
-                            'sale_currency': 'TL',
-                            'supplier': '',
-                            'is_consignment': 0,
-                            'color_type': 'Siyah'
-                        }
-                        saved_id = self.db.save_stock_item(new_toner_data, None)
-                        if saved_id:
-                            added_toners.append(f"Siyah Orijinal: {toner_name}")
-                            log_msg = f"Manuel toner eklendi: Siyah Orijinal: {toner_name}"
-                            logging.info(log_msg)
-                            self.operation_logs.append(log_msg)
-                if muadil_code:
-                    toner_name_muadil = f"{muadil_code} (Muadil)"
-                    part_number_muadil = f"{muadil_code} (Muadil)"  # 👈 Burada da düzeltildi
-                    existing_muadil = self.db.fetch_one(
-                        "SELECT id FROM stock_items WHERE item_type = 'Toner' AND (name = ? OR part_number = ?)",
-                        (toner_name_muadil, part_number_muadil)
-                    )
-                    if not existing_muadil:
-                        new_toner_data_muadil = {
-                            'item_type': 'Toner',
-                            'name': toner_name_muadil,
-                            'part_number': part_number_muadil,
-                            'description': "Siyah Toner - Muadil - Otomatik eklendi",
-                            'quantity': 0,
-                            'purchase_price': 0.0,
-                            'purchase_currency': 'TL',
-                            'sale_price': 0.0,
-                            'sale_currency': 'TL',
-                            'supplier': '',
-                            'is_consignment': 0,
-                            'color_type': 'Siyah'
-                        }
-                        saved_id = self.db.save_stock_item(new_toner_data_muadil, None)
-                        if saved_id:
-                            added_toners.append(f"Siyah Muadil: {toner_name_muadil}")
-                            log_msg = f"Manuel toner eklendi: Siyah Muadil: {toner_name_muadil}"
-                            logging.info(log_msg)
-                            self.operation_logs.append(log_msg)
-
             if added_toners:
                 toner_list = "\n".join(added_toners)
                 QMessageBox.information(
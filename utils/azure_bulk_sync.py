@@ -0,0 +1,342 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Azure SQL toplu senkronizasyon (MERGE)
+
+Kayıtlar satır satır SELECT/UPDATE/INSERT yerine parti parti gönderilir:
+parti geçici bir hazırlık tablosuna tek seferde yazılır (SQL Server'da
+`fast_executemany`) ve hedef tabloya tek bir MERGE ile uygulanır. Böylece
+parti başına yalnızca birkaç gidiş-dönüş yapılır.
+
+Her parti bir kayıt noktası (savepoint) içinde uygulanır. Parti hata verirse
+kayıt noktasına dönülür ve parti ikiye bölünerek yeniden denenir; hatalı
+kayıtlar tek başına kalana kadar bölünür, hata o kaydın kimliğiyle raporlanır,
+diğer kayıtlar yine yazılır. Silmeler de aynı şekilde parti parti uygulanır.
+
+Veritabanına özgü SQL `MergeBackend` alt sınıflarındadır:
+`SqlServerMergeBackend` Azure SQL için, `SQLiteMergeBackend` ise aynı yolu
+yerel bir SQLite kopyasına karşı denemek ve ölçmek içindir
+(bkz. tools/azure_sync_benchmark.py, utils/azure_emulator.py).
+"""
+
+import logging
+from typing import Any, Callable, Dict, List, Optional, Sequence, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Tek MERGE ile uygulanan kayıt sayısı
+MERGE_BATCH_SIZE = 500
+
+_STAGE_TABLE = 'sync_stage'
+_SAVEPOINT = 'merge_batch'
+
+
+class MergeBackend:
+    """
+    Toplu MERGE için veritabanına özgü işlemler.
+
+    `merge_records` bir çağrı boyunca sırasıyla `describe`, her sütun kümesi
+    için `prepare` / `merge` / `finish`, parti başına `savepoint` ile
+    `release_savepoint` veya `rollback_to_savepoint`, en sonda `commit` ya da
+    `rollback` çağırır.
+    """
+
+    name = 'base'
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.cursor = connection.cursor()
+
+    def describe(self, schema_name: Optional[str], table_name: str) -> Tuple[Set[str], bool]:
+        """Hedef tablonun sütunları (küçük harf) ve id'nin IDENTITY olup olmadığı."""
+        raise NotImplementedError
+
+    def prepare(self, schema_name: Optional[str], table_name: str, columns: Sequence[str], identity: bool) -> None:
+        """Verilen sütunlar için boş hazırlık tablosunu oluşturur."""
+        raise NotImplementedError
+
+    def merge(self, rows: List[tuple]) -> None:
+        """(id, sütunlar...) satırlarını hazırlık tablosuna yazar ve hedefe uygular."""
+        raise NotImplementedError
+
+    def finish(self) -> None:
+        """Hazırlık tablosunu kaldırır."""
+        raise NotImplementedError
+
+    def delete(self, schema_name: Optional[str], table_name: str, ids: List[Any]) -> None:
+        """Verilen id'lere sahip kayıtları siler."""
+        raise NotImplementedError
+
+    def savepoint(self) -> None:
+        raise NotImplementedError
+
+    def release_savepoint(self) -> None:
+        raise NotImplementedError
+
+    def rollback_to_savepoint(self) -> None:
+        raise NotImplementedError
+
+    def commit(self) -> None:
+        self.connection.commit()
+
+    def rollback(self) -> None:
+        self.connection.rollback()
+
+
+class SqlServerMergeBackend(MergeBackend):
+    """Azure SQL / SQL Server (pyodbc bağlantısı)."""
+
+    name = 'sqlserver'
+
+    def describe(self, schema_name, table_name):
+        self.cursor.execute("""
+            SELECT LOWER(c.COLUMN_NAME),
+                   COLUMNPROPERTY(OBJECT_ID(QUOTENAME(c.TABLE_SCHEMA) + '.' + QUOTENAME(c.TABLE_NAME)),
+                                  c.COLUMN_NAME, 'IsIdentity')
+            FROM INFORMATION_SCHEMA.COLUMNS c
+            WHERE c.TABLE_SCHEMA = ? AND c.TABLE_NAME = ?
+        """, (schema_name, table_name))
+        rows = self.cursor.fetchall()
+        return {row[0] for row in rows}, any(row[0] == 'id' and row[1] == 1 for row in rows)
+
+    def prepare(self, schema_name, table_name, columns, identity):
+        self.target = f"[{schema_name}].[{table_name}]"
+        self.columns = ['id'] + list(columns)
+        self.identity = identity
+        select_list = ', '.join(f"[{c}]" for c in self.columns)
+        # UNION ALL, hazırlık tablosunun id sütununu IDENTITY olmaktan çıkarır.
+        # Bu ilk ifade işlemi de başlatır; SAVE TRANSACTION açık işlem gerektirir.
+        self.cursor.execute(f"""
+            SELECT TOP 0 {select_list} INTO #{_STAGE_TABLE} FROM {self.target}
+            UNION ALL
+            SELECT TOP 0 {select_list} FROM {self.target}
+        """)
+        placeholders = ', '.join('?' for _ in self.columns)
+        self.insert_sql = f"INSERT INTO #{_STAGE_TABLE} ({select_list}) VALUES ({placeholders})"
+        updates = ', '.join(f"t.[{c}] = s.[{c}]" for c in columns)
+        matched = f"WHEN MATCHED THEN UPDATE SET {updates}" if columns else ""
+        merge_sql = f"""
+            MERGE {self.target} WITH (HOLDLOCK) AS t
+            USING #{_STAGE_TABLE} AS s ON t.[id] = s.[id]
+            {matched}
+            WHEN NOT MATCHED BY TARGET THEN
+                INSERT ({select_list}) VALUES ({', '.join(f's.[{c}]' for c in self.columns)});
+            TRUNCATE TABLE #{_STAGE_TABLE};"""
+        if identity:
+            merge_sql = (f"SET IDENTITY_INSERT {self.target} ON;{merge_sql}\n"
+                         f"SET IDENTITY_INSERT {self.target} OFF;")
+        self.merge_sql = merge_sql
+
+    def merge(self, rows):
+        self.cursor.fast_executemany = True
+        self.cursor.executemany(self.insert_sql, rows)
+        self.cursor.execute(self.merge_sql)
+
+    def finish(self):
+        self.cursor.execute(f"DROP TABLE #{_STAGE_TABLE}")
+
+    def delete(self, schema_name, table_name, ids):
+        self.cursor.fast_executemany = True
+        self.cursor.executemany(f"DELETE FROM [{schema_name}].[{table_name}] WHERE [id] = ?",
+                                [(record_id,) for record_id in ids])
+
+    def savepoint(self):
+        self.cursor.execute(f"SAVE TRANSACTION {_SAVEPOINT}")
+
+    def release_savepoint(self):
+        # SQL Server'da kayıt noktası serbest bırakılmaz
+        pass
+
+    def rollback_to_savepoint(self):
+        self.cursor.execute(f"ROLLBACK TRANSACTION {_SAVEPOINT}")
+        if self.identity:
+            # SET ifadeleri işlemle geri alınmaz
+            self.cursor.execute(f"SET IDENTITY_INSERT {self.target} OFF")
+
+
+class SQLiteMergeBackend(MergeBackend):
+    """
+    Yerel SQLite kopyası (sqlite3 bağlantısı).
+
+    `schema_name` verilirse bağlantıya o adla eklenmiş (ATTACH) veritabanı
+    kullanılır; verilmezse ana veritabanı.
+    """
+
+    name = 'sqlite'
+
+    @staticmethod
+    def _schema(schema_name: Optional[str]) -> str:
+        return f'"{schema_name}"' if schema_name else 'main'
+
+    def describe(self, schema_name, table_name):
+        rows = self.cursor.execute(f'PRAGMA {self._schema(schema_name)}.table_info("{table_name}")').fetchall()
+        return {row[1].lower() for row in rows}, False
+
+    def prepare(self, schema_name, table_name, columns, identity):
+        if not self.connection.in_transaction:
+            self.cursor.execute("BEGIN")
+        self.target = f'{self._schema(schema_name)}."{table_name}"'
+        self.identity = identity
+        self.columns = ['id'] + list(columns)
+        select_list = ', '.join(f'"{c}"' for c in self.columns)
+        self.cursor.execute(f"DROP TABLE IF EXISTS temp.{_STAGE_TABLE}")
+        self.cursor.execute(f'CREATE TEMP TABLE {_STAGE_TABLE} AS SELECT {select_list} FROM {self.target} WHERE 0')
+        self.insert_sql = f"INSERT INTO temp.{_STAGE_TABLE} ({select_list}) VALUES ({', '.join('?' for _ in self.columns)})"
+        updates = ', '.join(f'"{c}" = excluded."{c}"' for c in columns)
+        self.merge_sql = (
+            f'INSERT INTO {self.target} ({select_list}) SELECT {select_list} FROM temp.{_STAGE_TABLE} WHERE true '
+            + (f"ON CONFLICT (id) DO UPDATE SET {updates}" if columns else "ON CONFLICT (id) DO NOTHING")
+        )
+
+    def merge(self, rows):
+        self.cursor.executemany(self.insert_sql, rows)
+        self.cursor.execute(self.merge_sql)
+        self.cursor.execute(f"DELETE FROM temp.{_STAGE_TABLE}")
+
+    def finish(self):
+        self.cursor.execute(f"DROP TABLE IF EXISTS temp.{_STAGE_TABLE}")
+
+    def delete(self, schema_name, table_name, ids):
+        self.cursor.executemany(f'DELETE FROM {self._schema(schema_name)}."{table_name}" WHERE id = ?',
+                                [(record_id,) for record_id in ids])
+
+    def savepoint(self):
+        # İşlem dışında açılan kayıt noktası serbest bırakılınca onaylanır; önce işlem başlatılır
+        if not self.connection.in_transaction:
+            self.cursor.execute("BEGIN")
+        self.cursor.execute(f"SAVEPOINT {_SAVEPOINT}")
+
+    def release_savepoint(self):
+        self.cursor.execute(f"RELEASE {_SAVEPOINT}")
+
+    def rollback_to_savepoint(self):
+        self.cursor.execute(f"ROLLBACK TO {_SAVEPOINT}")
+        self.cursor.execute(f"RELEASE {_SAVEPOINT}")
+
+
+def merge_records(backend: MergeBackend, table_name: str, records: List[Dict[str, Any]],
+                  schema_name: Optional[str] = None, batch_size: int = MERGE_BATCH_SIZE,
+                  retryable: Optional[Callable[[BaseException], bool]] = None) -> dict:
+    """
+    Kayıtları hedef tabloya id'ye göre toplu olarak yazar (varsa günceller, yoksa ekler).
+
+    Aynı sütunlara sahip kayıtlar birlikte işlenir; aynı id birden fazla kez
+    gelirse son kayıt geçerlidir. Tamamı tek işlemde uygulanır ve sonunda
+    onaylanır. `retryable` doğru döndüren hatalar (ör. geçici bağlantı
+    hataları) kayda atfedilmez; işlem geri alınıp hata yükseltilir, çağrı
+    bütünüyle yeniden denenebilir.
+
+    Returns:
+        {'success': int, 'failed': int, 'errors': [], 'synced_ids': []}
+    """
+    result = {'success': 0, 'failed': 0, 'errors': [], 'synced_ids': []}
+
+    def fail(ids, message):
+        result['failed'] += len(ids)
+        for record_id in ids:
+            result['errors'].append(f"Record {record_id}: {message}")
+            logger.error(f"Sync error for {table_name}.{record_id}: {message}")
+
+    groups: Dict[Tuple[str, ...], Dict[Any, tuple]] = {}
+    for record in records:
+        record_id = record.get('id')
+        if not record_id:
+            result['failed'] += 1
+            result['errors'].append(f"No ID in record: {record}")
+            continue
+        columns = tuple(k for k in record if k != 'id')
+        groups.setdefault(columns, {})[record_id] = (record_id,) + tuple(record[c] for c in columns)
+
+    def merge_batch(rows):
+        backend.savepoint()
+        try:
+            backend.merge(rows)
+        except Exception as e:
+            if retryable and retryable(e):
+                raise
+            backend.rollback_to_savepoint()
+            if len(rows) == 1:
+                fail([rows[0][0]], str(e))
+                return
+            middle = len(rows) // 2
+            merge_batch(rows[:middle])
+            merge_batch(rows[middle:])
+            return
+        backend.release_savepoint()
+        result['success'] += len(rows)
+        result['synced_ids'].extend(row[0] for row in rows)
+
+    try:
+        target_columns, identity = backend.describe(schema_name, table_name)
+        for columns, rows_by_id in groups.items():
+            if not target_columns:
+                fail(list(rows_by_id), f"Tablo bulunamadı: {table_name}")
+                continue
+            unknown = [c for c in columns if c.lower() not in target_columns]
+            if unknown:
+                fail(list(rows_by_id), f"Bilinmeyen sütun(lar): {', '.join(unknown)}")
+                continue
+            rows = list(rows_by_id.values())
+            backend.prepare(schema_name, table_name, columns, identity)
+            for start in range(0, len(rows), batch_size):
+                merge_batch(rows[start:start + batch_size])
+            backend.finish()
+        backend.commit()
+    except Exception as e:
+        backend.rollback()
+        if retryable and retryable(e):
+            raise
+        logger.error(f"Sync transaction failed: {e}")
+        return {'success': 0, 'failed': len(records), 'errors': [str(e)], 'synced_ids': []}
+
+    return result
+
+
+def delete_records(backend: MergeBackend, table_name: str, ids: List[Any],
+                   schema_name: Optional[str] = None, batch_size: int = MERGE_BATCH_SIZE,
+                   retryable: Optional[Callable[[BaseException], bool]] = None) -> dict:
+    """
+    Kayıtları id'ye göre parti parti siler; hedefte olmayan id'ler hata sayılmaz.
+
+    Partiler `merge_records`'taki gibi kayıt noktası içinde uygulanır; hata
+    veren parti bölünerek yeniden denenir ve hata silinemeyen kaydın
+    kimliğiyle raporlanır (ör. buluttaki bağlı kayıtlar yüzünden). Tamamı tek
+    işlemde onaylanır. `retryable` için bkz. `merge_records`.
+
+    Returns:
+        {'success': int, 'failed': int, 'errors': [], 'synced_ids': []}
+    """
+    result = {'success': 0, 'failed': 0, 'errors': [], 'synced_ids': []}
+
+    def delete_batch(batch):
+        backend.savepoint()
+        try:
+            backend.delete(schema_name, table_name, batch)
+        except Exception as e:
+            if retryable and retryable(e):
+                raise
+            backend.rollback_to_savepoint()
+            if len(batch) == 1:
+                result['failed'] += 1
+                result['errors'].append(f"Record {batch[0]}: {e}")
+                logger.error(f"Sync delete error for {table_name}.{batch[0]}: {e}")
+                return
+            middle = len(batch) // 2
+            delete_batch(batch[:middle])
+            delete_batch(batch[middle:])
+            return
+        backend.release_savepoint()
+        result['success'] += len(batch)
+        result['synced_ids'].extend(batch)
+
+    try:
+        for start in range(0, len(ids), batch_size):
+            delete_batch(list(ids[start:start + batch_size]))
+        backend.commit()
+    except Exception as e:
+        backend.rollback()
+        if retryable and retryable(e):
+            raise
+        logger.error(f"Sync delete failed for {table_name}: {e}")
+        return {'success': 0, 'failed': len(ids), 'errors': [str(e)], 'synced_ids': []}
+    return result
@@ -0,0 +1,402 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Azure SQL emülatörü (ağ bağlantısı olmadan ölçüm ve deneme)
+
+`AzureEmulator` firma şemalarını bir dizinde SQLite dosyaları olarak tutar:
+her şema bir alt dizin, her tablo o dizinde ayrı bir dosyadır. Bağlantı,
+`"Company_X"."customers"` gibi şemalı adları gördüğünde tablonun dosyasını
+eklenmiş (ATTACH) veritabanına yönlendirir. SQLite kilidi dosya düzeyinde
+olduğundan farklı tablolara paralel yazılabilir (SQL Server'daki gibi; orada
+kilit satır düzeyindedir). Tablolar, `create_tables_from_sqlite_schema`'nın
+Azure'da kullandığı `company_table_ddl` tanımlarının SQLite'a çevrilmesiyle
+oluşturulur; böylece bulutta eksik olan tablo ve sütunlar emülatörde de eksiktir.
+Tam sayı `id` birincil anahtarı IDENTITY sütunu sayılır; ROWVERSION sütunu
+tanımlanır ama değeri üretilmez.
+
+SQL Server'dan taklit edilen davranışlar:
+- IDENTITY_INSERT: IDENTITY tablosuna açık id ile INSERT yalnızca o tablo için
+  `SET IDENTITY_INSERT ... ON` iken yapılabilir. Bir oturumda aynı anda
+  yalnızca bir tabloda açık olabilir.
+- Gecikme: her çağrı bir gidiş-dönüştür ve `rtt_ms` kadar bekler. Bu çağrılar
+  bağlantı açma, execute, executemany (`fast_executemany` gibi tek çağrı),
+  commit ve rollback'tir. `bandwidth_kbps` verilirse aktarılan bayt kadar ek
+  bekleme yapılır.
+- Aktarılan bayt TDS'e yakın kaba bir tahmindir: NVARCHAR ve SQL metni için
+  karakter başına 2 bayt, sayılar için 8 bayt.
+
+`EmulatedAzureSQLManager`, `AzureSQLManager`'ın bağlantı ve toplu gönderim
+yöntemlerini emülatöre yönlendirir; `SyncManager`'a gerçek yöneticinin yerine
+verilebilir (bkz. tools/sync_benchmark.py). Yalnızca buluta gönderim yolu
+(`describe_sync_tables`, `sync_table_data`, `delete_table_data`) taklit edilir. T-SQL'e özgü
+sorgular (sys.tables, HASHBYTES, ROWVERSION) desteklenmez.
+"""
+
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Iterable, Optional, Set, Tuple
+
+from utils.azure_bulk_sync import SQLiteMergeBackend
+from utils.azure_sql_manager import AzureSQLManager, company_table_ddl
+
+_SET_IDENTITY_INSERT = re.compile(r'^\s*SET\s+IDENTITY_INSERT\s+(\S+)\s+(ON|OFF)\s*;?\s*$', re.IGNORECASE)
+_INSERT_TARGET = re.compile(r'^\s*INSERT\s+INTO\s+((?:[\["]?\w+[\]"]?\.)?[\["]?\w+[\]"]?)\s*\(([^)]*)\)',
+                            re.IGNORECASE)
+# "şema"."tablo" ve PRAGMA "şema".table_info("tablo")
+_QUALIFIED_NAME = re.compile(r'"(\w+)"\."(\w+)"')
+_QUALIFIED_PRAGMA = re.compile(r'PRAGMA\s+"(\w+)"\.(\w+)\("(\w+)"\)', re.IGNORECASE)
+# T-SQL tablo tanımından SQLite'a çeviriler (sırayla uygulanır)
+_DDL_TRANSLATIONS = (
+    (re.compile(r'\bINT\s+IDENTITY\s*\(\s*\d+\s*,\s*\d+\s*\)', re.IGNORECASE), 'INTEGER'),
+    (re.compile(r'\(\s*MAX\s*\)', re.IGNORECASE), ''),
+    (re.compile(r'\bGETDATE\(\)', re.IGNORECASE), 'CURRENT_TIMESTAMP'),
+)
+# Bir bağlantıya eklenebilecek veritabanı sayısı (SQLite varsayılanı 10)
+MAX_ATTACHED = 8
+
+
+def _table_key(name: str) -> Tuple[str, str]:
+    """`[şema].[tablo]`, `"şema"."tablo"` veya `tablo` -> (şema, tablo)."""
+    parts = [part.strip('[]"') for part in name.split('.')]
+    return (parts[0], parts[1]) if len(parts) == 2 else ('main', parts[0])
+
+
+def sqlite_table_ddl(create_sql: str, schema: str) -> str:
+    """`company_table_ddl` ifadesini tablonun kendi dosyasında çalışacak SQLite ifadesine çevirir."""
+    create_sql = create_sql.replace(f"{schema}.", '')
+    for pattern, replacement in _DDL_TRANSLATIONS:
+        create_sql = pattern.sub(replacement, create_sql)
+    return create_sql
+
+
+def payload_size(value) -> int:
+    """Bir değerin hatta kapladığı yaklaşık bayt."""
+    if value is None:
+        return 1
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return len(value)
+    if isinstance(value, str):
+        return 2 * len(value)
+    return 8
+
+
+class LinkStats:
+    """Emülatöre yapılan tüm bağlantıların toplam trafiği (iş parçacığı güvenli)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.round_trips = 0
+            self.bytes_sent = 0
+            self.bytes_received = 0
+
+    def add(self, round_trips: int = 0, sent: int = 0, received: int = 0) -> None:
+        with self._lock:
+            self.round_trips += round_trips
+            self.bytes_sent += sent
+            self.bytes_received += received
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {'round_trips': self.round_trips, 'bytes_sent': self.bytes_sent,
+                    'bytes_received': self.bytes_received}
+
+
+class EmulatedCursor:
+    """pyodbc imlecinin senkronizasyonda kullanılan kısmı."""
+
+    def __init__(self, connection: 'EmulatedConnection', cursor: sqlite3.Cursor):
+        self._connection = connection
+        self._cursor = cursor
+        self.fast_executemany = False
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    @property
+    def rowcount(self) -> int:
+        return self._cursor.rowcount
+
+    def execute(self, sql: str, params: Iterable = ()):
+        params = tuple(params)
+        self._connection.round_trip(2 * len(sql) + sum(payload_size(v) for v in params))
+        match = _SET_IDENTITY_INSERT.match(sql)
+        if match:
+            self._connection.set_identity_insert(match.group(1), match.group(2).upper() == 'ON')
+            return self
+        self._connection.check_insert(sql)
+        self._cursor.execute(self._connection.translate(sql), params)
+        return self
+
+    def executemany(self, sql: str, rows: Iterable[Iterable]):
+        rows = [tuple(row) for row in rows]
+        self._connection.round_trip(2 * len(sql) + sum(payload_size(v) for row in rows for v in row))
+        self._connection.check_insert(sql)
+        self._cursor.executemany(self._connection.translate(sql), rows)
+        return self
+
+    def _received(self, rows: list) -> list:
+        self._connection.transfer(received=sum(payload_size(v) for row in rows for v in row))
+        return rows
+
+    def fetchone(self):
+        row = self._cursor.fetchone()
+        if row is not None:
+            self._received([row])
+        return row
+
+    def fetchmany(self, size: int = 1):
+        return self._received(self._cursor.fetchmany(size))
+
+    def fetchall(self):
+        return self._received(self._cursor.fetchall())
+
+    def close(self) -> None:
+        self._cursor.close()
+
+
+class EmulatedConnection:
+    """pyodbc bağlantısının senkronizasyonda kullanılan kısmı."""
+
+    def __init__(self, emulator: 'AzureEmulator', connection: sqlite3.Connection):
+        self.emulator = emulator
+        self._connection = connection
+        self._attached: Set[str] = set()
+        self.identity_insert: Optional[Tuple[str, str]] = None
+
+    @property
+    def in_transaction(self) -> bool:
+        return self._connection.in_transaction
+
+    def cursor(self) -> EmulatedCursor:
+        return EmulatedCursor(self, self._connection.cursor())
+
+    def commit(self) -> None:
+        self.round_trip(0)
+        self._connection.commit()
+
+    def rollback(self) -> None:
+        self.round_trip(0)
+        self._connection.rollback()
+
+    def close(self) -> None:
+        self._connection.close()
+
+    def round_trip(self, sent: int) -> None:
+        self.emulator.stats.add(round_trips=1, sent=sent)
+        self.emulator.wait(sent, round_trip=True)
+
+    def transfer(self, received: int) -> None:
+        self.emulator.stats.add(received=received)
+        self.emulator.wait(received)
+
+    def _attach(self, schema: str, table: str) -> str:
+        """Tablonun dosyasını bağlantıya ekler; eklenen veritabanının adı."""
+        alias = f"{schema}.{table}"
+        if alias not in self._attached:
+            if len(self._attached) >= MAX_ATTACHED and not self._connection.in_transaction:
+                for name in self._attached:
+                    self._connection.execute(f'DETACH DATABASE "{name}"')
+                self._attached.clear()
+            self._connection.execute(f'ATTACH DATABASE ? AS "{alias}"', (str(self.emulator.table_path(schema, table)),))
+            self._attached.add(alias)
+        return alias
+
+    def translate(self, sql: str) -> str:
+        """Şemalı tablo adlarını tablonun eklenmiş veritabanına yönlendirir."""
+        def pragma(match):
+            schema, name, table = match.groups()
+            if not self.emulator.has_schema(schema):
+                return match.group(0)
+            return f'PRAGMA "{self._attach(schema, table)}".{name}("{table}")'
+
+        def qualified(match):
+            schema, table = match.groups()
+            if not self.emulator.has_schema(schema):
+                return match.group(0)
+            return f'"{self._attach(schema, table)}"."{table}"'
+
+        return _QUALIFIED_NAME.sub(qualified, _QUALIFIED_PRAGMA.sub(pragma, sql))
+
+    def set_identity_insert(self, table: str, enabled: bool) -> None:
+        key = _table_key(table)
+        if not enabled:
+            if self.identity_insert == key:
+                self.identity_insert = None
+            return
+        if self.identity_insert and self.identity_insert != key:
+            raise sqlite3.OperationalError(
+                f"IDENTITY_INSERT is already ON for table '{'.'.join(self.identity_insert)}'. "
+                f"Cannot perform SET operation for table '{'.'.join(key)}'.")
+        if not self.emulator.is_identity(*key):
+            raise sqlite3.OperationalError(
+                f"Table '{'.'.join(key)}' does not have the identity property. Cannot perform SET operation.")
+        self.identity_insert = key
+
+    def check_insert(self, sql: str) -> None:
+        """IDENTITY tablosuna IDENTITY_INSERT kapalıyken açık id yazılmasını engeller."""
+        match = _INSERT_TARGET.match(sql)
+        if not match:
+            return
+        key = _table_key(match.group(1))
+        if not self.emulator.has_schema(key[0]):
+            return
+        columns = {column.strip(' \n"[]').lower() for column in match.group(2).split(',')}
+        if 'id' in columns and self.identity_insert != key and self.emulator.is_identity(*key):
+            raise sqlite3.IntegrityError(
+                f"Cannot insert explicit value for identity column in table '{key[1]}' "
+                f"when IDENTITY_INSERT is set to OFF.")
+
+
+class AzureEmulator:
+    """
+    Dizin tabanlı Azure SQL taklidi.
+
+    Args:
+        directory: Şema dizinlerinin tutulduğu dizin
+        rtt_ms: Gidiş-dönüş başına bekleme
+        bandwidth_kbps: Hat hızı (kilobit/sn); None ise sınırsız
+    """
+
+    def __init__(self, directory, rtt_ms: float = 0.0, bandwidth_kbps: Optional[float] = None):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.rtt = rtt_ms / 1000.0
+        self.bandwidth_kbps = bandwidth_kbps
+        self.stats = LinkStats()
+        self._identity: dict = {}
+        self._identity_lock = threading.Lock()
+
+    def wait(self, size: int, round_trip: bool = False) -> None:
+        delay = self.rtt if round_trip else 0.0
+        if self.bandwidth_kbps:
+            delay += size * 8 / (self.bandwidth_kbps * 1000)
+        if delay:
+            time.sleep(delay)
+
+    def has_schema(self, schema: str) -> bool:
+        return (self.directory / schema).is_dir()
+
+    def table_path(self, schema: str, table: str) -> Path:
+        return self.directory / schema / f"{table}.db"
+
+    def connect(self) -> EmulatedConnection:
+        """Yeni bağlantı (bir gidiş-dönüş sayılır)."""
+        connection = EmulatedConnection(self, sqlite3.connect(':memory:', timeout=30, check_same_thread=False))
+        connection.round_trip(0)
+        return connection
+
+    def create_schema(self, schema: str, tables: Optional[Iterable[str]] = None) -> None:
+        """Şemada `company_table_ddl` tablolarını (verilmişse yalnızca `tables`) oluşturur."""
+        (self.directory / schema).mkdir(exist_ok=True)
+        definitions = company_table_ddl(schema)
+        for table in (definitions if tables is None else tables):
+            if table not in definitions:
+                continue
+            target = sqlite3.connect(self.table_path(schema, table))
+            try:
+                if not target.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (table,)).fetchone():
+                    target.execute(sqlite_table_ddl(definitions[table], schema))
+                target.commit()
+            finally:
+                target.close()
+
+    def load_rows(self, schema: str, source: sqlite3.Connection, table: str) -> int:
+        """
+        Yerel tablonun bulutta da bulunan sütunlarını şemaya doğrudan kopyalar
+        (trafik sayılmaz; başlangıç verisi için).
+        """
+        target = sqlite3.connect(self.table_path(schema, table))
+        try:
+            cloud = {row[1] for row in target.execute(f'PRAGMA table_info("{table}")')}
+            names = [row[1] for row in source.execute(f'PRAGMA table_info("{table}")') if row[1] in cloud]
+            columns = ', '.join(f'"{name}"' for name in names)
+            placeholders = ', '.join('?' for _ in names)
+            rows = source.execute(f'SELECT {columns} FROM "{table}"').fetchall()
+            target.executemany(f'INSERT OR REPLACE INTO "{table}" ({columns}) VALUES ({placeholders})', rows)
+            target.commit()
+        finally:
+            target.close()
+        return len(rows)
+
+    def query(self, schema: str, table: str, sql: str, params: tuple = ()) -> list:
+        """Tablonun dosyasında doğrudan sorgu (trafik sayılmaz; sonuç kontrolü için)."""
+        conn = sqlite3.connect(self.table_path(schema, table))
+        try:
+            return conn.execute(sql, params).fetchall()
+        finally:
+            conn.close()
+
+    def is_identity(self, schema: str, table: str) -> bool:
+        with self._identity_lock:
+            if (schema, table) not in self._identity:
+                columns = self.query(schema, table, f'PRAGMA table_info("{table}")')
+                self._identity[(schema, table)] = any(name == 'id' and pk == 1 and 'INT' in (col_type or '').upper()
+                                                      for _, name, col_type, _, _, pk in columns)
+            return self._identity[(schema, table)]
+
+
+class EmulatedMergeBackend(SQLiteMergeBackend):
+    """
+    Emülatör bağlantısı için toplu MERGE: SQL Server'daki gibi IDENTITY
+    tablolarına yazarken IDENTITY_INSERT açılıp kapatılır. SQL Server'da bu
+    ifadeler MERGE ile aynı gönderimde (batch) gittiğinden ayrı gidiş-dönüş
+    sayılmaz.
+    """
+
+    name = 'emulator'
+
+    def describe(self, schema_name, table_name):
+        columns, _ = super().describe(schema_name, table_name)
+        return columns, self.connection.emulator.is_identity(schema_name, table_name)
+
+    def merge(self, rows):
+        if self.identity:
+            self.connection.set_identity_insert(self.target, True)
+        try:
+            super().merge(rows)
+        finally:
+            if self.identity:
+                self.connection.set_identity_insert(self.target, False)
+
+
+class EmulatedAzureSQLManager(AzureSQLManager):
+    """Bağlantıları `AzureEmulator`'e yönlendiren AzureSQLManager."""
+
+    merge_backend_class = EmulatedMergeBackend
+
+    def __init__(self, emulator: AzureEmulator, company_schema: str):
+        self.emulator = emulator
+        self.username = 'emulator'
+        self.password = 'emulator'
+        self.connection = None
+        self.current_company = company_schema
+
+    def load_credentials(self) -> bool:
+        return True
+
+    def _open_connection(self):
+        return self.emulator.connect()
+
+    def describe_sync_tables(self, schema_name: str = None):
+        """Şemadaki tabloların sütunları; sys.tables sorgusu gibi bir gidiş-dönüş sayılır."""
+        schema_name = schema_name or self.current_company
+        tables = {}
+        for path in sorted((self.emulator.directory / schema_name).glob('*.db')):
+            info = tables.setdefault(path.stem, {'columns': [], 'version_column': None})
+            columns = self.emulator.query(schema_name, path.stem, f'PRAGMA table_info("{path.stem}")')
+            for _, column, col_type, *_ in columns:
+                if (col_type or '').upper() == 'ROWVERSION':
+                    info['version_column'] = column
+                else:
+                    info['columns'].append(column)
+        self.emulator.stats.add(round_trips=1)
+        self.emulator.wait(0, round_trip=True)
+        return tables
@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Azure SQL bağlantı havuzu ve yeniden deneme
+
+Senkronizasyon, tablo başına ayrı iş parçacıklarında çalışır; her iş havuzdan
+bir bağlantı alır ve bitince geri bırakır. Bir süredir boşta kalan bağlantı
+verilmeden önce `SELECT 1` ile yoklanır; yanıt vermeyen veya işlem sırasında
+bağlantı hatası veren bağlantılar atılır, yerine yenisi açılır.
+
+Azure SQL'in geçici hataları (yük dengeleme, failover, kısıtlama, kilitlenme
+kurbanı, ağ kopması) `with_retries` ile artan bekleme süreleriyle (exponential
+backoff + jitter) yeniden denenir; diğer hatalar hemen yükseltilir.
+"""
+
+import logging
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator, List, Optional, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+# Azure SQL geçici hata numaraları
+TRANSIENT_ERROR_NUMBERS = (
+    '4060', '4221', '10053', '10054', '10060', '10928', '10929', '40143', '40197',
+    '40501', '40540', '40613', '42108', '42109', '49918', '49919', '49920', '1205', '233', '64',
+)
+# ODBC SQLSTATE: bağlantı hatası, bağlantı kurulamadı, zaman aşımı, serileştirme (deadlock)
+TRANSIENT_SQLSTATES = ('08001', '08S01', '08S02', 'HYT00', 'HYT01', '40001')
+# pyodbc yerel hata numarasını her tanılama kaydının sonunda "... (40613) (SQLExecDirectW)" biçiminde verir
+_NATIVE_ERROR_RE = re.compile(r'\((\d+)\)\s*\(SQL\w+\)')
+# Bağlantıyı kullanılamaz bırakan hatalar
+CONNECTION_SQLSTATES = ('08001', '08003', '08S01', '08S02')
+
+# Boşta bu kadar kalmış bağlantı verilmeden önce yoklanır
+HEALTH_CHECK_IDLE_SECONDS = 30.0
+
+
+def _sqlstate(exc: BaseException) -> str:
+    args = getattr(exc, 'args', ())
+    return str(args[0]) if args and isinstance(args[0], str) else ''
+
+
+def _native_errors(exc: BaseException) -> List[str]:
+    """Sürücünün tanılama kayıtlarındaki yerel SQL Server hata numaraları."""
+    args = getattr(exc, 'args', ())
+    if len(args) < 2 or not isinstance(args[0], str):
+        return []
+    return _NATIVE_ERROR_RE.findall(str(args[1]))
+
+
+def is_transient(exc: BaseException) -> bool:
+    """Hatanın yeniden denemeyle geçebilecek geçici bir hata olup olmadığı."""
+    if isinstance(exc, (ConnectionError, TimeoutError)):
+        return True
+    if _sqlstate(exc) in TRANSIENT_SQLSTATES:
+        return True
+    return any(number in TRANSIENT_ERROR_NUMBERS for number in _native_errors(exc))
+
+
+def is_connection_error(exc: BaseException) -> bool:
+    return isinstance(exc, ConnectionError) or _sqlstate(exc) in CONNECTION_SQLSTATES
+
+
+def with_retries(func: Callable[[], T], attempts: int = 5, base_delay: float = 0.5, max_delay: float = 8.0,
+                 retryable: Callable[[BaseException], bool] = is_transient, label: str = '') -> T:
+    """
+    `func`'ı çağırır; geçici hatalarda artan bekleme ile en fazla `attempts` kez dener.
+
+    Bekleme süresi her denemede ikiye katlanır (`max_delay` ile sınırlı) ve
+    aynı anda kopan iş parçacıkları birlikte yeniden denemesin diye rastgele
+    kısaltılır (full jitter).
+    """
+    for attempt in range(1, attempts + 1):
+        try:
+            return func()
+        except Exception as e:
+            if attempt == attempts or not retryable(e):
+                raise
+            delay = random.uniform(0, min(max_delay, base_delay * 2 ** (attempt - 1)))
+            logger.warning(f"Geçici hata{f' ({label})' if label else ''}, {delay:.1f} sn sonra yeniden denenecek "
+                           f"({attempt}/{attempts}): {e}")
+            time.sleep(delay)
+    raise AssertionError("unreachable")
+
+
+class ConnectionPool:
+    """
+    Sınırlı sayıda bağlantı tutan havuz.
+
+    `connection()` bağlam yöneticisi bir bağlantı verir; havuz doluysa ve tüm
+    bağlantılar kullanımdaysa biri bırakılana kadar bekler.
+    """
+
+    def __init__(self, factory: Callable[[], Any], size: int = 4,
+                 health_check: Optional[Callable[[Any], None]] = None,
+                 idle_check_seconds: float = HEALTH_CHECK_IDLE_SECONDS):
+        self._factory = factory
+        self._size = size
+        self._health_check = health_check or self._ping
+        self._idle_check_seconds = idle_check_seconds
+        self._idle: List[tuple] = []  # (bağlantı, bırakıldığı an)
+        self._open = 0
+        self._cond = threading.Condition()
+        self._closed = False
+
+    @staticmethod
+    def _ping(conn) -> None:
+        cursor = conn.cursor()
+        cursor.execute("SELECT 1")
+        cursor.fetchone()
+
+    def _acquire(self):
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise ConnectionError("Bağlantı havuzu kapatıldı")
+                if self._idle:
+                    conn, released_at = self._idle.pop()
+                    break
+                if self._open < self._size:
+                    self._open += 1
+                    conn, released_at = None, None
+                    break
+                self._cond.wait()
+        if conn is not None and time.monotonic() - released_at >= self._idle_check_seconds:
+            try:
+                self._health_check(conn)
+            except Exception as e:
+                logger.info(f"Boşta kalan bağlantı yanıt vermedi, yenisi açılıyor: {e}")
+                self._close_quietly(conn)
+                conn = None
+        if conn is None:
+            try:
+                conn = self._factory()
+            except Exception:
+                with self._cond:
+                    self._open -= 1
+                    self._cond.notify()
+                raise
+        return conn
+
+    def _release(self, conn, broken: bool) -> None:
+        if broken:
+            self._close_quietly(conn)
+        with self._cond:
+            if broken or self._closed:
+                self._open -= 1
+                if not broken:
+                    self._close_quietly(conn)
+            else:
+                self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self) -> Iterator[Any]:
+        """Havuzdan bir bağlantı verir; bağlantı hatasında bağlantı atılır."""
+        conn = self._acquire()
+        broken = False
+        try:
+            yield conn
+        except Exception as e:
+            broken = is_connection_error(e)
+            if not broken:
+                try:
+                    conn.rollback()
+                except Exception:
+                    broken = True
+            raise
+        finally:
+            self._release(conn, broken)
+
+    def close(self) -> None:
+        """Boştaki bağlantıları kapatır; kullanımdakiler bırakıldığında kapanır."""
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._open -= len(idle)
+            self._cond.notify_all()
+        for conn, _ in idle:
+            self._close_quietly(conn)
+
+    @staticmethod
+    def _close_quietly(conn) -> None:
+        try:
+            conn.close()
+        except Exception:
+            pass
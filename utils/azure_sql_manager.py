@@ -5,15 +5,214 @@ ProServis Azure SQL Database Manager
 Azure SQL Server ile merkezi veritabanı yönetimi
 """
 
-import pyodbc
 import logging
 logger = logging.getLogger(__name__)
+
+try:
+    import pyodbc
+    PYODBC_AVAILABLE = True
+except ImportError:
+    # ODBC sürücüsü olmayan ortamlarda (ör. utils/azure_emulator.py ile ölçüm) modül yine yüklenebilsin
+    pyodbc = None
+    PYODBC_AVAILABLE = False
 from pathlib import Path
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, Iterator, List, Tuple
 import json
 from cryptography.fernet import Fernet
 from datetime import datetime
 
+from utils.azure_bulk_sync import MERGE_BATCH_SIZE, SqlServerMergeBackend, delete_records, merge_records
+from utils.azure_pool import ConnectionPool, is_transient, with_retries
+
+
+def company_table_ddl(schema_name: str) -> Dict[str, str]:
+    """
+    Firma şemasının Azure SQL tablo tanımları (SQLite'dan uyarlanmış)
+
+    Args:
+        schema_name: Hedef schema
+
+    Returns:
+        {tablo: CREATE TABLE ifadesi}; yabancı anahtar sırasıyla
+    """
+    return {
+        "users": f"""
+            CREATE TABLE {schema_name}.users (
+                id INT IDENTITY(1,1) PRIMARY KEY,
+                username NVARCHAR(255) NOT NULL UNIQUE,
+                password_hash NVARCHAR(255) NOT NULL,
+                role NVARCHAR(50) DEFAULT 'user',
+                row_ver ROWVERSION
+            )
+        """,
+        
+        "settings": f"""
+            CREATE TABLE {schema_name}.settings (
+                [key] NVARCHAR(255) PRIMARY KEY,
+                value NVARCHAR(MAX),
+                row_ver ROWVERSION
+            )
+        """,
+        
+        "banks": f"""
+            CREATE TABLE {schema_name}.banks (
+                id INT IDENTITY(1,1) PRIMARY KEY,
+                bank_name NVARCHAR(255) NOT NULL,
+                account_holder NVARCHAR(255) NOT NULL,
+                iban NVARCHAR(50) NOT NULL,
+                notes NVARCHAR(MAX),
+                is_default INT DEFAULT 0,
+                row_ver ROWVERSION
+            )
+        """,
+        
+        "technicians": f"""
+            CREATE TABLE {schema_name}.technicians (
+                id INT IDENTITY(1,1) PRIMARY KEY,
+                name NVARCHAR(255) NOT NULL,
+                surname NVARCHAR(255) NOT NULL,
+                phone NVARCHAR(50),
+                email NVARCHAR(255),
+                is_active INT DEFAULT 1,
+                created_date DATETIME DEFAULT GETDATE(),
+                updated_date DATETIME DEFAULT GETDATE(),
+                row_ver ROWVERSION
+            )
+        """,
+        
+        "customers": f"""
+            CREATE TABLE {schema_name}.customers (
+                id INT IDENTITY(1,1) PRIMARY KEY,
+                name NVARCHAR(255) NOT NULL UNIQUE,
+                phone NVARCHAR(50),
+                email NVARCHAR(255),
+                address NVARCHAR(MAX),
+                tax_id NVARCHAR(50),
+                tax_office NVARCHAR(255),
+                is_contract INT DEFAULT 0,
+                contract_start_date DATE,
+                contract_end_date DATE,
+                contract_pdf_path NVARCHAR(500),
+                row_ver ROWVERSION
+            )
+        """,
+        
+        "devices": f"""
+            CREATE TABLE {schema_name}.devices (
+                id INT IDENTITY(1,1) PRIMARY KEY,
+                customer_id INT,
+                model NVARCHAR(255) NOT NULL,
+                type NVARCHAR(100),
+                serial_number NVARCHAR(255) UNIQUE,
+                is_cpc INT DEFAULT 0,
+                cpc_bw_price FLOAT DEFAULT 0.0,
+                cpc_color_price FLOAT DEFAULT 0.0,
+                cpc_bw_currency NVARCHAR(10) DEFAULT 'TL',
+                cpc_color_currency NVARCHAR(10) DEFAULT 'TL',
+                color_type NVARCHAR(50) DEFAULT 'Siyah-Beyaz',
+                rental_fee FLOAT,
+                rental_currency NVARCHAR(10),
+                stock_id INT,
+                row_ver ROWVERSION,
+                FOREIGN KEY (customer_id) REFERENCES {schema_name}.customers(id) ON DELETE CASCADE
+            )
+        """,
+        
+        "service_records": f"""
+            CREATE TABLE {schema_name}.service_records (
+                id INT IDENTITY(1,1) PRIMARY KEY,
+                device_id INT,
+                assigned_user_id INT,
+                problem_description NVARCHAR(MAX),
+                notes NVARCHAR(MAX),
+                created_date DATETIME,
+                bw_counter INT,
+                color_counter INT,
+                status NVARCHAR(50),
+                technician_id INT,
+                technician_report NVARCHAR(MAX),
+                service_form_pdf_path NVARCHAR(500),
+                row_ver ROWVERSION,
+                FOREIGN KEY (device_id) REFERENCES {schema_name}.devices(id) ON DELETE CASCADE
+            )
+        """,
+        
+        "stock_items": f"""
+            CREATE TABLE {schema_name}.stock_items (
+                id INT IDENTITY(1,1) PRIMARY KEY,
+                name NVARCHAR(255) NOT NULL,
+                category NVARCHAR(100),
+                quantity INT DEFAULT 0,
+                min_stock_level INT DEFAULT 0,
+                unit NVARCHAR(50),
+                purchase_price FLOAT,
+                sale_price FLOAT,
+                currency NVARCHAR(10) DEFAULT 'TL',
+                supplier NVARCHAR(255),
+                notes NVARCHAR(MAX),
+                color_type NVARCHAR(50),
+                location NVARCHAR(255),
+                created_at DATETIME DEFAULT GETDATE(),
+                row_ver ROWVERSION
+            )
+        """,
+        
+        "invoices": f"""
+            CREATE TABLE {schema_name}.invoices (
+                id INT IDENTITY(1,1) PRIMARY KEY,
+                customer_id INT,
+                invoice_number NVARCHAR(100) UNIQUE,
+                invoice_date DATE,
+                due_date DATE,
+                subtotal FLOAT,
+                tax_amount FLOAT,
+                total_amount FLOAT,
+                currency NVARCHAR(10) DEFAULT 'TL',
+                status NVARCHAR(50) DEFAULT 'Beklemede',
+                notes NVARCHAR(MAX),
+                created_at DATETIME DEFAULT GETDATE(),
+                row_ver ROWVERSION,
+                FOREIGN KEY (customer_id) REFERENCES {schema_name}.customers(id) ON DELETE CASCADE
+            )
+        """,
+        
+        "payments": f"""
+            CREATE TABLE {schema_name}.payments (
+                id INT IDENTITY(1,1) PRIMARY KEY,
+                invoice_id INT,
+                payment_date DATE,
+                amount FLOAT,
+                currency NVARCHAR(10) DEFAULT 'TL',
+                payment_method NVARCHAR(100),
+                notes NVARCHAR(MAX),
+                created_at DATETIME DEFAULT GETDATE(),
+                row_ver ROWVERSION,
+                FOREIGN KEY (invoice_id) REFERENCES {schema_name}.invoices(id) ON DELETE CASCADE
+            )
+        """
+    }
+
+
+def _add_row_versions(cursor, schema_name: str) -> None:
+    """ROWVERSION sütunu olmayan firma tablolarına `row_ver` ekler (artımlı çekme için)."""
+    cursor.execute("""
+        SELECT t.name
+        FROM sys.tables t
+        WHERE t.schema_id = SCHEMA_ID(?) AND t.name NOT IN ('_metadata', '_schema_version')
+          AND NOT EXISTS (SELECT 1 FROM sys.columns c
+                          WHERE c.object_id = t.object_id AND TYPE_NAME(c.user_type_id) IN ('timestamp', 'rowversion'))
+    """, (schema_name,))
+    for (table_name,) in cursor.fetchall():
+        cursor.execute(f"ALTER TABLE [{schema_name}].[{table_name}] ADD row_ver ROWVERSION")
+        logger.info(f"✅ {schema_name}.{table_name}: row_ver (ROWVERSION) eklendi")
+
+
+# Mevcut firma şemalarına sırayla ve bir kez uygulanan değişiklikler: (sürüm, açıklama, adım)
+# Yeni tablolar bu değişiklikleri company_table_ddl tanımlarında zaten içerir.
+COMPANY_SCHEMA_MIGRATIONS = [
+    (1, "Artımlı çekme için row_ver (ROWVERSION) sütunu", _add_row_versions),
+]
+
 
 
 class AzureSQLManager:
@@ -32,6 +231,12 @@ class AzureSQLManager:
     DATABASE = "Proservis-Database"
     PORT = 1433
     
+    # Senkronizasyonda aynı anda açık tutulan en fazla bağlantı
+    SYNC_POOL_SIZE = 4
+    
+    # Toplu gönderimde kullanılan SQL lehçesi (emülatör kendi sınıfını verir)
+    merge_backend_class = SqlServerMergeBackend
+    
     def __init__(self, credentials_dir: Path):
         # Azure entegrasyonu askıya alındı
         pass
@@ -148,21 +353,42 @@ class AzureSQLManager:
             
             logger.info("Azure SQL'e bağlanılıyor...")
             
-            conn_str = self.get_connection_string()
-            self.connection = pyodbc.connect(conn_str, timeout=30)
+            self.connection = self._open_connection()
             
             logger.info(f"✅ Azure SQL bağlantısı başarılı: {self.DATABASE}")
             return True
             
-        except pyodbc.Error as e:
-            logger.error(f"Azure SQL bağlantı hatası: {e}")
-            return False
         except Exception as e:
-            logger.error(f"Bağlantı hatası: {e}")
+            if PYODBC_AVAILABLE and isinstance(e, pyodbc.Error):
+                logger.error(f"Azure SQL bağlantı hatası: {e}")
+            else:
+                logger.error(f"Bağlantı hatası: {e}")
             return False
     
+    def _open_connection(self):
+        """Yeni bir veritabanı bağlantısı aç (DB-API; emülatör bu yöntemi değiştirir)"""
+        if not PYODBC_AVAILABLE:
+            raise ConnectionError("pyodbc yüklü değil")
+        return pyodbc.connect(self.get_connection_string(), timeout=30)
+    
+    def get_sync_pool(self) -> ConnectionPool:
+        """
+        Senkronizasyon için bağlantı havuzu (ilk kullanımda oluşturulur)
+        
+        Tablolar paralel gönderildiğinden her iş havuzdan kendi bağlantısını alır.
+        """
+        if getattr(self, '_sync_pool', None) is None:
+            if not self.username or not self.password:
+                if not self.load_credentials():
+                    raise ConnectionError("Credentials yüklü değil!")
+            self._sync_pool = ConnectionPool(self._open_connection, size=self.SYNC_POOL_SIZE)
+        return self._sync_pool
+    
     def disconnect(self):
         """Bağlantıyı kapat"""
+        if getattr(self, '_sync_pool', None) is not None:
+            self._sync_pool.close()
+            self._sync_pool = None
         if self.connection:
             try:
                 self.connection.close()
@@ -493,153 +719,7 @@ class AzureSQLManager:
             
             cursor = self.connection.cursor()
             
-            # Azure SQL Server tablo tanımları (SQLite'dan uyarlanmış)
-            tables = {
-                "users": f"""
-                    CREATE TABLE {schema_name}.users (
-                        id INT IDENTITY(1,1) PRIMARY KEY,
-                        username NVARCHAR(255) NOT NULL UNIQUE,
-                        password_hash NVARCHAR(255) NOT NULL,
-                        role NVARCHAR(50) DEFAULT 'user'
-                    )
-                """,
-                
-                "settings": f"""
-                    CREATE TABLE {schema_name}.settings (
-                        [key] NVARCHAR(255) PRIMARY KEY,
-                        value NVARCHAR(MAX)
-                    )
-                """,
-                
-                "banks": f"""
-                    CREATE TABLE {schema_name}.banks (
-                        id INT IDENTITY(1,1) PRIMARY KEY,
-                        bank_name NVARCHAR(255) NOT NULL,
-                        account_holder NVARCHAR(255) NOT NULL,
-                        iban NVARCHAR(50) NOT NULL,
-                        notes NVARCHAR(MAX),
-                        is_default INT DEFAULT 0
-                    )
-                """,
-                
-                "technicians": f"""
-                    CREATE TABLE {schema_name}.technicians (
-                        id INT IDENTITY(1,1) PRIMARY KEY,
-                        name NVARCHAR(255) NOT NULL,
-                        surname NVARCHAR(255) NOT NULL,
-                        phone NVARCHAR(50),
-                        email NVARCHAR(255),
-                        is_active INT DEFAULT 1,
-                        created_date DATETIME DEFAULT GETDATE(),
-                        updated_date DATETIME DEFAULT GETDATE()
-                    )
-                """,
-                
-                "customers": f"""
-                    CREATE TABLE {schema_name}.customers (
-                        id INT IDENTITY(1,1) PRIMARY KEY,
-                        name NVARCHAR(255) NOT NULL UNIQUE,
-                        phone NVARCHAR(50),
-                        email NVARCHAR(255),
-                        address NVARCHAR(MAX),
-                        tax_id NVARCHAR(50),
-                        tax_office NVARCHAR(255),
-                        is_contract INT DEFAULT 0,
-                        contract_start_date DATE,
-                        contract_end_date DATE,
-                        contract_pdf_path NVARCHAR(500)
-                    )
-                """,
-                
-                "devices": f"""
-                    CREATE TABLE {schema_name}.devices (
-                        id INT IDENTITY(1,1) PRIMARY KEY,
-                        customer_id INT,
-                        model NVARCHAR(255) NOT NULL,
-                        type NVARCHAR(100),
-                        serial_number NVARCHAR(255) UNIQUE,
-                        is_cpc INT DEFAULT 0,
-                        cpc_bw_price FLOAT DEFAULT 0.0,
-                        cpc_color_price FLOAT DEFAULT 0.0,
-                        cpc_bw_currency NVARCHAR(10) DEFAULT 'TL',
-                        cpc_color_currency NVARCHAR(10) DEFAULT 'TL',
-                        color_type NVARCHAR(50) DEFAULT 'Siyah-Beyaz',
-                        rental_fee FLOAT,
-                        rental_currency NVARCHAR(10),
-                        stock_id INT,
-                        FOREIGN KEY (customer_id) REFERENCES {schema_name}.customers(id) ON DELETE CASCADE
-                    )
-                """,
-                
-                "service_records": f"""
-                    CREATE TABLE {schema_name}.service_records (
-                        id INT IDENTITY(1,1) PRIMARY KEY,
-                        device_id INT,
-                        assigned_user_id INT,
-                        problem_description NVARCHAR(MAX),
-                        notes NVARCHAR(MAX),
-                        created_date DATETIME,
-                        bw_counter INT,
-                        color_counter INT,
-                        status NVARCHAR(50),
-                        technician_id INT,
-                        technician_report NVARCHAR(MAX),
-                        service_form_pdf_path NVARCHAR(500),
-                        FOREIGN KEY (device_id) REFERENCES {schema_name}.devices(id) ON DELETE CASCADE
-                    )
-                """,
-                
-                "stock_items": f"""
-                    CREATE TABLE {schema_name}.stock_items (
-                        id INT IDENTITY(1,1) PRIMARY KEY,
-                        name NVARCHAR(255) NOT NULL,
-                        category NVARCHAR(100),
-                        quantity INT DEFAULT 0,
-                        min_stock_level INT DEFAULT 0,
-                        unit NVARCHAR(50),
-                        purchase_price FLOAT,
-                        sale_price FLOAT,
-                        currency NVARCHAR(10) DEFAULT 'TL',
-                        supplier NVARCHAR(255),
-                        notes NVARCHAR(MAX),
-                        color_type NVARCHAR(50),
-                        location NVARCHAR(255),
-                        created_at DATETIME DEFAULT GETDATE()
-                    )
-                """,
-                
-                "invoices": f"""
-                    CREATE TABLE {schema_name}.invoices (
-                        id INT IDENTITY(1,1) PRIMARY KEY,
-                        customer_id INT,
-                        invoice_number NVARCHAR(100) UNIQUE,
-                        invoice_date DATE,
-                        due_date DATE,
-                        subtotal FLOAT,
-                        tax_amount FLOAT,
-                        total_amount FLOAT,
-                        currency NVARCHAR(10) DEFAULT 'TL',
-                        status NVARCHAR(50) DEFAULT 'Beklemede',
-                        notes NVARCHAR(MAX),
-                        created_at DATETIME DEFAULT GETDATE(),
-                        FOREIGN KEY (customer_id) REFERENCES {schema_name}.customers(id) ON DELETE CASCADE
-                    )
-                """,
-                
-                "payments": f"""
-                    CREATE TABLE {schema_name}.payments (
-                        id INT IDENTITY(1,1) PRIMARY KEY,
-                        invoice_id INT,
-                        payment_date DATE,
-                        amount FLOAT,
-                        currency NVARCHAR(10) DEFAULT 'TL',
-                        payment_method NVARCHAR(100),
-                        notes NVARCHAR(MAX),
-                        created_at DATETIME DEFAULT GETDATE(),
-                        FOREIGN KEY (invoice_id) REFERENCES {schema_name}.invoices(id) ON DELETE CASCADE
-                    )
-                """
-            }
+            tables = company_table_ddl(schema_name)
             
             # Tabloları oluştur
             created_count = 0
@@ -667,6 +747,7 @@ class AzureSQLManager:
                     self.connection.rollback()
             
             logger.info(f"✅ {created_count} yeni tablo oluşturuldu")
+            self.migrate_company_schema(schema_name)
             return True
             
         except Exception as e:
@@ -675,97 +756,117 @@ class AzureSQLManager:
                 self.connection.rollback()
             return False
     
-    def sync_table_data(self, table_name: str, records: list, schema_name: str = None) -> dict:
+    def migrate_company_schema(self, schema_name: str = None) -> int:
+        """
+        Firma şemasına henüz uygulanmamış COMPANY_SCHEMA_MIGRATIONS adımlarını uygula
+        
+        Uygulanan son adım şemadaki `_schema_version` tablosunda tutulur; her
+        adım bir kez ve kendi işleminde çalışır. Adımlar tabloları yeniden
+        yazabildiğinden girişte veya senkronizasyonda çağrılmaz; şema
+        kurulumunda (create_tables_from_sqlite_schema) ve mevcut firmalar için
+        tools/migrate_company_schemas.py ile çalıştırılır. Hata durumunda
+        istisna fırlatır.
+        
+        Returns:
+            Uygulanan adım sayısı
+        """
+        if not self.connection and not self.connect():
+            raise ConnectionError("Azure SQL bağlantısı kurulamadı")
+        schema_name = schema_name or self.current_company
+        cursor = self.connection.cursor()
+        
+        cursor.execute("""
+            SELECT COUNT(*) FROM INFORMATION_SCHEMA.TABLES
+            WHERE TABLE_SCHEMA = ? AND TABLE_NAME = '_schema_version'
+        """, (schema_name,))
+        if not cursor.fetchone()[0]:
+            cursor.execute(f"CREATE TABLE [{schema_name}].[_schema_version] (version INT NOT NULL)")
+            self.connection.commit()
+        cursor.execute(f"SELECT ISNULL(MAX(version), 0) FROM [{schema_name}].[_schema_version]")
+        current = cursor.fetchone()[0]
+        
+        applied = 0
+        for version, description, step in COMPANY_SCHEMA_MIGRATIONS:
+            if version <= current:
+                continue
+            try:
+                step(cursor, schema_name)
+                cursor.execute(f"INSERT INTO [{schema_name}].[_schema_version] (version) VALUES (?)", (version,))
+                self.connection.commit()
+            except Exception:
+                self.connection.rollback()
+                raise
+            applied += 1
+            logger.info(f"✅ {schema_name} şema sürümü {version}: {description}")
+        return applied
+    
+    def sync_table_data(self, table_name: str, records: list, schema_name: str = None,
+                        batch_size: int = MERGE_BATCH_SIZE) -> dict:
         """
         SQLite'tan Azure SQL'e veri senkronize et
         
+        Kayıtlar parti parti geçici tabloya yazılıp tek MERGE ile uygulanır
+        (bkz. utils/azure_bulk_sync.py); hatalı kayıtlar kimlikleriyle raporlanır.
+        Bağlantı havuzdan alınır, geçici hatalarda çağrı yeniden denenir.
+        Farklı tablolar için aynı anda çağrılabilir.
+        
         Args:
             table_name: Tablo adı
             records: Senkronize edilecek kayıtlar [{'id': 1, 'name': 'Test', ...}, ...]
             schema_name: Hedef schema (None ise current_company)
+            batch_size: Tek MERGE ile gönderilen kayıt sayısı
             
         Returns:
-            {'success': int, 'failed': int, 'errors': []}
+            {'success': int, 'failed': int, 'errors': [], 'synced_ids': []}
         """
-        if not self.connection:
-            if not self.connect():
-                return {'success': 0, 'failed': len(records), 'errors': ['Connection failed']}
-        
         if schema_name is None:
             if not self.current_company:
-                return {'success': 0, 'failed': len(records), 'errors': ['No company selected']}
+                return {'success': 0, 'failed': len(records), 'errors': ['No company selected'], 'synced_ids': []}
             # current_company zaten "Company_Test_Company_1" formatında
             schema_name = self.current_company
         
-        cursor = self.connection.cursor()
-        success_count = 0
-        failed_count = 0
-        errors = []
+        def attempt():
+            with self.get_sync_pool().connection() as conn:
+                return merge_records(self.merge_backend_class(conn), table_name, records,
+                                     schema_name, batch_size, retryable=is_transient)
         
         try:
-            for record in records:
-                try:
-                    # Kayıt var mı kontrol et
-                    record_id = record.get('id')
-                    if not record_id:
-                        failed_count += 1
-                        errors.append(f"No ID in record: {record}")
-                        continue
-                    
-                    cursor.execute(f"""
-                        SELECT COUNT(*) FROM [{schema_name}].[{table_name}]
-                        WHERE id = ?
-                    """, (record_id,))
-                    
-                    exists = cursor.fetchone()[0] > 0
-                    
-                    # Sütun adlarını ve değerlerini hazırla
-                    columns = [k for k in record.keys() if k != 'id']
-                    values = [record[k] for k in columns]
-                    
-                    if exists:
-                        # UPDATE
-                        set_clause = ', '.join([f"{col} = ?" for col in columns])
-                        query = f"""
-                            UPDATE [{schema_name}].[{table_name}]
-                            SET {set_clause}
-                            WHERE id = ?
-                        """
-                        cursor.execute(query, values + [record_id])
-                    else:
-                        # INSERT (IDENTITY kolonu için özel ayar gerekli)
-                        columns_with_id = ['id'] + columns
-                        placeholders = ', '.join(['?' for _ in columns_with_id])
-                        
-                        # IDENTITY_INSERT ON (SQLite'tan gelen id değerini kullanabilmek için)
-                        cursor.execute(f"SET IDENTITY_INSERT [{schema_name}].[{table_name}] ON")
-                        
-                        query = f"""
-                            INSERT INTO [{schema_name}].[{table_name}]
-                            ({', '.join(columns_with_id)})
-                            VALUES ({placeholders})
-                        """
-                        cursor.execute(query, [record_id] + values)
-                        
-                        # IDENTITY_INSERT OFF (geri al)
-                        cursor.execute(f"SET IDENTITY_INSERT [{schema_name}].[{table_name}] OFF")
-                    
-                    success_count += 1
-                    
-                except Exception as e:
-                    failed_count += 1
-                    errors.append(f"Record {record_id}: {str(e)}")
-                    logger.error(f"Sync error for {table_name}.{record_id}: {e}")
-            
-            self.connection.commit()
-            logger.info(f"✅ {table_name}: {success_count} success, {failed_count} failed")
-            
+            result = with_retries(attempt, label=table_name)
         except Exception as e:
-            self.connection.rollback()
-            logger.error(f"Sync transaction failed: {e}")
-            return {'success': 0, 'failed': len(records), 'errors': [str(e)]}
+            logger.error(f"Sync failed for {table_name}: {e}")
+            return {'success': 0, 'failed': len(records), 'errors': [str(e)], 'synced_ids': []}
+        logger.info(f"✅ {table_name}: {result['success']} success, {result['failed']} failed")
+        return result
+    
+    def delete_table_data(self, table_name: str, record_ids: list, schema_name: str = None) -> dict:
+        """
+        Yerelde silinmiş kayıtları Azure SQL'den sil
         
-        return {'success': success_count, 'failed': failed_count, 'errors': errors}
+        Args:
+            table_name: Tablo adı
+            record_ids: Silinecek kayıt id'leri
+            schema_name: Hedef schema (None ise current_company)
+            
+        Returns:
+            {'success': int, 'failed': int, 'errors': [], 'synced_ids': []}
+        """
+        if schema_name is None:
+            if not self.current_company:
+                return {'success': 0, 'failed': len(record_ids), 'errors': ['No company selected'], 'synced_ids': []}
+            schema_name = self.current_company
+        
+        def attempt():
+            with self.get_sync_pool().connection() as conn:
+                return delete_records(self.merge_backend_class(conn), table_name, record_ids,
+                                      schema_name, retryable=is_transient)
+        
+        try:
+            result = with_retries(attempt, label=table_name)
+        except Exception as e:
+            logger.error(f"Sync delete failed for {table_name}: {e}")
+            return {'success': 0, 'failed': len(record_ids), 'errors': [str(e)], 'synced_ids': []}
+        logger.info(f"✅ {table_name}: {result['success']} deleted, {result['failed']} failed")
+        return result
     
     def authenticate_user(self, username: str, password: str) -> dict:
         """
@@ -1015,6 +1116,158 @@ class AzureSQLManager:
             return []
 
 
+    def describe_sync_tables(self, schema_name: str = None) -> Dict[str, Dict[str, Any]]:
+        """
+        Schema'daki tabloların sütunlarını ve ROWVERSION sütununu döndür
+        
+        Gönderim ve çekme yalnızca iki tarafta da bulunan tablo ve sütunlarla
+        yapılır (bkz. cloud_pull.common_columns). ROWVERSION sütunu artımlı
+        çekmede (bkz. utils/database/cloud_pull.py) watermark olarak
+        kullanılır. Sütun firma tablolarının tanımında bulunur; eski şemalara
+        migrate_company_schema ile eklenir, girişte eklenmez (paylaşılan şemada
+        tüm satırları yeniden yazar). Sütunu olmayan tablolar her seferinde
+        baştan çekilir. Senkronizasyon havuzundan bir bağlantı kullanır.
+        Hata durumunda istisna fırlatır.
+        
+        Returns:
+            {tablo: {'columns': [...], 'version_column': str veya None}}
+        """
+        schema_name = schema_name or self.current_company
+        with self.get_sync_pool().connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT t.name, c.name, TYPE_NAME(c.user_type_id)
+                FROM sys.tables t
+                JOIN sys.columns c ON c.object_id = t.object_id
+                WHERE t.schema_id = SCHEMA_ID(?) AND t.name NOT IN ('_metadata', '_schema_version')
+                ORDER BY t.name, c.column_id
+            """, (schema_name,))
+            rows = cursor.fetchall()
+        tables: Dict[str, Dict[str, Any]] = {}
+        for table, column, type_name in rows:
+            info = tables.setdefault(table, {'columns': [], 'version_column': None})
+            if type_name in ('timestamp', 'rowversion'):
+                info['version_column'] = column
+            else:
+                info['columns'].append(column)
+        return tables
+    
+    def fetch_changed_rows(self, table_name: str, columns: List[str], version_column: Optional[str], since: int,
+                           batch_size: int = 1000, schema_name: str = None) -> Tuple[int, Iterator[List[tuple]]]:
+        """
+        ROWVERSION'ı `since`'ten büyük satırları parça parça oku
+        
+        Üst sınır, açık işlemlerin henüz görünmeyen satırları atlanmasın diye
+        MIN_ACTIVE_ROWVERSION() ile belirlenir. `version_column` None ise
+        tablonun tamamı okunur ve watermark 0 döner.
+        
+        Returns:
+            (yeni watermark, satır partileri üreteci)
+        """
+        schema_name = schema_name or self.current_company
+        cursor = self.connection.cursor()
+        
+        def batches():
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    return
+                yield rows
+        
+        if version_column is None:
+            cursor.execute(f"SELECT {', '.join(f'[{c}]' for c in columns)} FROM [{schema_name}].[{table_name}]")
+            return 0, batches()
+        
+        cursor.execute("SELECT CAST(MIN_ACTIVE_ROWVERSION() AS BIGINT) - 1")
+        upper = int(cursor.fetchone()[0])
+        cursor.execute(f"""
+            SELECT {', '.join(f'[{c}]' for c in columns)}
+            FROM [{schema_name}].[{table_name}]
+            WHERE [{version_column}] > CAST(? AS BINARY(8)) AND [{version_column}] <= CAST(? AS BINARY(8))
+        """, (since, upper))
+        return upper, batches()
+    
+    def count_rows(self, table_name: str, schema_name: str = None) -> int:
+        """Tablodaki satır sayısı"""
+        schema_name = schema_name or self.current_company
+        cursor = self.connection.cursor()
+        cursor.execute(f"SELECT COUNT_BIG(*) FROM [{schema_name}].[{table_name}]")
+        return int(cursor.fetchone()[0])
+    
+    def fetch_ids(self, table_name: str, schema_name: str = None) -> List[int]:
+        """Tablodaki tüm id'ler (silme tespiti için)"""
+        schema_name = schema_name or self.current_company
+        cursor = self.connection.cursor()
+        cursor.execute(f"SELECT id FROM [{schema_name}].[{table_name}]")
+        return [row[0] for row in cursor.fetchall()]
+
+    
+    def describe_columns(self, table_name: str, schema_name: str = None) -> Dict[str, str]:
+        """Tablonun sütunları ve veri tipleri {sütun: tip}"""
+        schema_name = schema_name or self.current_company
+        rows = self.fetch_all("""
+            SELECT COLUMN_NAME AS column_name, DATA_TYPE AS data_type
+            FROM INFORMATION_SCHEMA.COLUMNS
+            WHERE TABLE_SCHEMA = ? AND TABLE_NAME = ?
+        """, (schema_name, table_name))
+        return {row['column_name']: row['data_type'] for row in rows}
+    
+    def id_bounds(self, table_name: str, schema_name: str = None) -> Tuple[Optional[int], Optional[int]]:
+        """Tablodaki en küçük ve en büyük id (boş tabloda None, None)"""
+        schema_name = schema_name or self.current_company
+        rows = self.fetch_all(f"SELECT MIN([id]) AS lo, MAX([id]) AS hi FROM [{schema_name}].[{table_name}]")
+        if not rows:
+            raise ConnectionError(f"{table_name} id aralığı okunamadı")
+        return rows[0]['lo'], rows[0]['hi']
+    
+    def range_hashes(self, table_name: str, row_expr: str, lo: int, hi: int, width: int,
+                     schema_name: str = None) -> Tuple[Tuple[int, int], Dict[int, Tuple[int, int]]]:
+        """
+        [lo, hi] id aralığının `width` genişliğindeki parçalarının özetleri
+        
+        Özetler sunucuda hesaplanır, yalnızca parça başına (satır sayısı, özet
+        toplamı) aktarılır (bkz. utils/database/cloud_verify.py).
+        
+        Returns:
+            ((aralıktaki satır sayısı, özet toplamı), {parça: (satır sayısı, özet toplamı)})
+        """
+        schema_name = schema_name or self.current_company
+        lo, hi, width = int(lo), int(hi), int(width)
+        rows = self.fetch_all(f"""
+            SELECT bucket, COUNT_BIG(*) AS row_count,
+                   SUM(CAST(CAST(SUBSTRING(HASHBYTES('MD5', row_text), 1, 4) AS INT) AS BIGINT)) AS hash_sum
+            FROM (
+                SELECT ([id] - {lo}) / {width} AS bucket, {row_expr} AS row_text
+                FROM [{schema_name}].[{table_name}]
+                WHERE [id] BETWEEN {lo} AND {hi}
+            ) AS ranges
+            GROUP BY ROLLUP(bucket)
+        """)
+        buckets = {}
+        total = None
+        for row in rows:
+            summary = (int(row['row_count']), int(row['hash_sum'] or 0))
+            if row['bucket'] is None:
+                total = summary
+            else:
+                buckets[int(row['bucket'])] = summary
+        if total is None:
+            # ROLLUP her zaman toplam satırı döndürür; yoksa sorgu başarısız olmuştur
+            raise ConnectionError(f"{table_name} aralık özetleri okunamadı")
+        return total, buckets
+    
+    def fetch_range(self, table_name: str, columns: List[str], lo: int, hi: int,
+                    schema_name: str = None) -> List[tuple]:
+        """[lo, hi] id aralığındaki satırlar (`columns` sırasıyla)"""
+        schema_name = schema_name or self.current_company
+        rows = self.fetch_all(f"""
+            SELECT {', '.join(f'[{c}] AS [{c}]' for c in columns)}
+            FROM [{schema_name}].[{table_name}]
+            WHERE [id] BETWEEN ? AND ?
+        """, (int(lo), int(hi)))
+        return [tuple(row[c] for c in columns) for row in rows]
+
+
 # Test
 if __name__ == '__main__':
     logging.basicConfig(level=logging.INFO)
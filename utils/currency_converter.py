@@ -1,86 +1,250 @@
 """
 Döviz kuru bilgilerini Türkiye Cumhuriyet Merkez Bankası (TCMB) üzerinden
 almak için yardımcı fonksiyonlar içerir.
+
+Kurlar yerel veritabanındaki `exchange_rates` tablosunda geçmişiyle saklanır
+(bkz. `utils.database.exchange_rates`). Veritabanı yöneticisi açıldığında
+kendini `set_rate_source` ile kaynak olarak kaydeder; bundan sonra
+`get_exchange_rates` ve `rates_on` ağa çıkmadan yerel kayıtlardan okur.
+TCMB'ye yalnızca arka plandaki kur eşitlemesi (`fetch_tcmb_rates`) gider.
+
+Veritabanı olmayan süreçlerde (ör. PDF süreç havuzu) son kurlar ayar
+klasöründeki küçük bir JSON dosyasında saklanır; kurlar hiçbir durumda
+çağıranı ağ için bekletmez, eskimişse arka planda tazelenir. Hiç kur
+alınamamışsa (ilk kurulum, çevrimdışı) varsayılan kur uydurulmaz: dönen
+sözlükte yalnızca TL bulunur. Faturalama yolları kuru `require_rate` ile
+alır ve kur yoksa `MissingRateError` ile durur.
+
+TCMB adresi `PROSERVIS_TCMB_URL` ortam değişkeniyle değiştirilebilir; böylece
+eşitleme `tools/tcmb_fixture_server.py` ile yerel XML dosyalarına karşı
+çevrimdışı denenebilir.
 """
+import json
+import os
+import threading
 import requests
 import xml.etree.ElementTree as ET
+from datetime import date, datetime
 from decimal import Decimal, InvalidOperation
 import logging
 import time
+from typing import Callable, Dict, Optional, Tuple
 
-# Logger'ı ayarla
+TCMB_BASE_URL = os.getenv('PROSERVIS_TCMB_URL', 'https://www.tcmb.gov.tr/kurlar').rstrip('/')
 
 _CACHED_RATES: dict[str, Decimal] | None = None
 _CACHED_AT: float | None = None
 _CACHE_TTL_SECONDS = 300  # 5 dakika
+_CACHE_FILE_NAME = 'exchange_rates_cache.json'
+
+# Kayıtlı kurları okuyan kaynak: tarih (None = en güncel) -> {para birimi: alış kuru}
+_RATE_SOURCE: Optional[Callable[[Optional[str]], Dict[str, Decimal]]] = None
+
+_refresh_lock = threading.Lock()
+_refresh_thread: Optional[threading.Thread] = None
 
 
 def get_exchange_rates(force_refresh: bool = False) -> dict[str, Decimal]:
     """
-    TCMB'den güncel USD ve EUR döviz alış kurlarını çeker.
+    Güncel USD ve EUR döviz alış kurlarını bekletmeden döndürür.
+
+    Sıra: kayıtlı kur kaynağı (bkz. `set_rate_source`), bellekteki son kurlar,
+    diskteki son kurlar; hiçbiri yoksa yalnızca TL. Bellekteki kurlar eskimişse veya
+    hiç yoksa TCMB'den tazeleme arka planda başlatılır ve çağıran ağı beklemez
+    (stale-while-revalidate). `force_refresh` verilirse TCMB'den bekleyerek
+    çekilir; bu yalnızca arka plan işlerinde kullanılmalıdır.
 
     Returns:
         dict[str, Decimal]: Para birimi kodlarını (USD, EUR, TL) ve Decimal türünde
                             kur değerlerini içeren bir sözlük.
-                            Başarısız olursa boş bir sözlük döner.
-    
-    Raises:
-        requests.exceptions.RequestException: Ağ hatası veya HTTP hata durumu oluşursa.
-        ET.ParseError: XML verisi bozuksa.
-        Exception: Diğer beklenmedik hatalar için.
     """
-    global _CACHED_RATES, _CACHED_AT
+    if force_refresh:
+        return refresh_exchange_rates() or _last_known_rates()
+
+    if _RATE_SOURCE is not None:
+        stored = _RATE_SOURCE(None)
+        if len(stored) > 1:
+            return stored
+
+    rates = _last_known_rates()
+    if _CACHED_AT is None or (time.time() - _CACHED_AT) >= _CACHE_TTL_SECONDS:
+        refresh_in_background()
+    return rates
+
 
-    now = time.time()
-    if not force_refresh and _CACHED_RATES and _CACHED_AT and (now - _CACHED_AT) < _CACHE_TTL_SECONDS:
+def _last_known_rates() -> dict[str, Decimal]:
+    """Bellekteki, yoksa diskteki son kurlar; hiçbiri yoksa yalnızca TL (döviz kuru bilinmiyor)."""
+    global _CACHED_RATES, _CACHED_AT
+    if _CACHED_RATES is None:
+        cached = _read_cache_file()
+        if cached:
+            _CACHED_RATES, _CACHED_AT = cached
+    if _CACHED_RATES:
         return _CACHED_RATES
+    logging.warning("WARN: Bilinen kur yok; TCMB kurlari alinana kadar doviz kurlari bos")
+    return {'TL': Decimal('1.0')}
+
 
-    rates = {'TL': Decimal('1.0')}
-    url = "https://www.tcmb.gov.tr/kurlar/today.xml"
+def refresh_exchange_rates() -> Optional[dict[str, Decimal]]:
+    """
+    TCMB'den bugünün kurlarını bekleyerek çeker; bellekteki ve diskteki son kurları günceller.
 
+    Returns:
+        Kurlar; ağ veya XML hatasında None.
+    """
+    global _CACHED_RATES, _CACHED_AT
     try:
-        logging.info(f"TCMB'den döviz kurları çekiliyor: {url}")
-        response = requests.get(url, timeout=5)  # Timeout'u 5 saniyeye düşür
-        response.raise_for_status()  # HTTP 2xx dışındaki durumlar için hata fırlatır
-
-        root = ET.fromstring(response.content)
-        
-        # Tarih bilgisini al
-        tarih = root.get('Tarih', 'Bilinmiyor')
-        
-        usd_rate_str = root.findtext("./Currency[@Kod='USD']/ForexBuying")
-        if usd_rate_str:
-            rates['USD'] = Decimal(usd_rate_str)
-        else:
-            logging.warning("USD kuru XML'de bulunamadı")
-            
-        eur_rate_str = root.findtext("./Currency[@Kod='EUR']/ForexBuying")
-        if eur_rate_str:
-            rates['EUR'] = Decimal(eur_rate_str)
-        else:
-            logging.warning("EUR kuru XML'de bulunamadı")
-        
-        from datetime import datetime
+        logging.info(f"TCMB'den döviz kurları çekiliyor: {TCMB_BASE_URL}/today.xml")
+        result = fetch_tcmb_rates()
+        if not result:
+            raise ValueError("Bugünün kur bülteni bulunamadı.")
+        bulletin_date, bulletin = result
+        rates = {'TL': Decimal('1.0')}
+        rates.update({code: buying for code, (buying, _) in bulletin.items()})
+        for code in ('USD', 'EUR'):
+            if code not in rates:
+                logging.warning(f"{code} kuru XML'de bulunamadı")
         timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        logging.info(f"OK: Guncel kurlar cekildi ({timestamp}, TCMB Tarih: {tarih}): USD={rates.get('USD', 'N/A')}, EUR={rates.get('EUR', 'N/A')}")
-        _CACHED_RATES = rates
-        _CACHED_AT = now
+        logging.info(f"OK: Guncel kurlar cekildi ({timestamp}, TCMB Tarih: {bulletin_date}): USD={rates.get('USD', 'N/A')}, EUR={rates.get('EUR', 'N/A')}")
+        _CACHED_RATES, _CACHED_AT = rates, time.time()
+        _write_cache_file(rates, _CACHED_AT)
         return rates
-
     except (requests.exceptions.RequestException, ET.ParseError, InvalidOperation, Exception) as e:
-        from datetime import datetime
         timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
         logging.error(f"WARN: TCMB kurlari alinamadi ({timestamp}). Hata: {type(e).__name__}: {e}")
-        logging.warning("WARN: Varsayilan kurlar kullanilacak: USD=30.0, EUR=35.0")
+        return None
+
+
+def refresh_in_background() -> None:
+    """Kurları arka planda tazeler; süren bir tazeleme varsa yenisini başlatmaz."""
+    global _refresh_thread, _CACHED_AT
+    with _refresh_lock:
+        if _refresh_thread is not None and _refresh_thread.is_alive():
+            return
+        # Başarısız tazeleme her çağrıda yeniden denenmesin; sonraki deneme TTL sonra
+        _CACHED_AT = time.time()
+        _refresh_thread = threading.Thread(target=refresh_exchange_rates, name='exchange-rate-refresh', daemon=True)
+        _refresh_thread.start()
+
+
+def _cache_file_path() -> str:
+    from .settings_manager import SettingsManager
+    return SettingsManager()._get_config_path(_CACHE_FILE_NAME)
+
+
+def _read_cache_file() -> Optional[Tuple[dict[str, Decimal], float]]:
+    try:
+        with open(_cache_file_path(), encoding='utf-8') as f:
+            data = json.load(f)
+        return {code: Decimal(value) for code, value in data['rates'].items()}, float(data['fetched_at'])
+    except (OSError, ValueError, KeyError, TypeError, InvalidOperation):
+        return None
+
+
+def _write_cache_file(rates: dict[str, Decimal], fetched_at: float) -> None:
+    try:
+        path = _cache_file_path()
+        with open(path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump({'fetched_at': fetched_at, 'rates': {code: str(value) for code, value in rates.items()}}, f)
+        os.replace(path + '.tmp', path)
+    except OSError as e:
+        logging.warning(f"Kurlar diske yazılamadı: {e}")
+
+
+# --- Geçmiş kurlar ---
 
-        # Hata durumunda varsa cache'i dondur
-        if _CACHED_RATES:
-            return _CACHED_RATES
 
-        # Hata durumunda varsay??lan (yakla????k) kurlar?? d??nd??r
-        return {
-            'TL': Decimal('1.0'),
-            'USD': Decimal('30.0'),
-            'EUR': Decimal('35.0')
-        }
+def set_rate_source(source: Optional[Callable[[Optional[str]], Dict[str, Decimal]]]) -> None:
+    """Kayıtlı kurların okunacağı kaynağı ayarlar (ör. `DatabaseManager.rates_on`)."""
+    global _RATE_SOURCE
+    _RATE_SOURCE = source
 
+
+def rates_on(on_date: Optional[str] = None) -> Dict[str, Decimal]:
+    """
+    Verilen tarihte geçerli alış kurları (tarih 'YYYY-MM-DD...'; None ise en güncel).
+
+    Kayıtlı kur kaynağı yoksa veya tarihe ait kur bulunamazsa güncel kurlara düşer.
+    """
+    if _RATE_SOURCE is not None:
+        stored = _RATE_SOURCE(on_date)
+        if len(stored) > 1:
+            return stored
+    return get_exchange_rates()
+
+
+def rate_on(on_date: Optional[str], currency: str) -> Decimal:
+    """Tek bir para biriminin verilen tarihteki alış kuru (bulunamazsa 1)."""
+    if currency == 'TL':
+        return Decimal('1')
+    return Decimal(str(rates_on(on_date).get(currency, 1)))
+
+
+class MissingRateError(ValueError):
+    """Faturalamada gereken bir para biriminin TCMB kuru bilinmiyor."""
+
+
+def require_rate(rates: Dict[str, Decimal], currency: Optional[str]) -> Decimal:
+    """
+    Faturalamada kullanılacak kur (TL için 1); kur uydurulmaz.
+
+    Raises:
+        MissingRateError: Para biriminin kuru `rates` içinde yoksa.
+    """
+    currency = (currency or 'TL').strip().upper()
+    if currency == 'TL':
+        return Decimal('1')
+    if not rates or currency not in rates:
+        raise MissingRateError(f"{currency} kuru bilinmiyor; TCMB kurları alınmadan fatura oluşturulamaz.")
+    return Decimal(str(rates[currency]))
+
+
+def parse_tcmb_xml(content: bytes) -> Tuple[str, Dict[str, Tuple[Decimal, Optional[Decimal]]]]:
+    """
+    TCMB kur XML'ini çözümler.
+
+    Returns:
+        (bülten tarihi 'YYYY-MM-DD', {para birimi: (döviz alış, döviz satış)}).
+        Kurlar 1 birim içindir (ör. JPY'nin 100 birimlik kuru 100'e bölünür).
+    """
+    root = ET.fromstring(content)
+    bulletin_date = datetime.strptime(root.get('Tarih', ''), '%d.%m.%Y').strftime('%Y-%m-%d')
+    rates: Dict[str, Tuple[Decimal, Optional[Decimal]]] = {}
+    for currency in root.findall('Currency'):
+        code = currency.get('Kod') or currency.get('CurrencyCode')
+        buying = (currency.findtext('ForexBuying') or '').strip()
+        if not code or not buying:
+            continue
+        selling = (currency.findtext('ForexSelling') or '').strip()
+        unit = Decimal((currency.findtext('Unit') or '1').strip() or '1')
+        try:
+            rates[code] = (Decimal(buying) / unit, Decimal(selling) / unit if selling else None)
+        except InvalidOperation:
+            logging.warning(f"TCMB {bulletin_date} bülteninde {code} kuru okunamadı: {buying!r}")
+    return bulletin_date, rates
+
+
+def archive_url(day: date) -> str:
+    """TCMB kur arşivindeki günlük bülten adresi."""
+    return f"{TCMB_BASE_URL}/{day:%Y%m}/{day:%d%m%Y}.xml"
+
+
+def fetch_tcmb_rates(day: Optional[date] = None,
+                     timeout: float = 5) -> Optional[Tuple[str, Dict[str, Tuple[Decimal, Optional[Decimal]]]]]:
+    """
+    TCMB'den bir günün (None ise bugünün) kur bültenini çeker.
+
+    Returns:
+        `parse_tcmb_xml` sonucu; o gün bülten yayımlanmamışsa (hafta sonu,
+        resmi tatil) None.
+
+    Raises:
+        requests.exceptions.RequestException: Ağ hatası veya 404 dışı HTTP hatası.
+        ET.ParseError: XML verisi bozuksa.
+    """
+    url = archive_url(day) if day else f"{TCMB_BASE_URL}/today.xml"
+    response = requests.get(url, timeout=timeout)
+    if response.status_code == 404:
+        return None
+    response.raise_for_status()
+    return parse_tcmb_xml(response.content)
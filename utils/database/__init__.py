@@ -8,8 +8,15 @@ Uygulama genelinde kullanılacak tekil veritabanı nesnesi `db_manager`
 doğrudan bu paketten içe aktarılabilir.
 """
 
-from .connection import db_manager
+
+def __getattr__(name):
+    # `db_manager` ilk erişimde oluşturulur; böylece paketteki yardımcı modüller
+    # (ör. index_advisor) veritabanına bağlanmadan içe aktarılabilir.
+    if name == 'db_manager':
+        from .connection import db_manager
+        return db_manager
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 # Bu __init__.py dosyası, `utils.database` paketinden içe aktarım yapıldığında
 # `db_manager` nesnesinin kolayca erişilebilir olmasını sağlar.
-# Örneğin: `from utils.database import db_manager`
\ No newline at end of file
+# Örneğin: `from utils.database import db_manager`
@@ -0,0 +1,145 @@
+"""
+Bulut senkronizasyonu için değişiklik yakalama.
+
+Senkronize edilen tabloların her INSERT/UPDATE/DELETE'i tetikleyicilerle
+`sync_changes` tablosuna yazılır. Kuyruk (tablo, kayıt) başına tek satır
+tutar: aynı kayda gelen yeni değişiklik satırı günceller, işlemi en son
+işlemle değiştirir ve `version`'ı artırır. Henüz gönderilmemiş bir INSERT'in
+ardından gelen UPDATE'ler INSERT olarak kalır. Böylece kuyruk boyutu ve
+gönderilen kayıt sayısı düzenleme sayısıyla değil, değişen kayıt sayısıyla
+büyür.
+
+Gönderilen kayıtlar kuyruktan silinir (`prune_changes`). Silme, okunan
+`version` ile koşullandırılır; gönderim sırasında kayıt yeniden değişirse
+satır kuyrukta kalır ve sonraki senkronizasyonda gönderilir.
+
+İzlenecek tablolar şemadan türetilir (`sync_tables`): tam sayı `id` birincil
+anahtarı olan tablolar izlenir, `EXCLUDED_TABLES` dışarıda bırakılır.
+"""
+
+import sqlite3
+from typing import Dict, Iterable, List, Sequence, Set, Tuple
+
+CHANGES_TABLE_DDL = """CREATE TABLE IF NOT EXISTS sync_changes (
+    table_name TEXT NOT NULL,
+    record_id INTEGER NOT NULL,
+    operation TEXT NOT NULL,
+    changed_at TEXT NOT NULL,
+    version INTEGER NOT NULL DEFAULT 1,
+    PRIMARY KEY (table_name, record_id)
+) WITHOUT ROWID"""
+
+# Buluta gönderilmeyen tablolar: kullanıcılar bulutta merkezi tabloda
+# (dbo.global_users) tutulur.
+EXCLUDED_TABLES = ('users',)
+
+# TABLE_DEFINITIONS dışında, migrasyonlarla eklenmiş iş verisi tabloları
+EXTRA_TABLES = ('meter_readings',)
+
+_RECORD_CHANGE = """INSERT INTO sync_changes (table_name, record_id, operation, changed_at)
+    VALUES ('{table}', {row}.id, '{operation}', datetime('now'))
+    ON CONFLICT (table_name, record_id) DO UPDATE SET
+        operation = CASE WHEN sync_changes.operation = 'INSERT' AND excluded.operation = 'UPDATE'
+                         THEN 'INSERT' ELSE excluded.operation END,
+        changed_at = excluded.changed_at,
+        version = sync_changes.version + 1"""
+
+# (tetikleyici adı öneki, olay, satır)
+_EVENTS = (
+    ('sync_after_insert', 'INSERT', 'NEW'),
+    ('sync_after_update', 'UPDATE', 'NEW'),
+    ('sync_after_delete', 'DELETE', 'OLD'),
+)
+
+
+def sync_tables(conn: sqlite3.Connection, candidates: Iterable[str]) -> List[str]:
+    """Adaylardan veritabanında bulunan ve tam sayı `id` birincil anahtarı olan tablolar."""
+    tables = []
+    for table in list(candidates) + list(EXTRA_TABLES):
+        if table in EXCLUDED_TABLES or table in tables:
+            continue
+        columns = conn.execute(f'PRAGMA table_info("{table}")').fetchall()
+        if any(name == 'id' and pk == 1 and 'INT' in (col_type or '').upper()
+               for _, name, col_type, _, _, pk in columns):
+            tables.append(table)
+    return tables
+
+
+def create_change_capture(conn: sqlite3.Connection, tables: Sequence[str]) -> None:
+    """Kuyruk tablosunu ve tablolardaki değişiklik tetikleyicilerini oluşturur."""
+    conn.execute(CHANGES_TABLE_DDL)
+    for table in tables:
+        for prefix, operation, row in _EVENTS:
+            name = f"{prefix}_{table}"
+            body = _RECORD_CHANGE.format(table=table, row=row, operation=operation)
+            conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+            conn.execute(f"CREATE TRIGGER {name} AFTER {operation} ON {table}\nBEGIN\n{body};\nEND")
+
+
+def import_legacy_queues(conn: sqlite3.Connection, tables: Sequence[str]) -> int:
+    """
+    Eski tablo başına `sync_queue_<tablo>` kuyruklarındaki gönderilmemiş
+    kayıtları `sync_changes`'e aktarır ve eski kuyrukları kaldırır.
+    `create_change_capture`'tan sonra çağrılmalıdır.
+
+    Returns:
+        Aktarılan (tablo, kayıt) sayısı.
+    """
+    moved = 0
+    legacy = [row[0] for row in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name LIKE 'sync\\_queue\\_%' ESCAPE '\\'")]
+    for queue in legacy:
+        table = queue[len('sync_queue_'):]
+        if table in tables:
+            moved += conn.execute(f"""
+                INSERT INTO sync_changes (table_name, record_id, operation, changed_at)
+                SELECT ?, record_id,
+                       CASE WHEN operation = 'UPDATE' AND inserted THEN 'INSERT' ELSE operation END, created_at
+                FROM (
+                    SELECT record_id, operation, COALESCE(created_at, datetime('now')) AS created_at,
+                           MAX(id), SUM(operation = 'INSERT') > 0 AS inserted
+                    FROM {queue} WHERE synced = 0 GROUP BY record_id
+                ) WHERE true
+                ON CONFLICT (table_name, record_id) DO NOTHING""", (table,)).rowcount
+        else:
+            # Artık izlenmeyen tablonun eski tetikleyicileri kaldırılan kuyruğa yazmasın
+            for prefix, _, _ in _EVENTS:
+                conn.execute(f"DROP TRIGGER IF EXISTS {prefix}_{table}")
+        conn.execute(f"DROP TABLE {queue}")
+    return moved
+
+
+def pending_changes(conn: sqlite3.Connection) -> Dict[str, List[Tuple[int, str, int]]]:
+    """Tablo başına bekleyen değişiklikler: [(kayıt id, işlem, sürüm), ...]."""
+    changes: Dict[str, List[Tuple[int, str, int]]] = {}
+    for table, record_id, operation, version in conn.execute(
+            "SELECT table_name, record_id, operation, version FROM sync_changes ORDER BY table_name, record_id"):
+        changes.setdefault(table, []).append((record_id, operation, version))
+    return changes
+
+
+def table_dependencies(conn: sqlite3.Connection, tables: Iterable[str]) -> Dict[str, Set[str]]:
+    """
+    Tabloların yabancı anahtarla bağlı oldukları (önce gönderilmesi gereken)
+    tablolar; yalnızca verilen tablolar arasındaki bağlar, öz-başvurular hariç.
+    """
+    tables = list(tables)
+    names = set(tables)
+    return {
+        table: {row[2] for row in conn.execute(f'PRAGMA foreign_key_list("{table}")')
+                if row[2] in names and row[2] != table}
+        for table in tables
+    }
+
+
+def pending_count(conn: sqlite3.Connection) -> int:
+    return conn.execute("SELECT COUNT(*) FROM sync_changes").fetchone()[0]
+
+
+def prune_changes(conn: sqlite3.Connection, table: str, synced: Iterable[Tuple[int, int]]) -> int:
+    """Gönderilmiş (kayıt id, sürüm) çiftlerini kuyruktan siler; sonradan değişenler kalır."""
+    cursor = conn.executemany(
+        "DELETE FROM sync_changes WHERE table_name = ? AND record_id = ? AND version = ?",
+        [(table, record_id, version) for record_id, version in synced]
+    )
+    return cursor.rowcount
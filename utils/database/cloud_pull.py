@@ -0,0 +1,123 @@
+"""
+Buluttan (Azure SQL) yerel veritabanına artımlı çekme.
+
+Azure tablolarındaki ROWVERSION sütunu her INSERT/UPDATE'te veritabanı
+genelinde artan bir değer alır. Her tablo için en son çekilen değer
+(`watermark`) `sync_pull_state` tablosunda saklanır; girişte yalnızca bu
+değerden büyük satırlar parça parça (fetchmany) okunur ve yerel tabloya
+`executemany` ile id üzerinden eklenir/güncellenir. Firma tabloları `row_ver`
+sütunuyla oluşturulur; eski şemalara sütun bir kerelik şema migrasyonuyla
+eklenir (AzureSQLManager.migrate_company_schema). Migrasyonu uygulanmamış,
+ROWVERSION sütunu olmayan tablolar her seferinde baştan çekilir.
+
+Buluttaki silmeler ROWVERSION ile görünmez; bulut ile yerel satır sayıları
+tutmazsa buluttaki id listesi çekilip bulutta olmayan yerel kayıtlar silinir.
+
+Henüz buluta gönderilmemiş yerel değişikliği (`sync_changes`) olan kayıtlara
+dokunulmaz (yerel değişiklik kazanır). Çekilen satırlar değişiklik
+tetikleyicilerini çalıştırdığından oluşan kuyruk kayıtları aynı işlemde
+silinir; böylece buluttan gelen veri buluta geri gönderilmez.
+
+Yerel şema sürümü (PRAGMA user_version) veya buluttaki sütunlar değişirse
+tablonun imzası değişir ve watermark sıfırlanarak tablo baştan çekilir.
+"""
+
+import sqlite3
+from typing import Iterable, List, Optional, Sequence, Set
+
+PULL_STATE_TABLE_DDL = """CREATE TABLE IF NOT EXISTS sync_pull_state (
+    table_name TEXT PRIMARY KEY,
+    watermark INTEGER NOT NULL DEFAULT 0,
+    schema_signature TEXT,
+    pulled_at TEXT
+)"""
+
+
+def schema_signature(conn: sqlite3.Connection, cloud_columns: Iterable[str]) -> str:
+    """Yerel şema sürümü ve buluttaki sütunlardan oluşan imza."""
+    user_version = conn.execute("PRAGMA user_version").fetchone()[0]
+    return f"{user_version}:{','.join(sorted(c.lower() for c in cloud_columns))}"
+
+
+def load_watermark(conn: sqlite3.Connection, table: str, signature: str) -> int:
+    """Tablonun son watermark'ı; ilk çekmede veya imza değiştiyse 0 (tam çekme)."""
+    row = conn.execute("SELECT watermark, schema_signature FROM sync_pull_state WHERE table_name = ?",
+                       (table,)).fetchone()
+    return row[0] if row and row[1] == signature else 0
+
+
+def save_watermark(conn: sqlite3.Connection, table: str, watermark: int, signature: str) -> None:
+    conn.execute("""
+        INSERT INTO sync_pull_state (table_name, watermark, schema_signature, pulled_at)
+        VALUES (?, ?, ?, datetime('now'))
+        ON CONFLICT (table_name) DO UPDATE SET
+            watermark = excluded.watermark, schema_signature = excluded.schema_signature, pulled_at = excluded.pulled_at
+    """, (table, watermark, signature))
+
+
+def local_columns(conn: sqlite3.Connection, table: str) -> List[str]:
+    return [row[1] for row in conn.execute(f'PRAGMA table_info("{table}")')]
+
+
+def pending_ids(conn: sqlite3.Connection, table: str) -> Set[int]:
+    """Buluta henüz gönderilmemiş yerel değişikliği olan kayıtlar."""
+    return {row[0] for row in conn.execute("SELECT record_id FROM sync_changes WHERE table_name = ?", (table,))}
+
+
+def upsert_rows(conn: sqlite3.Connection, table: str, columns: Sequence[str], rows: Iterable[Sequence],
+                skip_ids: Set[int]) -> int:
+    """
+    Bulut satırlarını id üzerinden yerel tabloya yazar; `skip_ids` atlanır.
+
+    `columns` ilk sırada 'id' içermelidir.
+
+    Returns:
+        Yazılan satır sayısı.
+    """
+    rows = [tuple(row) for row in rows if row[0] not in skip_ids]
+    if not rows:
+        return 0
+    column_list = ', '.join(f'"{c}"' for c in columns)
+    updates = ', '.join(f'"{c}" = excluded."{c}"' for c in columns[1:])
+    conflict = f"DO UPDATE SET {updates}" if updates else "DO NOTHING"
+    conn.executemany(
+        f'INSERT INTO "{table}" ({column_list}) VALUES ({", ".join("?" for _ in columns)}) ON CONFLICT (id) {conflict}',
+        rows
+    )
+    # Tetikleyicilerin bu satırlar için açtığı kuyruk kayıtları buluttan geldiği için gönderilmez
+    conn.executemany("DELETE FROM sync_changes WHERE table_name = ? AND record_id = ?",
+                     [(table, row[0]) for row in rows])
+    return len(rows)
+
+
+def remove_missing(conn: sqlite3.Connection, table: str, cloud_ids: Iterable[int], skip_ids: Set[int]) -> int:
+    """
+    Bulutta bulunmayan yerel kayıtları siler; `skip_ids` (gönderilmemiş yerel
+    değişiklikler) korunur.
+
+    Returns:
+        Silinen kayıt sayısı.
+    """
+    conn.execute("CREATE TEMP TABLE IF NOT EXISTS pull_cloud_ids (id INTEGER PRIMARY KEY)")
+    conn.execute("DELETE FROM temp.pull_cloud_ids")
+    conn.executemany("INSERT OR IGNORE INTO temp.pull_cloud_ids (id) VALUES (?)", [(i,) for i in cloud_ids])
+    missing = [row[0] for row in conn.execute(
+        f'SELECT id FROM "{table}" WHERE id NOT IN (SELECT id FROM temp.pull_cloud_ids)') if row[0] not in skip_ids]
+    conn.executemany(f'DELETE FROM "{table}" WHERE id = ?', [(i,) for i in missing])
+    conn.executemany("DELETE FROM sync_changes WHERE table_name = ? AND record_id = ?", [(table, i) for i in missing])
+    conn.execute("DELETE FROM temp.pull_cloud_ids")
+    return len(missing)
+
+
+def local_count(conn: sqlite3.Connection, table: str) -> int:
+    return conn.execute(f'SELECT COUNT(*) FROM "{table}"').fetchone()[0]
+
+
+def common_columns(local: Sequence[str], cloud: Sequence[str]) -> Optional[List[str]]:
+    """Her iki tarafta bulunan sütunlar ('id' başta); id yoksa None."""
+    cloud_lower = {c.lower() for c in cloud}
+    columns = [c for c in local if c.lower() in cloud_lower]
+    if 'id' not in columns:
+        return None
+    columns.remove('id')
+    return ['id'] + columns
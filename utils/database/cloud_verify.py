@@ -0,0 +1,211 @@
+"""
+Yerel veritabanı ile buluttaki (Azure SQL) kopyanın tutarlılık kontrolü.
+
+Tablolar tam aktarım yapılmadan, id aralıklarına bölünmüş özetlerle
+karşılaştırılır (Merkle ağacı gibi, yukarıdan aşağıya):
+
+1. Her satır için sütun değerleri tipine göre ortak bir metne çevrilir
+   (`sqlite_row_expr` / `sqlserver_row_expr`). Bu metnin MD5'inin (UTF-16LE)
+   ilk 4 baytı satır özetidir. SQL Server'da HASHBYTES ile hesaplanır,
+   SQLite'ta `sync_row_hash` fonksiyonu ile. Ondalık değerler iki tarafta
+   aynı adımlarla yuvarlanır: önce 10 basamaklı DECIMAL'e çevrilir, sonra 4
+   basamağa sıfırdan uzağa yuvarlanır (SQLite'ta `sync_decimal`). printf ve
+   FLOAT üzerindeki ROUND ikili değeri farklı yuvarladığından yarım
+   değerlerde (ör. 1.00005) ayrışırdı.
+2. Bir id aralığının özeti (satır sayısı, satır özetlerinin toplamı)
+   ikilisidir. Aralık `FANOUT` parçaya bölünür; her iki tarafta tek sorguyla
+   parça özetleri ve aralığın toplamı alınır.
+3. Özetleri tutmayan parçalar, en fazla `LEAF_ROWS` satır kalana kadar
+   yeniden bölünür. Tutarlı bir tabloda buluttan yalnızca tek bir sorgunun
+   birkaç satırı gelir; bir farkı bulmak için ağaçtaki her seviyede birkaç
+   yüz bayt aktarılır.
+4. Tutmayan yaprak aralıklarının bulut satırları indirilip yerel tabloya
+   yazılır; bulutta olmayan yerel kayıtlar silinir. Henüz gönderilmemiş
+   yerel değişikliği olan kayıtlara dokunulmaz (bkz. cloud_pull).
+"""
+
+import hashlib
+import sqlite3
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from .cloud_pull import upsert_rows
+
+# Bir aralığın bölündüğü parça sayısı
+FANOUT = 16
+# Bu kadar veya daha az satırlık tutmayan aralık doğrudan onarılır
+LEAF_ROWS = 64
+
+# SQL Server tipi -> ortak metin biçimi
+INTEGER_TYPES = ('int', 'bigint', 'smallint', 'tinyint', 'bit')
+DECIMAL_TYPES = ('float', 'real', 'decimal', 'numeric', 'money', 'smallmoney')
+DATETIME_TYPES = ('datetime', 'datetime2', 'smalldatetime', 'datetimeoffset')
+DATE_TYPES = ('date',)
+# Özete katılmayan tipler
+SKIPPED_TYPES = ('timestamp', 'rowversion', 'binary', 'varbinary', 'image')
+
+# NULL değerin metni ve sütun ayırıcı (U+001F)
+NULL_MARKER = '\\N'
+SEPARATOR_CODE = 31
+
+# Ondalık değerler önce bu ölçekte DECIMAL'e çevrilir, sonra DECIMAL_SCALE basamağa yuvarlanır
+CONVERT_SCALE = Decimal('1e-10')
+DECIMAL_SCALE = Decimal('0.0001')
+
+# (satır sayısı, özet toplamı)
+Summary = Tuple[int, int]
+
+
+def row_hash(text: Optional[str]) -> int:
+    """Satır metninin özeti: MD5(UTF-16LE) ilk 4 bayt, işaretli tam sayı (SQL Server ile aynı)."""
+    digest = hashlib.md5((text or '').encode('utf-16-le')).digest()
+    return int.from_bytes(digest[:4], 'big', signed=True)
+
+
+def decimal_text(value: Any) -> Optional[str]:
+    """
+    Ondalık değerin özetteki metni; SQL Server'daki
+    CAST(ROUND(CAST(x AS DECIMAL(38, 10)), 4) AS DECIMAL(38, 4)) ile aynı sonucu verir.
+    """
+    if value is None:
+        return None
+    try:
+        number = Decimal(value) if isinstance(value, (int, float)) else Decimal(str(value))
+        number = number.quantize(CONVERT_SCALE, ROUND_HALF_UP).quantize(DECIMAL_SCALE, ROUND_HALF_UP)
+    except (InvalidOperation, ValueError):
+        return str(value)
+    return str(abs(number) if number.is_zero() else number)
+
+
+def register_functions(conn: sqlite3.Connection) -> None:
+    conn.create_function('sync_row_hash', 1, row_hash, deterministic=True)
+    conn.create_function('sync_decimal', 1, decimal_text, deterministic=True)
+
+
+def hash_columns(local: Sequence[str], cloud_types: Dict[str, str]) -> Optional[List[Tuple[str, str]]]:
+    """
+    İki tarafta da bulunan, özete katılan sütunlar ve bulut tipleri ('id' başta).
+    Tablonun id sütunu yoksa None.
+    """
+    types = {name.lower(): type_name.lower() for name, type_name in cloud_types.items()}
+    columns = [(c, types[c.lower()]) for c in local
+               if c.lower() in types and types[c.lower()] not in SKIPPED_TYPES]
+    ids = [column for column in columns if column[0] == 'id']
+    if not ids:
+        return None
+    return ids + [column for column in columns if column[0] != 'id']
+
+
+def sqlite_row_expr(columns: Sequence[Tuple[str, str]]) -> str:
+    parts = []
+    for name, type_name in columns:
+        column = f'"{name}"'
+        if type_name in INTEGER_TYPES:
+            value = f"CAST(CAST({column} AS INTEGER) AS TEXT)"
+        elif type_name in DECIMAL_TYPES:
+            value = f"sync_decimal({column})"
+        elif type_name in DATETIME_TYPES:
+            value = f"strftime('%Y-%m-%d %H:%M:%S', {column})"
+        elif type_name in DATE_TYPES:
+            value = f"strftime('%Y-%m-%d', {column})"
+        else:
+            value = f"CAST({column} AS TEXT)"
+        parts.append(f"COALESCE(CASE WHEN {column} IS NULL THEN NULL ELSE {value} END, '{NULL_MARKER}')")
+    return f" || char({SEPARATOR_CODE}) || ".join(parts)
+
+
+def sqlserver_row_expr(columns: Sequence[Tuple[str, str]]) -> str:
+    parts = []
+    for name, type_name in columns:
+        column = f"[{name}]"
+        if type_name in INTEGER_TYPES:
+            value = f"CONVERT(NVARCHAR(20), {column})"
+        elif type_name in DECIMAL_TYPES:
+            value = f"CONVERT(NVARCHAR(50), CAST(ROUND(CAST({column} AS DECIMAL(38, 10)), 4) AS DECIMAL(38, 4)))"
+        elif type_name in DATETIME_TYPES:
+            value = f"CONVERT(NVARCHAR(19), {column}, 120)"
+        elif type_name in DATE_TYPES:
+            value = f"CONVERT(NVARCHAR(10), {column}, 23)"
+        else:
+            value = f"CAST({column} AS NVARCHAR(MAX))"
+        parts.append(f"ISNULL({value}, N'{NULL_MARKER}')")
+    return f"CONCAT({f', NCHAR({SEPARATOR_CODE}), '.join(parts)})" if len(parts) > 1 else parts[0]
+
+
+def bucket_width(lo: int, hi: int, fanout: int = FANOUT) -> int:
+    return max(1, -(-(hi - lo + 1) // fanout))
+
+
+def local_id_bounds(conn: sqlite3.Connection, table: str) -> Tuple[Optional[int], Optional[int]]:
+    return tuple(conn.execute(f'SELECT MIN(id), MAX(id) FROM "{table}"').fetchone())
+
+
+def local_range_hashes(conn: sqlite3.Connection, table: str, columns: Sequence[Tuple[str, str]],
+                       lo: int, hi: int, width: int) -> Dict[int, Summary]:
+    """[lo, hi] aralığının `width` genişliğindeki parçalarının özetleri {parça: (sayı, toplam)}."""
+    rows = conn.execute(f"""
+        SELECT (id - ?) / ? AS bucket, COUNT(*), SUM(sync_row_hash({sqlite_row_expr(columns)}))
+        FROM "{table}" WHERE id BETWEEN ? AND ?
+        GROUP BY bucket
+    """, (lo, width, lo, hi))
+    return {bucket: (count, total) for bucket, count, total in rows}
+
+
+def find_mismatches(local: Callable[[int, int, int], Dict[int, Summary]],
+                    cloud: Callable[[int, int, int], Tuple[Summary, Dict[int, Summary]]],
+                    lo: int, hi: int, stats: Dict[str, int],
+                    fanout: int = FANOUT, leaf_rows: int = LEAF_ROWS) -> List[Tuple[int, int, int]]:
+    """
+    [lo, hi] aralığında iki tarafın tutmadığı yaprak aralıklarını bulur.
+
+    Args:
+        local: (lo, hi, genişlik) -> yerel parça özetleri
+        cloud: (lo, hi, genişlik) -> (aralık toplamı, bulut parça özetleri)
+        stats: 'queries' ve 'hash_rows' sayaçları güncellenir
+
+    Returns:
+        [(lo, hi, buluttaki satır sayısı), ...]
+    """
+    mismatches = []
+    ranges = [(lo, hi)]
+    while ranges:
+        range_lo, range_hi = ranges.pop()
+        width = bucket_width(range_lo, range_hi, fanout)
+        cloud_total, cloud_buckets = cloud(range_lo, range_hi, width)
+        local_buckets = local(range_lo, range_hi, width)
+        stats['queries'] += 1
+        stats['hash_rows'] += len(cloud_buckets) + 1
+        local_total = (sum(c for c, _ in local_buckets.values()), sum(h for _, h in local_buckets.values()))
+        if local_total == cloud_total:
+            continue
+        for bucket in sorted(set(local_buckets) | set(cloud_buckets)):
+            local_summary = local_buckets.get(bucket, (0, 0))
+            cloud_summary = cloud_buckets.get(bucket, (0, 0))
+            if local_summary == cloud_summary:
+                continue
+            bucket_lo = range_lo + bucket * width
+            bucket_hi = min(range_hi, bucket_lo + width - 1)
+            if width == 1 or max(local_summary[0], cloud_summary[0]) <= leaf_rows:
+                mismatches.append((bucket_lo, bucket_hi, cloud_summary[0]))
+            else:
+                ranges.append((bucket_lo, bucket_hi))
+    return sorted(mismatches)
+
+
+def repair_range(conn: sqlite3.Connection, table: str, columns: Sequence[str], cloud_rows: Iterable[Sequence[Any]],
+                 lo: int, hi: int, skip_ids: Set[int]) -> Tuple[int, int]:
+    """
+    [lo, hi] aralığını bulut satırlarıyla eşitler: bulut satırları yazılır,
+    bulutta olmayan yerel kayıtlar silinir; `skip_ids` korunur.
+
+    Returns:
+        (yazılan, silinen) satır sayıları
+    """
+    cloud_rows = [tuple(row) for row in cloud_rows]
+    cloud_ids = {row[0] for row in cloud_rows}
+    written = upsert_rows(conn, table, columns, cloud_rows, skip_ids)
+    missing = [row[0] for row in conn.execute(f'SELECT id FROM "{table}" WHERE id BETWEEN ? AND ?', (lo, hi))
+               if row[0] not in cloud_ids and row[0] not in skip_ids]
+    conn.executemany(f'DELETE FROM "{table}" WHERE id = ?', [(i,) for i in missing])
+    conn.executemany("DELETE FROM sync_changes WHERE table_name = ? AND record_id = ?", [(table, i) for i in missing])
+    return written, len(missing)
@@ -2,26 +2,41 @@
 Veritabanı bağlantısını ve temel CRUD (Oluştur, Oku, Güncelle, Sil)
 işlemlerini yöneten merkezi modül.
 Bu modül, Singleton tasarım desenini kullanarak uygulama genelinde tek bir
-veritabanı bağlantı nesnesi (`DatabaseManager`) sağlar. Bu, kaynakların
-verimli kullanılmasını ve bağlantıların tutarlı bir şekilde yönetilmesini sağlar.
+veritabanı yöneticisi (`DatabaseManager`) sağlar. Yönetici, her iş parçacığına
+kendi okuma bağlantısını veren ve yazmaları tek bir yazıcı bağlantısında
+sıralayan bir bağlantı havuzu (`ConnectionPool`) kullanır.
 """
 import sqlite3
 import bcrypt
 import os
 import logging
-from typing import Any, List, Tuple, Optional, Dict
+from contextlib import contextmanager
+from time import monotonic, perf_counter
+from typing import Any, Callable, Iterable, Iterator, List, Tuple, Optional, Dict, Sequence, Type
 # Proje kök dizininden importlar
 from ..settings_manager import SettingsManager
-from ..currency_converter import get_exchange_rates
+from ..currency_converter import get_exchange_rates, set_rate_source
 from ..auto_backup import AutoBackupManager
-from .queries_general import GeneralQueriesMixin
+from .pool import ConnectionPool, LockedConnection
+from .profiles import PERFORMANCE_PROFILES, apply_profile, resolve_profile_name
+from .instrumentation import QueryStats
+from .query_cache import MISSING, QueryCache
+from .index_advisor import advise, format_report
+from .migrations import Migration, SchemaCache, run_migrations
+from .records import Device, Record, record_factory
+from .dates import DATE_COLUMNS, normalize_date_text
+from .search import rebuild_search_indexes
+from .cpc_billing import RUN_ITEMS_INDEX_DDL, RUN_ITEMS_TABLE_DDL, RUNS_TABLE_DDL
+from .exchange_rates import EXCHANGE_RATES_TABLE_DDL, RateIndex
+from .meter_readings import READINGS_TABLE_DDL, create_meter_readings_schema, move_service_readings
+from .dashboard_summary import SUMMARY_TABLE_DDL, create_dashboard_triggers, rebuild_dashboard_summary
+from .queries_general import GeneralQueriesMixin, CUSTOMER_DEVICE_COLUMNS
 from .queries_service import ServiceQueriesMixin
 from .queries_stock import StockQueriesMixin
 from .queries_billing import BillingQueriesMixin
 # Logging yapılandırması
 # --- VERİTABANI ŞEMA TANIMLARI ---
-# Her sürümde yapılacak değişiklikleri burada tanımla
-SCHEMA_VERSION = 9
+# Her sürümde yapılacak değişiklikleri MIGRATIONS listesine yeni bir adım olarak ekle
 TABLE_DEFINITIONS: Dict[str, str] = {
     "users": "CREATE TABLE IF NOT EXISTS users (id INTEGER PRIMARY KEY AUTOINCREMENT, username TEXT NOT NULL UNIQUE, password_hash TEXT NOT NULL, role TEXT DEFAULT 'user')",
     "settings": "CREATE TABLE IF NOT EXISTS settings (key TEXT PRIMARY KEY, value TEXT)",
@@ -332,13 +347,260 @@ TABLE_DEFINITIONS: Dict[str, str] = {
         FOREIGN KEY (customer_id) REFERENCES customers (id) ON DELETE CASCADE
     )"""
 }
+# Eski sürümlerde tek tek eklenen sütunlar: (tablo, sütun, tip)
+LEGACY_COLUMNS: List[Tuple[str, str, str]] = [
+    ('stock_items', 'compatible_models', 'TEXT'),
+    ('customers', 'tax_id', 'TEXT'),
+    ('customers', 'tax_office', 'TEXT'),
+    ('customers', 'is_contract', 'INTEGER DEFAULT 0'),
+    ('customers', 'contract_start_date', 'TEXT'),
+    ('customers', 'contract_end_date', 'TEXT'),
+    ('customers', 'contract_pdf_path', 'TEXT'),
+    ('customers', 'contract_period', "TEXT DEFAULT 'Aylik'"),
+    ('customers', 'contract_price', 'REAL DEFAULT 0.0'),
+    ('customers', 'contract_currency', "TEXT DEFAULT 'TL'"),
+    ('quote_items', 'total_tl', 'REAL DEFAULT 0.0'),
+    ('stock_items', 'supplier', 'TEXT'),
+    ('stock_items', 'location', 'TEXT'),
+    ('stock_items', 'min_stock_level', 'INTEGER DEFAULT 0'),
+    ('stock_items', 'color_type', "TEXT DEFAULT 'Siyah-Beyaz'"),
+    ('devices', 'color_type', "TEXT DEFAULT 'Siyah-Beyaz'"),
+    ('devices', 'rental_fee', 'REAL DEFAULT 0.0'),
+    ('devices', 'rental_currency', "TEXT DEFAULT 'TL'"),
+    ('devices', 'stock_id', 'INTEGER'),
+    ('service_records', 'related_invoice_id', 'INTEGER'),
+    ('service_records', 'description', 'TEXT'),
+    ('service_records', 'technician_id', 'INTEGER'),
+    ('service_records', 'assigned_user_id', 'INTEGER'),
+    ('service_records', 'completed_date', 'TEXT'),
+    ('service_records', 'technician_report', 'TEXT'),
+    ('service_records', 'service_form_pdf_path', 'TEXT'),
+    ('invoices', 'notes', 'TEXT'),
+    ('invoices', 'related_id', 'INTEGER'),
+    ('invoices', 'items_json', 'TEXT'),
+    ('invoices', 'exchange_rate', 'REAL DEFAULT 1.0'),
+    ('invoice_items', 'stock_item_id', 'INTEGER'),
+    ('invoice_items', 'tax_rate', 'REAL DEFAULT 0'),
+    ('invoice_items', 'tax_amount', 'REAL DEFAULT 0'),
+    ('invoice_items', 'cost_at_sale', 'REAL DEFAULT 0'),
+    ('invoice_items', 'cost_currency', "TEXT DEFAULT 'TL'"),
+    ('cpc_invoices', 'is_invoiced', 'INTEGER DEFAULT 0'),
+    ('pending_sales', 'sale_data_json', 'TEXT'),
+    ('pending_sales', 'invoice_id', 'INTEGER'),
+    # Customer devices location and free columns
+    ('customer_devices', 'location_id', 'INTEGER'),
+    ('customer_devices', 'is_free', 'INTEGER DEFAULT 0'),
+    # Add rental fee columns for customer devices
+    ('customer_devices', 'rental_fee', 'REAL DEFAULT 0.0'),
+    ('customer_devices', 'rental_currency', "TEXT DEFAULT 'TL'"),
+    # Add CPC price columns for customer devices
+    ('customer_devices', 'cpc_bw_price', 'REAL DEFAULT 0.0'),
+    ('customer_devices', 'cpc_bw_currency', "TEXT DEFAULT 'TL'"),
+    ('customer_devices', 'cpc_color_price', 'REAL DEFAULT 0.0'),
+    ('customer_devices', 'cpc_color_currency', "TEXT DEFAULT 'TL'"),
+    # Service records location column
+    ('service_records', 'location_id', 'INTEGER'),
+    # CPC invoices location column (customer_id'den location_id'ye geçiş)
+    ('cpc_invoices', 'location_id', 'INTEGER'),
+]
+def _migrate_baseline_schema(conn: sqlite3.Connection, schema: SchemaCache) -> None:
+    """Sürüm 9'a kadarki tüm şemayı oluşturur; eski veritabanlarında eksikleri tamamlar."""
+    # CpcFaturalari tablosunu cpc_invoices olarak yeniden adlandır (tablolar oluşturulmadan önce)
+    if schema.has_table('CpcFaturalari') and not schema.has_table('cpc_invoices'):
+        schema.rename_table(conn, 'CpcFaturalari', 'cpc_invoices')
+        logging.info("Tablo 'CpcFaturalari' -> 'cpc_invoices' olarak yeniden adlandırıldı.")
+    for table, query in TABLE_DEFINITIONS.items():
+        schema.create_table(conn, table, query)
+    # Varsayılan price_settings kaydı
+    conn.execute("""
+        INSERT INTO price_settings (id, settings_json)
+        SELECT 1, '{"default_margin": 20.0, "currency": "TL", "tax_rate": 18.0}'
+        WHERE NOT EXISTS (SELECT 1 FROM price_settings)
+    """)
+    for table, column, column_type in LEGACY_COLUMNS:
+        schema.add_column(conn, table, column, column_type)
+    _migrate_customers_to_locations(conn)
+    for name, table, columns in (
+        ('idx_customers_name', 'customers', 'name'),
+        ('idx_devices_serial', 'devices', 'serial_number'),
+        ('idx_devices_customer', 'devices', 'customer_id'),
+        ('idx_customer_devices_serial', 'customer_devices', 'serial_number'),
+        ('idx_customer_devices_customer', 'customer_devices', 'customer_id'),
+        ('idx_service_device', 'service_records', 'device_id'),
+    ):
+        conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {table}({columns})")
+def _migrate_customers_to_locations(conn: sqlite3.Connection) -> None:
+    """
+    Mevcut müşterilerin her biri için varsayılan lokasyon oluşturur ve
+    lokasyonsuz cihaz/servis kayıtlarını bu lokasyona bağlar. Küme tabanlı
+    sorgularla çalışır; müşteri sayısından bağımsız olarak sabit sayıda ifade.
+    """
+    if conn.execute("SELECT 1 FROM customer_locations LIMIT 1").fetchone():
+        logging.info("Customer locations zaten mevcut, migrasyon atlandı.")
+        return
+    inserted = conn.execute("""
+        INSERT INTO customer_locations (customer_id, location_name, address, phone, email)
+        SELECT id, name || ' - Ana Lokasyon', address, phone, email FROM customers
+    """).rowcount
+    if sqlite3.sqlite_version_info >= (3, 33, 0):
+        conn.execute("""
+            UPDATE customer_devices SET location_id = cl.id
+            FROM customer_locations cl
+            WHERE cl.customer_id = customer_devices.customer_id
+              AND (customer_devices.location_id IS NULL OR customer_devices.location_id = '')
+        """)
+        conn.execute("""
+            UPDATE service_records SET location_id = cl.id
+            FROM customer_devices cd
+            JOIN customer_locations cl ON cl.customer_id = cd.customer_id
+            WHERE cd.id = service_records.device_id
+              AND (service_records.location_id IS NULL OR service_records.location_id = '')
+        """)
+    else:
+        # UPDATE ... FROM desteklemeyen eski SQLite sürümleri için
+        conn.execute("""
+            UPDATE customer_devices SET location_id = (
+                SELECT cl.id FROM customer_locations cl WHERE cl.customer_id = customer_devices.customer_id
+            )
+            WHERE (location_id IS NULL OR location_id = '')
+              AND customer_id IN (SELECT customer_id FROM customer_locations)
+        """)
+        conn.execute("""
+            UPDATE service_records SET location_id = (
+                SELECT cl.id FROM customer_devices cd
+                JOIN customer_locations cl ON cl.customer_id = cd.customer_id
+                WHERE cd.id = service_records.device_id
+            )
+            WHERE (location_id IS NULL OR location_id = '')
+              AND device_id IN (
+                  SELECT cd.id FROM customer_devices cd
+                  JOIN customer_locations cl ON cl.customer_id = cd.customer_id
+              )
+        """)
+    logging.info(f"{inserted} müşteri için lokasyon migrasyonu tamamlandı.")
+# Sık çalışan sorguların filtre/sıralama sütunlarına göre indeksler: (ad, tablo, sütunlar, WHERE)
+WORKLOAD_INDEXES: List[Tuple[str, str, str, Optional[str]]] = [
+    # Sayaç geçmişi ve CPC faturalama: cihaz başına tarih sıralı okumalar
+    ('idx_service_device_date', 'service_records', 'device_id, created_date, id', None),
+    ('idx_service_uninvoiced', 'service_records', 'device_id, created_date', 'is_invoiced = 0'),
+    ('idx_service_status', 'service_records', 'status, created_date', None),
+    ('idx_service_created', 'service_records', 'created_date', None),
+    ('idx_service_location', 'service_records', 'location_id', None),
+    ('idx_invoices_customer_date', 'invoices', 'customer_id, invoice_date', None),
+    ('idx_invoices_date', 'invoices', 'invoice_date', None),
+    ('idx_invoices_type_related', 'invoices', 'invoice_type, related_id', None),
+    ('idx_invoice_items_invoice', 'invoice_items', 'invoice_id', None),
+    ('idx_payments_invoice_date', 'payments', 'invoice_id, payment_date', None),
+    ('idx_payments_date', 'payments', 'payment_date', None),
+    ('idx_stock_movements_item_date', 'stock_movements', 'stock_item_id, movement_date', None),
+    ('idx_quote_items_service', 'quote_items', 'service_record_id', None),
+    ('idx_customer_locations_customer', 'customer_locations', 'customer_id', None),
+    ('idx_customer_devices_location', 'customer_devices', 'location_id', None),
+    ('idx_cpc_invoices_location', 'cpc_invoices', 'location_id, billing_period_end', None),
+]
+def _migrate_workload_indexes(conn: sqlite3.Connection, schema: SchemaCache) -> None:
+    """Gerçek sorgu desenlerine göre indeksleri oluşturur ve istatistikleri günceller."""
+    for name, table, columns, where in WORKLOAD_INDEXES:
+        if not all(schema.has_column(table, c.strip()) for c in columns.split(',')):
+            logging.warning(f"İndeks atlandı, sütun eksik: {name} ({table}: {columns})")
+            continue
+        where_clause = f" WHERE {where}" if where else ""
+        conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {table}({columns}){where_clause}")
+    # idx_service_device_date'in ön eki olduğu için gereksiz
+    conn.execute("DROP INDEX IF EXISTS idx_service_device")
+    # Sorgu planlayıcısının yeni indeksleri doğru seçebilmesi için
+    conn.execute("ANALYZE")
+def _migrate_dashboard_summary(conn: sqlite3.Connection, schema: SchemaCache) -> None:
+    """Gösterge paneli özet tablosunu, tetikleyicilerini ve ilk değerlerini oluşturur."""
+    schema.create_table(conn, 'dashboard_summary', SUMMARY_TABLE_DDL)
+    create_dashboard_triggers(conn)
+    rebuild_dashboard_summary(conn)
+def _migrate_normalize_dates(conn: sqlite3.Connection, schema: SchemaCache) -> None:
+    """
+    Tarih sütunlarını ISO biçimine ('YYYY-MM-DD[ HH:MM[:SS]]') çevirir; böylece
+    sorgular strftime() yerine indekslenebilir aralık koşulları kullanabilir.
+    Güncellemeler gösterge paneli özetini de tetikleyicilerle düzeltir.
+    """
+    conn.create_function('iso_date', 1, normalize_date_text, deterministic=True)
+    for table, column in DATE_COLUMNS:
+        if not schema.has_column(table, column):
+            continue
+        changed = conn.execute(
+            f"UPDATE {table} SET {column} = iso_date({column}) "
+            f"WHERE {column} IS NOT NULL AND {column} != iso_date({column})"
+        ).rowcount
+        if changed:
+            logging.info(f"{table}.{column}: {changed} tarih ISO biçimine çevrildi.")
+    # Sona eren/biten sözleşme listeleri ve CPC kullanım geçmişi aralık sorguları için
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_customers_contract_end ON customers(contract_end_date) WHERE is_contract = 1")
+    if schema.has_table('cpc_usage_history'):
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_cpc_usage_device_date ON cpc_usage_history(device_id, usage_date)")
+def _migrate_search_indexes(conn: sqlite3.Connection, schema: SchemaCache) -> None:
+    """Müşteri, lokasyon, cihaz ve stok aramaları için FTS5 dizinlerini oluşturur ve doldurur."""
+    rebuild_search_indexes(conn)
+def _migrate_meter_readings(conn: sqlite3.Connection, schema: SchemaCache) -> None:
+    """Sayaç okumalarını servis kayıtlarından ayrı, indeksli `meter_readings` tablosuna taşır."""
+    schema.create_table(conn, 'meter_readings', READINGS_TABLE_DDL)
+    create_meter_readings_schema(conn)
+    moved = move_service_readings(conn)
+    logging.info(f"{moved} periyodik sayaç okuması meter_readings tablosuna taşındı.")
+def _migrate_cpc_billing_runs(conn: sqlite3.Connection, schema: SchemaCache) -> None:
+    """Ay sonu toplu CPC faturalama çalıştırmalarını ve PDF kalemlerini izleyen tabloları oluşturur."""
+    schema.create_table(conn, 'cpc_billing_runs', RUNS_TABLE_DDL)
+    schema.create_table(conn, 'cpc_billing_run_items', RUN_ITEMS_TABLE_DDL)
+    conn.execute(RUN_ITEMS_INDEX_DDL)
+def _migrate_exchange_rates(conn: sqlite3.Connection, schema: SchemaCache) -> None:
+    """
+    Geçmiş döviz kurları tablosunu oluşturur. Ayarlarda saklanan son kurlar
+    ilk kayıt olarak eklenir; böylece arşiv eşitlenene kadar da kur bulunur.
+    """
+    schema.create_table(conn, 'exchange_rates', EXCHANGE_RATES_TABLE_DDL)
+    settings = dict(conn.execute(
+        "SELECT key, value FROM settings WHERE key IN ('usd_rate', 'eur_rate', 'last_currency_update')").fetchall())
+    day = (settings.get('last_currency_update') or '')[:10]
+    if not day:
+        return
+    for currency, key in (('USD', 'usd_rate'), ('EUR', 'eur_rate')):
+        try:
+            rate = float(settings.get(key) or 0)
+        except ValueError:
+            continue
+        if rate > 0:
+            conn.execute("INSERT OR IGNORE INTO exchange_rates (date, currency, buying) VALUES (?, ?, ?)", (day, currency, rate))
+# Numaralı migrasyon adımları. Sürüm 9 öncesi şema değişiklikleri tek bir
+# temel adımda toplanmıştır; yeni değişiklikler listenin sonuna eklenir.
+MIGRATIONS: List[Migration] = [
+    Migration(9, 'Temel şema', _migrate_baseline_schema),
+    Migration(10, 'İş yüküne göre indeksler', _migrate_workload_indexes),
+    Migration(11, 'Gösterge paneli özet tablosu', _migrate_dashboard_summary),
+    Migration(12, 'Tarih sütunlarının ISO biçimine çevrilmesi', _migrate_normalize_dates),
+    Migration(13, 'Tam metin arama dizinleri', _migrate_search_indexes),
+    Migration(14, 'Sayaç okumaları zaman serisi tablosu', _migrate_meter_readings),
+    Migration(15, 'Toplu CPC faturalama çalıştırmaları', _migrate_cpc_billing_runs),
+    Migration(16, 'Geçmiş döviz kurları tablosu', _migrate_exchange_rates),
+]
+SCHEMA_VERSION = MIGRATIONS[-1].version
+
+# Başka süreçlerin yazmalarını (PRAGMA data_version) en fazla bu aralıkla kontrol et (saniye)
+DATA_VERSION_CHECK_INTERVAL = 0.5
+
 class DatabaseManager(GeneralQueriesMixin, ServiceQueriesMixin, StockQueriesMixin, BillingQueriesMixin):
     """
     Singleton sınıfı, veritabanı bağlantısını ve işlemlerini yönetir.
     """
     _instance: Optional['DatabaseManager'] = None
-    _connection: Optional[sqlite3.Connection] = None
+    _pool: Optional[ConnectionPool] = None
     _db_path: Optional[str] = None
+    _is_network_db: bool = False
+    _profile_name: Optional[str] = None
+    _query_stats: Optional[QueryStats] = None
+    _query_cache: Optional[QueryCache] = None
+    _data_version: Optional[int] = None
+    _data_version_checked: float = 0.0
+    _tx_depth: int = 0  # Yalnızca yazma kilidi tutulurken okunur/değiştirilir
+    _rate_index: Optional[RateIndex] = None
+    _commit_listeners: List[Callable[[], None]] = []
+    migration_report: List[Dict[str, Any]] = []
     def __new__(cls) -> 'DatabaseManager':
         if cls._instance is None:
             cls._instance = super(DatabaseManager, cls).__new__(cls)
@@ -349,15 +611,18 @@ class DatabaseManager(GeneralQueriesMixin, ServiceQueriesMixin, StockQueriesMixi
         self._settings_manager = SettingsManager()
         self.get_exchange_rates = get_exchange_rates
         self._determine_db_path()
+        self._setup_query_stats()
         self._connect()
-        if self._connection:
+        if self._pool:
             self._setup_database()
             self._setup_auto_backup()
+            set_rate_source(self.get_stored_rates)
     def _determine_db_path(self) -> None:
         """Ayarlardan veritabanı yolunu belirler."""
         network_path = self._settings_manager.get_setting('sqlite_network_path')
         if network_path and os.path.exists(os.path.dirname(network_path)):
             self._db_path = network_path
+            self._is_network_db = True
             logging.info(f"Ağ veritabanı yolu kullanılıyor: {self._db_path}")
         else:
             # get_appdata_path benzeri bir yapı SettingsManager içinde olmalı
@@ -365,10 +630,11 @@ class DatabaseManager(GeneralQueriesMixin, ServiceQueriesMixin, StockQueriesMixi
             app_data_dir = os.getenv('APPDATA') or os.path.expanduser('~')
             proservis_dir = os.path.join(app_data_dir, 'ProServis')
             self._db_path = os.path.join(proservis_dir, "teknik_servis_local.db")
+            self._is_network_db = False
             logging.info(f"Yerel veritabanı yolu kullanılıyor: {self._db_path}")
     def _connect(self) -> None:
-        """Veritabanına bağlanır."""
-        if self._connection:
+        """Veritabanı bağlantı havuzunu kurar ve yazıcı bağlantısını açar."""
+        if self._pool:
             return
         if not self._db_path:
             logging.error("Veritabanı yolu belirlenemedi.")
@@ -380,16 +646,59 @@ class DatabaseManager(GeneralQueriesMixin, ServiceQueriesMixin, StockQueriesMixi
                 logging.info(f"Veritabanı dizini oluşturuldu: {dir_name}")
             except OSError as e:
                 logging.error(f"Veritabanı dizini oluşturulamadı: {e}", exc_info=True)
-                self._connection = None
+                self._pool = None
                 return
+        self._profile_name = resolve_profile_name(
+            self._settings_manager.get_setting('sqlite_performance_profile'), self._is_network_db
+        )
         try:
-            # FIXED: Use context manager to prevent connection leak
-            self._connection = sqlite3.connect(self._db_path, check_same_thread=False)
-            self._connection.row_factory = sqlite3.Row # Sütun adlarıyla erişim için
+            self._query_cache = QueryCache(self._query_cache_size())
+            # Yazıcıda ifade önbelleği kapalı: önbelleğe alınmış bir ifade yeniden
+            # hazırlanmadığında yetkilendirme geri çağrısı tetiklenmez ve yazma kaçırılırdı.
+            pool = ConnectionPool(self._db_path, configure=self._configure_connection,
+                                  writer_cached_statements=0)
+            pool.writer  # Bağlantı hatalarını erken yakalamak için yazıcıyı hemen aç
+            self._pool = pool
             logging.info(f"Veritabanı bağlantısı başarıyla kuruldu: {self._db_path}")
+            logging.info(f"SQLite performans profili: {self._profile_name} {PERFORMANCE_PROFILES[self._profile_name]}")
         except sqlite3.Error as e:
             logging.critical(f"SQLite bağlantı hatası: {e}", exc_info=True)
-            self._connection = None
+            self._pool = None
+    def _configure_connection(self, conn: sqlite3.Connection, is_writer: bool) -> None:
+        """Havuzda açılan her bağlantıya aktif performans profilini uygular."""
+        try:
+            # journal_mode kalıcıdır; yalnızca ilk açılan yazıcı bağlantıda ayarlanır
+            apply_profile(conn, self._profile_name, set_journal_mode=is_writer)
+        except sqlite3.Error as e:
+            logging.error(f"SQLite performans profili uygulanamadı ({self._profile_name}): {e}")
+        if is_writer and self._query_cache is not None:
+            # Yazılan tabloları sorgu önbelleği için izler
+            conn.set_authorizer(self._query_cache.authorizer)
+    @property
+    def performance_profile(self) -> Optional[str]:
+        """Aktif SQLite performans profilinin adını döndürür."""
+        return self._profile_name
+    def apply_performance_profile(self, profile_name: Optional[str] = None) -> bool:
+        """
+        Yazıcı bağlantısına geçici olarak başka bir profilin bağlantı ayarlarını uygular.
+        Örn. toplu içe aktarma öncesi 'bulk-import', sonrasında argümansız çağrılarak
+        ayarlardaki profile geri dönülür. journal_mode çalışma sırasında değiştirilmez.
+        """
+        name = profile_name or self._profile_name
+        if name not in PERFORMANCE_PROFILES:
+            logging.error(f"Bilinmeyen SQLite performans profili: {name}")
+            return False
+        pool = self._get_pool()
+        if not pool:
+            return False
+        try:
+            with pool.write() as conn:
+                apply_profile(conn, name)
+            logging.info(f"Yazıcı bağlantısına '{name}' performans profili uygulandı.")
+            return True
+        except sqlite3.Error as e:
+            logging.error(f"SQLite performans profili uygulanamadı ({name}): {e}")
+            return False
     def _setup_auto_backup(self) -> None:
         """Otomatik yedekleme sistemini başlatır."""
         try:
@@ -428,19 +737,23 @@ class DatabaseManager(GeneralQueriesMixin, ServiceQueriesMixin, StockQueriesMixi
             bool: Başarılı ise True
         """
         try:
-            # Eski bağlantıyı kapat
-            if self._connection:
-                self._connection.close()
-                self._connection = None
+            # Eski bağlantıları kapat
+            if self._pool:
+                self._pool.close_all()
+                self._pool = None
             
             # Yeni yolu ayarla
             self._db_path = new_path
+            self._is_network_db = (
+                new_path.startswith(('\\\\', '//'))
+                or new_path == self._settings_manager.get_setting('sqlite_network_path')
+            )
             logging.info(f"Database path değiştirildi: {new_path}")
             
             # Yeni bağlantı kur
             self._connect()
             
-            if self._connection:
+            if self._pool:
                 # Schema kontrolü
                 self._setup_database()
                 return True
@@ -452,52 +765,370 @@ class DatabaseManager(GeneralQueriesMixin, ServiceQueriesMixin, StockQueriesMixi
             logging.error(f"Database path değiştirme hatası: {e}", exc_info=True)
             return False
     
-    def get_connection(self) -> Optional[sqlite3.Connection]:
-        """Aktif veritabanı bağlantısını döndürür, yoksa yeniden bağlanır."""
-        if self._connection is None:
+    def _get_pool(self) -> Optional[ConnectionPool]:
+        """Bağlantı havuzunu döndürür, yoksa yeniden kurar."""
+        if self._pool is None:
             self._connect()
-        return self._connection
+        return self._pool
+    def get_connection(self) -> Optional[LockedConnection]:
+        """
+        Yazıcı bağlantısını yazma kilidi arkasında döndürür, yoksa yeniden bağlanır.
+
+        Eski kodla uyumluluk için korunmuştur. Her çağrı kilidi alır; açık işlem
+        kalırsa kilit commit/rollback'e kadar bu thread'de tutulur (bkz.
+        `LockedConnection`). Yeni kodda `transaction()`, `execute_query`,
+        `fetch_one` ve `fetch_all` kullanılmalıdır.
+        """
+        pool = self._get_pool()
+        return LockedConnection(pool, self._sync_query_cache) if pool else None
+    def _setup_query_stats(self) -> None:
+        """PROSERVIS_QUERY_STATS=1 veya ayar ile açıldıysa sorgu ölçümünü başlatır."""
+        enabled = (os.getenv('PROSERVIS_QUERY_STATS') == '1'
+                   or str(self._settings_manager.get_setting('query_instrumentation_enabled', False)).lower() in ('1', 'true'))
+        if enabled:
+            self.enable_query_stats()
+    def enable_query_stats(self, slow_threshold_ms: Optional[float] = None,
+                           keep_samples: Optional[bool] = None) -> QueryStats:
+        """
+        Sorgu ölçümünü açar; eşik verilmezse `slow_query_threshold_ms` ayarı kullanılır.
+        `keep_samples` (varsayılan: PROSERVIS_QUERY_SAMPLES=1) indeks danışmanı için
+        son parametre değerlerini bellekte tutar; dosyaya maskelenerek yazılır.
+        """
+        if keep_samples is None:
+            keep_samples = os.getenv('PROSERVIS_QUERY_SAMPLES') == '1'
+        if slow_threshold_ms is None:
+            try:
+                slow_threshold_ms = float(self._settings_manager.get_setting('slow_query_threshold_ms', 100))
+            except (TypeError, ValueError):
+                slow_threshold_ms = 100.0
+        if self._query_stats is None:
+            self._query_stats = QueryStats(slow_threshold_ms, keep_samples=keep_samples)
+            logging.info(f"Sorgu ölçümü etkin (yavaş sorgu eşiği: {slow_threshold_ms:.0f} ms)")
+        else:
+            self._query_stats.slow_threshold_ms = slow_threshold_ms
+            self._query_stats.keep_samples = keep_samples
+        return self._query_stats
+    def disable_query_stats(self) -> None:
+        """Sorgu ölçümünü kapatır ve toplanan istatistikleri bırakır."""
+        self._query_stats = None
+    def get_query_stats(self, limit: int = 20, order_by: str = 'total_ms') -> List[Dict[str, Any]]:
+        """En maliyetli sorgu şablonlarını döndürür. Ölçüm kapalıysa boş liste döner."""
+        return self._query_stats.top(limit, order_by) if self._query_stats else []
+    def dump_query_stats(self, path: Optional[str] = None) -> Optional[str]:
+        """Sorgu istatistiklerini JSON olarak yazar ve dosya yolunu döndürür."""
+        return self._query_stats.dump(path) if self._query_stats else None
+    def advise_indexes(self, limit: int = 50) -> List[Dict[str, Any]]:
+        """
+        Ölçülen sorguları EXPLAIN QUERY PLAN ile inceler; tam tarama ve geçici
+        B-ağacı kullananları toplam süreye göre sıralı döndürür ve günlüğe yazar.
+        """
+        pool = self._get_pool()
+        if not pool or not self._query_stats:
+            return []
+        findings = advise(pool.reader(), self._query_stats.top(limit))
+        if findings:
+            logging.info(f"İndeks danışmanı raporu:\n{format_report(findings)}")
+        return findings
+    def _query_cache_size(self) -> int:
+        try:
+            return int(self._settings_manager.get_setting('query_cache_max_entries', 256))
+        except (TypeError, ValueError):
+            return 256
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """Sorgu önbelleğinin isabet oranı ve kayıt sayılarını döndürür."""
+        return self._query_cache.stats() if self._query_cache else {}
+    def clear_query_cache(self) -> None:
+        """Sorgu önbelleğindeki tüm kayıtları geçersiz kılar."""
+        if self._query_cache:
+            self._query_cache.clear()
+    def _sync_query_cache(self, conn: sqlite3.Connection) -> None:
+        """Yazma kilidi tutulurken çağrılır: commit edilen tabloların sürümlerini artırır."""
+        if self._query_cache is not None and self._tx_depth == 0:
+            self._query_cache.sync(conn.in_transaction)
+        if self._commit_listeners and self._tx_depth == 0 and not conn.in_transaction:
+            for listener in list(self._commit_listeners):
+                try:
+                    listener()
+                except Exception as e:
+                    logging.warning(f"Commit dinleyicisi hatası: {e}")
+    def add_commit_listener(self, listener: Callable[[], None]) -> None:
+        """
+        Yazıcı bağlantısındaki her işlem sonunda çağrılacak fonksiyonu ekler
+        (ör. bulut senkronizasyonunu uyandırmak için). Yazma kilidi tutulurken
+        çağrılır; hızlı olmalı ve veritabanına erişmemelidir.
+        """
+        if listener not in self._commit_listeners:
+            self._commit_listeners = self._commit_listeners + [listener]
+    def remove_commit_listener(self, listener: Callable[[], None]) -> None:
+        self._commit_listeners = [l for l in self._commit_listeners if l != listener]
+    def _refresh_query_cache(self, pool: ConnectionPool) -> None:
+        """
+        Önbellekten okumadan önce çağrılır. Başka bir süreç veritabanını değiştirdiyse
+        (`PRAGMA data_version`) önbelleği boşaltır; get_connection() ile yapılmış eski
+        tarz yazmaların sürümlerini artırır ve gerekirse tablo listesini yeniler.
+        Yazıcı başka bir thread'de meşgulse beklemez; o yazma kendi commit'inde senkronlar.
+        """
+        cache = self._query_cache
+        now = monotonic()
+        if not cache.has_pending() and now - self._data_version_checked < DATA_VERSION_CHECK_INTERVAL:
+            return
+        with pool.try_write() as writer:
+            if writer is None:
+                return
+            self._data_version_checked = now
+            version = writer.execute("PRAGMA data_version").fetchone()[0]
+            if self._data_version is not None and version != self._data_version:
+                cache.clear()
+            self._data_version = version
+            cache.sync(writer.in_transaction)
+            if cache.needs_schema():
+                cache.set_known_tables(row[0] for row in writer.execute(
+                    "SELECT name FROM sqlite_master WHERE type IN ('table', 'view')"))
+    def _cached_query(self, query: str, params: tuple, many: bool) -> Any:
+        pool = self._get_pool()
+        if not pool:
+            return [] if many else None
+        cache = self._query_cache
+        # Yazma kilidini tutan thread commit edilmemiş veriyi görür; önbelleğe yazılmamalı
+        use_cache = cache is not None and not pool.holds_write_lock()
+        if use_cache:
+            self._refresh_query_cache(pool)
+            value = cache.get(query, params)
+            if value is not MISSING:
+                return value
+            versions = cache.snapshot(query)
+        try:
+            started = perf_counter()
+            conn = pool.reader()
+            cursor = conn.execute(query, params)
+            try:
+                value = cursor.fetchall() if many else cursor.fetchone()
+            finally:
+                cursor.close()
+        except sqlite3.Error as e:
+            logging.error(f"Önbellekli sorgu hatası: {e}\nSorgu: {query}\nParametreler: {params}", exc_info=True)
+            return [] if many else None  # Hatalı sonuç önbelleğe alınmaz
+        if self._query_stats:
+            self._record_query(conn, query, params, len(value) if many else int(value is not None), started)
+        if use_cache:
+            cache.put(query, params, value, versions)
+        return value
+    def fetch_all_cached(self, query: str, params: tuple = ()) -> List[sqlite3.Row]:
+        """
+        `fetch_all`'un önbellekli hali. Müşteri/teknisyen listeleri gibi küçük ve
+        sık okunan sorgular içindir; sonuç, sorgudaki tablolardan birine yazılana
+        kadar önbellekten döner.
+        """
+        return list(self._cached_query(query, params, many=True))
+    def fetch_one_cached(self, query: str, params: tuple = ()) -> Optional[sqlite3.Row]:
+        """`fetch_one`'ın önbellekli hali (bkz. `fetch_all_cached`)."""
+        return self._cached_query(query, params, many=False)
+    def _record_query(self, conn: sqlite3.Connection, query: str, params: tuple, rows: int, started: float) -> None:
+        """Ölçüm açıksa sorgu süresini kaydeder; yavaş sorgular için planı aynı bağlantıdan alır."""
+        def explain() -> List[str]:
+            return [str(tuple(r)) for r in conn.execute(f"EXPLAIN QUERY PLAN {query}", params).fetchall()]
+        self._query_stats.record(query, params, rows, perf_counter() - started, explain)
     def close(self) -> None:
-        """Veritabanı bağlantısını kapatır."""
-        if self._connection:
-            self._connection.close()
-            self._connection = None
+        """Havuzdaki tüm veritabanı bağlantılarını kapatır."""
+        if self._query_stats:
+            for row in self._query_stats.top(5):
+                logging.info(f"[SORGU] {row['calls']} çağrı, toplam {row['total_ms']:.1f} ms, en fazla {row['max_ms']:.1f} ms: {row['sql']}")
+        if self._query_cache:
+            stats = self._query_cache.stats()
+            logging.info(f"[ÖNBELLEK] isabet oranı {stats['hit_rate']:.0%} ({stats['hits']} isabet, {stats['misses']} ıska, {stats['invalidations']} geçersizleştirme)")
+        if self._pool:
+            self._pool.close_all()
+            self._pool = None
             logging.info("Veritabanı bağlantısı kapatıldı.")
-    def execute_query(self, query: str, params: tuple = ()) -> Optional[int]:
-        """INSERT, UPDATE, DELETE gibi veri değiştiren sorguları çalıştırır."""
-        conn = self.get_connection()
-        if not conn: return None
-        try:
-            cursor = conn.cursor()
-            cursor.execute(query, params)
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """
+        Yazıcı bağlantısında bir işlem açar; blok hatasız biterse commit, hata
+        olursa rollback yapar ve hatayı yeniden fırlatır.
+
+        İç içe kullanılabilir: içteki bloklar SAVEPOINT olarak açılır ve yalnızca
+        kendi değişikliklerini geri alır. İşlem içindeki `execute_query` ve
+        `execute_many` çağrıları commit yapmaz, hata durumunda istisna fırlatır.
+
+        Örnek:
+            with db.transaction():
+                for item in items:
+                    db.execute_query("INSERT ...", (...))
+        """
+        pool = self._get_pool()
+        if not pool:
+            raise sqlite3.OperationalError("Veritabanı bağlantısı kurulamadı.")
+        with pool.write() as conn:
+            depth = self._tx_depth
+            savepoint = f"sp_{depth}"
+            if depth == 0:
+                self._commit_left_open(conn, "transaction()")
+                conn.execute("BEGIN")
+            else:
+                conn.execute(f"SAVEPOINT {savepoint}")
+            self._tx_depth = depth + 1
+            try:
+                yield conn
+            except BaseException:
+                if depth == 0:
+                    conn.rollback()
+                else:
+                    conn.execute(f"ROLLBACK TO {savepoint}")
+                    conn.execute(f"RELEASE {savepoint}")
+                raise
+            else:
+                if depth == 0:
+                    conn.commit()
+                else:
+                    conn.execute(f"RELEASE {savepoint}")
+            finally:
+                self._tx_depth = depth
+                self._sync_query_cache(conn)
+                if depth == 0:
+                    pool.release_held_write()
+    @staticmethod
+    def _commit_left_open(conn: sqlite3.Connection, caller: str) -> None:
+        """
+        Bu thread'in get_connection() ile açıp commit etmediği işlemi uyararak commit eder;
+        başka thread'in işlemi olamaz (o thread kilidi bırakmamış olurdu). `transaction()`
+        ve `execute_query` aynı davranır, yarım kalan değişiklikler sessizce kaybolmaz.
+        """
+        if conn.in_transaction:
+            logging.warning(f"{caller}: get_connection() ile açılıp commit edilmemiş işlem commit edildi.")
             conn.commit()
-            return cursor.lastrowid
-        except sqlite3.Error as e:
-            logging.error(f"Sorgu hatası: {e}\nSorgu: {query}\nParametreler: {params}", exc_info=True)
-            conn.rollback()
-            return None
+    @property
+    def in_transaction(self) -> bool:
+        """Çağıran iş parçacığı `transaction()` bloğu içinde mi?"""
+        return bool(self._pool and self._pool.holds_write_lock() and self._tx_depth)
+    def execute_query(self, query: str, params: tuple = ()) -> Optional[int]:
+        """INSERT, UPDATE, DELETE gibi veri değiştiren sorguları yazıcı bağlantısında çalıştırır."""
+        pool = self._get_pool()
+        if not pool: return None
+        with pool.write() as conn:
+            nested = self._tx_depth > 0
+            try:
+                if not nested:
+                    self._commit_left_open(conn, "execute_query")
+                started = perf_counter()
+                cursor = conn.cursor()
+                cursor.execute(query, params)
+                if not nested:
+                    conn.commit()
+                if self._query_stats:
+                    self._record_query(conn, query, params, cursor.rowcount, started)
+                return cursor.lastrowid
+            except sqlite3.Error as e:
+                logging.error(f"Sorgu hatası: {e}\nSorgu: {query}\nParametreler: {params}", exc_info=True)
+                if nested:
+                    raise  # Geri alma kararı çevreleyen transaction() bloğuna aittir
+                conn.rollback()
+                return None
+            finally:
+                self._sync_query_cache(conn)
+                if not nested:
+                    pool.release_held_write()
+    def execute_many(self, query: str, rows: Iterable[Sequence[Any]]) -> Optional[int]:
+        """
+        Aynı sorguyu birden çok parametre satırıyla tek bir işlem içinde çalıştırır.
+
+        Returns:
+            Etkilenen satır sayısı; hata durumunda None (transaction() içinde
+            çağrıldıysa hata fırlatılır).
+        """
+        pool = self._get_pool()
+        if not pool: return None
+        with pool.write():
+            nested = self._tx_depth > 0
+            try:
+                with self.transaction() as conn:
+                    started = perf_counter()
+                    cursor = conn.executemany(query, rows)
+                    if self._query_stats:
+                        self._query_stats.record(query, (), cursor.rowcount, perf_counter() - started)
+                    return cursor.rowcount
+            except sqlite3.Error as e:
+                logging.error(f"Toplu sorgu hatası: {e}\nSorgu: {query}", exc_info=True)
+                if nested:
+                    raise
+                return None
     def fetch_one(self, query: str, params: tuple = ()) -> Optional[sqlite3.Row]:
-        """Tek bir satır sonuç döndüren sorguları çalıştırır."""
-        conn = self.get_connection()
-        if not conn: return None
+        """Tek bir satır sonuç döndüren sorguları thread'e ait okuma bağlantısında çalıştırır."""
+        pool = self._get_pool()
+        if not pool: return None
         try:
-            cursor = conn.cursor()
-            cursor.execute(query, params)
-            return cursor.fetchone()
+            started = perf_counter()
+            conn = pool.reader()
+            cursor = conn.execute(query, params)
+            try:
+                row = cursor.fetchone()
+            finally:
+                cursor.close()  # Okuma kilidini hemen bırak
+            if self._query_stats:
+                self._record_query(conn, query, params, 1 if row is not None else 0, started)
+            return row
         except sqlite3.Error as e:
             logging.error(f"Fetch one hatası: {e}\nSorgu: {query}\nParametreler: {params}", exc_info=True)
             return None
-    def fetch_all(self, query: str, params: tuple = ()) -> List[sqlite3.Row]:
-        """Birden çok satır sonuç döndüren sorguları çalıştırır."""
-        conn = self.get_connection()
-        if not conn: return []
+    def fetch_all(self, query: str, params: tuple = (), record_type: Optional[Type[Record]] = None) -> List[sqlite3.Row]:
+        """
+        Birden çok satır sonuç döndüren sorguları thread'e ait okuma bağlantısında çalıştırır.
+        `record_type` verilirse satırlar `sqlite3.Row` yerine o kayıt tipinde döner.
+        """
+        pool = self._get_pool()
+        if not pool: return []
         try:
+            started = perf_counter()
+            conn = pool.reader()
             cursor = conn.cursor()
+            if record_type is not None:
+                cursor.row_factory = record_factory(record_type)
             cursor.execute(query, params)
-            return cursor.fetchall()
+            try:
+                rows = cursor.fetchall()
+            finally:
+                cursor.close()
+            if self._query_stats:
+                self._record_query(conn, query, params, len(rows), started)
+            return rows
         except sqlite3.Error as e:
             logging.error(f"Fetch all hatası: {e}\nSorgu: {query}\nParametreler: {params}", exc_info=True)
             return []
+    def iter_query(self, query: str, params: tuple = (), batch: int = 500,
+                   record_type: Optional[Type[Record]] = None) -> Iterator[sqlite3.Row]:
+        """
+        Sonuçları `fetchmany` ile `batch` satırlık parçalar halinde okuyan üreteç.
+
+        Dışa aktarma ve raporlar gibi büyük sonuç kümelerinde tüm satırları
+        belleğe almadan işlemek için kullanılır. `record_type` `fetch_all`'daki
+        gibidir. `fetch_all`'dan farklı olarak
+        hata durumunda boş sonuç yerine istisna fırlatır; yarım kalmış bir
+        dışa aktarma sessizce eksik dosya üretmemelidir.
+        """
+        pool = self._get_pool()
+        if not pool:
+            raise sqlite3.OperationalError("Veritabanı bağlantısı kurulamadı.")
+        started = perf_counter()
+        conn = pool.reader()
+        count = 0
+        try:
+            cursor = conn.cursor()
+            if record_type is not None:
+                cursor.row_factory = record_factory(record_type)
+            cursor.execute(query, params)
+        except sqlite3.Error as e:
+            logging.error(f"Iter query hatası: {e}\nSorgu: {query}\nParametreler: {params}", exc_info=True)
+            raise
+        try:
+            while True:
+                rows = cursor.fetchmany(batch)
+                if not rows:
+                    break
+                count += len(rows)
+                yield from rows
+        finally:
+            cursor.close()
+            if self._query_stats:
+                self._record_query(conn, query, params, count, started)
     def _get_user_version(self) -> int:
         """Veritaban?? user_version de??erini d??nd??r??r."""
         conn = self.get_connection()
@@ -509,159 +1140,18 @@ class DatabaseManager(GeneralQueriesMixin, ServiceQueriesMixin, StockQueriesMixi
         except Exception as e:
             logging.error(f"user_version okunamad??: {e}")
             return 0
-    def _set_user_version(self, version: int) -> None:
-        """Veritaban?? user_version de??erini g??nceller."""
-        conn = self.get_connection()
-        if not conn:
-            return
-        try:
-            conn.execute(f"PRAGMA user_version = {int(version)}")
-            conn.commit()
-        except Exception as e:
-            logging.error(f"user_version ayarlanamad??: {e}")
-
     def _setup_database(self) -> None:
         """Veritabanı tablolarını ve ilk verileri kurar/günceller."""
         self._run_migrations()
         self._create_initial_admin_user()
     def _run_migrations(self) -> None:
-        """Veritabanı şemasını oluşturur ve güncellemeleri uygular."""
-        conn = self.get_connection()
-        if not conn: return
+        """Bekleyen numaralı migrasyon adımlarını uygular ve süre raporunu saklar."""
+        if not self._get_pool(): return
 
         current_version = self._get_user_version()
         if current_version >= SCHEMA_VERSION:
             return
-        
-        # Tabloları oluştur
-        for table, query in TABLE_DEFINITIONS.items():
-            self.execute_query(query)
-        
-        # Varsay??lan price_settings kayd??
-        try:
-            row = self.fetch_one("SELECT COUNT(*) FROM price_settings")
-            if row and row[0] == 0:
-                default_settings = '{"default_margin": 20.0, "currency": "TL", "tax_rate": 18.0}'
-                self.execute_query("INSERT INTO price_settings (id, settings_json) VALUES (1, ?)", (default_settings,))
-        except Exception as e:
-            logging.warning(f"price_settings varsay??lan kayd?? eklenemedi: {e}")
-
-        # --- STOK UYUMLULUK SÜTUNU (YENİ EKLENEN) ---
-        self._add_column_if_not_exists('stock_items', 'compatible_models', 'TEXT')
-        # --------------------------------------------
-
-        # Diğer Migrasyonlar
-        self._add_column_if_not_exists('customers', 'tax_id', 'TEXT')
-        self._add_column_if_not_exists('customers', 'tax_office', 'TEXT')
-        self._add_column_if_not_exists('customers', 'is_contract', 'INTEGER DEFAULT 0')
-        self._add_column_if_not_exists('customers', 'contract_start_date', 'TEXT')
-        self._add_column_if_not_exists('customers', 'contract_end_date', 'TEXT')
-        self._add_column_if_not_exists('customers', 'contract_pdf_path', 'TEXT')
-        self._add_column_if_not_exists('customers', 'contract_period', "TEXT DEFAULT 'Aylik'")
-        self._add_column_if_not_exists('customers', 'contract_price', 'REAL DEFAULT 0.0')
-        self._add_column_if_not_exists('customers', 'contract_currency', "TEXT DEFAULT 'TL'")
-        self._add_column_if_not_exists('quote_items', 'total_tl', 'REAL DEFAULT 0.0')
-        self._add_column_if_not_exists('stock_items', 'supplier', 'TEXT')
-        self._add_column_if_not_exists('stock_items', 'location', 'TEXT')
-        self._add_column_if_not_exists('stock_items', 'min_stock_level', 'INTEGER DEFAULT 0')
-        self._add_column_if_not_exists('stock_items', 'color_type', "TEXT DEFAULT 'Siyah-Beyaz'")
-        self._add_column_if_not_exists('devices', 'color_type', "TEXT DEFAULT 'Siyah-Beyaz'")
-        self._add_column_if_not_exists('devices', 'rental_fee', 'REAL DEFAULT 0.0')
-        self._add_column_if_not_exists('devices', 'rental_currency', "TEXT DEFAULT 'TL'")
-        self._add_column_if_not_exists('devices', 'stock_id', 'INTEGER')
-        self._add_column_if_not_exists('service_records', 'related_invoice_id', 'INTEGER')
-        self._add_column_if_not_exists('service_records', 'description', 'TEXT')
-        self._add_column_if_not_exists('service_records', 'technician_id', 'INTEGER')
-        self._add_column_if_not_exists('service_records', 'assigned_user_id', 'INTEGER')
-        self._add_column_if_not_exists('service_records', 'completed_date', 'TEXT')
-        self._add_column_if_not_exists('service_records', 'technician_report', 'TEXT')
-        self._add_column_if_not_exists('service_records', 'service_form_pdf_path', 'TEXT')
-        self._add_column_if_not_exists('invoices', 'notes', 'TEXT')
-        self._add_column_if_not_exists('invoices', 'related_id', 'INTEGER')
-        self._add_column_if_not_exists('invoices', 'items_json', 'TEXT')
-        self._add_column_if_not_exists('invoices', 'exchange_rate', 'REAL DEFAULT 1.0')
-        self._add_column_if_not_exists('invoice_items', 'stock_item_id', 'INTEGER')
-        self._add_column_if_not_exists('invoice_items', 'tax_rate', 'REAL DEFAULT 0')
-        self._add_column_if_not_exists('invoice_items', 'tax_amount', 'REAL DEFAULT 0')
-        self._add_column_if_not_exists('invoice_items', 'cost_at_sale', 'REAL DEFAULT 0')
-        self._add_column_if_not_exists('invoice_items', 'cost_currency', "TEXT DEFAULT 'TL'")
-        self._add_column_if_not_exists('cpc_invoices', 'is_invoiced', 'INTEGER DEFAULT 0')
-        self._add_column_if_not_exists('pending_sales', 'sale_data_json', 'TEXT')
-        self._add_column_if_not_exists('pending_sales', 'invoice_id', 'INTEGER')
-        
-        # Customer devices location and free columns
-        self._add_column_if_not_exists('customer_devices', 'location_id', 'INTEGER')
-        self._add_column_if_not_exists('customer_devices', 'is_free', 'INTEGER DEFAULT 0')
-        
-        # Add rental fee columns for customer devices
-        self._add_column_if_not_exists('customer_devices', 'rental_fee', 'REAL DEFAULT 0.0')
-        self._add_column_if_not_exists('customer_devices', 'rental_currency', "TEXT DEFAULT 'TL'")
-        
-        # Add CPC price columns for customer devices
-        self._add_column_if_not_exists('customer_devices', 'cpc_bw_price', 'REAL DEFAULT 0.0')
-        self._add_column_if_not_exists('customer_devices', 'cpc_bw_currency', "TEXT DEFAULT 'TL'")
-        self._add_column_if_not_exists('customer_devices', 'cpc_color_price', 'REAL DEFAULT 0.0')
-        self._add_column_if_not_exists('customer_devices', 'cpc_color_currency', "TEXT DEFAULT 'TL'")
-        
-        # Service records location column
-        self._add_column_if_not_exists('service_records', 'location_id', 'INTEGER')
-        
-        # CPC invoices location column (customer_id'den location_id'ye geçiş)
-        if not self._column_exists('cpc_invoices', 'location_id'):
-            # Önce location_id sütunu ekle
-            self._add_column_if_not_exists('cpc_invoices', 'location_id', 'INTEGER')
-        
-        # Mevcut müşterileri customer_locations'a taşı
-        self._migrate_customers_to_locations()
-        
-        # CpcFaturalari tablosunu cpc_invoices olarak yeniden adlandır
-        if self._table_exists('CpcFaturalari') and not self._table_exists('cpc_invoices'):
-            self.execute_query("ALTER TABLE CpcFaturalari RENAME TO cpc_invoices")
-            logging.info("Tablo 'CpcFaturalari' -> 'cpc_invoices' olarak yeniden adlandırıldı.")
-
-        if not self._create_performance_indexes():
-            logging.warning('Index olusturma basarisiz - performans dusuk olabilir')
-
-        self._set_user_version(SCHEMA_VERSION)
-
-    def _create_performance_indexes(self) -> bool:
-        """Performans icin index olusturur."""
-        try:
-            conn = self.get_connection()
-            if not conn:
-                return False
-            cursor = conn.cursor()
-
-            cursor.execute("""
-                CREATE INDEX IF NOT EXISTS idx_customers_name 
-                ON customers(name)
-            """)
-            cursor.execute("""
-                CREATE INDEX IF NOT EXISTS idx_devices_serial 
-                ON devices(serial_number)
-            """)
-            cursor.execute("""
-                CREATE INDEX IF NOT EXISTS idx_devices_customer 
-                ON devices(customer_id)
-            """)
-            cursor.execute("""
-                CREATE INDEX IF NOT EXISTS idx_customer_devices_serial 
-                ON customer_devices(serial_number)
-            """)
-            cursor.execute("""
-                CREATE INDEX IF NOT EXISTS idx_customer_devices_customer 
-                ON customer_devices(customer_id)
-            """)
-            cursor.execute("""
-                CREATE INDEX IF NOT EXISTS idx_service_device 
-                ON service_records(device_id)
-            """)
-
-            conn.commit()
-            return True
-        except Exception as e:
-            logging.error(f"Index olusturma hatasi: {e}")
-            return False
+        self.migration_report = run_migrations(self.transaction, MIGRATIONS, current_version)
 
     def _table_exists(self, table_name: str) -> bool:
         """Bir tablonun veritabanında olup olmadığını kontrol eder."""
@@ -678,57 +1168,13 @@ class DatabaseManager(GeneralQueriesMixin, ServiceQueriesMixin, StockQueriesMixi
     def _add_column_if_not_exists(self, table_name: str, column_name: str, column_type: str) -> None:
         """Bir tabloya, eğer mevcut değilse, yeni bir sütun ekler."""
         try:
-            res = self.fetch_one(f"PRAGMA table_info({table_name})")
-            if res: # fetch_one None dönebilir
-                columns = [info['name'] for info in self.fetch_all(f"PRAGMA table_info({table_name})")]
+            columns = [info['name'] for info in self.fetch_all(f"PRAGMA table_info({table_name})")]
+            if columns:  # Tablo yoksa boş liste döner
                 if column_name not in columns:
                     self.execute_query(f"ALTER TABLE {table_name} ADD COLUMN {column_name} {column_type}")
                     logging.info(f"'{table_name}' tablosuna '{column_name}' sütunu eklendi.")
         except Exception as e:
             logging.error(f"Sütun eklenirken hata oluştu ({table_name}.{column_name}): {e}", exc_info=True)
-    def _migrate_customers_to_locations(self) -> None:
-        """Mevcut müşteri verilerini customer_locations'a taşır."""
-        try:
-            # customer_locations tablosunda hiç kayıt var mı kontrol et
-            existing_locations = self.fetch_one("SELECT COUNT(*) as count FROM customer_locations")
-            if existing_locations and existing_locations['count'] > 0:
-                logging.info("Customer locations zaten mevcut, migrasyon atlandı.")
-                return
-            
-            # Tüm müşterileri al
-            customers = self.fetch_all("SELECT id, name, phone, email, address FROM customers")
-            
-            for customer in customers:
-                # Her müşteri için varsayılan lokasyon oluştur
-                location_name = f"{customer['name']} - Ana Lokasyon"
-                self.execute_query("""
-                    INSERT INTO customer_locations (customer_id, location_name, address, phone, email)
-                    VALUES (?, ?, ?, ?, ?)
-                """, (customer['id'], location_name, customer['address'], customer['phone'], customer['email']))
-                
-                # customer_devices tablosundaki customer_id'yi location_id'ye güncelle
-                location_id = self.fetch_one("SELECT id FROM customer_locations WHERE customer_id = ? AND location_name = ?", 
-                                           (customer['id'], location_name))
-                if location_id:
-                    self.execute_query("""
-                        UPDATE customer_devices 
-                        SET location_id = ? 
-                        WHERE customer_id = ? AND (location_id IS NULL OR location_id = '')
-                    """, (location_id['id'], customer['id']))
-                    
-                    # service_records tablosundaki location_id'yi güncelle
-                    self.execute_query("""
-                        UPDATE service_records 
-                        SET location_id = ? 
-                        WHERE device_id IN (
-                            SELECT id FROM customer_devices WHERE customer_id = ?
-                        ) AND (location_id IS NULL OR location_id = '')
-                    """, (location_id['id'], customer['id']))
-            
-            logging.info(f"{len(customers)} müşteri için lokasyon migrasyonu tamamlandı.")
-            
-        except Exception as e:
-            logging.error(f"Müşteri lokasyon migrasyonu hatası: {e}", exc_info=True)
     def _create_initial_admin_user(self) -> None:
         """Varsayılan 'admin' kullanıcısını, eğer mevcut değilse, oluşturur."""
         if not self.fetch_one("SELECT id FROM users WHERE username = 'admin'"):
@@ -770,22 +1216,42 @@ class DatabaseManager(GeneralQueriesMixin, ServiceQueriesMixin, StockQueriesMixi
             Any: Ayar değeri veya varsayılan değer
         """
         try:
-            result = self.fetch_one("SELECT value FROM settings WHERE key = ?", (key,))
+            result = self.fetch_one_cached("SELECT value FROM settings WHERE key = ?", (key,))
             return result[0] if result else default
         except Exception as e:
             logging.error(f"Ayar okunurken hata ({key}): {e}", exc_info=True)
             return default
     
+    def iter_customers_with_devices(self) -> Iterator[Dict[str, Any]]:
+        """
+        Müşterileri, 'devices' anahtarında `Device` kayıt listeleriyle birlikte tek tek üretir.
+        Müşteriler ve cihazlar iki sıralı sorgudan birleştirilerek okunur; bellekte
+        aynı anda yalnızca bir müşterinin cihazları tutulur.
+        """
+        devices = self.iter_query(f"""
+            SELECT cd.customer_id AS owner_id, {CUSTOMER_DEVICE_COLUMNS}
+            FROM customer_devices cd
+            LEFT JOIN customer_locations cl ON cd.location_id = cl.id
+            WHERE cd.customer_id IS NOT NULL
+            ORDER BY cd.customer_id, cl.location_name, cd.device_model
+        """)
+        pending = next(devices, None)
+        device_type = Device.with_fields(pending.keys()[1:]) if pending is not None else Device
+        for cust in self.iter_query("SELECT * FROM customers ORDER BY id"):
+            cust_dict = dict(cust)
+            cust_devices = []
+            while pending is not None and pending['owner_id'] < cust_dict['id']:
+                pending = next(devices, None)  # Müşterisi silinmiş cihazlar
+            while pending is not None and pending['owner_id'] == cust_dict['id']:
+                cust_devices.append(device_type(tuple(pending)[1:]))
+                pending = next(devices, None)
+            cust_dict["devices"] = cust_devices
+            yield cust_dict
+    
     def get_all_customers_and_devices(self) -> Dict[str, list]:
         """Tüm müşterileri ve her müşterinin cihazlarını döndürür."""
-        customers = self.fetch_all("SELECT * FROM customers")
-        customers_list = []
-        for cust in customers:
-            cust_dict = dict(cust)
-            cust_dict["devices"] = self.get_customer_devices(cust_dict["id"])
-            customers_list.append(cust_dict)
         return {
-            "customers": customers_list
+            "customers": list(self.iter_customers_with_devices())
         }
     
     def update_customer_details(self, customer_id: int, details: dict) -> None:
@@ -0,0 +1,415 @@
+"""
+Kopya başı (CPC) faturalama motoru.
+
+Bir veya birden çok müşterinin CPC cihazları için dönem başı/sonu sayaçlarını,
+tüketimi ve sayaç sıfırlamalarını `meter_readings` üzerinde tek bir pencereli
+SQL sorgusuyla cihaz başına bir satır olarak hesaplar; para birimi kodları da
+aynı sorguda normalleştirilir. Sonuç sütun bazlı
+(`CpcBilling`) döner: fiyat × tüketim ve kur çevrimi sütunlar üzerinde tek
+seferde yapılır (NumPy varsa vektörel, yoksa düz Python ile).
+
+Sayaç sıfırlama: bir okuma bir öncekinden küçükse cihazın sayacı sıfırlanmış
+(ör. anakart değişimi) kabul edilir ve tüketim sıfırdan itibaren sayılır.
+
+Fatura kalemleri (`invoice_lines`) ve PDF kalemleri (`pdf_items`) hem tek
+müşterilik faturalamada hem de ay sonu toplu faturalamada aynı fonksiyonlarla
+üretilir. Toplu çalıştırmaların durumu `cpc_billing_runs` ve
+`cpc_billing_run_items` tablolarında tutulur; PDF üretimi yarıda kalırsa
+bekleyen kalemlerden devam edilir.
+"""
+
+import json
+import logging
+from datetime import datetime
+from decimal import Decimal
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    np = None
+    NUMPY_AVAILABLE = False
+
+from ..currency_converter import require_rate
+
+CURRENCY_ALIASES = {
+    'EUR': ('EURO', 'EUR', 'E', '€'),
+    'USD': ('DOLAR', 'USD', 'US$', '$', 'DOLLAR'),
+}
+
+
+def normalize_currency(code: Optional[str]) -> str:
+    """Para birimi yazımlarını kur tablosundaki kodlara çevirir (EUR, USD, TL)."""
+    value = str(code or '').strip().upper()
+    for target, aliases in CURRENCY_ALIASES.items():
+        if value in aliases:
+            return target
+    return 'TL'
+
+
+def currency_sql(column: str) -> str:
+    """`normalize_currency` ile aynı eşlemeyi yapan SQL ifadesi."""
+    cases = ' '.join(
+        f"WHEN UPPER(TRIM({column})) IN ({', '.join(repr(a) for a in aliases)}) THEN '{target}'"
+        for target, aliases in CURRENCY_ALIASES.items()
+    )
+    return f"CASE {cases} ELSE 'TL' END"
+
+
+def _usage(counter: str, previous: str) -> str:
+    return f"CASE WHEN {counter} IS NULL THEN 0 WHEN {counter} >= {previous} THEN {counter} - {previous} ELSE {counter} END"
+
+
+# Pencere yalnızca dönem içindeki okumalar ile her cihazın dönemden önceki son
+# okuması üzerinde çalışır; ikisi de (device_id, reading_ts) indeksinden aralık
+# ve tek satırlık aramayla okunur, cihazın tüm geçmişi taranmaz.
+# {devices}: cihaz ID'leri için yer tutucular (iki kez kullanılır)
+# {invoiced}: faturalanmış okumaları dışarıda bırakan koşul veya boş metin
+# Parametreler: cihaz ID'leri, dönem başı, dönem sonu, dönem başı, cihaz ID'leri, dönem başı
+BILLING_QUERY = f"""
+    WITH span AS (
+        SELECT id, device_id, reading_ts, bw_counter, color_counter, is_invoiced
+        FROM meter_readings
+        WHERE device_id IN ({{devices}}) AND reading_ts >= ? AND reading_ts < ?
+        UNION ALL
+        SELECT id, device_id, reading_ts, bw_counter, color_counter, is_invoiced
+        FROM meter_readings
+        WHERE id IN (
+            SELECT (SELECT mr.id FROM meter_readings mr
+                    WHERE mr.device_id = cd.id AND mr.reading_ts < ?
+                    ORDER BY mr.reading_ts DESC, mr.id DESC LIMIT 1)
+            FROM customer_devices cd WHERE cd.id IN ({{devices}})
+        )
+    ),
+    steps AS (
+        SELECT
+            id, device_id, reading_ts, bw_counter, color_counter, is_invoiced,
+            LAG(reading_ts) OVER w AS prev_reading_ts,
+            COALESCE(LAG(bw_counter) OVER w, 0) AS prev_bw_counter,
+            COALESCE(LAG(color_counter) OVER w, 0) AS prev_color_counter
+        FROM span
+        WINDOW w AS (PARTITION BY device_id ORDER BY reading_ts, id)
+    ),
+    period AS (
+        SELECT
+            id, device_id, reading_ts, bw_counter, color_counter, prev_bw_counter, prev_color_counter,
+            FIRST_VALUE(prev_reading_ts) OVER w AS start_ts,
+            FIRST_VALUE(prev_bw_counter) OVER w AS start_bw,
+            FIRST_VALUE(prev_color_counter) OVER w AS start_color,
+            LEAD(id) OVER w IS NULL AS is_last
+        FROM steps
+        WHERE reading_ts >= ? {{invoiced}}
+        WINDOW w AS (PARTITION BY device_id ORDER BY reading_ts, id)
+    )
+    SELECT
+        cd.customer_id,
+        cd.id AS device_id,
+        cd.device_model AS model,
+        cd.serial_number,
+        cd.color_type,
+        MAX(p.start_ts) AS start_ts,
+        MAX(p.reading_ts) AS end_ts,
+        MAX(p.start_bw) AS start_bw,
+        MAX(CASE WHEN p.is_last THEN p.bw_counter END) AS end_bw,
+        MAX(p.start_color) AS start_color,
+        MAX(CASE WHEN p.is_last THEN p.color_counter END) AS end_color,
+        SUM({_usage('p.bw_counter', 'p.prev_bw_counter')}) AS bw_usage,
+        CASE WHEN cd.color_type = 'Renkli'
+             THEN SUM({_usage('p.color_counter', 'p.prev_color_counter')}) ELSE 0 END AS color_usage,
+        SUM(p.bw_counter < p.prev_bw_counter) AS bw_resets,
+        CASE WHEN cd.color_type = 'Renkli' THEN SUM(p.color_counter < p.prev_color_counter) ELSE 0 END AS color_resets,
+        COALESCE(cd.cpc_bw_price, 0) AS cpc_bw_price,
+        COALESCE(cd.cpc_color_price, 0) AS cpc_color_price,
+        {currency_sql('cd.cpc_bw_currency')} AS cpc_bw_currency,
+        {currency_sql('cd.cpc_color_currency')} AS cpc_color_currency,
+        GROUP_CONCAT(p.id) AS reading_ids
+    FROM period p
+    JOIN customer_devices cd ON cd.id = p.device_id
+    GROUP BY p.device_id
+    HAVING bw_usage > 0 OR color_usage > 0
+    ORDER BY cd.customer_id, cd.device_model, cd.id
+"""
+
+BILLING_COLUMNS = (
+    'customer_id', 'device_id', 'model', 'serial_number', 'color_type',
+    'start_ts', 'end_ts', 'start_bw', 'end_bw', 'start_color', 'end_color',
+    'bw_usage', 'color_usage', 'bw_resets', 'color_resets',
+    'cpc_bw_price', 'cpc_color_price', 'cpc_bw_currency', 'cpc_color_currency', 'reading_ids',
+)
+
+DEVICES_QUERY = "SELECT id FROM customer_devices WHERE customer_id IN ({}) AND is_cpc = 1 AND is_free = 0"
+
+
+class CpcBilling:
+    """
+    Cihaz başına bir satırlık, sütun bazlı CPC faturalama sonucu.
+
+    `billing['bw_usage']` bir sütunu (NumPy dizisi veya liste), `billing.rows()`
+    satırları sözlük olarak verir. Tutar sütunları `apply_rates()` çağrılınca
+    eklenir.
+    """
+
+    __slots__ = ('columns', '_length')
+
+    def __init__(self, rows: Sequence[Sequence[Any]]):
+        values = list(zip(*rows)) if rows else [()] * len(BILLING_COLUMNS)
+        self.columns: Dict[str, Any] = {name: list(column) for name, column in zip(BILLING_COLUMNS, values)}
+        self.columns['reading_ids'] = [[int(i) for i in str(ids).split(',')] if ids else []
+                                       for ids in self.columns['reading_ids']]
+        self._length = len(rows)
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __getitem__(self, name: str) -> Any:
+        return self.columns[name]
+
+    def apply_rates(self, rates: Mapping[str, Any]) -> 'CpcBilling':
+        """
+        Fiyat × tüketim ve TL çevrimini tüm satırlar için tek seferde hesaplar.
+
+        Raises:
+            MissingRateError: Kullanılan bir para biriminin kuru `rates` içinde yoksa.
+        """
+        lookup = {code: float(require_rate(rates, code))
+                  for code in set(self.columns['cpc_bw_currency']) | set(self.columns['cpc_color_currency'])}
+        bw_rate = [lookup[c] for c in self.columns['cpc_bw_currency']]
+        color_rate = [lookup[c] for c in self.columns['cpc_color_currency']]
+        if NUMPY_AVAILABLE:
+            money = _money_numpy(self.columns, bw_rate, color_rate)
+        else:
+            money = _money_python(self.columns, bw_rate, color_rate)
+        self.columns.update(money)
+        return self
+
+    def rows(self) -> Iterator[Dict[str, Any]]:
+        """Satırları düz Python değerleriyle sözlük olarak döndürür."""
+        names = list(self.columns)
+        columns = [c.tolist() if hasattr(c, 'tolist') else c for c in self.columns.values()]
+        for values in zip(*columns):
+            yield dict(zip(names, values))
+
+    def grand_total_tl(self) -> float:
+        """Tüm satırların TL toplamı (`apply_rates` sonrası)."""
+        return round(float(sum(self.columns.get('device_total_tl', ()))), 2)
+
+    def totals_by_customer(self) -> Dict[int, float]:
+        """Müşteri başına TL toplamları."""
+        totals: Dict[int, float] = {}
+        if NUMPY_AVAILABLE and self._length:
+            customers = np.asarray(self.columns['customer_id'])
+            keys, inverse = np.unique(customers, return_inverse=True)
+            sums = np.bincount(inverse, weights=np.asarray(self.columns['device_total_tl'], dtype=float))
+            return {int(k): round(float(s), 2) for k, s in zip(keys, sums)}
+        for customer_id, total in zip(self.columns['customer_id'], self.columns.get('device_total_tl', [])):
+            totals[customer_id] = totals.get(customer_id, 0.0) + total
+        return {k: round(v, 2) for k, v in totals.items()}
+
+
+def _money_numpy(columns: Dict[str, Any], bw_rate: List[float], color_rate: List[float]) -> Dict[str, Any]:
+    bw_usage = np.asarray(columns['bw_usage'], dtype=float)
+    color_usage = np.asarray(columns['color_usage'], dtype=float)
+    bw_price = np.asarray(columns['cpc_bw_price'], dtype=float)
+    color_price = np.asarray(columns['cpc_color_price'], dtype=float)
+    bw_rate = np.asarray(bw_rate, dtype=float)
+    color_rate = np.asarray(color_rate, dtype=float)
+    total_bw_cost = bw_usage * bw_price
+    total_color_cost = color_usage * color_price
+    total_bw_cost_tl = np.round(total_bw_cost * bw_rate, 4)
+    total_color_cost_tl = np.round(total_color_cost * color_rate, 4)
+    return {
+        'bw_rate': bw_rate,
+        'color_rate': color_rate,
+        'total_bw_cost': np.round(total_bw_cost, 4),
+        'total_color_cost': np.round(total_color_cost, 4),
+        'total_bw_cost_tl': total_bw_cost_tl,
+        'total_color_cost_tl': total_color_cost_tl,
+        'cpc_bw_price_tl': np.round(bw_price * bw_rate, 4),
+        'cpc_color_price_tl': np.round(color_price * color_rate, 4),
+        'device_total_tl': np.round(total_bw_cost_tl + total_color_cost_tl, 4),
+    }
+
+
+def _money_python(columns: Dict[str, Any], bw_rate: List[float], color_rate: List[float]) -> Dict[str, Any]:
+    total_bw_cost = [float(u) * float(p) for u, p in zip(columns['bw_usage'], columns['cpc_bw_price'])]
+    total_color_cost = [float(u) * float(p) for u, p in zip(columns['color_usage'], columns['cpc_color_price'])]
+    total_bw_cost_tl = [round(c * r, 4) for c, r in zip(total_bw_cost, bw_rate)]
+    total_color_cost_tl = [round(c * r, 4) for c, r in zip(total_color_cost, color_rate)]
+    return {
+        'bw_rate': bw_rate,
+        'color_rate': color_rate,
+        'total_bw_cost': [round(c, 4) for c in total_bw_cost],
+        'total_color_cost': [round(c, 4) for c in total_color_cost],
+        'total_bw_cost_tl': total_bw_cost_tl,
+        'total_color_cost_tl': total_color_cost_tl,
+        'cpc_bw_price_tl': [round(float(p) * r, 4) for p, r in zip(columns['cpc_bw_price'], bw_rate)],
+        'cpc_color_price_tl': [round(float(p) * r, 4) for p, r in zip(columns['cpc_color_price'], color_rate)],
+        'device_total_tl': [round(b + c, 4) for b, c in zip(total_bw_cost_tl, total_color_cost_tl)],
+    }
+
+
+# --- Fatura kalemleri ---
+
+RENTAL_DEVICES_QUERY = """
+    SELECT customer_id, id, device_model as model, serial_number, rental_fee, rental_currency
+    FROM customer_devices
+    WHERE customer_id IN ({}) AND rental_fee > 0
+"""
+
+
+def rental_quantity(start_date: Optional[str], end_date: Optional[str]) -> Decimal:
+    """Kiralama bedelinin dönem için çarpanı: 28-31 gün tam ay, diğerleri 30 gün üzerinden prorata."""
+    if not (start_date and end_date):
+        return Decimal(1)
+    try:
+        days = (datetime.strptime(end_date, '%Y-%m-%d') - datetime.strptime(start_date, '%Y-%m-%d')).days + 1
+    except ValueError:
+        return Decimal(1)
+    if 28 <= days <= 31:
+        return Decimal(1)
+    return Decimal(days) / Decimal(30)
+
+
+def invoice_lines(billing_rows: Iterable[Dict[str, Any]], rental_devices: Iterable[Any], rates: Mapping[str, Any],
+                  start_date: Optional[str] = None, end_date: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Decimal]:
+    """
+    Bir müşterinin fatura kalemlerini ve TL genel toplamını üretir.
+
+    Args:
+        billing_rows: `CpcBilling.rows()` satırları (`apply_rates` sonrası).
+        rental_devices: `RENTAL_DEVICES_QUERY` satırları; aylık kiralama bedeli kalemleri eklenir.
+
+    Raises:
+        MissingRateError: Kiralama bedelinin para biriminin kuru `rates` içinde yoksa.
+    """
+    details: List[Dict[str, Any]] = []
+    grand_total = Decimal('0.00')
+    for row in billing_rows:
+        if row['bw_resets'] or row['color_resets']:
+            logging.info(f"Cihaz {row['device_id']} için dönem içinde sayaç sıfırlaması algılandı; tüketim sıfırdan hesaplandı.")
+        grand_total += Decimal(str(row['device_total_tl']))
+        details.append({
+            'device_id': row['device_id'],
+            'model': row['model'] or '',
+            'serial_number': row['serial_number'] or '',
+            'color_type': row['color_type'] or '',
+            'bw_usage': row['bw_usage'],
+            'color_usage': row['color_usage'],
+            'cpc_bw_price': row['cpc_bw_price'],
+            'cpc_color_price': row['cpc_color_price'],
+            'cpc_bw_currency': row['cpc_bw_currency'],
+            'cpc_color_currency': row['cpc_color_currency'],
+            'total_bw_cost': row['total_bw_cost'],
+            'total_color_cost': row['total_color_cost'],
+            'total_bw_cost_tl': row['total_bw_cost_tl'],
+            'total_color_cost_tl': row['total_color_cost_tl'],
+            'cpc_bw_price_tl': row['cpc_bw_price_tl'],
+            'cpc_color_price_tl': row['cpc_color_price_tl'],
+            'device_total_tl': row['device_total_tl'],
+            'reading_ids': row['reading_ids']  # Faturalandırılacak sayaç okuma ID'leri
+        })
+
+    quantity = rental_quantity(start_date, end_date)
+    for device in rental_devices:
+        rental_fee = Decimal(str(device['rental_fee']))
+        if rental_fee <= 0:
+            continue
+        currency = normalize_currency(device['rental_currency'])
+        rate = require_rate(rates, currency)
+        rental_fee_tl = rental_fee * rate
+        billed_tl = rental_fee_tl if quantity == 1 else (rental_fee_tl * quantity).quantize(Decimal('0.01'))
+        grand_total += billed_tl
+        details.append({
+            'device_id': device['id'],
+            'model': device['model'],
+            'serial_number': device['serial_number'],
+            'description': f"{device['model']} ({device['serial_number']}) - Aylık Kiralama Bedeli",
+            'quantity': float(quantity.quantize(Decimal('0.01'))),
+            'unit_price': rental_fee,
+            'currency': currency,
+            'unit_price_tl': rental_fee_tl,
+            'total_tl': float(billed_tl),
+            'is_rental': True  # Bu kalemin kiralama bedeli olduğunu belirt
+        })
+    return details, grand_total
+
+
+def pdf_items(details: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Fatura kalemlerini PDF satırlarına çevirir (tutarlar TL). details_json'dan
+    okunan, değerleri metne çevrilmiş kalemler de kabul edilir.
+    """
+    items = []
+    for item in details:
+        if str(item.get('is_rental', False)) == 'True':
+            items.append({
+                "description": f"{item.get('model', '')} ({item.get('serial_number', '')}) - Aylık Kiralama",
+                "quantity": float(item.get('quantity', 1)),
+                "unit_price": float(item.get('unit_price_tl', 0)),
+                "unit_price_tl": float(item.get('unit_price_tl', 0)),
+                "total": float(item.get('total_tl', 0)),
+                "currency": 'TL'
+            })
+            continue
+        name = f"{item['model']} ({item['serial_number']})"
+        for usage_key, price_key, total_key, label in (
+                ('bw_usage', 'cpc_bw_price_tl', 'total_bw_cost_tl', 'S/B Baskı'),
+                ('color_usage', 'cpc_color_price_tl', 'total_color_cost_tl', 'Renkli Baskı')):
+            usage = int(float(item.get(usage_key) or 0))
+            if usage > 0:
+                unit_price_tl = float(item.get(price_key, 0))
+                items.append({
+                    "description": f"{name} - {label}",
+                    "quantity": usage,
+                    "unit_price": unit_price_tl,
+                    "unit_price_tl": unit_price_tl,
+                    "total": float(item.get(total_key, 0)),
+                    "currency": 'TL'
+                })
+    return items
+
+
+def serialize_details(details: Iterable[Dict[str, Any]]) -> str:
+    """Fatura kalemlerini faturada saklanan details_json biçimine çevirir."""
+    return json.dumps([{k: str(v) for k, v in item.items()} for item in details], ensure_ascii=False, indent=4)
+
+
+# --- Ay sonu toplu faturalama ---
+
+RUN_PENDING = 'PDF Bekliyor'
+RUN_DONE = 'Tamamlandı'
+ITEM_PENDING = 'Bekliyor'
+ITEM_READY = 'Hazır'
+ITEM_FAILED = 'Hata'
+ITEM_SKIPPED = 'Atlandı'
+
+RUNS_TABLE_DDL = """CREATE TABLE IF NOT EXISTS cpc_billing_runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    period_start TEXT NOT NULL,
+    period_end TEXT NOT NULL,
+    output_dir TEXT,
+    created_at TEXT NOT NULL,
+    finished_at TEXT,
+    status TEXT NOT NULL DEFAULT 'PDF Bekliyor'
+)"""
+
+RUN_ITEMS_TABLE_DDL = """CREATE TABLE IF NOT EXISTS cpc_billing_run_items (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    run_id INTEGER NOT NULL,
+    customer_id INTEGER,
+    invoice_id INTEGER,
+    pdf_path TEXT,
+    status TEXT NOT NULL DEFAULT 'Bekliyor',
+    error TEXT,
+    FOREIGN KEY (run_id) REFERENCES cpc_billing_runs (id) ON DELETE CASCADE,
+    FOREIGN KEY (customer_id) REFERENCES customers (id) ON DELETE SET NULL,
+    FOREIGN KEY (invoice_id) REFERENCES invoices (id) ON DELETE SET NULL
+)"""
+
+RUN_ITEMS_INDEX_DDL = "CREATE INDEX IF NOT EXISTS idx_cpc_billing_run_items_run ON cpc_billing_run_items (run_id, status)"
+
+
+def safe_file_name(text: str) -> str:
+    """Dosya adında kullanılamayacak karakterleri ayıklar."""
+    return "".join(c for c in (text or '') if c.isalnum() or c in " _-").rstrip()
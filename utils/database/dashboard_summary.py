@@ -0,0 +1,329 @@
+"""
+Gösterge paneli özet tablosu (`dashboard_summary`).
+
+Ana paneldeki kartların değerleri her yenilemede servis, fatura, ödeme ve
+müşteri tablolarının tamamı taranarak hesaplanmaz; bunun yerine küçük bir
+özet tablosunda (metrik, kova, para birimi) anahtarıyla sayaç ve tutar olarak
+tutulur. Kaynak tablolardaki her INSERT/UPDATE/DELETE, tetikleyiciler
+(trigger) ile özete aynı işlem içinde eklenir veya özetten çıkarılır; böylece
+özet hiçbir zaman kaynak verinin gerisinde kalmaz ve panel, geçmişin
+büyüklüğünden bağımsız olarak tek sorguyla okunur.
+
+Metrikler:
+    service_month   Ay başına açılan servis sayısı (kova: YYYY-MM)
+    service_status  Duruma göre servis sayısı (kova: durum)
+    invoiced        Ay başına fatura sayısı ve tutarı (kova: YYYY-MM)
+    paid            Ay başına ödeme tutarı (kova: YYYY-MM)
+    pending         Ödenmemiş faturaların kalan bakiyesi (kova: '')
+    customers       Toplam müşteri sayısı (kova: '')
+    contract_end    Sözleşme bitiş tarihine göre sözleşmeli müşteriler (kova: tarih)
+    contract_open   Bitiş tarihi olmayan sözleşmeli müşteriler (kova: '')
+
+Servis sayılarına CPC sayaç okumaları (is_cpc=1 cihazların kayıtları ve
+"Periyodik Sayaç Okuma" kayıtları) dahil edilmez. Tutarlar, faturada geçerli
+bir kur varsa TL'ye çevrilmiş olarak para birimi '' altında; kuru olmayan
+döviz faturalarında ise orijinal para birimi altında tutulur ve okuma anında
+güncel kurla çevrilir. %20 vergi okuma anında eklenir.
+
+Tetikleyiciler devre dışıyken yapılmış değişiklikler veya elle yapılan
+düzeltmeler sonrasında `rebuild_dashboard_summary` özeti baştan hesaplar.
+"""
+
+import logging
+import sqlite3
+from datetime import datetime
+from decimal import Decimal
+from typing import Any, Callable, Dict, List, Optional
+
+SUMMARY_TABLE_DDL = """CREATE TABLE IF NOT EXISTS dashboard_summary (
+    metric TEXT NOT NULL,
+    bucket TEXT NOT NULL,
+    currency TEXT NOT NULL,
+    cnt INTEGER NOT NULL DEFAULT 0,
+    amount REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (metric, bucket, currency)
+) WITHOUT ROWID"""
+
+# Panelde gösterilen servis durumları
+ON_REPAIR_STATUSES = ('İşleme alındı', 'Servise alındı')
+AWAITING_PART_STATUS = 'Parça bekleniyor'
+AWAITING_APPROVAL_STATUS = 'Müşteri Onayı Alınacak'
+
+# Ay kovalı metrikler; okumada yalnızca içinde bulunulan ay alınır
+MONTHLY_METRICS = ('service_month', 'invoiced', 'paid')
+
+TAX_MULTIPLIER = Decimal('1.20')
+
+_UPSERT = """
+    ON CONFLICT (metric, bucket, currency) DO UPDATE SET
+        cnt = cnt + excluded.cnt, amount = amount + excluded.amount"""
+
+
+# --- Satır ifadeleri (tetikleyiciler ve yeniden hesaplama aynı ifadeleri kullanır) ---
+
+def _month(column: str) -> str:
+    return f"COALESCE(strftime('%Y-%m', {column}), '')"
+
+
+def _not_meter_reading(row: str) -> str:
+    return (f"({row}.problem_description IS NULL "
+            f"OR {row}.problem_description NOT LIKE '%Periyodik Sayaç Okuma%')")
+
+
+def _service_counted(row: str) -> str:
+    """Servis kaydı panel sayılarına dahil mi (CPC sayaç okuması değil mi)?"""
+    return (f"{_not_meter_reading(row)} AND COALESCE("
+            f"(SELECT is_cpc FROM customer_devices WHERE id = {row}.device_id), 0) = 0")
+
+
+def _is_tl(row: str) -> str:
+    return f"({row}.currency IS NULL OR {row}.currency IN ('', 'TL'))"
+
+
+def _currency_key(row: str) -> str:
+    """TL'ye çevrilebilen tutarlar için '', kuru olmayan döviz için para birimi."""
+    return f"(CASE WHEN {_is_tl(row)} OR {row}.exchange_rate > 0 THEN '' ELSE {row}.currency END)"
+
+
+def _tl_factor(row: str) -> str:
+    """Faturadaki kayıtlı kurla TL'ye çevirme çarpanı."""
+    return f"(CASE WHEN {_is_tl(row)} THEN 1.0 WHEN {row}.exchange_rate > 0 THEN {row}.exchange_rate ELSE 1.0 END)"
+
+
+# --- Tetikleyici gövdeleri: bir satırın özete katkısını ekler (+1) veya çıkarır (-1) ---
+
+def _service_delta(row: str, sign: int) -> List[str]:
+    return [
+        f"""INSERT INTO dashboard_summary (metric, bucket, currency, cnt, amount)
+        SELECT 'service_month', {_month(f'{row}.created_date')}, '', {sign}, 0
+        WHERE {_service_counted(row)}{_UPSERT}""",
+        f"""INSERT INTO dashboard_summary (metric, bucket, currency, cnt, amount)
+        SELECT 'service_status', COALESCE({row}.status, ''), '', {sign}, 0
+        WHERE {_service_counted(row)}{_UPSERT}""",
+    ]
+
+
+def _device_services_delta(device: str, sign: str) -> List[str]:
+    """Bir cihazın (sayaç okuması olmayan) tüm servis kayıtlarını toplu ekler/çıkarır."""
+    return [
+        f"""INSERT INTO dashboard_summary (metric, bucket, currency, cnt, amount)
+        SELECT 'service_month', {_month('sr.created_date')}, '', {sign} * COUNT(*), 0
+        FROM service_records sr
+        WHERE sr.device_id = {device}.id AND {_not_meter_reading('sr')}
+        GROUP BY 2{_UPSERT}""",
+        f"""INSERT INTO dashboard_summary (metric, bucket, currency, cnt, amount)
+        SELECT 'service_status', COALESCE(sr.status, ''), '', {sign} * COUNT(*), 0
+        FROM service_records sr
+        WHERE sr.device_id = {device}.id AND {_not_meter_reading('sr')}
+        GROUP BY 2{_UPSERT}""",
+    ]
+
+
+def _invoice_delta(row: str, sign: int) -> List[str]:
+    return [
+        f"""INSERT INTO dashboard_summary (metric, bucket, currency, cnt, amount)
+        SELECT 'invoiced', {_month(f'{row}.invoice_date')}, {_currency_key(row)},
+               {sign}, {sign} * COALESCE({row}.total_amount, 0) * {_tl_factor(row)}
+        WHERE 1{_UPSERT}""",
+        f"""INSERT INTO dashboard_summary (metric, bucket, currency, cnt, amount)
+        SELECT 'pending', '', {_currency_key(row)}, {sign},
+               {sign} * (COALESCE({row}.total_amount, 0) - COALESCE({row}.paid_amount, 0)) * {_tl_factor(row)}
+        WHERE {row}.status != 'Ödendi'{_UPSERT}""",
+    ]
+
+
+def _payment_delta(row: str, sign: int) -> List[str]:
+    # Faturası olmayan (yetim) ödemeler, paneldeki JOIN gibi sayılmaz
+    return [
+        f"""INSERT INTO dashboard_summary (metric, bucket, currency, cnt, amount)
+        SELECT 'paid', {_month(f'{row}.payment_date')}, {_currency_key('i')},
+               {sign}, {sign} * COALESCE({row}.amount_paid, 0) * {_tl_factor('i')}
+        FROM invoices i
+        WHERE i.id = {row}.invoice_id{_UPSERT}""",
+    ]
+
+
+def _invoice_payments_delta(invoice: str, sign: int) -> List[str]:
+    """Bir faturanın tüm ödemelerini, faturanın (OLD/NEW) kur bilgisiyle ekler/çıkarır."""
+    return [
+        f"""INSERT INTO dashboard_summary (metric, bucket, currency, cnt, amount)
+        SELECT 'paid', {_month('p.payment_date')}, {_currency_key(invoice)},
+               {sign} * COUNT(*), {sign} * TOTAL(p.amount_paid) * {_tl_factor(invoice)}
+        FROM payments p
+        WHERE p.invoice_id = {invoice}.id
+        GROUP BY 2{_UPSERT}""",
+    ]
+
+
+def _customer_delta(row: str, sign: int) -> List[str]:
+    return [
+        f"""INSERT INTO dashboard_summary (metric, bucket, currency, cnt, amount)
+        SELECT 'customers', '', '', {sign}, 0
+        WHERE 1{_UPSERT}""",
+        f"""INSERT INTO dashboard_summary (metric, bucket, currency, cnt, amount)
+        SELECT 'contract_end', {row}.contract_end_date, '', {sign}, 0
+        WHERE {row}.is_contract = 1 AND {row}.contract_end_date IS NOT NULL{_UPSERT}""",
+        f"""INSERT INTO dashboard_summary (metric, bucket, currency, cnt, amount)
+        SELECT 'contract_open', '', '', {sign}, 0
+        WHERE {row}.is_contract = 1 AND {row}.contract_end_date IS NULL{_UPSERT}""",
+    ]
+
+
+# (ad, zamanlama ve olay, WHEN koşulu, gövde ifadeleri)
+_CPC_CHANGED = "(COALESCE(OLD.is_cpc, 0) = 0) != (COALESCE(NEW.is_cpc, 0) = 0)"
+_RATE_CHANGED = "OLD.currency IS NOT NEW.currency OR OLD.exchange_rate IS NOT NEW.exchange_rate"
+
+TRIGGERS = [
+    ('trg_dash_service_ins', 'AFTER INSERT ON service_records', None, _service_delta('NEW', 1)),
+    ('trg_dash_service_del', 'AFTER DELETE ON service_records', None, _service_delta('OLD', -1)),
+    ('trg_dash_service_upd',
+     'AFTER UPDATE OF device_id, created_date, status, problem_description ON service_records', None,
+     _service_delta('OLD', -1) + _service_delta('NEW', 1)),
+    # Cihaz CPC'ye alınır/çıkarılırsa servis kayıtları panel sayılarından çıkar/girer
+    ('trg_dash_device_cpc', 'AFTER UPDATE OF is_cpc ON customer_devices', _CPC_CHANGED,
+     _device_services_delta('NEW', "(CASE WHEN COALESCE(NEW.is_cpc, 0) = 0 THEN 1 ELSE -1 END)")),
+    # CPC cihaz silinince kayıtları artık CPC sayılmaz; basamaklı silinen kayıtlar
+    # ardından kendi tetikleyicileriyle düşülür
+    ('trg_dash_device_del', 'BEFORE DELETE ON customer_devices', 'COALESCE(OLD.is_cpc, 0) != 0',
+     _device_services_delta('OLD', '1')),
+    ('trg_dash_invoice_ins', 'AFTER INSERT ON invoices', None, _invoice_delta('NEW', 1)),
+    # Silinen faturanın ödemeleri de düşülür; basamaklı silinen ödemeler fatura
+    # bulunamadığı için ikinci kez düşülmez
+    ('trg_dash_invoice_del', 'BEFORE DELETE ON invoices', None,
+     _invoice_delta('OLD', -1) + _invoice_payments_delta('OLD', -1)),
+    ('trg_dash_invoice_upd',
+     'AFTER UPDATE OF invoice_date, total_amount, paid_amount, status, currency, exchange_rate ON invoices', None,
+     _invoice_delta('OLD', -1) + _invoice_delta('NEW', 1)),
+    ('trg_dash_invoice_rate', 'AFTER UPDATE OF currency, exchange_rate ON invoices', _RATE_CHANGED,
+     _invoice_payments_delta('OLD', -1) + _invoice_payments_delta('NEW', 1)),
+    ('trg_dash_payment_ins', 'AFTER INSERT ON payments', None, _payment_delta('NEW', 1)),
+    ('trg_dash_payment_del', 'AFTER DELETE ON payments', None, _payment_delta('OLD', -1)),
+    ('trg_dash_payment_upd', 'AFTER UPDATE OF invoice_id, payment_date, amount_paid ON payments', None,
+     _payment_delta('OLD', -1) + _payment_delta('NEW', 1)),
+    ('trg_dash_customer_ins', 'AFTER INSERT ON customers', None, _customer_delta('NEW', 1)),
+    ('trg_dash_customer_del', 'AFTER DELETE ON customers', None, _customer_delta('OLD', -1)),
+    ('trg_dash_customer_upd', 'AFTER UPDATE OF is_contract, contract_end_date ON customers', None,
+     _customer_delta('OLD', -1) + _customer_delta('NEW', 1)),
+]
+
+
+def create_dashboard_triggers(conn: sqlite3.Connection) -> None:
+    """Özeti güncel tutan tetikleyicileri (yeniden) oluşturur."""
+    for name, event, when, statements in TRIGGERS:
+        conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+        when_clause = f" WHEN {when}" if when else ""
+        body = ";\n".join(statements)
+        conn.execute(f"CREATE TRIGGER {name} {event}{when_clause}\nBEGIN\n{body};\nEND")
+
+
+def rebuild_dashboard_summary(conn: sqlite3.Connection) -> None:
+    """Özeti kaynak tablolardan küme tabanlı sorgularla baştan hesaplar."""
+    conn.execute("DELETE FROM dashboard_summary")
+    counted = (f"{_not_meter_reading('sr')} AND COALESCE(cd.is_cpc, 0) = 0")
+    statements = [
+        f"""INSERT INTO dashboard_summary (metric, bucket, currency, cnt, amount)
+        SELECT 'service_month', {_month('sr.created_date')}, '', COUNT(*), 0
+        FROM service_records sr LEFT JOIN customer_devices cd ON cd.id = sr.device_id
+        WHERE {counted} GROUP BY 2""",
+        f"""INSERT INTO dashboard_summary (metric, bucket, currency, cnt, amount)
+        SELECT 'service_status', COALESCE(sr.status, ''), '', COUNT(*), 0
+        FROM service_records sr LEFT JOIN customer_devices cd ON cd.id = sr.device_id
+        WHERE {counted} GROUP BY 2""",
+        f"""INSERT INTO dashboard_summary (metric, bucket, currency, cnt, amount)
+        SELECT 'invoiced', {_month('i.invoice_date')}, {_currency_key('i')},
+               COUNT(*), TOTAL(COALESCE(i.total_amount, 0) * {_tl_factor('i')})
+        FROM invoices i GROUP BY 2, 3""",
+        f"""INSERT INTO dashboard_summary (metric, bucket, currency, cnt, amount)
+        SELECT 'pending', '', {_currency_key('i')}, COUNT(*),
+               TOTAL((COALESCE(i.total_amount, 0) - COALESCE(i.paid_amount, 0)) * {_tl_factor('i')})
+        FROM invoices i WHERE i.status != 'Ödendi' GROUP BY 3""",
+        f"""INSERT INTO dashboard_summary (metric, bucket, currency, cnt, amount)
+        SELECT 'paid', {_month('p.payment_date')}, {_currency_key('i')},
+               COUNT(*), TOTAL(COALESCE(p.amount_paid, 0) * {_tl_factor('i')})
+        FROM payments p JOIN invoices i ON i.id = p.invoice_id GROUP BY 2, 3""",
+        """INSERT INTO dashboard_summary (metric, bucket, currency, cnt, amount)
+        SELECT 'customers', '', '', COUNT(*), 0 FROM customers""",
+        """INSERT INTO dashboard_summary (metric, bucket, currency, cnt, amount)
+        SELECT 'contract_end', contract_end_date, '', COUNT(*), 0 FROM customers
+        WHERE is_contract = 1 AND contract_end_date IS NOT NULL GROUP BY 2""",
+        """INSERT INTO dashboard_summary (metric, bucket, currency, cnt, amount)
+        SELECT 'contract_open', '', '', COUNT(*), 0 FROM customers
+        WHERE is_contract = 1 AND contract_end_date IS NULL""",
+    ]
+    for statement in statements:
+        conn.execute(statement)
+    logging.info("Gösterge paneli özeti yeniden hesaplandı.")
+
+
+# --- Okuma tarafı ---
+
+SUMMARY_QUERY = """
+    SELECT metric, bucket, currency, cnt, amount FROM dashboard_summary
+    WHERE metric NOT IN ('service_month', 'invoiced', 'paid') OR bucket = ?
+"""
+
+
+def fold_summary(rows, today: Optional[datetime] = None,
+                 get_rates: Optional[Callable[[], Dict[str, Any]]] = None) -> Dict[str, Dict[str, Any]]:
+    """
+    Özet satırlarını kart değerlerine çevirir.
+
+    Args:
+        rows: `SUMMARY_QUERY` sonucu (metric, bucket, currency, cnt, amount).
+        today: Ay ve sözleşme karşılaştırmaları için tarih (varsayılan: şimdi).
+        get_rates: Kuru kaydedilmemiş döviz tutarları varsa çağrılır.
+
+    Returns:
+        {'services': {...}, 'financial': {...}, 'customers': {...}}
+    """
+    today = today or datetime.now()
+    month = today.strftime('%Y-%m')
+    date = today.strftime('%Y-%m-%d')
+
+    services = {'monthly_new': 0, 'on_repair': 0, 'awaiting_part': 0, 'awaiting_approval': 0}
+    customers = {'total': 0, 'contract': 0, 'expiring_this_month': 0, 'expired': 0}
+    totals = {'invoiced': Decimal('0'), 'paid': Decimal('0'), 'pending': Decimal('0')}
+    invoice_count = 0
+    foreign: List[tuple] = []
+
+    for metric, bucket, currency, cnt, amount in rows:
+        if metric == 'service_month':
+            services['monthly_new'] += cnt
+        elif metric == 'service_status':
+            if bucket in ON_REPAIR_STATUSES:
+                services['on_repair'] += cnt
+            elif bucket == AWAITING_PART_STATUS:
+                services['awaiting_part'] += cnt
+            elif bucket == AWAITING_APPROVAL_STATUS:
+                services['awaiting_approval'] += cnt
+        elif metric in totals:
+            if metric == 'invoiced':
+                invoice_count += cnt
+            if currency:
+                foreign.append((metric, currency, amount))
+            else:
+                totals[metric] += Decimal(str(amount))
+        elif metric == 'customers':
+            customers['total'] += cnt
+        elif metric == 'contract_open':
+            customers['contract'] += cnt
+        elif metric == 'contract_end':
+            customers['contract'] += cnt
+            if bucket.startswith(month):
+                customers['expiring_this_month'] += cnt
+            if bucket < date:
+                customers['expired'] += cnt
+
+    if foreign:
+        # Kuru kaydedilmemiş eski döviz faturaları güncel kurla çevrilir
+        rates = get_rates() if get_rates else {}
+        for metric, currency, amount in foreign:
+            totals[metric] += Decimal(str(amount)) * Decimal(str(rates.get(currency, 1.0)))
+
+    financial = {
+        'total_invoiced': float(round(totals['invoiced'] * TAX_MULTIPLIER, 2)),
+        'total_paid': float(round(totals['paid'] * TAX_MULTIPLIER, 2)),
+        'invoice_count': invoice_count,
+        'pending_balance': float(round(totals['pending'] * TAX_MULTIPLIER, 2)),
+    }
+    return {'services': services, 'financial': financial, 'customers': customers}
@@ -0,0 +1,125 @@
+"""
+Tarih sütunları için yardımcılar.
+
+Veritabanındaki tüm tarih/saat sütunları ISO biçiminde tutulur:
+'YYYY-MM-DD' veya 'YYYY-MM-DD HH:MM[:SS]'. Bu biçim metin olarak
+karşılaştırıldığında kronolojik sıralanır; bu yüzden sorgular sütunu
+`strftime()` veya `LIKE` ile sarmak yerine `sütun >= ? AND sütun < ?`
+aralıkları kullanır ve SQLite sütundaki indeksi aralık taraması için
+kullanabilir.
+
+Aralıkların bitişi her zaman hariçtir (yarı açık aralık): bir günün veya
+ayın tamamı, saat bileşeni ne olursa olsun, '23:59:59' gibi uçlara gerek
+kalmadan kapsanır.
+"""
+
+import re
+from datetime import date, datetime, timedelta
+from typing import List, Optional, Tuple, Union
+
+DateLike = Union[str, date, datetime]
+
+ISO_DATE_FORMAT = '%Y-%m-%d'
+
+# Normalleştirme migrasyonunun dolaştığı (tablo, sütun) çiftleri
+DATE_COLUMNS: List[Tuple[str, str]] = [
+    ('service_records', 'created_date'),
+    ('service_records', 'completed_date'),
+    ('invoices', 'invoice_date'),
+    ('payments', 'payment_date'),
+    ('stock_movements', 'movement_date'),
+    ('cpc_invoices', 'invoice_date'),
+    ('cpc_invoices', 'billing_period_start'),
+    ('cpc_invoices', 'billing_period_end'),
+    ('customers', 'contract_start_date'),
+    ('customers', 'contract_end_date'),
+    ('customer_devices', 'installation_date'),
+    ('cpc_usage_history', 'usage_date'),
+    ('purchase_invoices', 'invoice_date'),
+    ('pending_sales', 'sale_date'),
+]
+
+_ISO = re.compile(r'^(\d{4})[-/.](\d{1,2})[-/.](\d{1,2})(?:[T ](\d{1,2}):(\d{2})(?::(\d{2}))?(?:\.\d+)?)?'
+                  r'(?:Z|[+-]\d{2}:?\d{2})?$')
+_DAY_FIRST = re.compile(r'^(\d{1,2})[./-](\d{1,2})[./-](\d{4})(?:[T ](\d{1,2}):(\d{2})(?::(\d{2}))?)?$')
+
+
+def normalize_date_text(value: Optional[str]) -> Optional[str]:
+    """
+    Tanınan bir tarih metnini ISO biçimine çevirir; tanınmayan değerleri aynen döndürür.
+
+    '05.10.2025' -> '2025-10-05', '2025-10-05T14:30:00.123' -> '2025-10-05 14:30:00',
+    '2025/10/5 9:05' -> '2025-10-05 09:05'
+    """
+    if not isinstance(value, str):
+        return value
+    text = value.strip()
+    match = _ISO.match(text)
+    if match:
+        year, month, day, hour, minute, second = match.groups()
+    else:
+        match = _DAY_FIRST.match(text)
+        if not match:
+            return value
+        day, month, year, hour, minute, second = match.groups()
+    try:
+        date(int(year), int(month), int(day))
+    except ValueError:
+        return value
+    result = f"{int(year):04d}-{int(month):02d}-{int(day):02d}"
+    if hour is not None:
+        result += f" {int(hour):02d}:{minute}"
+        if second is not None:
+            result += f":{second}"
+    return result
+
+
+def _as_date(value: DateLike) -> date:
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return datetime.strptime(normalize_date_text(value)[:10], ISO_DATE_FORMAT).date()
+
+
+def month_bounds(day: Optional[DateLike] = None) -> Tuple[str, str]:
+    """Verilen günün (varsayılan: bugün) ayı için [ayın ilk günü, sonraki ayın ilk günü)."""
+    first = _as_date(day or date.today()).replace(day=1)
+    following = (first + timedelta(days=32)).replace(day=1)
+    return first.strftime(ISO_DATE_FORMAT), following.strftime(ISO_DATE_FORMAT)
+
+
+def day_bounds(start: Optional[DateLike] = None, end: Optional[DateLike] = None) -> Tuple[Optional[str], Optional[str]]:
+    """Bitiş günü dahil gün aralığının yarı açık sınırları: [başlangıç, bitiş + 1 gün)."""
+    lower = _as_date(start).strftime(ISO_DATE_FORMAT) if start else None
+    upper = (_as_date(end) + timedelta(days=1)).strftime(ISO_DATE_FORMAT) if end else None
+    return lower, upper
+
+
+def date_range(column: str, start: Optional[DateLike] = None,
+               end: Optional[DateLike] = None) -> Tuple[str, List[str]]:
+    """
+    `column` için indeks dostu aralık koşulu üretir. Bitiş günü dahildir.
+
+    Returns:
+        (koşul, parametreler). Sınır verilmezse koşul boş metindir.
+        Örn: ("created_date >= ? AND created_date < ?", ['2025-10-01', '2025-11-01'])
+    """
+    lower, upper = day_bounds(start, end)
+    return _range_clause(column, lower, upper)
+
+
+def month_range(column: str, day: Optional[DateLike] = None) -> Tuple[str, List[str]]:
+    """`column` için verilen günün (varsayılan: bugün) ayını kapsayan aralık koşulu."""
+    return _range_clause(column, *month_bounds(day))
+
+
+def _range_clause(column: str, lower: Optional[str], upper: Optional[str]) -> Tuple[str, List[str]]:
+    parts, params = [], []
+    if lower:
+        parts.append(f"{column} >= ?")
+        params.append(lower)
+    if upper:
+        parts.append(f"{column} < ?")
+        params.append(upper)
+    return " AND ".join(parts), params
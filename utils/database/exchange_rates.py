@@ -0,0 +1,145 @@
+"""
+Geçmiş döviz kurları.
+
+TCMB'nin günlük kur bültenleri `exchange_rates` tablosunda (tarih, para
+birimi) anahtarıyla saklanır ve arka planda eşitlenir: bugünün bülteni ile
+kayıtlı son tarihten bugüne kadarki eksik günler ve en eski döviz faturasına
+kadar geriye doğru arşiv günleri çekilir. Kayıtlar böylece kesintisiz bir tarih
+aralığı oluşturur; hafta sonu ve tatil günlerinde bülten yayımlanmadığından bu
+günlerde bir önceki iş gününün kuru geçerlidir.
+
+Kur sorguları ağa ve veritabanına gitmez: tablo bir kez okunup para birimi
+başına tarih sıralı dizilerden oluşan `RateIndex`'e yüklenir; her kayıt kendi
+tarihinden bir sonraki bülten tarihine kadar geçerli olduğundan bir tarihteki
+kur ikili arama (bisect) ile bulunur.
+"""
+
+import sqlite3
+import threading
+from bisect import bisect_right
+from decimal import Decimal
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .cpc_billing import currency_sql
+
+EXCHANGE_RATES_TABLE_DDL = """CREATE TABLE IF NOT EXISTS exchange_rates (
+    date TEXT NOT NULL,
+    currency TEXT NOT NULL,
+    buying REAL NOT NULL,
+    selling REAL,
+    PRIMARY KEY (currency, date)
+) WITHOUT ROWID"""
+
+# Arşivden geriye doğru en fazla bu kadar gün istenir (ilk eşitleme)
+DEFAULT_BACKFILL_DAYS = 90
+
+# İki bülten arasındaki en uzun boşluk (bayram tatilleri dahil); faturalamada
+# kullanılacak kurun bülteni fatura tarihinden daha eskiyse kur eskimiş sayılır
+MAX_BULLETIN_AGE_DAYS = 10
+
+UPSERT_RATE = """INSERT INTO exchange_rates (date, currency, buying, selling) VALUES (?, ?, ?, ?)
+    ON CONFLICT (currency, date) DO UPDATE SET buying = excluded.buying, selling = excluded.selling"""
+
+# Kuru kaydedilmemiş (boş veya 0) döviz faturalarına fatura
+# tarihindeki kuru yazar. Gösterge paneli özeti tetikleyicilerle düzelir.
+FILL_INVOICE_RATES = f"""
+    UPDATE invoices
+    SET exchange_rate = (
+        SELECT er.buying FROM exchange_rates er
+        WHERE er.currency = {currency_sql('invoices.currency')} AND er.date <= substr(invoices.invoice_date, 1, 10)
+        ORDER BY er.date DESC LIMIT 1
+    )
+    WHERE {currency_sql('currency')} != 'TL'
+      AND (exchange_rate IS NULL OR exchange_rate <= 0)
+      AND invoice_date IS NOT NULL
+      AND EXISTS (
+        SELECT 1 FROM exchange_rates er
+        WHERE er.currency = {currency_sql('invoices.currency')} AND er.date <= substr(invoices.invoice_date, 1, 10)
+      )"""
+
+EARLIEST_FOREIGN_INVOICE_QUERY = f"""
+    SELECT MIN(substr(invoice_date, 1, 10)) FROM invoices
+    WHERE {currency_sql('currency')} != 'TL' AND invoice_date IS NOT NULL"""
+
+
+class RateIndex:
+    """
+    Para birimi başına tarih sıralı kur dizileri.
+
+    Bir kayıt, kendi tarihinden bir sonraki kaydın tarihine kadar geçerlidir;
+    `rate_on` tarihte veya öncesinde yayımlanmış son kuru döndürür. Ekleme ve
+    okuma aynı kilitle korunur, arka plandaki eşitleme ile GUI birlikte
+    kullanabilir.
+    """
+
+    def __init__(self, rows: Iterable[Tuple[str, str, float, Optional[float]]] = ()):
+        self._dates: Dict[str, List[str]] = {}
+        self._rates: Dict[str, List[Tuple[Decimal, Optional[Decimal]]]] = {}
+        self._lock = threading.Lock()
+        for day, currency, buying, selling in sorted(rows, key=lambda r: (r[1], r[0])):
+            self._dates.setdefault(currency, []).append(day)
+            self._rates.setdefault(currency, []).append(_decimal_pair(buying, selling))
+
+    def __len__(self) -> int:
+        return sum(len(dates) for dates in self._dates.values())
+
+    def add(self, day: str, currency: str, buying, selling=None) -> None:
+        """Bir kur kaydı ekler veya aynı tarihteki kaydı günceller."""
+        value = _decimal_pair(buying, selling)
+        with self._lock:
+            dates = self._dates.setdefault(currency, [])
+            rates = self._rates.setdefault(currency, [])
+            i = bisect_right(dates, day)
+            if i and dates[i - 1] == day:
+                rates[i - 1] = value
+            else:
+                dates.insert(i, day)
+                rates.insert(i, value)
+
+    def rate_on(self, day: Optional[str], currency: str, selling: bool = False) -> Optional[Decimal]:
+        """Tarihte geçerli kur (tarih None ise en güncel kur); kayıt yoksa None."""
+        if currency == 'TL':
+            return Decimal('1')
+        with self._lock:
+            dates = self._dates.get(currency)
+            if not dates:
+                return None
+            i = len(dates) if day is None else bisect_right(dates, day[:10])
+            if not i:
+                return None
+            buying_rate, selling_rate = self._rates[currency][i - 1]
+        return selling_rate if selling and selling_rate is not None else buying_rate
+
+    def bulletin_date(self, day: Optional[str], currency: str) -> Optional[str]:
+        """Tarihte geçerli kurun bülten tarihi (tarih None ise en güncel); kayıt yoksa None."""
+        with self._lock:
+            dates = self._dates.get(currency)
+            if not dates:
+                return None
+            i = len(dates) if day is None else bisect_right(dates, day[:10])
+            return dates[i - 1] if i else None
+
+    def rates_on(self, day: Optional[str] = None) -> Dict[str, Decimal]:
+        """Tarihte geçerli tüm alış kurları ('TL' dahil)."""
+        rates = {'TL': Decimal('1.0')}
+        for currency in list(self._dates):
+            rate = self.rate_on(day, currency)
+            if rate is not None:
+                rates[currency] = rate
+        return rates
+
+    def date_range(self) -> Tuple[Optional[str], Optional[str]]:
+        """Kayıtlı ilk ve son bülten tarihi."""
+        with self._lock:
+            firsts = [dates[0] for dates in self._dates.values() if dates]
+            lasts = [dates[-1] for dates in self._dates.values() if dates]
+        return (min(firsts), max(lasts)) if firsts else (None, None)
+
+
+def _decimal_pair(buying, selling) -> Tuple[Decimal, Optional[Decimal]]:
+    return Decimal(str(buying)), (Decimal(str(selling)) if selling is not None else None)
+
+
+def load_rate_index(conn: sqlite3.Connection) -> RateIndex:
+    """`exchange_rates` tablosunun tamamını belleğe yükler."""
+    return RateIndex(conn.execute("SELECT date, currency, buying, selling FROM exchange_rates").fetchall())
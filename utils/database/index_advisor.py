@@ -0,0 +1,109 @@
+"""
+İndeks danışmanı.
+
+Sorgu ölçümünün (`instrumentation.QueryStats`) topladığı sorgu şablonlarını,
+varsa son çağrının özgün SQL metniyle `EXPLAIN QUERY PLAN` ile yeniden oynatır; tam tablo taramalarını (SCAN) ve
+geçici B-ağacı (USE TEMP B-TREE) kullanan sıralama/gruplamaları işaretler.
+Sonuçlar toplam süreye göre sıralanır, böylece önce en pahalı sorgular görülür.
+
+Komut satırı kullanımı için `tools/index_advisor.py` betiğine bakın.
+"""
+
+import re
+import sqlite3
+from typing import Any, Dict, Iterable, List, Sequence
+
+from .instrumentation import count_placeholders, is_explainable
+
+_FULL_SCAN = re.compile(r"^SCAN (?!CONSTANT ROW)(\S+)(?: AS \S+)?$")
+_INDEX_SCAN = re.compile(r"^SCAN (\S+)(?: AS \S+)? USING (?:COVERING )?INDEX (\S+)")
+_TEMP_BTREE = re.compile(r"USE TEMP B-TREE FOR (.+)$")
+
+
+def _prepare(sql: str, params: Sequence[Any]) -> tuple:
+    """Sorguyu (özgün metin veya normalize şablon) çalıştırılabilir hale getirir ve parametreleri tamamlar."""
+    sql = sql.replace('IN (?, ...)', 'IN (?)')
+    needed = count_placeholders(sql)
+    params = list(params)[:needed]
+    params += [None] * (needed - len(params))
+    return sql, tuple(params)
+
+
+def explain(conn: sqlite3.Connection, sql: str, params: Sequence[Any] = ()) -> List[str]:
+    """Sorgunun plan satırlarını (detail sütunu) döndürür."""
+    sql, params = _prepare(sql, params)
+    return [str(row[3]) for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()]
+
+
+def analyze_plan(plan: Iterable[str]) -> List[Dict[str, str]]:
+    """Plan satırlarındaki sorunları döndürür: full_scan, index_scan, temp_btree."""
+    issues = []
+    for line in plan:
+        detail = line.strip()
+        match = _FULL_SCAN.match(detail)
+        if match and not match.group(1).startswith('sqlite_'):
+            issues.append({'kind': 'full_scan', 'table': match.group(1), 'detail': detail})
+            continue
+        match = _INDEX_SCAN.match(detail)
+        if match:
+            # İndeksin tamamı okunuyor; arama değil tarama yapılıyor
+            issues.append({'kind': 'index_scan', 'table': match.group(1), 'detail': detail})
+            continue
+        match = _TEMP_BTREE.search(detail)
+        if match:
+            issues.append({'kind': 'temp_btree', 'table': '', 'detail': detail})
+    return issues
+
+
+def advise(conn: sqlite3.Connection, statements: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Yakalanan sorgu şablonlarını değerlendirir.
+
+    Args:
+        conn: Planların çıkarılacağı bağlantı (gerçek şemayı görmelidir).
+        statements: `QueryStats.top()` veya dökümdeki 'statements' kayıtları; varsa
+            'sample_sql' ve 'sample_params' ile, yoksa normalize şablonla oynatılır.
+
+    Returns:
+        Sorunlu sorgular; her biri sql, calls, total_ms, plan ve issues içerir.
+    """
+    findings = []
+    for stmt in statements:
+        sql = stmt.get('sql', '')
+        if not is_explainable(sql):
+            continue
+        try:
+            plan = explain(conn, stmt.get('sample_sql') or sql, stmt.get('sample_params') or ())
+        except sqlite3.Error as e:
+            findings.append({**_summary(stmt), 'plan': [], 'issues': [{'kind': 'error', 'table': '', 'detail': str(e)}]})
+            continue
+        issues = analyze_plan(plan)
+        if issues:
+            findings.append({**_summary(stmt), 'plan': plan, 'issues': issues})
+    findings.sort(key=lambda f: f['total_ms'], reverse=True)
+    return findings
+
+
+def _summary(stmt: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        'sql': stmt.get('sql', ''),
+        'calls': stmt.get('calls', 0),
+        'total_ms': stmt.get('total_ms', 0.0),
+        'max_ms': stmt.get('max_ms', 0.0),
+    }
+
+
+def format_report(findings: List[Dict[str, Any]]) -> str:
+    """Bulguları okunabilir bir metin raporuna çevirir."""
+    if not findings:
+        return "Sorunlu sorgu planı bulunamadı."
+    labels = {'full_scan': 'TAM TARAMA', 'index_scan': 'İNDEKS TARAMASI',
+              'temp_btree': 'GEÇİCİ B-AĞACI', 'error': 'HATA'}
+    lines = []
+    for i, f in enumerate(findings, 1):
+        lines.append(f"{i}. {f['calls']} çağrı, toplam {f['total_ms']:.1f} ms, en fazla {f['max_ms']:.1f} ms")
+        lines.append(f"   {f['sql']}")
+        for issue in f['issues']:
+            lines.append(f"   - {labels.get(issue['kind'], issue['kind'])}: {issue['detail']}")
+        lines.append("")
+    return "\n".join(lines)
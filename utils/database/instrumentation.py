@@ -0,0 +1,232 @@
+"""
+Sorgu zamanlama ölçümü ve yavaş sorgu günlüğü.
+
+`DatabaseManager` isteğe bağlı olarak her ifadenin normalize edilmiş SQL
+metnini, parametre sayısını, dönen satır sayısını ve süresini burada kaydeder.
+Eşik değerini aşan sorgular `EXPLAIN QUERY PLAN` çıktısıyla birlikte ayrı bir
+yavaş sorgu günlüğüne yazılır.
+
+Etkinleştirmek için `PROSERVIS_QUERY_STATS=1` ortam değişkeni veya
+`query_instrumentation_enabled` ayarı kullanılır; eşik `slow_query_threshold_ms`
+ayarıyla belirlenir.
+
+Şablonla birlikte son çağrının özgün SQL metni (`sample_sql`) de tutulur.
+İndeks danışmanı planı bu metinle çıkarır: normalize edilmiş şablondaki '?'
+işaretleri sabitlerden de geldiğinden parametreler yanlış yerlere bağlanır ve
+`is_invoiced = 0` gibi kısmi indeks koşulları eşleşmez.
+
+Parametre değerleri (şifre özetleri, müşteri bilgileri) varsayılan olarak
+saklanmaz. İndeks danışmanının sorguları örnek değerlerle oynatması için
+`keep_samples` ile (`PROSERVIS_QUERY_SAMPLES=1`) şablon başına son parametreler
+yalnızca bellekte tutulur. JSON dökümüne metin değerleri ve özgün SQL'deki
+metin sabitleri maskelenerek yazılır.
+"""
+
+import json
+import logging
+import os
+import re
+import threading
+from datetime import datetime
+from logging.handlers import RotatingFileHandler
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+# Histogram kova üst sınırları (milisaniye); son kova sınırsızdır.
+HISTOGRAM_BOUNDS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?\b")
+_PLACEHOLDER_LIST = re.compile(r"\bIN\s*\(\s*\?(?:\s*,\s*\?)+\s*\)", re.IGNORECASE)
+_WHITESPACE = re.compile(r"\s+")
+
+# Plan çıkarılabilecek ifade türleri (DDL, PRAGMA ve işlem komutları hariç)
+_EXPLAINABLE = ('SELECT', 'WITH', 'INSERT', 'UPDATE', 'DELETE', 'REPLACE')
+
+
+def normalize_sql(sql: str) -> str:
+    """Sabitleri '?' ile değiştirip boşlukları sadeleştirerek sorgunun şablonunu döndürür."""
+    text = _STRING_LITERAL.sub('?', sql)
+    text = _NUMBER_LITERAL.sub('?', text)
+    text = _WHITESPACE.sub(' ', text).strip().rstrip(';')
+    return _PLACEHOLDER_LIST.sub('IN (?, ...)', text)
+
+
+def is_explainable(sql: str) -> bool:
+    """Sorgu için EXPLAIN QUERY PLAN çalıştırılabilir mi?"""
+    return sql.lstrip().upper().startswith(_EXPLAINABLE)
+
+
+def count_placeholders(sql: str) -> int:
+    """Metin sabitlerinin dışındaki '?' işaretlerinin sayısı."""
+    return _STRING_LITERAL.sub('', sql).count('?')
+
+
+def _redact_sql(sql: Optional[str]) -> Optional[str]:
+    """Özgün SQL'deki metin sabitlerini maskeler; sayılar ve parametre yerleri korunur."""
+    return _STRING_LITERAL.sub("'?'", sql) if sql else sql
+
+
+def _redact(value: Any) -> Any:
+    """Dökümde sayılar kalır; metin ve ikili değerler maskelenir."""
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    return '?'
+
+
+class _StatementStats:
+    """Tek bir sorgu şablonu için toplanan istatistikler."""
+    __slots__ = ('sql', 'param_count', 'calls', 'total_ms', 'max_ms', 'rows', 'histogram', 'sample_sql',
+                 'sample_params')
+
+    def __init__(self, sql: str, param_count: int):
+        self.sql = sql
+        self.param_count = param_count
+        self.calls = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.rows = 0
+        self.histogram = [0] * (len(HISTOGRAM_BOUNDS_MS) + 1)
+        self.sample_sql: Optional[str] = None
+        self.sample_params: List[Any] = []
+
+    def add(self, elapsed_ms: float, rows: int, sql: str, params: Optional[Sequence[Any]]) -> None:
+        self.calls += 1
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+        self.rows += max(rows, 0)
+        for i, bound in enumerate(HISTOGRAM_BOUNDS_MS):
+            if elapsed_ms <= bound:
+                self.histogram[i] += 1
+                break
+        else:
+            self.histogram[-1] += 1
+        # İndeks danışmanının sorguyu yeniden oynatabilmesi için; parametreler özgün
+        # metinle aynı çağrıdan gelir, böylece yerleri birbirini tutar
+        self.sample_sql = sql
+        self.sample_params = list(params) if params is not None else []
+
+    def percentile(self, fraction: float) -> float:
+        """Histogramdan yaklaşık yüzdelik değeri (kova üst sınırı) döndürür."""
+        target = self.calls * fraction
+        seen = 0
+        for i, count in enumerate(self.histogram):
+            seen += count
+            if seen >= target and count:
+                return HISTOGRAM_BOUNDS_MS[i] if i < len(HISTOGRAM_BOUNDS_MS) else self.max_ms
+        return self.max_ms
+
+    def as_dict(self, redact: bool = False) -> Dict[str, Any]:
+        return {
+            'sql': self.sql,
+            'param_count': self.param_count,
+            'calls': self.calls,
+            'total_ms': round(self.total_ms, 3),
+            'avg_ms': round(self.total_ms / self.calls, 3) if self.calls else 0.0,
+            'max_ms': round(self.max_ms, 3),
+            'p50_ms': self.percentile(0.5),
+            'p95_ms': self.percentile(0.95),
+            'rows': self.rows,
+            'histogram': list(self.histogram),
+            'sample_sql': _redact_sql(self.sample_sql) if redact else self.sample_sql,
+            'sample_params': [_redact(p) for p in self.sample_params] if redact else list(self.sample_params),
+        }
+
+
+class QueryStats:
+    """
+    Sorgu şablonu başına süre histogramlarını bellekte tutar ve yavaş
+    sorguları plan çıktısıyla birlikte günlüğe yazar. Thread güvenlidir.
+    """
+
+    def __init__(self, slow_threshold_ms: float = 100.0, log_dir: Optional[str] = None,
+                 keep_samples: bool = False):
+        self.slow_threshold_ms = slow_threshold_ms
+        self.keep_samples = keep_samples
+        self._log_dir = log_dir or self._default_log_dir()
+        self._stats: Dict[str, _StatementStats] = {}
+        self._lock = threading.Lock()
+        self._slow_logger = self._create_slow_logger()
+
+    @staticmethod
+    def _default_log_dir() -> str:
+        log_file = os.getenv('PROSERVIS_LOG_FILE')
+        if log_file:
+            return os.path.dirname(log_file)
+        return os.path.join(os.getenv('APPDATA') or os.path.expanduser('~'), 'ProServis', 'logs')
+
+    def _create_slow_logger(self) -> logging.Logger:
+        slow_logger = logging.getLogger('proservis.slow_query')
+        if not slow_logger.handlers:
+            try:
+                os.makedirs(self._log_dir, exist_ok=True)
+                handler = RotatingFileHandler(
+                    os.path.join(self._log_dir, 'slow_queries.log'),
+                    maxBytes=2 * 1024 * 1024, backupCount=3, encoding='utf-8'
+                )
+                handler.setFormatter(logging.Formatter('%(asctime)s - %(message)s', datefmt='%Y-%m-%d %H:%M:%S'))
+                slow_logger.addHandler(handler)
+            except OSError as e:
+                logging.warning(f"Yavaş sorgu günlüğü açılamadı, ana günlük kullanılacak: {e}")
+        return slow_logger
+
+    def record(self, sql: str, params: Sequence[Any], rows: int, elapsed_s: float,
+               explain: Optional[Callable[[], List[str]]] = None) -> None:
+        """
+        Bir sorgu çalıştırmasını kaydeder.
+
+        Args:
+            sql: Çalıştırılan SQL metni.
+            params: Sorgu parametreleri.
+            rows: Dönen veya etkilenen satır sayısı.
+            elapsed_s: Geçen süre (saniye).
+            explain: Sorgu yavaşsa plan satırlarını döndürecek fonksiyon.
+        """
+        elapsed_ms = elapsed_s * 1000.0
+        params = params or ()
+        key = normalize_sql(sql)
+        with self._lock:
+            stats = self._stats.get(key)
+            if stats is None:
+                stats = self._stats[key] = _StatementStats(key, len(params))
+            stats.add(elapsed_ms, rows, sql, params if self.keep_samples else None)
+
+        if elapsed_ms >= self.slow_threshold_ms:
+            plan: List[str] = []
+            if explain and is_explainable(sql):
+                try:
+                    plan = explain()
+                except Exception as e:
+                    plan = [f"(plan alınamadı: {e})"]
+            plan_text = ''.join(f"\n    {line}" for line in plan)
+            self._slow_logger.warning(
+                f"{elapsed_ms:.1f} ms | {rows} satır | {len(params)} parametre | {key}{plan_text}"
+            )
+
+    def top(self, limit: int = 20, order_by: str = 'total_ms', redact: bool = False) -> List[Dict[str, Any]]:
+        """En çok maliyetli sorgu şablonlarını döndürür (total_ms, max_ms, calls, avg_ms...)."""
+        with self._lock:
+            rows = [s.as_dict(redact) for s in self._stats.values()]
+        rows.sort(key=lambda r: r.get(order_by, 0), reverse=True)
+        return rows[:limit]
+
+    def dump(self, path: Optional[str] = None) -> Optional[str]:
+        """Tüm istatistikleri JSON dosyasına yazar (parametre metinleri maskelenir) ve dosya yolunu döndürür."""
+        path = path or os.path.join(self._log_dir, f"query_stats_{datetime.now():%Y%m%d_%H%M%S}.json")
+        payload = {
+            'generated_at': datetime.now().isoformat(timespec='seconds'),
+            'slow_threshold_ms': self.slow_threshold_ms,
+            'histogram_bounds_ms': list(HISTOGRAM_BOUNDS_MS),
+            'statements': self.top(limit=len(self._stats) or 1, redact=True),
+        }
+        try:
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(payload, f, ensure_ascii=False, indent=2)
+            return path
+        except OSError as e:
+            logging.error(f"Sorgu istatistikleri yazılamadı: {e}")
+            return None
+
+    def reset(self) -> None:
+        """Toplanan istatistikleri temizler."""
+        with self._lock:
+            self._stats.clear()
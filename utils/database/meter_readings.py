@@ -0,0 +1,139 @@
+"""
+Sayaç okumaları zaman serisi.
+
+Kopya başı (CPC) cihazların sayaç okumaları `meter_readings` tablosunda
+tutulur ve (device_id, reading_ts) indeksiyle cihaz başına zaman sırasında
+okunur. Periyodik sayaç okumaları yalnızca bu tabloya yazılır; servis
+kayıtlarına girilen sayaçlar ise `service_records` üzerindeki
+tetikleyicilerle bu tabloya yansıtılır (`service_record_id` ile bağlı).
+Böylece servis sorguları okuma kayıtlarını ayıklamak zorunda kalmaz,
+faturalama da servis kayıtlarını taramaz.
+
+`meter_reading_deltas` görünümü her okumayı cihazın bir önceki okumasıyla
+pencere fonksiyonu (LAG) üzerinden eşleştirip dönem tüketimini verir.
+Görünüm cihaz başına bölümlendiği için `device_id` koşulları pencerenin
+içine indirilir ve yalnızca ilgili cihazların indeks aralıkları okunur.
+"""
+
+import logging
+import sqlite3
+
+READINGS_TABLE_DDL = """CREATE TABLE IF NOT EXISTS meter_readings (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    device_id INTEGER NOT NULL,
+    reading_ts TEXT NOT NULL,
+    bw_counter INTEGER,
+    color_counter INTEGER,
+    service_record_id INTEGER UNIQUE,
+    assigned_user_id INTEGER,
+    is_invoiced INTEGER DEFAULT 0,
+    related_invoice_id INTEGER,
+    FOREIGN KEY (device_id) REFERENCES customer_devices (id) ON DELETE CASCADE,
+    FOREIGN KEY (service_record_id) REFERENCES service_records (id) ON DELETE CASCADE,
+    FOREIGN KEY (assigned_user_id) REFERENCES users (id) ON DELETE SET NULL
+)"""
+
+READINGS_INDEX_DDL = "CREATE INDEX IF NOT EXISTS idx_meter_readings_device_ts ON meter_readings (device_id, reading_ts, id)"
+
+DELTAS_VIEW_DDL = """CREATE VIEW meter_reading_deltas AS
+    SELECT
+        id,
+        device_id,
+        reading_ts,
+        bw_counter,
+        color_counter,
+        is_invoiced,
+        related_invoice_id,
+        service_record_id,
+        LAG(reading_ts) OVER w AS prev_reading_ts,
+        COALESCE(LAG(bw_counter) OVER w, 0) AS prev_bw_counter,
+        COALESCE(LAG(color_counter) OVER w, 0) AS prev_color_counter,
+        COALESCE(bw_counter, 0) - COALESCE(LAG(bw_counter) OVER w, 0) AS bw_usage,
+        COALESCE(color_counter, 0) - COALESCE(LAG(color_counter) OVER w, 0) AS color_usage
+    FROM meter_readings
+    WINDOW w AS (PARTITION BY device_id ORDER BY reading_ts, id)"""
+
+# Sayaç değeri girilmiş servis kayıtları okuma olarak yansıtılır. Formda boş
+# bırakılan sayaçlar 0 olarak kaydedildiği için 0 okuma sayılmaz.
+_HAS_COUNTER = "{row}.device_id IS NOT NULL AND (COALESCE({row}.bw_counter, 0) > 0 OR COALESCE({row}.color_counter, 0) > 0)"
+
+_UPSERT_FROM_SERVICE = """INSERT INTO meter_readings (device_id, reading_ts, bw_counter, color_counter, service_record_id, assigned_user_id)
+    SELECT NEW.device_id, COALESCE(NEW.created_date, datetime('now', 'localtime')), NEW.bw_counter, NEW.color_counter, NEW.id, NEW.assigned_user_id
+    WHERE {condition}
+    ON CONFLICT (service_record_id) DO UPDATE SET
+        device_id = excluded.device_id, reading_ts = excluded.reading_ts,
+        bw_counter = excluded.bw_counter, color_counter = excluded.color_counter"""
+
+# (ad, olay, gövde ifadeleri)
+TRIGGERS = [
+    ('trg_meter_service_ins', 'AFTER INSERT ON service_records',
+     [_UPSERT_FROM_SERVICE.format(condition=_HAS_COUNTER.format(row='NEW'))]),
+    ('trg_meter_service_upd', 'AFTER UPDATE OF device_id, created_date, bw_counter, color_counter ON service_records',
+     [f"DELETE FROM meter_readings WHERE service_record_id = NEW.id AND NOT ({_HAS_COUNTER.format(row='NEW')})",
+      _UPSERT_FROM_SERVICE.format(condition=_HAS_COUNTER.format(row='NEW'))]),
+    ('trg_meter_service_del', 'AFTER DELETE ON service_records',
+     ["DELETE FROM meter_readings WHERE service_record_id = OLD.id"]),
+]
+
+PERIODIC_READING_DESCRIPTION = 'Periyodik Sayaç Okuma'
+
+
+def create_meter_readings_schema(conn: sqlite3.Connection) -> None:
+    """Tabloyu, indeksi, tüketim görünümünü ve servis kaydı tetikleyicilerini oluşturur."""
+    conn.execute(READINGS_TABLE_DDL)
+    conn.execute(READINGS_INDEX_DDL)
+    conn.execute("DROP VIEW IF EXISTS meter_reading_deltas")
+    conn.execute(DELTAS_VIEW_DDL)
+    for name, event, statements in TRIGGERS:
+        conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+        body = ";\n".join(statements)
+        conn.execute(f"CREATE TRIGGER {name} {event}\nBEGIN\n{body};\nEND")
+
+
+def move_service_readings(conn: sqlite3.Connection) -> int:
+    """
+    Servis kayıtlarındaki sayaç okumalarını `meter_readings` tablosuna taşır.
+
+    "Periyodik Sayaç Okuma" kayıtları aynı kimlikle taşınıp servis
+    kayıtlarından silinir; eski CPC faturalarının details_json içinde
+    sakladığı kayıt kimlikleri böylece okuma kimlikleriyle eşleşmeye devam
+    eder. Cihazı bulunmayan (device_id boş veya silinmiş) okumalar
+    taşınamaz; kaybolmasınlar diye servis kayıtlarında bırakılıp loglanır.
+    Sayaç girilmiş gerçek servis kayıtları ise yansıtılır.
+
+    Returns:
+        Taşınan periyodik okuma sayısı.
+    """
+    movable = """problem_description = ? AND device_id IS NOT NULL
+                 AND device_id IN (SELECT id FROM customer_devices)"""
+    moved = conn.execute(
+        f"""INSERT INTO meter_readings (id, device_id, reading_ts, bw_counter, color_counter,
+                                        assigned_user_id, is_invoiced, related_invoice_id)
+            SELECT id, device_id, COALESCE(created_date, datetime('now', 'localtime')), bw_counter, color_counter,
+                   assigned_user_id, COALESCE(is_invoiced, 0), related_invoice_id
+            FROM service_records
+            WHERE {movable}""",
+        (PERIODIC_READING_DESCRIPTION,)
+    ).rowcount
+    # Yeni okuma kimlikleri eski servis kaydı kimlikleriyle çakışmasın
+    last_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM service_records").fetchone()[0]
+    if not conn.execute("SELECT 1 FROM sqlite_sequence WHERE name = 'meter_readings'").fetchone():
+        conn.execute("INSERT INTO sqlite_sequence (name, seq) VALUES ('meter_readings', 0)")
+    conn.execute("UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = 'meter_readings'", (last_id,))
+    conn.execute(f"DELETE FROM service_records WHERE {movable}", (PERIODIC_READING_DESCRIPTION,))
+    orphans = [row[0] for row in conn.execute(
+        "SELECT id FROM service_records WHERE problem_description = ? ORDER BY id", (PERIODIC_READING_DESCRIPTION,))]
+    if orphans:
+        logging.warning(f"Cihazı bulunmayan {len(orphans)} periyodik sayaç okuması taşınmadı, servis kayıtlarında "
+                        f"bırakıldı (id: {', '.join(map(str, orphans[:20]))}{', ...' if len(orphans) > 20 else ''})")
+    conn.execute(
+        f"""INSERT INTO meter_readings (device_id, reading_ts, bw_counter, color_counter, service_record_id,
+                                        assigned_user_id, is_invoiced)
+            SELECT sr.device_id, COALESCE(sr.created_date, datetime('now', 'localtime')), sr.bw_counter, sr.color_counter,
+                   sr.id, sr.assigned_user_id, COALESCE(sr.is_invoiced, 0)
+            FROM service_records sr
+            WHERE {_HAS_COUNTER.format(row='sr')}
+              AND sr.device_id IN (SELECT id FROM customer_devices)
+            ON CONFLICT (service_record_id) DO NOTHING"""
+    )
+    return moved
@@ -0,0 +1,118 @@
+"""
+Numaralı şema migrasyonları.
+
+Her migrasyon adımı bir sürüm numarası taşır ve tek bir işlem (transaction)
+içinde, `PRAGMA user_version` güncellemesiyle birlikte uygulanır. Adım yarıda
+kalırsa hiçbir değişikliği kalıcı olmaz ve bir sonraki açılışta yeniden denenir.
+
+Şema bilgisi (tablolar ve sütunlar) çalıştırma başında tek sorguyla okunur ve
+`SchemaCache` içinde tutulur; sütun eklemek için her seferinde
+`PRAGMA table_info` çağrılmaz.
+"""
+
+import logging
+import sqlite3
+from dataclasses import dataclass
+from time import perf_counter
+from typing import Any, Callable, ContextManager, Dict, List, Set
+
+
+class SchemaCache:
+    """Veritabanındaki tablo ve sütun adlarının önbelleği."""
+
+    def __init__(self, conn: sqlite3.Connection):
+        self._columns: Dict[str, Set[str]] = {}
+        rows = conn.execute("""
+            SELECT m.name AS table_name, p.name AS column_name
+            FROM sqlite_master m
+            LEFT JOIN pragma_table_info(m.name) p
+            WHERE m.type = 'table'
+        """).fetchall()
+        for table_name, column_name in rows:
+            columns = self._columns.setdefault(table_name.lower(), set())
+            if column_name:
+                columns.add(column_name.lower())
+
+    def has_table(self, table_name: str) -> bool:
+        return table_name.lower() in self._columns
+
+    def has_column(self, table_name: str, column_name: str) -> bool:
+        return column_name.lower() in self._columns.get(table_name.lower(), ())
+
+    def _load_table(self, conn: sqlite3.Connection, table_name: str) -> None:
+        rows = conn.execute("SELECT name FROM pragma_table_info(?)", (table_name,)).fetchall()
+        self._columns[table_name.lower()] = {row[0].lower() for row in rows}
+
+    def create_table(self, conn: sqlite3.Connection, table_name: str, ddl: str) -> bool:
+        """Tablo yoksa oluşturur. Oluşturulduysa True döner."""
+        if self.has_table(table_name):
+            return False
+        conn.execute(ddl)
+        self._load_table(conn, table_name)
+        return True
+
+    def rename_table(self, conn: sqlite3.Connection, old_name: str, new_name: str) -> None:
+        conn.execute(f"ALTER TABLE {old_name} RENAME TO {new_name}")
+        self._columns[new_name.lower()] = self._columns.pop(old_name.lower(), set())
+
+    def add_column(self, conn: sqlite3.Connection, table_name: str, column_name: str, column_type: str) -> bool:
+        """Tablo mevcutsa ve sütun yoksa ekler. Sütun eklendiyse True döner."""
+        if not self.has_table(table_name) or self.has_column(table_name, column_name):
+            return False
+        conn.execute(f"ALTER TABLE {table_name} ADD COLUMN {column_name} {column_type}")
+        self._columns[table_name.lower()].add(column_name.lower())
+        logging.info(f"'{table_name}' tablosuna '{column_name}' sütunu eklendi.")
+        return True
+
+
+@dataclass
+class Migration:
+    """Tek bir numaralı migrasyon adımı."""
+    version: int
+    description: str
+    apply: Callable[[sqlite3.Connection, SchemaCache], None]
+
+
+def run_migrations(transaction: Callable[[], ContextManager[sqlite3.Connection]],
+                   migrations: List[Migration], current_version: int) -> List[Dict[str, Any]]:
+    """
+    `current_version` sonrasındaki adımları sırayla uygular.
+
+    Args:
+        transaction: Yazıcı bağlantısında işlem açan bağlam yöneticisi
+            (`DatabaseManager.transaction`).
+        migrations: Sürüme göre sıralı migrasyon listesi.
+        current_version: Veritabanının mevcut `user_version` değeri.
+
+    Returns:
+        Her adım için sürüm, açıklama, süre ve durum bilgisini içeren rapor.
+        Bir adım başarısız olursa sonraki adımlar çalıştırılmaz.
+    """
+    pending = [m for m in migrations if m.version > current_version]
+    report: List[Dict[str, Any]] = []
+    if not pending:
+        return report
+
+    with transaction() as conn:
+        schema = SchemaCache(conn)
+
+    total_started = perf_counter()
+    for migration in pending:
+        started = perf_counter()
+        try:
+            with transaction() as conn:
+                migration.apply(conn, schema)
+                conn.execute(f"PRAGMA user_version = {int(migration.version)}")
+        except Exception as e:
+            elapsed = perf_counter() - started
+            report.append({'version': migration.version, 'description': migration.description,
+                           'seconds': round(elapsed, 3), 'ok': False, 'error': str(e)})
+            logging.error(f"Migrasyon {migration.version} ({migration.description}) başarısız: {e}", exc_info=True)
+            break
+        elapsed = perf_counter() - started
+        report.append({'version': migration.version, 'description': migration.description,
+                       'seconds': round(elapsed, 3), 'ok': True})
+        logging.info(f"Migrasyon {migration.version} ({migration.description}): {elapsed * 1000:.1f} ms")
+
+    logging.info(f"{len(report)} migrasyon adımı {(perf_counter() - total_started) * 1000:.1f} ms içinde işlendi.")
+    return report
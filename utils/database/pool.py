@@ -0,0 +1,284 @@
+"""
+SQLite bağlantı havuzu.
+
+Her iş parçacığına (UI, döviz kuru, senkronizasyon, yedekleme) kendi okuma
+bağlantısını verir; tüm yazma işlemleri ise tek bir yazıcı bağlantısı
+üzerinden, bir kilit arkasında sıralı olarak yürütülür. Böylece arka plan
+işleri UI sorgularını bekletmez ve aynı bağlantı üzerindeki imleçler
+birbirine karışmaz.
+"""
+
+import sqlite3
+import threading
+import logging
+from contextlib import ExitStack, contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional
+
+
+class ConnectionPool:
+    """
+    Thread başına okuma bağlantısı ve tek bir seri yazıcı bağlantısı yönetir.
+
+    Yazma kilidini tutan iş parçacığı okumalarını da yazıcı bağlantısı
+    üzerinden yapar; böylece kendi açık işlemindeki henüz commit edilmemiş
+    değişiklikleri görür.
+    """
+
+    def __init__(self, db_path: str, timeout: float = 30.0,
+                 configure: Optional[Callable[[sqlite3.Connection, bool], None]] = None,
+                 writer_cached_statements: int = 128):
+        """
+        Args:
+            db_path: SQLite veritabanı dosyası.
+            timeout: Kilitli veritabanında beklenecek süre (saniye).
+            configure: Her yeni bağlantı açıldığında çağrılır: (bağlantı, yazıcı_mı).
+            writer_cached_statements: Yazıcı bağlantının hazırlanmış ifade önbelleği boyutu.
+        """
+        self._db_path = db_path
+        self._timeout = timeout
+        self._configure = configure
+        self._writer_cached_statements = writer_cached_statements
+        self._local = threading.local()
+        self._readers: Dict[int, sqlite3.Connection] = {}
+        self._readers_lock = threading.Lock()
+        self._write_lock = threading.RLock()
+        self._write_owner: Optional[int] = None
+        self._write_depth = 0
+        self._writer: Optional[sqlite3.Connection] = None
+
+    @property
+    def db_path(self) -> str:
+        return self._db_path
+
+    def _open(self, is_writer: bool) -> sqlite3.Connection:
+        """Yeni bir SQLite bağlantısı açar ve yapılandırır."""
+        # check_same_thread=False: close_all() bağlantıları başka bir thread'den kapatabilmeli
+        extra = {'cached_statements': self._writer_cached_statements} if is_writer else {}
+        conn = sqlite3.connect(self._db_path, timeout=self._timeout, check_same_thread=False, **extra)
+        conn.row_factory = sqlite3.Row  # Sütun adlarıyla erişim için
+        if self._configure:
+            self._configure(conn, is_writer)
+        return conn
+
+    @property
+    def writer(self) -> sqlite3.Connection:
+        """Yazıcı bağlantısını döndürür (gerekirse açar)."""
+        if self._writer is None:
+            with self._write_lock:
+                if self._writer is None:
+                    self._writer = self._open(is_writer=True)
+        return self._writer
+
+    def holds_write_lock(self) -> bool:
+        """Çağıran iş parçacığı yazma kilidini tutuyor mu?"""
+        return self._write_owner == threading.get_ident()
+
+    def reader(self) -> sqlite3.Connection:
+        """Çağıran iş parçacığına ait okuma bağlantısını döndürür."""
+        if self.holds_write_lock():
+            return self.writer
+
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            return conn
+
+        # Qt (QThread/QThreadPool) thread'leri threading.enumerate() içinde görünmez;
+        # current_thread() onları kaydeder, böylece bağlantıları "ölü" sanılıp kapatılmaz.
+        threading.current_thread()
+        conn = self._open(is_writer=False)
+        self._local.conn = conn
+        with self._readers_lock:
+            # Sonlanmış bir thread'in kimliği yeniden kullanılmış olabilir
+            stale = self._readers.pop(threading.get_ident(), None)
+            if stale is not None:
+                stale.close()
+            self._readers[threading.get_ident()] = conn
+            self._prune_dead_readers()
+        return conn
+
+    def _prune_dead_readers(self) -> None:
+        """Sonlanmış iş parçacıklarına ait okuma bağlantılarını kapatır."""
+        alive = {t.ident for t in threading.enumerate()}
+        for ident in [i for i in self._readers if i not in alive]:
+            try:
+                self._readers.pop(ident).close()
+            except sqlite3.Error:
+                pass
+
+    @contextmanager
+    def write(self) -> Iterator[sqlite3.Connection]:
+        """
+        Yazma kilidini alır ve yazıcı bağlantısını verir.
+        Kilit yeniden girilebilirdir (aynı thread iç içe kullanabilir).
+        """
+        with self._write_lock:
+            self._write_owner = threading.get_ident()
+            self._write_depth += 1
+            try:
+                yield self.writer
+            finally:
+                self._write_depth -= 1
+                if self._write_depth == 0:
+                    self._write_owner = None
+
+    def hold_write(self) -> None:
+        """
+        Yazma kilidini `release_held_write()` ile bırakılana kadar tutar.
+        Kilit zaten bu thread'deyse (ör. transaction() içinde) bir şey yapmaz;
+        kilidi bırakmak dıştaki sahibin işidir.
+        """
+        if getattr(self._local, 'held', None) is not None or self.holds_write_lock():
+            return
+        stack = ExitStack()
+        writer = stack.enter_context(self.write())
+        self._local.held = stack
+        self._local.held_changes = writer.total_changes
+
+    def release_held_write(self, on_changed: Optional[Callable[[sqlite3.Connection], None]] = None) -> None:
+        """
+        `hold_write()` ile tutulan kilidi, yazıcıda açık işlem kalmadıysa bırakır.
+        Kilit tutulurken satır değiştiyse önce `on_changed(yazıcı)` çağrılır.
+        """
+        stack = getattr(self._local, 'held', None)
+        if stack is None or (self._writer is not None and self._writer.in_transaction):
+            return
+        self._local.held = None
+        with stack:
+            if on_changed and self._writer is not None and self._writer.total_changes != self._local.held_changes:
+                on_changed(self._writer)
+
+    @contextmanager
+    def try_write(self) -> Iterator[Optional[sqlite3.Connection]]:
+        """`write()` gibi; kilit başka bir thread'deyse beklemeden None verir."""
+        if not self._write_lock.acquire(blocking=False):
+            yield None
+            return
+        try:
+            self._write_owner = threading.get_ident()
+            self._write_depth += 1
+            try:
+                yield self.writer
+            finally:
+                self._write_depth -= 1
+                if self._write_depth == 0:
+                    self._write_owner = None
+        finally:
+            self._write_lock.release()
+
+    def close_all(self) -> None:
+        """Havuzdaki tüm bağlantıları kapatır."""
+        with self._write_lock:
+            with self._readers_lock:
+                for conn in self._readers.values():
+                    try:
+                        conn.close()
+                    except sqlite3.Error as e:
+                        logging.warning(f"Okuma bağlantısı kapatılamadı: {e}")
+                self._readers.clear()
+            self._local = threading.local()
+            if self._writer is not None:
+                try:
+                    self._writer.close()
+                except sqlite3.Error as e:
+                    logging.warning(f"Yazıcı bağlantısı kapatılamadı: {e}")
+                self._writer = None
+
+
+class LockedCursor:
+    """`LockedConnection.cursor()` imleci; her çağrı yazma kilidi altında yapılır."""
+
+    def __init__(self, owner: 'LockedConnection', cursor: sqlite3.Cursor):
+        object.__setattr__(self, '_owner', owner)
+        object.__setattr__(self, '_cursor', cursor)
+
+    def execute(self, *args) -> 'LockedCursor':
+        self._owner._call(self._cursor.execute, *args)
+        return self
+
+    def executemany(self, *args) -> 'LockedCursor':
+        self._owner._call(self._cursor.executemany, *args)
+        return self
+
+    def executescript(self, *args) -> 'LockedCursor':
+        self._owner._call(self._cursor.executescript, *args)
+        return self
+
+    def fetchone(self):
+        return self._owner._call(self._cursor.fetchone)
+
+    def fetchmany(self, *args):
+        return self._owner._call(self._cursor.fetchmany, *args)
+
+    def fetchall(self):
+        return self._owner._call(self._cursor.fetchall)
+
+    def __iter__(self):
+        return iter(self.fetchall())
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._cursor, name)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        setattr(self._cursor, name, value)
+
+
+class LockedConnection:
+    """
+    Eski kodun (`DatabaseManager.get_connection()`) kullandığı yazıcı bağlantısı.
+
+    Her çağrı yazma kilidini alır. Çağrıdan sonra açık işlem kalmışsa (DML,
+    BEGIN veya `with conn:` bloğu) kilit, işlem commit/rollback edilene kadar
+    bu thread'de tutulur. Böylece diğer thread'lerin yazmaları yarım kalmış
+    işleme karışmaz ve onu commit etmez.
+    """
+
+    def __init__(self, pool: ConnectionPool, on_changed: Optional[Callable[[sqlite3.Connection], None]] = None):
+        self._pool = pool
+        self._on_changed = on_changed
+
+    def _call(self, func: Callable, *args) -> Any:
+        self._pool.hold_write()
+        try:
+            return func(*args)
+        finally:
+            self._pool.release_held_write(self._on_changed)
+
+    @property
+    def in_transaction(self) -> bool:
+        return self._pool.writer.in_transaction
+
+    def cursor(self) -> LockedCursor:
+        return LockedCursor(self, self._call(self._pool.writer.cursor))
+
+    def execute(self, *args) -> LockedCursor:
+        return self.cursor().execute(*args)
+
+    def executemany(self, *args) -> LockedCursor:
+        return self.cursor().executemany(*args)
+
+    def executescript(self, *args) -> LockedCursor:
+        return self.cursor().executescript(*args)
+
+    def commit(self) -> None:
+        self._call(self._pool.writer.commit)
+
+    def rollback(self) -> None:
+        self._call(self._pool.writer.rollback)
+
+    def close(self) -> None:
+        """Yazıcı bağlantısı paylaşılır; kapatılmaz, yalnızca açık işlem geri alınır."""
+        if self._pool.holds_write_lock() and self._pool.writer.in_transaction:
+            self.rollback()
+
+    def __enter__(self) -> 'LockedConnection':
+        self._pool.hold_write()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        try:
+            self._pool.writer.__exit__(exc_type, exc, tb)
+        finally:
+            self._pool.release_held_write(self._on_changed)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._pool.writer, name)
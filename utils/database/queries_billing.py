@@ -7,11 +7,19 @@ finansal raporlama ile ilgili veritabanı işlemlerini eklemek için tasarlanmı
 
 import json
 import logging
+import os
 logger = logging.getLogger(__name__)
 import sqlite3
 from datetime import datetime
 from decimal import Decimal, InvalidOperation
-from typing import List, Dict, Any, Optional, Tuple
+from typing import List, Dict, Any, Optional, Sequence, Tuple
+
+from ..currency_converter import MissingRateError, require_rate
+from .cpc_billing import (BILLING_QUERY, DEVICES_QUERY, ITEM_FAILED, ITEM_PENDING, ITEM_SKIPPED, RENTAL_DEVICES_QUERY,
+                          RUN_DONE, RUN_PENDING, CpcBilling, invoice_lines, pdf_items, safe_file_name, serialize_details)
+from .dates import date_range, day_bounds, month_range
+from .dashboard_summary import SUMMARY_QUERY, fold_summary, rebuild_dashboard_summary
+from .records import Invoice
 
 # Logging yapılandırması
 
@@ -41,7 +49,7 @@ class BillingQueriesMixin:
             return False, "Veritabanı bağlantısı kurulamadı."
 
         try:
-            with conn:  # `with` bloğu transaction'ı otomatik yönetir (commit/rollback)
+            with self.transaction() as conn:  # commit/rollback (iç içe çağrılarda savepoint)
                 cursor = conn.cursor()
 
                 # Fatura toplamını ve para birimini hesapla
@@ -52,7 +60,7 @@ class BillingQueriesMixin:
                     item_currency = (item.get('currency', 'TL') or 'TL').strip().upper()
                     unit_price = Decimal(str(item.get('unit_price', 0)))
                     quantity = Decimal(str(item.get('quantity', 0)))
-                    rate = Decimal(str(rates.get(item_currency, 1.0))) if item_currency != 'TL' else Decimal('1')
+                    rate = require_rate(rates, item_currency)
                     unit_price_tl = unit_price * rate
                     total_tl = unit_price_tl * quantity
                     enriched = dict(item)
@@ -104,6 +112,9 @@ class BillingQueriesMixin:
         except sqlite3.IntegrityError as e:
             logging.error(f"Satış faturası oluşturulurken bütünlük hatası: {e}", exc_info=True)
             return False, "Girilen seri numaralarından biri zaten başka bir müşteriye kayıtlı."
+        except MissingRateError as e:
+            logging.warning(f"Satış faturası oluşturulmadı: {e}")
+            return False, str(e)
         except Exception as e:
             logging.error(f"Satış faturası oluşturma hatası: {e}", exc_info=True)
             return False, f"Beklenmedik bir hata oluştu: {e}"
@@ -117,7 +128,7 @@ class BillingQueriesMixin:
         rates = self.get_exchange_rates()
         for item in items:
             item_currency = (item.get('currency', 'TL') or 'TL').strip().upper()
-            rate = Decimal(str(rates.get(item_currency, 1.0))) if item_currency != 'TL' else Decimal('1')
+            rate = require_rate(rates, item_currency)
             quantity = Decimal(str(item.get('quantity', 0)))
             unit_price = Decimal(str(item.get('unit_price', 0)))
             tax_rate = Decimal(str(item.get('tax_rate', 20)))
@@ -218,38 +229,11 @@ class BillingQueriesMixin:
         conn = self.get_connection()
         if not conn: return False
         try:
-            with conn:
-                cursor = conn.cursor()
-                invoice_date = datetime.now().strftime("%Y-%m-%d")
-                
-                # Eski `cpc_invoices` tablosuna kayıt
-                legacy_query = "INSERT INTO cpc_invoices (location_id, billing_period_start, billing_period_end, invoice_date, total_amount_tl, details_json) VALUES (?, ?, ?, ?, ?, ?)"
-                legacy_params = (location_id, start_date, end_date, invoice_date, total_tl, details_json)
-                cursor.execute(legacy_query, legacy_params)
-                legacy_invoice_id = cursor.lastrowid
-                if not legacy_invoice_id:
-                    raise Exception("CPC fatura ID'si alınamadı.")
-
-                # Lokasyon bilgilerini al
-                location_info = self.fetch_one("SELECT customer_id FROM customer_locations WHERE id = ?", (location_id,))
-                customer_id = location_info['customer_id'] if location_info else None
-                
-                # Merkezi `invoices` tablosuna kayıt
-                central_query = "INSERT INTO invoices (customer_id, invoice_type, related_id, invoice_date, total_amount, currency, details_json, notes) VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
-                central_params = (customer_id, 'Kopya Başı', legacy_invoice_id, invoice_date, total_tl, 'TL', details_json, f"Dönem: {start_date} - {end_date}")
-                cursor.execute(central_query, central_params)
-            
-            # İlgili sayaç kayıtlarını faturalandırıldı olarak işaretle
-            data = json.loads(details_json)
-            device_ids = [item.get('device_id') for item in data if item.get('device_id')]
-            if device_ids:
-                update_query = """
-                    UPDATE service_records
-                    SET is_invoiced = 1
-                    WHERE device_id IN ({}) 
-                    AND created_date BETWEEN ? AND ?
-                """.format(','.join('?' * len(device_ids)))
-                cursor.execute(update_query, device_ids + [start_date, end_date])
+            # Lokasyon bilgilerini al
+            location_info = self.fetch_one("SELECT customer_id FROM customer_locations WHERE id = ?", (location_id,))
+            customer_id = location_info['customer_id'] if location_info else None
+            with self.transaction() as conn:
+                legacy_invoice_id, _ = self._insert_cpc_invoice(conn.cursor(), location_id, customer_id, start_date, end_date, total_tl, details_json)
             
             logging.info(f"CPC Faturası (eski ID: {legacy_invoice_id}) başarıyla oluşturuldu.")
             return True
@@ -257,201 +241,225 @@ class BillingQueriesMixin:
             logging.error(f"CPC Fatura oluşturma hatası: {e}", exc_info=True)
             return False
 
-    def get_dashboard_stats(self) -> Dict[str, int]:
-        """Ana panel için temel servis istatistiklerini alır.
-        
-        Not: CPC sayaç okumaları (is_cpc=1 olan cihazlara ait kayıtlar veya 
-        "Periyodik Sayaç Okuma" problem tanımlı kayıtlar) servis sayılarına dahil edilmez.
+    def _insert_cpc_invoice(self, cursor: sqlite3.Cursor, location_id: int, customer_id: Optional[int], start_date: str,
+                            end_date: str, total_tl: float, details_json: str) -> Tuple[int, int]:
         """
-        stats = {'monthly_new': 0, 'on_repair': 0, 'awaiting_part': 0, 'awaiting_approval': 0}
+        CPC faturasını açık işlem içinde yazar ve dönemin sayaç okumalarını faturalandı olarak işaretler.
+
+        Returns:
+            (eski `cpc_invoices` ID'si, merkezi `invoices` ID'si)
+        """
+        invoice_date = datetime.now().strftime("%Y-%m-%d")
         
-        try:
-            # CPC sayaç okumalarını hariç tutan temel filtre
-            # is_cpc=0 olan cihazlara ait veya problem_description "Periyodik Sayaç Okuma" olmayan kayıtlar
-            cpc_filter = """
-                AND (
-                    sr.problem_description IS NULL 
-                    OR sr.problem_description NOT LIKE '%Periyodik Sayaç Okuma%'
-                )
-                AND (
-                    cd.is_cpc IS NULL 
-                    OR cd.is_cpc = 0
-                )
-            """
-            
-            # Bu ay açılan gerçek servis sayısı (CPC sayaç okumaları hariç)
-            monthly_query = f"""
-                SELECT COUNT(*) FROM service_records sr
-                LEFT JOIN customer_devices cd ON sr.device_id = cd.id
-                WHERE strftime('%Y-%m', sr.created_date) = strftime('%Y-%m', 'now')
-                {cpc_filter}
-            """
-            result = self.fetch_one(monthly_query)
-            if result:
-                stats['monthly_new'] = result[0]
-                logging.info(f"Dashboard: Bu ay açılan servis sayısı = {result[0]} (CPC hariç)")
-
-            # Onarımda bekleyen: İşleme alındı veya Servise alındı durumundaki servisler (CPC hariç)
-            on_repair_query = f"""
-                SELECT COUNT(*) FROM service_records sr
-                LEFT JOIN customer_devices cd ON sr.device_id = cd.id
-                WHERE sr.status IN ('İşleme alındı', 'Servise alındı')
-                {cpc_filter}
-            """
-            result = self.fetch_one(on_repair_query)
-            if result:
-                stats['on_repair'] = result[0]
-
-            # Parça bekleyen servisler (CPC hariç)
-            awaiting_part_query = f"""
-                SELECT COUNT(*) FROM service_records sr
-                LEFT JOIN customer_devices cd ON sr.device_id = cd.id
-                WHERE sr.status = 'Parça bekleniyor'
-                {cpc_filter}
-            """
-            result = self.fetch_one(awaiting_part_query)
-            if result:
-                stats['awaiting_part'] = result[0]
-
-            # Müşteri onayı bekleyen servisler (CPC hariç)
-            awaiting_approval_query = f"""
-                SELECT COUNT(*) FROM service_records sr
-                LEFT JOIN customer_devices cd ON sr.device_id = cd.id
-                WHERE sr.status = 'Müşteri Onayı Alınacak'
-                {cpc_filter}
-            """
-            result = self.fetch_one(awaiting_approval_query)
-            if result:
-                stats['awaiting_approval'] = result[0]
-
-            logging.info(f"Dashboard stats: {stats}")
+        # Eski `cpc_invoices` tablosuna kayıt
+        legacy_query = "INSERT INTO cpc_invoices (location_id, billing_period_start, billing_period_end, invoice_date, total_amount_tl, details_json) VALUES (?, ?, ?, ?, ?, ?)"
+        legacy_params = (location_id, start_date, end_date, invoice_date, total_tl, details_json)
+        cursor.execute(legacy_query, legacy_params)
+        legacy_invoice_id = cursor.lastrowid
+        if not legacy_invoice_id:
+            raise sqlite3.DatabaseError("CPC fatura ID'si alınamadı.")
+
+        # Merkezi `invoices` tablosuna kayıt
+        central_query = "INSERT INTO invoices (customer_id, invoice_type, related_id, invoice_date, total_amount, currency, details_json, notes) VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+        central_params = (customer_id, 'Kopya Başı', legacy_invoice_id, invoice_date, total_tl, 'TL', details_json, f"Dönem: {start_date} - {end_date}")
+        cursor.execute(central_query, central_params)
+        invoice_id = cursor.lastrowid
+
+        # Dönemdeki sayaç okumalarını bu faturayla faturalandırıldı olarak işaretle
+        data = json.loads(details_json)
+        device_ids = [item.get('device_id') for item in data if item.get('device_id')]
+        if device_ids:
+            period, period_params = date_range('reading_ts', start_date, end_date)
+            update_query = """
+                UPDATE meter_readings
+                SET is_invoiced = 1, related_invoice_id = ?
+                WHERE device_id IN ({}) 
+                AND {}
+            """.format(','.join('?' * len(device_ids)), period)
+            cursor.execute(update_query, [invoice_id] + device_ids + period_params)
+        return legacy_invoice_id, invoice_id
+
+    def get_rental_devices(self, customer_ids: Sequence[int]) -> List[sqlite3.Row]:
+        """Verilen müşterilerin aylık kiralama bedeli tanımlı cihazları."""
+        customer_ids = list(customer_ids)
+        if not customer_ids:
+            return []
+        return self.fetch_all(RENTAL_DEVICES_QUERY.format(','.join('?' * len(customer_ids))), customer_ids)
+
+    # --- Ay sonu toplu CPC faturalama ---
+
+    def create_cpc_billing_run(self, start_date: str, end_date: str, rates: Dict[str, Any], output_dir: str) -> Optional[int]:
+        """
+        Dönemde faturalanacak sayaç okuması olan tüm CPC müşterileri için faturaları tek işlemde oluşturur.
 
-        except Exception as e:
-            logging.error(f"Dashboard servis istatistikleri alınırken hata: {e}", exc_info=True)
-            
-        return stats
+        Her müşteri ilk lokasyonuna faturalanır; lokasyonu olmayan müşteriler
+        'Atlandı' olarak kaydedilir. PDF'ler daha sonra `get_cpc_billing_run_jobs`
+        ile alınan işlerden üretilir. İşlem yarıda kesilirse hiçbir fatura
+        oluşmaz ve okumalar faturalanmamış kalır.
+
+        Returns:
+            Toplu çalıştırma ID'si; hata durumunda None.
+        """
+        customer_ids = [row['customer_id'] for row in self.fetch_all(
+            "SELECT DISTINCT customer_id FROM customer_devices WHERE is_cpc = 1 AND is_free = 0 AND customer_id IS NOT NULL")]
+        billing = self.calculate_cpc_billing(customer_ids, start_date, end_date, rates)
+        rows_by_customer: Dict[int, List[Dict[str, Any]]] = {}
+        for row in billing.rows():
+            rows_by_customer.setdefault(row['customer_id'], []).append(row)
+        rentals_by_customer: Dict[int, List[sqlite3.Row]] = {}
+        for device in self.get_rental_devices(list(rows_by_customer)):
+            rentals_by_customer.setdefault(device['customer_id'], []).append(device)
+        locations = {row['customer_id']: row['location_id'] for row in self.fetch_all(
+            "SELECT customer_id, MIN(id) as location_id FROM customer_locations GROUP BY customer_id")}
+        names = {row['id']: row['name'] for row in self.fetch_all("SELECT id, name FROM customers")}
 
-    def get_dashboard_financial_stats(self) -> Dict[str, Any]:
-        """Ana panel için finansal istatistikleri (aylık ciro, ödemeler, bekleyen bakiye) alır."""
-        stats = {'total_invoiced': Decimal('0.0'), 'total_paid': Decimal('0.0'), 'invoice_count': 0, 'pending_balance': Decimal('0.0')}
         try:
-            rates = self.get_exchange_rates()
+            with self.transaction() as conn:
+                cursor = conn.cursor()
+                cursor.execute(
+                    "INSERT INTO cpc_billing_runs (period_start, period_end, output_dir, created_at, status) VALUES (?, ?, ?, ?, ?)",
+                    (start_date, end_date, output_dir, datetime.now().strftime('%Y-%m-%d %H:%M:%S'), RUN_PENDING))
+                run_id = cursor.lastrowid
+                for customer_id, rows in rows_by_customer.items():
+                    location_id = locations.get(customer_id)
+                    if not location_id:
+                        cursor.execute("INSERT INTO cpc_billing_run_items (run_id, customer_id, status, error) VALUES (?, ?, ?, ?)",
+                                       (run_id, customer_id, ITEM_SKIPPED, "Müşteriye ait lokasyon bulunamadı."))
+                        continue
+                    details, total_tl = invoice_lines(rows, rentals_by_customer.get(customer_id, []), rates, start_date, end_date)
+                    _, invoice_id = self._insert_cpc_invoice(cursor, location_id, customer_id, start_date, end_date,
+                                                             float(total_tl), serialize_details(details))
+                    file_name = f"cpc_fatura_{safe_file_name(names.get(customer_id, ''))}_{invoice_id}_{end_date}.pdf"
+                    cursor.execute("INSERT INTO cpc_billing_run_items (run_id, customer_id, invoice_id, pdf_path, status) VALUES (?, ?, ?, ?, ?)",
+                                   (run_id, customer_id, invoice_id, os.path.join(output_dir, file_name), ITEM_PENDING))
+            logging.info(f"Toplu CPC faturalama #{run_id}: {len(rows_by_customer)} müşteri için faturalar oluşturuldu ({start_date} - {end_date}).")
+            return run_id
+        except (sqlite3.Error, ValueError) as e:
+            logging.error(f"Toplu CPC faturalama oluşturulamadı: {e}", exc_info=True)
+            return None
 
-            # Bu ay faturalanan toplam tutar (fatura kesim tarihindeki kur + %20 vergi)
-            query_invoiced = "SELECT total_amount, currency, exchange_rate FROM invoices WHERE strftime('%Y-%m', invoice_date) = strftime('%Y-%m', 'now')"
-            all_invoices_this_month = self.fetch_all(query_invoiced)
-            
-            # DEBUG: Fatura sayısını logla
-            logging.info(f"Dashboard: Bu ay {len(all_invoices_this_month)} fatura bulundu")
-            
-            total_invoiced_tl = Decimal('0.0')
-            
-            for row in all_invoices_this_month:
-                amount = Decimal(str(row['total_amount']))
-                currency = row['currency']
-                saved_rate = row['exchange_rate'] if 'exchange_rate' in row.keys() else None  # Fatura kesildiğindeki kur
-                
-                # Eğer döviz ise TL'ye çevir (kaydedilmiş kur varsa onu kullan)
-                if currency and currency != 'TL':
-                    if saved_rate and saved_rate > 0:
-                        rate = Decimal(str(saved_rate))
-                    else:
-                        # Eski faturalar için güncel kuru kullan (fallback)
-                        rate = Decimal(str(rates.get(currency, 1.0)))
-                    amount_in_tl = amount * rate
-                else:
-                    amount_in_tl = amount
-                
-                # %20 vergi ekle
-                amount_with_tax = amount_in_tl * Decimal('1.20')
-                total_invoiced_tl += amount_with_tax
-            
-            stats['invoice_count'] = len(all_invoices_this_month)
-            stats['total_invoiced'] = total_invoiced_tl
+    def get_cpc_billing_run_jobs(self, run_id: int) -> List[Dict[str, Any]]:
+        """Toplu çalıştırmanın PDF'i henüz üretilmemiş (bekleyen veya hatalı) kalemleri için PDF işleri."""
+        rows = self.fetch_all("""
+            SELECT ri.id as item_id, ri.pdf_path, i.id as invoice_id, i.invoice_date, i.details_json, c.*
+            FROM cpc_billing_run_items ri
+            JOIN invoices i ON i.id = ri.invoice_id
+            JOIN customers c ON c.id = ri.customer_id
+            WHERE ri.run_id = ? AND ri.status IN (?, ?)
+            ORDER BY ri.id
+        """, (run_id, ITEM_PENDING, ITEM_FAILED))
+        company_info = self.get_all_company_info()
+        vat_rate = self.get_setting('default_vat_rate', 20)
+        jobs = []
+        for row in rows:
+            row = dict(row)
+            customer_info = {k: v for k, v in row.items() if k not in ('item_id', 'pdf_path', 'invoice_id', 'invoice_date', 'details_json')}
+            jobs.append({
+                'item_id': row['item_id'],
+                'customer_name': customer_info.get('name', ''),
+                'pdf_path': row['pdf_path'],
+                'pdf_data': {
+                    'id': row['invoice_id'],
+                    'invoice_date': row['invoice_date'],
+                    'customer_info': customer_info,
+                    'company_info': company_info,
+                    'items': pdf_items(json.loads(row['details_json'] or '[]')),
+                    'vat_rate': vat_rate,
+                    'currency': 'TL',
+                },
+            })
+        return jobs
 
-            # Bu ay alınan toplam ödeme (ödeme tarihindeki güncel kur + %20 vergi)
-            query_paid = "SELECT p.amount_paid, i.currency, i.exchange_rate FROM payments p JOIN invoices i ON p.invoice_id = i.id WHERE strftime('%Y-%m', p.payment_date) = strftime('%Y-%m', 'now')"
-            all_payments_this_month = self.fetch_all(query_paid)
-            total_paid_tl = Decimal('0.0')
-            
-            for row in all_payments_this_month:
-                amount = Decimal(str(row['amount_paid']))
-                currency = row['currency']
-                saved_rate = row['exchange_rate'] if 'exchange_rate' in row.keys() else None
-                
-                # Eğer döviz ise TL'ye çevir
-                if currency and currency != 'TL':
-                    if saved_rate and saved_rate > 0:
-                        rate = Decimal(str(saved_rate))
-                    else:
-                        rate = Decimal(str(rates.get(currency, 1.0)))
-                    amount_in_tl = amount * rate
-                else:
-                    amount_in_tl = amount
-                
-                # %20 vergi ekle
-                amount_with_tax = amount_in_tl * Decimal('1.20')
-                total_paid_tl += amount_with_tax
-            
-            stats['total_paid'] = total_paid_tl
+    def set_cpc_billing_run_item_status(self, item_id: int, status: str, error: Optional[str] = None) -> None:
+        """Toplu çalıştırma kaleminin PDF durumunu günceller."""
+        self.execute_query("UPDATE cpc_billing_run_items SET status = ?, error = ? WHERE id = ?", (status, error, item_id))
 
-            # Tüm zamanlardaki ödenmemiş bakiye (faturadaki kur + %20 vergi)
-            query_pending = "SELECT total_amount, paid_amount, currency, exchange_rate FROM invoices WHERE status != 'Ödendi'"
-            pending_invoices = self.fetch_all(query_pending)
-            total_pending_tl = Decimal('0.0')
-            
-            for row in pending_invoices:
-                total = Decimal(str(row['total_amount']))
-                paid = Decimal(str(row['paid_amount']))
-                remaining = total - paid
-                currency = row['currency']
-                saved_rate = row['exchange_rate'] if 'exchange_rate' in row.keys() else None
-                
-                # Eğer döviz ise TL'ye çevir
-                if currency and currency != 'TL':
-                    if saved_rate and saved_rate > 0:
-                        rate = Decimal(str(saved_rate))
-                    else:
-                        rate = Decimal(str(rates.get(currency, 1.0)))
-                    remaining_in_tl = remaining * rate
-                else:
-                    remaining_in_tl = remaining
-                
-                # %20 vergi ekle
-                remaining_with_tax = remaining_in_tl * Decimal('1.20')
-                total_pending_tl += remaining_with_tax
-            
-            stats['pending_balance'] = total_pending_tl
-        except (InvalidOperation, Exception) as e:
-            logging.error(f"Dashboard finansal istatistikleri alınırken hata: {e}", exc_info=True)
+    def finish_cpc_billing_run(self, run_id: int) -> bool:
+        """Bekleyen veya hatalı PDF kalmadıysa çalıştırmayı tamamlandı olarak işaretler."""
+        open_items = self.fetch_one("SELECT COUNT(*) FROM cpc_billing_run_items WHERE run_id = ? AND status IN (?, ?)",
+                                    (run_id, ITEM_PENDING, ITEM_FAILED))[0]
+        if open_items:
+            return False
+        self.execute_query("UPDATE cpc_billing_runs SET status = ?, finished_at = ? WHERE id = ?",
+                           (RUN_DONE, datetime.now().strftime('%Y-%m-%d %H:%M:%S'), run_id))
+        return True
+
+    def get_open_cpc_billing_runs(self) -> List[Dict[str, Any]]:
+        """PDF üretimi tamamlanmamış toplu çalıştırmalar (devam ettirilebilir), en yenisi önce."""
+        rows = self.fetch_all("""
+            SELECT r.id, r.period_start, r.period_end, r.output_dir, r.created_at,
+                   SUM(ri.status IN (?, ?)) as open_items, COUNT(ri.id) as total_items
+            FROM cpc_billing_runs r
+            LEFT JOIN cpc_billing_run_items ri ON ri.run_id = r.id
+            WHERE r.status = ?
+            GROUP BY r.id
+            ORDER BY r.id DESC
+        """, (ITEM_PENDING, ITEM_FAILED, RUN_PENDING))
+        return [dict(row) for row in rows]
+
+    def get_dashboard_summary(self) -> Dict[str, Dict[str, Any]]:
+        """Ana paneldeki tüm kart değerlerini `dashboard_summary` tablosundan tek sorguyla okur.
+
+        Dönen sözlük 'services', 'financial' ve 'customers' anahtarlarını içerir;
+        içerikleri `get_dashboard_stats`, `get_dashboard_financial_stats` ve
+        müşteri istatistikleriyle aynıdır.
+        """
+        now = datetime.now()
+        try:
+            rows = self.fetch_all(SUMMARY_QUERY, (now.strftime('%Y-%m'),))
+            return fold_summary(rows, now, self.get_exchange_rates)
+        except Exception as e:
+            logging.error(f"Gösterge paneli özeti okunurken hata: {e}", exc_info=True)
+            return fold_summary([], now)
+
+    def rebuild_dashboard_summary(self) -> bool:
+        """Gösterge paneli özetini kaynak tablolardan yeniden hesaplar (onarım için)."""
+        try:
+            with self.transaction() as conn:
+                rebuild_dashboard_summary(conn)
+            return True
+        except sqlite3.Error as e:
+            logging.error(f"Gösterge paneli özeti yeniden hesaplanamadı: {e}", exc_info=True)
+            return False
+
+    def get_dashboard_stats(self) -> Dict[str, int]:
+        """Ana panel için temel servis istatistiklerini alır.
         
-        # Sonuçları float'a çevirerek döndür (UI uyumluluğu için)
-        return {k: float(v) if isinstance(v, Decimal) else v for k, v in stats.items()}
+        Not: CPC sayaç okumaları (is_cpc=1 olan cihazlara ait kayıtlar veya 
+        "Periyodik Sayaç Okuma" problem tanımlı kayıtlar) servis sayılarına dahil edilmez.
+        """
+        return self.get_dashboard_summary()['services']
 
-    def get_invoices_for_current_month(self) -> List[Dict[str, Any]]:
+    def get_dashboard_financial_stats(self) -> Dict[str, Any]:
+        """Ana panel için finansal istatistikleri (aylık ciro, ödemeler, bekleyen bakiye) alır."""
+        return self.get_dashboard_summary()['financial']
+
+    def get_invoices_for_current_month(self) -> List[Invoice]:
         """İçinde bulunulan ay için oluşturulan tüm faturaları listeler."""
-        query = """
+        this_month, params = month_range('i.invoice_date')
+        query = f"""
             SELECT i.id, i.invoice_date, c.name, i.invoice_type, i.total_amount, i.currency, i.exchange_rate, i.status 
             FROM invoices i 
             JOIN customers c ON i.customer_id = c.id 
-            WHERE strftime('%Y-%m', i.invoice_date) = strftime('%Y-%m', 'now') 
+            WHERE {this_month}
             ORDER BY i.invoice_date DESC
         """
-        return [dict(row) for row in self.fetch_all(query)]
+        return self.fetch_all(query, params, record_type=Invoice)
 
     def get_payments_for_current_month(self) -> List[Dict[str, Any]]:
         """İçinde bulunulan ayda yapılan tüm ödemeleri listeler."""
-        query = """
+        this_month, params = month_range('p.payment_date')
+        query = f"""
             SELECT p.payment_date, c.name, p.invoice_id, p.amount_paid, i.currency, p.payment_method 
             FROM payments p 
             JOIN invoices i ON p.invoice_id = i.id 
             JOIN customers c ON i.customer_id = c.id 
-            WHERE strftime('%Y-%m', p.payment_date) = strftime('%Y-%m', 'now') 
+            WHERE {this_month}
             ORDER BY p.payment_date DESC
         """
-        return [dict(row) for row in self.fetch_all(query)]
+        return [dict(row) for row in self.fetch_all(query, params)]
 
-    def get_pending_invoices(self) -> List[Dict[str, Any]]:
+    def get_pending_invoices(self) -> List[Invoice]:
         """Durumu 'Ödendi' olmayan tüm faturaları ve kalan bakiyelerini listeler."""
         query = """
             SELECT i.id, i.invoice_date, c.name, i.total_amount, i.paid_amount, 
@@ -461,7 +469,7 @@ class BillingQueriesMixin:
             WHERE i.status != 'Ödendi' 
             ORDER BY i.invoice_date DESC
         """
-        return [dict(row) for row in self.fetch_all(query)]
+        return self.fetch_all(query, record_type=Invoice)
 
     def get_full_invoice_details(self, invoice_id: int) -> Optional[Dict[str, Any]]:
         """
@@ -605,7 +613,7 @@ class BillingQueriesMixin:
         try:
             items = invoice_dict.get('items', [])
             if isinstance(items, list) and items:
-                rates = self.get_exchange_rates()
+                rates = self.rates_on(invoice_dict.get('invoice_date'))
                 for item in items:
                     try:
                         item_currency = (item.get('currency', 'TL') or 'TL').strip().upper()
@@ -638,7 +646,7 @@ class BillingQueriesMixin:
         conn = self.get_connection()
         if not conn: return False
         try:
-            with conn:
+            with self.transaction() as conn:
                 cursor = conn.cursor()
                 
                 # Ödemeyi ekle
@@ -683,14 +691,12 @@ class BillingQueriesMixin:
         Ücretsiz cihazlar dahil edilmez.
         """
         query = """
-            WITH RankedServiceRecords AS (
-                SELECT *, ROW_NUMBER() OVER(PARTITION BY device_id ORDER BY created_date DESC, id DESC) as rn 
-                FROM service_records
-            ) 
             SELECT cd.id, cd.device_model as model, cd.serial_number, cd.device_type as type, cd.color_type, cd.is_cpc, 
-                   rsr.bw_counter, rsr.color_counter, rsr.created_date as last_update 
+                   mr.bw_counter, mr.color_counter, mr.reading_ts as last_update 
             FROM customer_devices cd 
-            LEFT JOIN RankedServiceRecords rsr ON cd.id = rsr.device_id AND rsr.rn = 1 
+            LEFT JOIN meter_readings mr ON mr.id = (
+                SELECT id FROM meter_readings WHERE device_id = cd.id ORDER BY reading_ts DESC, id DESC LIMIT 1
+            )
             WHERE cd.customer_id = ? AND cd.is_cpc = 1 AND cd.is_free = 0
             ORDER BY cd.device_model
         """
@@ -711,54 +717,28 @@ class BillingQueriesMixin:
     def get_billable_cpc_data(self, customer_id: int, start_date: str, end_date: str) -> List[Dict[str, Any]]:
         """
         Belirtilen müşteri ve tarih aralığı için faturalandırılabilir CPC verilerini hesaplar.
-        Bu fonksiyon, belirtilen tarih aralığındaki faturalandırılmamış sayaç okumalarını alır
-        ve her biri için bir önceki okumayla (tarih aralığı dışında olabilir) arasındaki farkı bularak tüketimi hesaplar.
+        Belirtilen tarih aralığındaki faturalandırılmamış sayaç okumalarını, her birinin bir önceki
+        okumayla (tarih aralığı dışında olabilir) arasındaki tüketimle birlikte `meter_reading_deltas`
+        görünümünden alır. Cihaz ID'leri sorguya sabit liste olarak verilir; SQLite bu koşulu görünümün
+        penceresine indirir ve yalnızca müşterinin cihazlarına ait okumaları indeks üzerinden okur
+        (alt sorgulu bir IN koşulu indirilmez).
         """
         logger.debug(f"DEBUG: get_billable_cpc_data çağrıldı - customer_id: {customer_id}, start_date: {start_date}, end_date: {end_date}")
         query = """
-            WITH AllRecords AS (
-                -- Müşterinin tüm CPC cihazlarına ait tüm servis kayıtlarını al
-                SELECT
-                    sr.id as record_id,
-                    sr.device_id,
-                    sr.created_date,
-                    sr.bw_counter,
-                    sr.color_counter,
-                    sr.is_invoiced,
-                    ROW_NUMBER() OVER (PARTITION BY sr.device_id ORDER BY sr.created_date, sr.id) as row_num
-                FROM service_records sr
-                JOIN customer_devices cd ON sr.device_id = cd.id
-                WHERE cd.customer_id = ? AND cd.is_cpc = 1 AND cd.is_free = 0
-            ),
-            RecordsWithPrevious AS (
-                -- Her kayıt için bir önceki kaydı bul (tarih aralığına bakılmaksızın)
-                SELECT
-                    ar.record_id,
-                    ar.device_id,
-                    ar.created_date,
-                    ar.bw_counter,
-                    ar.color_counter,
-                    ar.is_invoiced,
-                    COALESCE(prev_ar.bw_counter, 0) as prev_bw_counter,
-                    COALESCE(prev_ar.color_counter, 0) as prev_color_counter
-                FROM AllRecords ar
-                LEFT JOIN AllRecords prev_ar ON ar.device_id = prev_ar.device_id 
-                    AND prev_ar.row_num = ar.row_num - 1
-            )
             SELECT
-                rwp.record_id,
+                d.id as reading_id,
                 cd.id as device_id,
                 cd.device_model as model,
                 cd.serial_number,
                 cd.color_type,
-                rwp.created_date,
-                rwp.bw_counter,
-                rwp.color_counter,
-                rwp.prev_bw_counter,
-                rwp.prev_color_counter,
-                (rwp.bw_counter - rwp.prev_bw_counter) as bw_usage,
+                d.reading_ts as created_date,
+                d.bw_counter,
+                d.color_counter,
+                d.prev_bw_counter,
+                d.prev_color_counter,
+                d.bw_usage,
                 CASE
-                    WHEN cd.color_type = 'Renkli' THEN (rwp.color_counter - rwp.prev_color_counter)
+                    WHEN cd.color_type = 'Renkli' THEN d.color_usage
                     ELSE 0
                 END as color_usage,
                 cd.cpc_bw_price,
@@ -768,19 +748,25 @@ class BillingQueriesMixin:
                 0.0 as rental_fee,
                 'TRY' as rental_currency,
                 cd.customer_id
-            FROM RecordsWithPrevious rwp
-            JOIN customer_devices cd ON rwp.device_id = cd.id
+            FROM meter_reading_deltas d
+            JOIN customer_devices cd ON d.device_id = cd.id
             WHERE
-                rwp.is_invoiced = 0
-                AND rwp.created_date >= ?
-                AND rwp.created_date <= ?
-                AND ( (rwp.bw_counter - rwp.prev_bw_counter) > 0 OR (cd.color_type = 'Renkli' AND (rwp.color_counter - rwp.prev_color_counter) > 0) )
-            ORDER BY cd.device_model, rwp.created_date;
+                d.device_id IN ({})
+                AND d.is_invoiced = 0
+                AND d.reading_ts >= ?
+                AND d.reading_ts < ?
+                AND ( d.bw_usage > 0 OR (cd.color_type = 'Renkli' AND d.color_usage > 0) )
+            ORDER BY cd.device_model, d.reading_ts;
         """
-        end_date_full = end_date + " 23:59:59"
+        period_start, period_end = day_bounds(start_date, end_date)
         try:
+            device_ids = [row['id'] for row in self.fetch_all(
+                "SELECT id FROM customer_devices WHERE customer_id = ? AND is_cpc = 1 AND is_free = 0", (customer_id,))]
+            if not device_ids:
+                return []
+            query = query.format(','.join('?' * len(device_ids)))
             logger.debug("DEBUG: SQL sorgusu çalıştırılıyor...")
-            results = self.fetch_all(query, (customer_id, start_date, end_date_full))
+            results = self.fetch_all(query, (*device_ids, period_start, period_end))
             logger.debug(f"DEBUG: SQL sonucu: {len(results)} kayıt")
             if results:
                 logger.debug(f"DEBUG: İlk kayıt sütun sayısı: {len(results[0])}")
@@ -808,71 +794,60 @@ class BillingQueriesMixin:
             logging.error(f"Servis kayıtları faturalandırıldı olarak işaretlenirken hata: {e}", exc_info=True)
             return False
 
+    def calculate_cpc_billing(self, customer_ids: Sequence[int], start_date: str, end_date: str,
+                              rates: Optional[Dict[str, Any]] = None, include_invoiced: bool = False) -> CpcBilling:
+        """
+        Verilen müşterilerin CPC cihazları için dönem tüketimini tek sorguda, cihaz başına bir satır olarak hesaplar.
+
+        Args:
+            customer_ids: Faturalandırılacak müşteri ID'leri.
+            start_date, end_date: Dönem (bitiş günü dahil).
+            rates: Verilirse tutar ve TL çevrimi sütunları da hesaplanır (`CpcBilling.apply_rates`).
+            include_invoiced: True ise daha önce faturalanmış okumalar da hesaba katılır.
+        """
+        customer_ids = list(customer_ids)
+        rows = []
+        if customer_ids:
+            devices = self.fetch_all(DEVICES_QUERY.format(','.join('?' * len(customer_ids))), customer_ids)
+            device_ids = [row['id'] for row in devices]
+            if device_ids:
+                period_start, period_end = day_bounds(start_date, end_date)
+                query = BILLING_QUERY.format(devices=','.join('?' * len(device_ids)),
+                                             invoiced='' if include_invoiced else 'AND is_invoiced = 0')
+                params = (*device_ids, period_start, period_end, period_start, *device_ids, period_start)
+                rows = self.fetch_all(query, params)
+        billing = CpcBilling(rows)
+        if rates is not None:
+            billing.apply_rates(rates)
+        return billing
+
     def get_cpc_billing_data(self, customer_id: int, start_date: str, end_date: str) -> List[Dict[str, Any]]:
         """
         Belirtilen tarih aralığı için bir müşterinin CPC faturalandırma verilerini hesaplar.
-        Her cihaz için başlangıç ve bitiş sayaçlarını bularak tüketimi ve maliyeti hesaplar.
+        Her cihaz için dönem başı ve sonu sayaçlarından tüketimi ve TL maliyetini bulur.
         """
-        query = "SELECT id, device_model as model, serial_number, cpc_bw_price, cpc_color_price, device_type as type, COALESCE(cpc_bw_currency, 'TL') as cpc_bw_currency, COALESCE(cpc_color_currency, 'TL') as cpc_color_currency FROM customer_devices WHERE customer_id = ? AND is_cpc = 1 AND is_free = 0"
-        cpc_devices = self.fetch_all(query, (customer_id,))
-        billing_data = []
-
-        for device in cpc_devices:
-            dev_id = device['id']
-            
-            # Bitiş sayacını bul (verilen aralıktaki en son kayıt)
-            end_query = "SELECT id, created_date, bw_counter, color_counter FROM service_records WHERE device_id = ? AND created_date <= ? ORDER BY created_date DESC, id DESC LIMIT 1"
-            end_record = self.fetch_one(end_query, (dev_id, end_date + " 23:59:59"))
-            
-            # Eğer bitiş kaydı yoksa veya aralığın başından daha eskiyse, bu cihazı atla
-            if not end_record or end_record['created_date'] < (start_date + " 00:00:00"):
-                continue
-
-            # Başlangıç sayacını bul (bitiş kaydından önceki en son kayıt)
-            start_query = "SELECT bw_counter, color_counter FROM service_records WHERE device_id = ? AND (created_date < ? OR (created_date = ? AND id < ?)) ORDER BY created_date DESC, id DESC LIMIT 1"
-            start_record = self.fetch_one(start_query, (dev_id, end_record['created_date'], end_record['created_date'], end_record['id']))
-            
-            start_bw = Decimal(start_record['bw_counter'] or 0) if start_record else Decimal(0)
-            start_color = Decimal(start_record['color_counter'] or 0) if start_record else Decimal(0)
-            end_bw = Decimal(end_record['bw_counter'] or 0)
-            end_color = Decimal(end_record['color_counter'] or 0)
-
-            # Sayaç sıfırlanmış olabilir, negatif tüketimi engelle
-            if end_bw < start_bw or (device['type'] == 'Renkli' and end_color < start_color):
-                continue
-
-            usage_bw = end_bw - start_bw
-            usage_color = (end_color - start_color) if device['type'] == 'Renkli' else Decimal(0)
-
-            if (usage_bw + usage_color) > 0:
-                bw_price = Decimal(device['cpc_bw_price'] or 0)
-                color_price = Decimal(device['cpc_color_price'] or 0)
-                
-                # TODO: Kur dönüşümü burada da uygulanmalı
-                total_bw_cost = usage_bw * bw_price
-                total_color_cost = usage_color * color_price
-                
-                billing_data.append({
-                    'model': device['model'], 'serial': device['serial_number'],
-                    'usage_bw': float(usage_bw), 'total_bw_cost': float(total_bw_cost),
-                    'bw_price': float(bw_price), 'bw_currency': device['cpc_bw_currency'],
-                    'usage_color': float(usage_color), 'total_color_cost': float(total_color_cost),
-                    'color_price': float(color_price), 'color_currency': device['cpc_color_currency'],
-                    'device_total_tl': float(total_bw_cost + total_color_cost) # Varsayım: Fiyatlar TL
-                })
-        return billing_data
-
-    def get_invoices_for_customer(self, customer_id: int) -> List[Dict[str, Any]]:
+        billing = self.calculate_cpc_billing([customer_id], start_date, end_date, self.get_exchange_rates(),
+                                             include_invoiced=True)
+        return [{
+            'model': row['model'], 'serial': row['serial_number'],
+            'usage_bw': float(row['bw_usage']), 'total_bw_cost': row['total_bw_cost'],
+            'bw_price': float(row['cpc_bw_price']), 'bw_currency': row['cpc_bw_currency'],
+            'usage_color': float(row['color_usage']), 'total_color_cost': row['total_color_cost'],
+            'color_price': float(row['cpc_color_price']), 'color_currency': row['cpc_color_currency'],
+            'device_total_tl': row['device_total_tl']
+        } for row in billing.rows()]
+
+    def get_invoices_for_customer(self, customer_id: int) -> List[Invoice]:
         """Belirli bir müşteriye ait tüm faturaları listeler."""
         query = "SELECT id, invoice_date, invoice_type, total_amount, paid_amount, (total_amount - paid_amount) as balance, status, currency FROM invoices WHERE customer_id = ? ORDER BY invoice_date DESC"
-        return [dict(row) for row in self.fetch_all(query, (customer_id,))]
+        return self.fetch_all(query, (customer_id,), Invoice)
 
     def get_uninvoiced_cpc_readings(self, customer_id: int) -> List[Dict[str, Any]]:
         """Bir müşteriye ait faturalandırılmamış CPC okumalarını listeler."""
         devices_query = """
             WITH LastInvoicedReading AS (
-                SELECT device_id, MAX(created_date) as last_date
-                FROM service_records
+                SELECT device_id, MAX(reading_ts) as last_date
+                FROM meter_readings
                 WHERE is_invoiced = 1
                 GROUP BY device_id
             )
@@ -881,8 +856,8 @@ class BillingQueriesMixin:
                 cd.device_model as model, 
                 cd.serial_number, 
                 cd.color_type,
-                COALESCE(prev.created_date, '2000-01-01') as start_date,
-                sr.created_date as end_date,
+                COALESCE(prev.reading_ts, '2000-01-01') as start_date,
+                sr.reading_ts as end_date,
                 COALESCE(prev.bw_counter, 0) as start_bw,
                 sr.bw_counter as end_bw,
                 COALESCE(prev.color_counter, 0) as start_color,
@@ -892,11 +867,11 @@ class BillingQueriesMixin:
                 COALESCE(cd.cpc_bw_currency, 'TL') as cpc_bw_currency,
                 COALESCE(cd.cpc_color_currency, 'TL') as cpc_color_currency
             FROM customer_devices cd
-            INNER JOIN service_records sr ON cd.id = sr.device_id AND sr.is_invoiced = 0
+            INNER JOIN meter_readings sr ON cd.id = sr.device_id AND sr.is_invoiced = 0
             LEFT JOIN LastInvoicedReading lir ON cd.id = lir.device_id
-            LEFT JOIN service_records prev ON cd.id = prev.device_id AND prev.created_date = lir.last_date
+            LEFT JOIN meter_readings prev ON cd.id = prev.device_id AND prev.reading_ts = lir.last_date
             WHERE cd.customer_id = ? AND cd.is_cpc = 1 AND cd.is_free = 0
-            ORDER BY sr.created_date DESC
+            ORDER BY sr.reading_ts DESC
         """
         
         # Henüz faturalandırılmamış tüm sayaç okumalarını al
@@ -947,7 +922,7 @@ class BillingQueriesMixin:
             logging.error("Toplu fatura oluşturulamadı: Veritabanı bağlantısı yok.")
             return False
         try:
-            with conn:
+            with self.transaction() as conn:
                 cursor = conn.cursor()
                 invoice_date = datetime.now().strftime('%Y-%m-%d')
                 
@@ -1021,8 +996,8 @@ class BillingQueriesMixin:
         """Belirli bir cihaz için faturalandırılmamış CPC okumalarını alır."""
         query = """
             WITH LastInvoicedReading AS (
-                SELECT device_id, MAX(created_date) as last_date
-                FROM service_records
+                SELECT device_id, MAX(reading_ts) as last_date
+                FROM meter_readings
                 WHERE is_invoiced = 1 AND device_id = ?
                 GROUP BY device_id
             )
@@ -1031,8 +1006,8 @@ class BillingQueriesMixin:
                 cd.device_model as model, 
                 cd.serial_number, 
                 cd.color_type,
-                COALESCE(prev.created_date, '2000-01-01') as start_date,
-                sr.created_date as end_date,
+                COALESCE(prev.reading_ts, '2000-01-01') as start_date,
+                sr.reading_ts as end_date,
                 COALESCE(prev.bw_counter, 0) as start_bw,
                 sr.bw_counter as end_bw,
                 COALESCE(prev.color_counter, 0) as start_color,
@@ -1042,11 +1017,11 @@ class BillingQueriesMixin:
                 COALESCE(cd.cpc_bw_currency, 'TL') as cpc_bw_currency,
                 COALESCE(cd.cpc_color_currency, 'TL') as cpc_color_currency
             FROM customer_devices cd
-            INNER JOIN service_records sr ON cd.id = sr.device_id AND sr.is_invoiced = 0
+            INNER JOIN meter_readings sr ON cd.id = sr.device_id AND sr.is_invoiced = 0
             LEFT JOIN LastInvoicedReading lir ON cd.id = lir.device_id
-            LEFT JOIN service_records prev ON cd.id = prev.device_id AND prev.created_date = lir.last_date
+            LEFT JOIN meter_readings prev ON cd.id = prev.device_id AND prev.reading_ts = lir.last_date
             WHERE cd.id = ? AND cd.is_cpc = 1 AND cd.is_free = 0
-            ORDER BY sr.created_date DESC
+            ORDER BY sr.reading_ts DESC
             LIMIT 1
         """
         
@@ -1095,11 +1070,11 @@ class BillingQueriesMixin:
             return False
         
         try:
-            with conn:
+            with self.transaction() as conn:
                 cursor = conn.cursor()
                 
                 # Ã–nce fatura bilgilerini al
-                cursor.execute("SELECT invoice_type, related_id, details_json FROM invoices WHERE id = ?", (invoice_id,))
+                cursor.execute("SELECT invoice_type, related_id FROM invoices WHERE id = ?", (invoice_id,))
                 invoice_info = cursor.fetchone()
                 
                 if not invoice_info:
@@ -1107,7 +1082,6 @@ class BillingQueriesMixin:
                 
                 invoice_type = invoice_info["invoice_type"]
                 related_id = invoice_info["related_id"]
-                details_json = invoice_info["details_json"]
 
                 # Stoktan d?sen ?r?nleri fatura silinince/i?ptal edilince geri al
                 try:
@@ -1155,19 +1129,9 @@ class BillingQueriesMixin:
                     # Servis kaydÄ±nÄ± tekrar faturalanmamÄ±ÅŸ olarak iÅŸaretle
                     cursor.execute("UPDATE service_records SET is_invoiced = 0 WHERE id = ?", (related_id,))
                 
-                elif invoice_type == "Kopya BaÅŸÄ±":
-                    # CPC faturasÄ± - details_json'dan cihaz ID'lerini al ve sayaÃ§ kayÄ±tlarÄ±nÄ± iÅŸaretle
-                    try:
-                        details = json.loads(details_json)
-                        for item in details:
-                            device_id = item.get("device_id")
-                            record_ids = item.get("record_ids", [])
-                            if device_id and record_ids:
-                                # Bu cihaza ait kayÄ±tlarÄ± tekrar faturalanmamÄ±ÅŸ olarak iÅŸaretle
-                                placeholders = ",".join("?" for _ in record_ids)
-                                cursor.execute(f"UPDATE service_records SET is_invoiced = 0 WHERE id IN ({placeholders})", record_ids)
-                    except (json.JSONDecodeError, KeyError) as e:
-                        logging.warning(f"CPC fatura detaylarÄ± ayrÄ±ÅŸtÄ±rÄ±lamadÄ±: {e}")
+                elif invoice_type == "Kopya Başı":
+                    # Bu faturayla işaretlenen sayaç okumalarını tekrar faturalanmamış yap
+                    cursor.execute("UPDATE meter_readings SET is_invoiced = 0, related_invoice_id = NULL WHERE related_invoice_id = ?", (invoice_id,))
                 
                 # Fatura ile iliÅŸkili Ã¶demeleri sil
                 cursor.execute("DELETE FROM payments WHERE invoice_id = ?", (invoice_id,))
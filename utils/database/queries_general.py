@@ -7,12 +7,28 @@ için tasarlanmıştır.
 """
 
 import logging
-from typing import List, Dict, Any, Optional, Tuple
-from datetime import datetime
+from typing import Callable, List, Dict, Any, Optional, Tuple
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+from ..currency_converter import MissingRateError
+from .dates import date_range
+from .exchange_rates import (DEFAULT_BACKFILL_DAYS, EARLIEST_FOREIGN_INVOICE_QUERY, FILL_INVOICE_RATES,
+                             MAX_BULLETIN_AGE_DAYS, UPSERT_RATE, RateIndex, load_rate_index)
+from .records import Customer, Device
+from .search import build_match_query, code_match_query, search_query
 
 # Logging yapılandırması
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+# get_customer_devices ve toplu müşteri/cihaz dökümünde ortak kullanılan sütunlar
+CUSTOMER_DEVICE_COLUMNS = """
+    cd.id, cd.device_model, cd.serial_number, cd.brand, cd.device_type, cd.color_type, 
+    cd.installation_date, cd.notes, cd.is_cpc, cd.cpc_bw_price, cd.cpc_bw_currency,
+    cd.cpc_color_price, cd.cpc_color_currency, cd.rental_fee, cd.rental_currency, cd.is_free,
+    cl.location_name, cl.address as location_address, cl.phone as location_phone
+"""
+
 class GeneralQueriesMixin:
     """
     Genel veritabanı sorguları için bir mixin sınıfı.
@@ -23,7 +39,7 @@ class GeneralQueriesMixin:
 
     def get_setting(self, key: str, default: Any = None) -> Any:
         """Veritabanından belirli bir ayarı alır."""
-        res = self.fetch_one("SELECT value FROM settings WHERE key=?", (key,))
+        res = self.fetch_one_cached("SELECT value FROM settings WHERE key=?", (key,))
         return res['value'] if res else default
 
     def set_setting(self, key: str, value: Any) -> None:
@@ -62,6 +78,138 @@ class GeneralQueriesMixin:
         self.set_setting('eur_rate', rates.get('EUR', 0.0))
         self.set_setting('last_currency_update', datetime.now().isoformat())
 
+    # --- Geçmiş Döviz Kurları ---
+
+    def get_rate_index(self) -> RateIndex:
+        """`exchange_rates` tablosunun bellekteki dizini (ilk çağrıda yüklenir)."""
+        if self._rate_index is None:
+            conn = self.get_connection()
+            self._rate_index = load_rate_index(conn) if conn else RateIndex()
+        return self._rate_index
+
+    def get_stored_rates(self, on_date: Optional[str] = None) -> Dict[str, Decimal]:
+        """Kayıtlı kurlardan verilen tarihte (None ise en güncel) geçerli alış kurları; ağa çıkmaz."""
+        return self.get_rate_index().rates_on(on_date)
+
+    def rates_on(self, on_date: Optional[str] = None) -> Dict[str, Decimal]:
+        """Verilen tarihte geçerli alış kurları; kayıtlı kur yoksa güncel kurlara düşer."""
+        rates = self.get_stored_rates(on_date)
+        return rates if len(rates) > 1 else self.get_exchange_rates()
+
+    def billing_rates(self, on_date: str, currencies: Tuple[str, ...] = ('USD', 'EUR')) -> Dict[str, Decimal]:
+        """
+        Faturalamada kullanılacak, fatura tarihinde geçerli TCMB alış kurları.
+
+        Yalnızca kayıtlı bültenler kullanılır; önbellekteki güncel kurlara düşülmez.
+
+        Raises:
+            MissingRateError: Bir para biriminin tarihte geçerli kaydı yoksa veya
+                bülteni fatura tarihinden `MAX_BULLETIN_AGE_DAYS` günden eskiyse.
+        """
+        index = self.get_rate_index()
+        day = date.fromisoformat(on_date[:10])
+        for currency in currencies:
+            bulletin = index.bulletin_date(on_date, currency)
+            if bulletin is None:
+                raise MissingRateError(f"{day} tarihinde geçerli kayıtlı {currency} kuru yok; "
+                                       f"kurlar eşitlenmeden faturalama yapılamaz.")
+            age = (day - date.fromisoformat(bulletin)).days
+            if age > MAX_BULLETIN_AGE_DAYS:
+                raise MissingRateError(f"Son kayıtlı {currency} kuru {bulletin} tarihli ({age} gün eski); "
+                                       f"kurlar eşitlenmeden faturalama yapılamaz.")
+        return index.rates_on(on_date)
+
+    def rate_on(self, on_date: Optional[str], currency: str) -> Decimal:
+        """Tek bir para biriminin verilen tarihteki alış kuru (bulunamazsa 1)."""
+        return Decimal(str(self.rates_on(on_date).get(currency, 1)))
+
+    def save_exchange_rates(self, bulletin_date: str, rates: Dict[str, Tuple[Any, Any]]) -> int:
+        """Bir TCMB bülteninin kurlarını ({para birimi: (alış, satış)}) kaydeder ve dizine ekler."""
+        rows = [(bulletin_date, currency, float(buying), float(selling) if selling is not None else None)
+                for currency, (buying, selling) in rates.items()]
+        with self.transaction() as conn:
+            conn.executemany(UPSERT_RATE, rows)
+        index = self.get_rate_index()
+        for row in rows:
+            index.add(*row)
+        return len(rows)
+
+    def sync_exchange_rates(self, fetch: Callable[[Optional[date]], Any], today: Optional[date] = None,
+                            max_requests: int = 400) -> int:
+        """
+        Bugünün kur bültenini ve eksik arşiv günlerini kaydeder.
+
+        Kayıtlı son tarihten bugüne kadarki iş günleri ile, en eski döviz
+        faturasının tarihine (fatura yoksa son `DEFAULT_BACKFILL_DAYS` güne)
+        kadar geriye doğru arşiv günleri çekilir. Bülten yayımlanmayan günler
+        (hafta sonu, tatil) atlanır. Sonunda kuru kaydedilmemiş döviz
+        faturalarına fatura tarihindeki kur yazılır.
+
+        Args:
+            fetch: `currency_converter.fetch_tcmb_rates` imzasında fonksiyon
+                   (gün None ise bugünün bülteni; yayımlanmamışsa None döner).
+            max_requests: Tek eşitlemede arşive yapılacak en fazla istek; kalan
+                          günler bir sonraki eşitlemede çekilir.
+
+        Returns:
+            Kaydedilen bülten sayısı.
+        """
+        today = today or date.today()
+        index = self.get_rate_index()
+        saved = 0
+        result = fetch(None)
+        if result:
+            self.save_exchange_rates(*result)
+            saved += 1
+
+        def business_days(start: date, stop: date, step: int):
+            day = start
+            while (day < stop) if step > 0 else (day > stop):
+                if day.weekday() < 5:
+                    yield day
+                day += timedelta(days=step)
+
+        requests_left = max_requests
+        first, last = index.date_range()
+        if last:
+            for day in business_days(date.fromisoformat(last) + timedelta(days=1), today, 1):
+                if not requests_left:
+                    break
+                requests_left -= 1
+                result = fetch(day)
+                if result:
+                    self.save_exchange_rates(*result)
+                    saved += 1
+
+        earliest = self.fetch_one(EARLIEST_FOREIGN_INVOICE_QUERY)[0]
+        target = earliest or (today - timedelta(days=DEFAULT_BACKFILL_DAYS)).isoformat()
+        first = index.date_range()[0]
+        if first is None or first > target:
+            start = date.fromisoformat(first) - timedelta(days=1) if first else today - timedelta(days=1)
+            for day in business_days(start, date.min, -1):
+                if not requests_left:
+                    break
+                requests_left -= 1
+                result = fetch(day)
+                if result:
+                    self.save_exchange_rates(*result)
+                    saved += 1
+                    if result[0] <= target:
+                        break
+
+        if saved:
+            self.fill_missing_invoice_rates()
+        logging.info(f"Döviz kuru eşitlemesi: {saved} bülten kaydedildi, kayıtlı aralık {index.date_range()}.")
+        return saved
+
+    def fill_missing_invoice_rates(self) -> int:
+        """Kuru kaydedilmemiş döviz faturalarına fatura tarihindeki kuru yazar."""
+        with self.transaction() as conn:
+            updated = conn.execute(FILL_INVOICE_RATES).rowcount
+        if updated:
+            logging.info(f"{updated} döviz faturasına fatura tarihindeki kur yazıldı.")
+        return updated
+
     # --- Kullanıcı Sorguları ---
 
     def get_all_users(self) -> List[Dict[str, Any]]:
@@ -82,10 +230,37 @@ class GeneralQueriesMixin:
             WHERE is_active = 1
             ORDER BY name, surname
         """
-        return [(row[0], row[1]) for row in self.fetch_all(query)]
+        return [(row[0], row[1]) for row in self.fetch_all_cached(query)]
 
     # --- Müşteri ve Cihaz Sorguları ---
 
+    def search(self, entity: str, text: str, limit: Optional[int] = 50,
+               columns: Optional[List[str]] = None) -> List[int]:
+        """
+        Tam metin araması yapar ve eşleşen kayıtların kimliklerini ilgililik sırasıyla döndürür.
+
+        Args:
+            entity: 'customer', 'location', 'device' veya 'stock'.
+            text: Kullanıcının yazdığı metin; her kelime önek olarak aranır.
+                Parça ve seri numaralarında alt dize eşleşmeleri sıralı sonuçların ardına eklenir.
+            limit: En fazla sonuç sayısı (None: sınırsız).
+            columns: Aramanın sınırlanacağı sütunlar (ör. ['serial_number']).
+        """
+        expression = build_match_query(text, columns)
+        if expression is None:
+            return []
+        params = (expression, limit) if limit else (expression,)
+        try:
+            ids = [row[0] for row in self.fetch_all(search_query(entity, limit), params)]
+            codes = code_match_query(entity, text, columns)
+            if codes and (not limit or len(ids) < limit):
+                found = set(ids)
+                ids += [row[0] for row in self.fetch_all(*codes) if row[0] not in found]
+            return ids[:limit] if limit else ids
+        except Exception as e:
+            logging.error(f"Arama hatası ({entity}): {e}", exc_info=True)
+            return []
+
     def add_customer(self, name: str, phone: str, email: str, address: str, tax_id: str, tax_office: str) -> Optional[int]:
         """Veritabanına yeni bir müşteri ekler."""
         query = "INSERT INTO customers (name, phone, email, address, tax_id, tax_office) VALUES (?, ?, ?, ?, ?, ?)"
@@ -104,6 +279,13 @@ class GeneralQueriesMixin:
         result = self.execute_query("DELETE FROM customers WHERE id=?", (customer_id,))
         return result is not None
 
+    def get_customer_list(self) -> List[Customer]:
+        """Müşteri listesini sözleşme tarihleriyle birlikte ada göre sıralı döndürür."""
+        return self.fetch_all(
+            "SELECT id, name, is_contract, contract_start_date, contract_end_date FROM customers ORDER BY name",
+            (), Customer
+        )
+
     def get_customer_by_id(self, customer_id: int) -> Optional[Dict[str, Any]]:
         """ID ile bir müşterinin bilgilerini alır."""
         res = self.fetch_one("SELECT * FROM customers WHERE id=?", (customer_id,))
@@ -281,20 +463,16 @@ class GeneralQueriesMixin:
             logging.error(f"Customer device kaydetme hatası: {e}")
             return None
 
-    def get_customer_devices(self, customer_id: int) -> List[Dict[str, Any]]:
+    def get_customer_devices(self, customer_id: int) -> List[Device]:
         """Müşterinin cihazlarını listeler."""
-        query = """
-            SELECT cd.id, cd.device_model, cd.serial_number, cd.brand, cd.device_type, cd.color_type, 
-                   cd.installation_date, cd.notes, cd.is_cpc, cd.cpc_bw_price, cd.cpc_bw_currency,
-                   cd.cpc_color_price, cd.cpc_color_currency, cd.rental_fee, cd.rental_currency, cd.is_free,
-                   cl.location_name, cl.address as location_address, cl.phone as location_phone
+        query = f"""
+            SELECT {CUSTOMER_DEVICE_COLUMNS}
             FROM customer_devices cd
             LEFT JOIN customer_locations cl ON cd.location_id = cl.id
             WHERE cd.customer_id = ?
             ORDER BY cl.location_name, cd.device_model
         """
-        results = self.fetch_all(query, (customer_id,))
-        return [dict(row) for row in results]
+        return self.fetch_all(query, (customer_id,), Device)
 
     def get_customer_device(self, device_id: int) -> Optional[Dict[str, Any]]:
         """Belirli bir müşteri cihazını getirir."""
@@ -435,15 +613,10 @@ class GeneralQueriesMixin:
             """
             params = [device_id]
             
-            if start_date and end_date:
-                query += " AND cuh.usage_date BETWEEN ? AND ?"
-                params.extend([start_date, end_date])
-            elif start_date:
-                query += " AND cuh.usage_date >= ?"
-                params.append(start_date)
-            elif end_date:
-                query += " AND cuh.usage_date <= ?"
-                params.append(end_date)
+            period, period_params = date_range('cuh.usage_date', start_date, end_date)
+            if period:
+                query += f" AND {period}"
+                params.extend(period_params)
                 
             query += " ORDER BY cuh.usage_date DESC, cuh.id DESC"
             
@@ -467,15 +640,10 @@ class GeneralQueriesMixin:
             """
             params = [device_id]
             
-            if start_date and end_date:
-                query += " AND usage_date BETWEEN ? AND ?"
-                params.extend([start_date, end_date])
-            elif start_date:
-                query += " AND usage_date >= ?"
-                params.append(start_date)
-            elif end_date:
-                query += " AND usage_date <= ?"
-                params.append(end_date)
+            period, period_params = date_range('usage_date', start_date, end_date)
+            if period:
+                query += f" AND {period}"
+                params.extend(period_params)
                 
             result = self.fetch_one(query, params)
             return dict(result) if result else {}
@@ -11,6 +11,11 @@ from datetime import datetime
 from decimal import Decimal
 from typing import List, Dict, Any, Optional
 
+from ..currency_converter import require_rate
+from .dates import day_bounds
+from .meter_readings import PERIODIC_READING_DESCRIPTION
+from .records import ServiceRecord
+
 # Logging yapılandırması
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
@@ -36,14 +41,14 @@ class ServiceQueriesMixin:
         if counter_type not in ['bw_counter', 'color_counter']:
             raise ValueError("Geçersiz sayaç tipi. 'bw_counter' veya 'color_counter' olmalıdır.")
 
-        query = f"SELECT {counter_type} FROM service_records WHERE device_id = ? AND {counter_type} IS NOT NULL"
+        query = f"SELECT {counter_type} FROM meter_readings WHERE device_id = ? AND {counter_type} IS NOT NULL"
         params = [device_id]
         
         if exclude_record_id:
-            query += " AND id != ?"
+            query += " AND service_record_id IS NOT ?"
             params.append(exclude_record_id)
             
-        query += " ORDER BY created_date DESC, id DESC LIMIT 1"
+        query += " ORDER BY reading_ts DESC, id DESC LIMIT 1"
         
         result = self.fetch_one(query, tuple(params))
         return result[0] if result and result[0] is not None else 0
@@ -60,21 +65,32 @@ class ServiceQueriesMixin:
         """
         return [dict(row) for row in self.fetch_all(query, (customer_id,))]
 
-    def get_history_for_device(self, device_id: int) -> List[Dict[str, Any]]:
+    def get_history_for_device(self, device_id: int) -> List[ServiceRecord]:
         """Belirli bir cihaza ait tüm servis geçmişini listeler."""
-        query = "SELECT created_date, status, problem_description, notes FROM service_records WHERE device_id = ? ORDER BY created_date DESC"
-        return [dict(row) for row in self.fetch_all(query, (device_id,))]
+        query = f"""
+            SELECT created_date, status, problem_description, notes FROM service_records WHERE device_id = ?
+            UNION ALL
+            SELECT reading_ts, 'Tamamlandı', '{PERIODIC_READING_DESCRIPTION}', NULL
+            FROM meter_readings WHERE device_id = ? AND service_record_id IS NULL
+            ORDER BY 1 DESC
+        """
+        return self.fetch_all(query, (device_id, device_id), ServiceRecord)
 
-    def get_all_services_for_customer(self, customer_id: int) -> List[Dict[str, Any]]:
+    def get_all_services_for_customer(self, customer_id: int) -> List[ServiceRecord]:
         """Belirli bir müşteriye ait tüm cihazların servis kayıtlarını birleştirerek listeler."""
-        query = """
+        query = f"""
             SELECT sr.created_date, cd.device_model, cd.serial_number, sr.status, sr.problem_description, sr.notes 
             FROM service_records sr 
             JOIN customer_devices cd ON sr.device_id = cd.id 
             WHERE cd.customer_id = ? 
-            ORDER BY sr.created_date DESC
+            UNION ALL
+            SELECT mr.reading_ts, cd.device_model, cd.serial_number, 'Tamamlandı', '{PERIODIC_READING_DESCRIPTION}', NULL
+            FROM meter_readings mr
+            JOIN customer_devices cd ON mr.device_id = cd.id
+            WHERE cd.customer_id = ? AND mr.service_record_id IS NULL
+            ORDER BY 1 DESC
         """
-        return [dict(row) for row in self.fetch_all(query, (customer_id,))]
+        return self.fetch_all(query, (customer_id, customer_id), ServiceRecord)
 
     def get_all_quotes(self, start_date: str, end_date: str) -> List[tuple]:
         """
@@ -95,10 +111,10 @@ class ServiceQueriesMixin:
             FROM service_records sr
             JOIN customer_devices cd ON sr.device_id = cd.id
             JOIN customers c ON cd.customer_id = c.id
-            WHERE sr.created_date BETWEEN ? AND ?
+            WHERE sr.created_date >= ? AND sr.created_date < ?
             ORDER BY sr.created_date DESC
         """
-        rows = self.fetch_all(query, (start_date, end_date + ' 23:59:59'))
+        rows = self.fetch_all(query, day_bounds(start_date, end_date))
         return [(row['id'], row['customer_name'], row['device_model'], row['created_date'], row['total_amount'], row['status']) for row in rows]
 
     def get_quote_details(self, service_record_id: int) -> Optional[Dict[str, Any]]:
@@ -161,22 +177,23 @@ class ServiceQueriesMixin:
         if not conn: return False
         
         try:
-            with conn:
+            # Kur bilgisi ağdan gelebilir; yazma kilidi alınmadan önce okunur
+            rates = self.get_exchange_rates()
+
+            with self.transaction() as conn:
                 cursor = conn.cursor()
                 cursor.execute("DELETE FROM quote_items WHERE service_record_id = ?", (service_record_id,))
-                
-                rates = self.get_exchange_rates()
 
+                rows = []
                 for item in items:
                     quantity = Decimal(str(item.get('quantity', 0)))
                     unit_price = Decimal(str(item.get('unit_price', 0)))
                     currency = item.get('currency', 'TL')
-                    rate = Decimal(str(rates.get(currency, 1.0)))
+                    rate = require_rate(rates, currency)
                     
                     total_tl = (quantity * unit_price * rate).quantize(Decimal('0.01'))
 
-                    query = "INSERT INTO quote_items (service_record_id, description, quantity, unit_price, stock_item_id, currency, total_tl) VALUES (?, ?, ?, ?, ?, ?, ?)"
-                    params = (
+                    rows.append((
                         service_record_id, 
                         item.get('description'), 
                         float(quantity), 
@@ -184,8 +201,10 @@ class ServiceQueriesMixin:
                         item.get('stock_item_id'), 
                         currency,
                         float(total_tl)
-                    )
-                    cursor.execute(query, params)
+                    ))
+
+                query = "INSERT INTO quote_items (service_record_id, description, quantity, unit_price, stock_item_id, currency, total_tl) VALUES (?, ?, ?, ?, ?, ?, ?)"
+                cursor.executemany(query, rows)
             logging.info(f"Servis #{service_record_id} için teklif kalemleri başarıyla kaydedildi.")
             return True
         except Exception as e:
@@ -226,24 +245,24 @@ class ServiceQueriesMixin:
 
     def add_meter_reading_record(self, device_id: int, assigned_user_id: int, bw_counter: Optional[int], color_counter: Optional[int]) -> Optional[int]:
         """
-        Periyodik sayaç okuması için özel bir servis kaydı oluşturur.
+        Periyodik sayaç okumasını `meter_readings` tablosuna kaydeder ve okuma ID'sini döndürür.
         """
         if bw_counter is None and color_counter is None:
             logging.warning("Sayaç okuma kaydı oluşturulmadı: Her iki sayaç değeri de boş.")
             return None
             
-        date = datetime.now().strftime("%Y-%m-%d %H:%M")
-        query = "INSERT INTO service_records (device_id, assigned_user_id, problem_description, status, bw_counter, color_counter, created_date, is_invoiced) VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
-        params = (device_id, assigned_user_id, "Periyodik Sayaç Okuma", "Tamamlandı", bw_counter, color_counter, date, 0) # Sayaç okumaları başlangıçta faturalanmamış olarak kaydedilir
+        reading_ts = datetime.now().strftime("%Y-%m-%d %H:%M")
+        query = "INSERT INTO meter_readings (device_id, reading_ts, bw_counter, color_counter, assigned_user_id, is_invoiced) VALUES (?, ?, ?, ?, ?, ?)"
+        params = (device_id, reading_ts, bw_counter, color_counter, assigned_user_id, 0) # Sayaç okumaları başlangıçta faturalanmamış olarak kaydedilir
         
-        record_id = self.execute_query(query, params)
-        if record_id:
-            logging.info(f"Cihaz #{device_id} için sayaç okuma kaydı #{record_id} oluşturuldu.")
-        return record_id
+        reading_id = self.execute_query(query, params)
+        if reading_id:
+            logging.info(f"Cihaz #{device_id} için sayaç okuma kaydı #{reading_id} oluşturuldu.")
+        return reading_id
 
     def get_previous_counter_readings(self, device_id: int, current_service_id: int) -> Dict[str, Optional[int]]:
         """
-        Cihazın önceki servis kaydındaki sayaç okumalarını döndürür.
+        Cihazın bir önceki sayaç okumasını (periyodik okuma veya başka bir servis kaydı) döndürür.
         
         Args:
             device_id: Cihaz ID'si
@@ -254,9 +273,9 @@ class ServiceQueriesMixin:
         """
         query = """
         SELECT bw_counter, color_counter 
-        FROM service_records 
-        WHERE device_id = ? AND id != ? AND (bw_counter IS NOT NULL OR color_counter IS NOT NULL)
-        ORDER BY created_date DESC 
+        FROM meter_readings 
+        WHERE device_id = ? AND service_record_id IS NOT ?
+        ORDER BY reading_ts DESC, id DESC 
         LIMIT 1
         """
         params = (device_id, current_service_id)
@@ -14,42 +14,46 @@ import json
 import sqlite3
 from datetime import datetime
 from decimal import Decimal
-from typing import List, Dict, Any, Optional, Union
+from typing import List, Dict, Any, Optional, Tuple, Union
+
+from ..currency_converter import get_exchange_rates, require_rate
+from .records import StockItem
+from .search import match_clause
 
 # Logging yapılandırması
 logger = logging.getLogger(__name__)
 
+# Stok listelerindeki filtre kutusunun aradığı sütunlar
+STOCK_SEARCH_COLUMNS = ('name', 'part_number', 'compatible_models')
+
 class StockQueriesMixin:
     """
     Stok kalemleri, stok hareketleri ve envanter yönetimi için veritabanı
     sorgularını içeren bir mixin sınıfı. `DatabaseManager` ile birlikte kullanılır.
     """
 
-    def get_stock_items(self, filter_text: str = '') -> List[Dict[str, Any]]:
+    def get_stock_items(self, filter_text: str = '') -> List[StockItem]:
         """
         Stok kalemlerini filtreleyerek listeler.
         """
         query = "SELECT id, item_type, name, part_number, quantity, compatible_models FROM stock_items"
-        params = []
-        if filter_text:
-            # --- GÜNCELLEME: Uyumlu Modeller içinde de arama yap ---
-            query += " WHERE name LIKE ? OR part_number LIKE ? OR compatible_models LIKE ?"
-            params.extend([f'%{filter_text}%', f'%{filter_text}%', f'%{filter_text}%'])
+        # Ad, parça numarası ve uyumlu modellerde tam metin araması
+        matches, params = match_clause('stock', 'id', filter_text, STOCK_SEARCH_COLUMNS)
+        if matches:
+            query += f" WHERE {matches}"
         query += " ORDER BY item_type, name"
-        return [dict(row) for row in self.fetch_all(query, tuple(params))]
+        return self.fetch_all(query, tuple(params), StockItem)
 
-    def get_stock_items_for_sale(self, filter_text: str = '') -> List[Dict[str, Any]]:
+    def get_stock_items_for_sale(self, filter_text: str = '') -> List[StockItem]:
         """
         Sadece stok miktarı 0'dan büyük olan satılabilir ürünleri listeler.
         """
         query = "SELECT id, item_type, name, quantity, sale_price, sale_currency, compatible_models FROM stock_items WHERE quantity > 0"
-        params = []
-        if filter_text:
-            # --- GÜNCELLEME: Uyumlu Modeller içinde de arama yap ---
-            query += " AND (name LIKE ? OR part_number LIKE ? OR compatible_models LIKE ?)"
-            params.extend([f'%{filter_text}%', f'%{filter_text}%', f'%{filter_text}%'])
+        matches, params = match_clause('stock', 'id', filter_text, STOCK_SEARCH_COLUMNS)
+        if matches:
+            query += f" AND {matches}"
         query += " ORDER BY item_type, name"
-        return [dict(row) for row in self.fetch_all(query, tuple(params))]
+        return self.fetch_all(query, tuple(params), StockItem)
 
     def get_stock_item_details(self, item_id: int) -> Optional[Dict[str, Any]]:
         """
@@ -181,7 +185,7 @@ class StockQueriesMixin:
         if not conn: return False
         
         try:
-            with conn:
+            with self.transaction() as conn:
                 # ensure movement detail columns exist
                 cols = [row[1] for row in conn.execute('PRAGMA table_info(stock_movements)').fetchall()]
                 if 'quantity_after' not in cols:
@@ -229,11 +233,9 @@ class StockQueriesMixin:
         'Yedek Parça' tipindeki stok kalemlerini listeler.
         """
         query = "SELECT id, name, part_number, quantity, sale_price, sale_currency, compatible_models FROM stock_items WHERE item_type = 'Yedek Parça'"
-        params = []
-        if filter_text:
-            # --- GÜNCELLEME: Uyumlu Modeller içinde de arama yap ---
-            query += " AND (name LIKE ? OR part_number LIKE ? OR compatible_models LIKE ?)"
-            params.extend([f'%{filter_text}%', f'%{filter_text}%', f'%{filter_text}%'])
+        matches, params = match_clause('stock', 'id', filter_text, STOCK_SEARCH_COLUMNS)
+        if matches:
+            query += f" AND {matches}"
         query += " ORDER BY name"
         return [dict(row) for row in self.fetch_all(query, tuple(params))]
 
@@ -248,7 +250,7 @@ class StockQueriesMixin:
         if quantity_to_sell == 0: return "Satılacak cihaz seri numarası belirtilmedi."
 
         try:
-            with conn:
+            with self.transaction() as conn:
                 # ensure movement detail columns exist
                 cols = [row[1] for row in conn.execute('PRAGMA table_info(stock_movements)').fetchall()]
                 if 'quantity_after' not in cols:
@@ -289,7 +291,7 @@ class StockQueriesMixin:
                     item_currency = (item.get('currency', 'TL') or 'TL').strip().upper()
                     unit_price = Decimal(str(item.get('unit_price', 0)))
                     quantity = Decimal(str(item.get('quantity', 0)))
-                    rate = Decimal(str(rates.get(item_currency, 1.0))) if item_currency != 'TL' else Decimal('1')
+                    rate = require_rate(rates, item_currency)
                     unit_price_tl = unit_price * rate
                     total_tl = unit_price_tl * quantity
                     enriched = dict(item)
@@ -395,7 +397,7 @@ class StockQueriesMixin:
         
         invoice_id = -1
         try:
-            with conn:
+            with self.transaction() as conn:
                 # ensure movement detail columns exist
                 cols = [row[1] for row in conn.execute('PRAGMA table_info(stock_movements)').fetchall()]
                 if 'quantity_after' not in cols:
@@ -523,7 +525,7 @@ class StockQueriesMixin:
             return "Veritabanı bağlantısı kurulamadı."
         
         try:
-            with conn:
+            with self.transaction() as conn:
                 # ensure movement detail columns exist
                 cols = [row[1] for row in conn.execute('PRAGMA table_info(stock_movements)').fetchall()]
                 if 'quantity_after' not in cols:
@@ -561,7 +563,6 @@ class StockQueriesMixin:
                 movement_date = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
                 
                 # Güncel kurları al (karışık para birimi için)
-                from utils.currency_converter import get_exchange_rates
                 rates = get_exchange_rates()
                 
                 total_amount_tl = 0.0
@@ -577,7 +578,7 @@ class StockQueriesMixin:
                     
                     # Ürün tutarını TL'ye çevir
                     if currency and currency != 'TL':
-                        rate = float(rates.get(currency, 1.0))
+                        rate = float(require_rate(rates, currency))
                         item_total_tl = quantity * unit_price * rate
                     else:
                         item_total_tl = quantity * unit_price
@@ -687,7 +688,7 @@ class StockQueriesMixin:
     def get_price_settings(self) -> Dict[str, float]:
         """Fiyat ayarlarını getirir."""
         try:
-            result = self.fetch_one("SELECT settings_json FROM price_settings WHERE id = 1")
+            result = self.fetch_one_cached("SELECT settings_json FROM price_settings WHERE id = 1")
             if result:
                 return json.loads(result[0])
             else:
@@ -855,7 +856,7 @@ class StockQueriesMixin:
             return "Veritabanı bağlantısı kurulamadı."
         
         try:
-            with conn:
+            with self.transaction() as conn:
                 # ensure movement detail columns exist
                 cols = [row[1] for row in conn.execute('PRAGMA table_info(stock_movements)').fetchall()]
                 if 'quantity_after' not in cols:
@@ -930,7 +931,6 @@ class StockQueriesMixin:
                     return f"Bilinmeyen satış detayı formatı: {type(items_data)}"
                 
                 # Güncel kur bilgisini al
-                from utils.currency_converter import get_exchange_rates
                 rates = get_exchange_rates()
                 exchange_rate = 1.0
                 enriched_items = []
@@ -938,7 +938,7 @@ class StockQueriesMixin:
                     item_currency = (item.get('currency', 'TL') or 'TL').strip().upper()
                     unit_price = Decimal(str(item.get('unit_price', 0)))
                     quantity = Decimal(str(item.get('quantity', 0)))
-                    rate = Decimal(str(rates.get(item_currency, 1.0))) if item_currency != 'TL' else Decimal('1')
+                    rate = require_rate(rates, item_currency)
                     unit_price_tl = unit_price * rate
                     total_tl = unit_price_tl * quantity
                     enriched = dict(item)
@@ -949,7 +949,7 @@ class StockQueriesMixin:
                     enriched_items.append(enriched)
 
                 if currency and currency != 'TL':
-                    exchange_rate = float(rates.get(currency, 1.0))
+                    exchange_rate = float(require_rate(rates, currency))
                 
                 # Fatura oluştur
                 invoice_date = datetime.now().strftime('%Y-%m-%d')
@@ -1009,7 +1009,7 @@ class StockQueriesMixin:
             return False, "Fatura kalemi bulunamadi."
 
         try:
-            with conn:
+            with self.transaction() as conn:
                 # ensure movement detail columns exist
                 cols = [row[1] for row in conn.execute('PRAGMA table_info(stock_movements)').fetchall()]
                 if 'quantity_after' not in cols:
@@ -1022,7 +1022,8 @@ class StockQueriesMixin:
                 cursor = conn.cursor()
                 supplier_id = self._ensure_supplier(cursor, supplier_name)
 
-                rates = self.get_exchange_rates()
+                # Kalemler fatura tarihindeki kurla TL'ye çevrilir
+                rates = self.rates_on(invoice_date)
 
                 subtotal = Decimal('0')
                 tax_total = Decimal('0')
@@ -1062,7 +1063,7 @@ class StockQueriesMixin:
                     subtotal += line_subtotal
                     tax_total += line_tax
 
-                    rate = Decimal(str(rates.get(currency, 1.0)))
+                    rate = require_rate(rates, currency)
                     unit_cost_tl = (unit_price * rate).quantize(Decimal('0.0001'))
 
                     cursor.execute(
@@ -0,0 +1,170 @@
+"""
+Tablo sürümlerine duyarlı, okuma üzerinden doldurulan sorgu önbelleği.
+
+Müşteri listesi, teknisyenler, fiyat ve uygulama ayarları gibi küçük ve sık
+okunan sorguların sonuçları (sorgu, parametreler) anahtarıyla saklanır. Her
+tablonun bir sürüm sayacı vardır; bir kayıt, okunduğu andaki tablo sürümleriyle
+birlikte tutulur ve sürümlerden biri artmışsa geçersiz sayılır.
+
+Sürümler yazıcı bağlantısına kurulan SQLite yetkilendirme (authorizer) geri
+çağrısıyla artırılır: INSERT/UPDATE/DELETE yapılan tablolar (tetikleyicilerin
+değiştirdikleri dahil) "kirli" işaretlenir ve yazıcı bağlantısındaki işlem
+bittiğinde sürümleri artırılır. Başka süreçlerin (ör. ağ paylaşımındaki diğer
+bilgisayarların) yazmaları `PRAGMA data_version` ile fark edilir ve tüm
+önbellek geçersiz kılınır. Kayıt sayısı sınırlıdır; en uzun süre
+kullanılmayan kayıt çıkarılır (LRU).
+"""
+
+import re
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, FrozenSet, Iterable, Optional, Tuple
+
+_IDENTIFIER = re.compile(r'[A-Za-z_][A-Za-z0-9_]*')
+
+_WRITE_ACTIONS = {sqlite3.SQLITE_INSERT, sqlite3.SQLITE_UPDATE, sqlite3.SQLITE_DELETE}
+_SCHEMA_ACTIONS = {sqlite3.SQLITE_CREATE_TABLE, sqlite3.SQLITE_DROP_TABLE, sqlite3.SQLITE_ALTER_TABLE,
+                   sqlite3.SQLITE_CREATE_VIEW, sqlite3.SQLITE_DROP_VIEW}
+
+# Önbellekte "sonuç yok" (fetch_one -> None) ile "kayıt yok" ayrımı için
+MISSING = object()
+
+
+class QueryCache:
+    """
+    LRU sorgu önbelleği. Thread güvenlidir.
+
+    Tipik kullanım (`DatabaseManager._cached_query` içinde):
+        rows = cache.get(sql, params)
+        if rows is MISSING:
+            versions = cache.snapshot(sql)   # sorgudan ÖNCE alınır
+            rows = <sorguyu çalıştır>
+            cache.put(sql, params, rows, versions)
+    """
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max(1, int(max_entries))
+        self._entries: 'OrderedDict[Tuple[str, tuple], Tuple[Tuple[int, ...], Any]]' = OrderedDict()
+        self._versions: Dict[str, int] = {}
+        self._epoch = 0
+        self._dirty: set = set()
+        self._schema_dirty = True
+        self._known_tables: FrozenSet[str] = frozenset()
+        self._sql_tables: Dict[str, Tuple[str, ...]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    # --- Yazma tarafı (yazıcı bağlantısı) ---
+
+    def authorizer(self, action: int, arg1: Optional[str], arg2: Optional[str],
+                   db_name: Optional[str], trigger: Optional[str]) -> int:
+        """Yazıcı bağlantısına `set_authorizer` ile kurulur; hiçbir işlemi engellemez."""
+        if action in _WRITE_ACTIONS:
+            if arg1 and not arg1.startswith('sqlite_'):
+                with self._lock:
+                    self._dirty.add(arg1.lower())
+        elif action in _SCHEMA_ACTIONS:
+            self._schema_dirty = True
+        return sqlite3.SQLITE_OK
+
+    def sync(self, writer_in_transaction: bool) -> None:
+        """
+        Kirli tabloların sürümlerini artırır. Yazma kilidi tutulurken çağrılmalıdır.
+        Yazıcıdaki işlem henüz commit edilmediyse beklenir: o ana kadar
+        okuyucular zaten eski veriyi görür.
+        """
+        if writer_in_transaction or not self._dirty:
+            return
+        with self._lock:
+            dirty, self._dirty = self._dirty, set()
+            for table in dirty:
+                self._versions[table] = self._versions.get(table, 0) + 1
+            if dirty:
+                self.invalidations += 1
+
+    def needs_schema(self) -> bool:
+        return self._schema_dirty
+
+    def has_pending(self) -> bool:
+        """Sürümü henüz artırılmamış yazma veya şema değişikliği var mı?"""
+        return self._schema_dirty or bool(self._dirty)
+
+    def set_known_tables(self, names: Iterable[str]) -> None:
+        """Şemadaki tablo/görünüm adlarını yükler ve tüm kayıtları geçersiz kılar."""
+        with self._lock:
+            self._known_tables = frozenset(n.lower() for n in names)
+            self._sql_tables.clear()
+            self._schema_dirty = False
+            self._clear_locked()
+
+    def clear(self) -> None:
+        """Tüm kayıtları geçersiz kılar (ör. başka bir süreç veritabanını değiştirdiğinde)."""
+        with self._lock:
+            self._clear_locked()
+
+    def _clear_locked(self) -> None:
+        self._epoch += 1
+        if self._entries:
+            self.invalidations += 1
+        self._entries.clear()
+
+    # --- Okuma tarafı ---
+
+    def tables_for(self, sql: str) -> Tuple[str, ...]:
+        """Sorgu metninde geçen bilinen tablo adları (bağımlılıklar)."""
+        tables = self._sql_tables.get(sql)
+        if tables is None:
+            words = {w.lower() for w in _IDENTIFIER.findall(sql)}
+            tables = tuple(sorted(words & self._known_tables))
+            self._sql_tables[sql] = tables
+        return tables
+
+    def snapshot(self, sql: str) -> Tuple[int, ...]:
+        """Sorgunun bağlı olduğu tabloların şu anki sürümleri (sorgudan önce alınmalı)."""
+        with self._lock:
+            return (self._epoch,) + tuple(self._versions.get(t, 0) for t in self.tables_for(sql))
+
+    def get(self, sql: str, params: tuple) -> Any:
+        """Geçerli kayıt varsa sonucu, yoksa `MISSING` döndürür."""
+        key = (sql, params)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                current = (self._epoch,) + tuple(self._versions.get(t, 0) for t in self.tables_for(sql))
+                if entry[0] == current:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                del self._entries[key]
+            self.misses += 1
+            return MISSING
+
+    def put(self, sql: str, params: tuple, value: Any, versions: Tuple[int, ...]) -> None:
+        """Sonucu, sorgudan önce alınan sürüm bilgisiyle saklar."""
+        if not self.tables_for(sql):
+            return  # Bağımlılığı bilinmeyen sorgu güvenle önbelleğe alınamaz
+        key = (sql, params)
+        with self._lock:
+            self._entries[key] = (versions, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """İsabet oranı ve kayıt sayıları."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+            }
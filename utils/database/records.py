@@ -0,0 +1,132 @@
+"""
+Hafif, tuple tabanlı kayıt tipleri.
+
+Büyük listelerde her satır için `dict(row)` kopyası üretmek yerine sorgu
+sonuçları doğrudan bu tiplere dönüştürülür. Bir kayıt, sütun adları sınıf
+düzeyinde tutulan bir tuple'dır; satır başına sözlük tutulmaz.
+
+Arayüz kodu için sözlük benzeri erişim korunur:
+    kayit['name'], kayit.get('name', ''), 'name' in kayit, kayit.name, dict(kayit)
+Kayıtlar değiştirilemez; üzerinde değişiklik yapılacaksa `dict(kayit)` ile
+kopyası alınmalıdır. `sqlite3.Row` gibi, üzerinde dönüldüğünde değerleri verir.
+"""
+
+import sqlite3
+from typing import Any, Callable, Dict, Iterator, Optional, Sequence, Tuple, Type, TypeVar
+
+R = TypeVar('R', bound='Record')
+
+
+class Record(tuple):
+    """Sütun adlarıyla erişilebilen, değiştirilemez satır."""
+    __slots__ = ()
+    _fields: Tuple[str, ...] = ()
+    _index: Dict[str, int] = {}
+    _variants: Dict[Tuple[str, ...], type] = {}
+
+    @classmethod
+    def with_fields(cls: Type[R], fields: Sequence[str]) -> Type[R]:
+        """Verilen sütun dizisi için (önbelleğe alınmış) alt sınıfı döndürür."""
+        base = cls._base()
+        fields = tuple(fields)
+        variant = base._variants.get(fields)
+        if variant is None:
+            variant = type(base.__name__, (base,), {
+                '__slots__': (),
+                '_fields': fields,
+                '_index': {name: i for i, name in enumerate(fields)},
+            })
+            base._variants[fields] = variant
+        return variant
+
+    @classmethod
+    def _base(cls) -> type:
+        # Sütunlara özel alt sınıflar, tanımlanan varlık sınıfını (ör. Customer) temel alır
+        return cls if '_variants' in cls.__dict__ else cls.__mro__[1]
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if '_fields' not in cls.__dict__:
+            cls._variants = {}
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            try:
+                return tuple.__getitem__(self, self._index[key])
+            except KeyError:
+                raise KeyError(key) from None
+        return tuple.__getitem__(self, key)
+
+    def __getattr__(self, name: str) -> Any:
+        index = type(self)._index.get(name)
+        if index is None:
+            raise AttributeError(f"'{type(self).__name__}' kaydında '{name}' alanı yok")
+        return tuple.__getitem__(self, index)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._index
+
+    def __repr__(self) -> str:
+        values = ', '.join(f"{name}={value!r}" for name, value in zip(self._fields, self))
+        return f"{type(self).__name__}({values})"
+
+    def __reduce__(self):
+        # Dinamik alt sınıflar doğrudan pickle edilemez; temel sınıf ve sütunlarla yeniden kurulur
+        return (_rebuild, (type(self)._base(), self._fields, tuple(self)))
+
+    def get(self, key: str, default: Any = None) -> Any:
+        index = self._index.get(key)
+        return default if index is None else tuple.__getitem__(self, index)
+
+    def keys(self) -> Tuple[str, ...]:
+        return self._fields
+
+    def values(self) -> Tuple[Any, ...]:
+        return tuple(self)
+
+    def items(self) -> Iterator[Tuple[str, Any]]:
+        return zip(self._fields, self)
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Değiştirilebilir bir sözlük kopyası döndürür."""
+        return dict(zip(self._fields, self))
+
+
+def _rebuild(base: Type[Record], fields: Tuple[str, ...], values: tuple) -> Record:
+    return base.with_fields(fields)(values)
+
+
+class Customer(Record):
+    __slots__ = ()
+
+
+class Device(Record):
+    __slots__ = ()
+
+
+class ServiceRecord(Record):
+    __slots__ = ()
+
+
+class StockItem(Record):
+    __slots__ = ()
+
+
+class Invoice(Record):
+    __slots__ = ()
+
+
+def record_factory(record_type: Type[Record]) -> Callable[[sqlite3.Cursor, tuple], Record]:
+    """İmlecin `row_factory` özelliğine atanacak, satırları `record_type` yapan fonksiyon."""
+    last_description: Optional[tuple] = None
+    last_type: Optional[type] = None
+
+    def factory(cursor: sqlite3.Cursor, row: tuple) -> Record:
+        nonlocal last_description, last_type
+        description = cursor.description
+        if description is not last_description:
+            last_type = record_type.with_fields(tuple(col[0] for col in description))
+            last_description = description
+        return last_type(row)
+
+    return factory
@@ -0,0 +1,159 @@
+"""
+FTS5 tam metin arama dizinleri.
+
+Müşteri, lokasyon, müşteri cihazı ve stok kalemleri için birer FTS5 tablosu
+tutulur; satır kimliği (rowid) kaynak tablonun `id` değeridir. Dizinler
+kaynak tablolardaki tetikleyicilerle aynı işlem içinde güncellenir, böylece
+yazarken ek bir adım gerekmez ve dizin hiçbir zaman eskimez.
+
+Türkçe harf katlama: unicode61 ayrıştırıcısı büyük/küçük harfi katlar ve
+aksanları kaldırır (Ş/ş -> s, Ğ/ğ -> g, Ü -> u, Ö -> o, Ç -> c, İ -> i);
+tek eksik olan noktasız 'ı' harfidir. Bu yüzden hem dizine yazılan metinde
+hem de arama metninde 'ı' -> 'i' dönüşümü yapılır. Sonuçta "IŞIK", "ışık",
+"Işık" ve "isik" aynı terimle eşleşir; kullanıcının Türkçe klavye kullanıp
+kullanmaması aramayı etkilemez.
+
+Yazarken arama (search-as-you-type) için her terim önek olarak aranır
+("kyo" -> kyo*) ve tablolar 2-3 harflik önek dizinleriyle oluşturulur.
+
+Önek araması kelimenin ortasını bulmaz; parça ve seri numaralarında ise
+kullanıcı çoğu zaman kodun bir bölümünü yazar ("1150" -> "TK1150"). Bu kod
+sütunları (`CODE_COLUMNS`) için tam metin koşuluna ayrıca LIKE '%...%' ile
+alt dize araması eklenir. Bu kısım dizin kullanmaz; stok ve cihaz tabloları
+küçük olduğundan tarama kabul edilebilir.
+"""
+
+import re
+import sqlite3
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# Varlık adı -> (FTS tablosu, kaynak tablo, dizinlenen sütunlar)
+SEARCH_ENTITIES: Dict[str, Tuple[str, str, Tuple[str, ...]]] = {
+    'customer': ('customers_fts', 'customers', ('name', 'phone', 'email')),
+    'location': ('customer_locations_fts', 'customer_locations', ('location_name', 'address', 'phone')),
+    'device': ('customer_devices_fts', 'customer_devices', ('brand', 'device_model', 'serial_number')),
+    'stock': ('stock_items_fts', 'stock_items', ('name', 'part_number', 'compatible_models', 'supplier', 'item_type')),
+}
+
+# Varlık adı -> alt dize olarak da aranan kod sütunları
+CODE_COLUMNS: Dict[str, Tuple[str, ...]] = {
+    'device': ('serial_number',),
+    'stock': ('part_number',),
+}
+
+_TOKEN = re.compile(r'\w+', re.UNICODE)
+
+
+def fold_text(text: str) -> str:
+    """Arama metnini dizindeki biçime yaklaştırır (noktasız ı -> i)."""
+    return text.replace('ı', 'i')
+
+
+def build_match_query(text: str, columns: Optional[Sequence[str]] = None) -> Optional[str]:
+    """
+    Kullanıcının yazdığı metinden FTS5 MATCH ifadesi üretir.
+
+    Her kelime tırnak içinde önek terimi olur ve tüm terimler birlikte aranır
+    (VE). `columns` verilirse arama bu sütunlarla sınırlandırılır.
+    Aranacak kelime yoksa None döner.
+    """
+    tokens = _TOKEN.findall(fold_text(text or ''))
+    if not tokens:
+        return None
+    expression = ' '.join(f'"{token}"*' for token in tokens)
+    if columns:
+        expression = f"{{{' '.join(columns)}}} : ({expression})"
+    return expression
+
+
+def code_match_query(entity: str, text: str,
+                     columns: Optional[Sequence[str]] = None) -> Optional[Tuple[str, List[str]]]:
+    """
+    Kod sütunlarında (`CODE_COLUMNS`) alt dize araması yapan kimlik sorgusu.
+
+    Returns:
+        (sorgu, parametreler); aranan sütunlar arasında kod sütunu yoksa veya
+        metin boşsa None.
+    """
+    text = (text or '').strip()
+    codes = [c for c in CODE_COLUMNS.get(entity, ()) if columns is None or c in columns]
+    if not text or not codes:
+        return None
+    source = SEARCH_ENTITIES[entity][1]
+    pattern = '%' + re.sub(r'([\\%_])', r'\\\1', text) + '%'
+    conditions = ' OR '.join(f"{column} LIKE ? ESCAPE '\\'" for column in codes)
+    return f"SELECT id FROM {source} WHERE {conditions}", [pattern] * len(codes)
+
+
+def match_clause(entity: str, id_column: str, text: str,
+                 columns: Optional[Sequence[str]] = None) -> Tuple[str, List[str]]:
+    """
+    Mevcut bir sorguya eklenebilecek arama koşulu üretir.
+
+    Kod sütunları aranıyorsa tam metin koşuluna alt dize araması da eklenir
+    (bkz. `code_match_query`).
+
+    Returns:
+        (koşul, parametreler). Örn: ("id IN (SELECT rowid FROM stock_items_fts
+        WHERE stock_items_fts MATCH ?)", ['"tk"*']). Aranacak kelime yoksa
+        koşul boş metindir.
+    """
+    fts_table = SEARCH_ENTITIES[entity][0]
+    expression = build_match_query(text, columns)
+    if expression is None:
+        return "", []
+    clause = f"{id_column} IN (SELECT rowid FROM {fts_table} WHERE {fts_table} MATCH ?)"
+    params = [expression]
+    codes = code_match_query(entity, text, columns)
+    if codes:
+        clause = f"({clause} OR {id_column} IN ({codes[0]}))"
+        params += codes[1]
+    return clause, params
+
+
+def search_query(entity: str, limit: Optional[int]) -> str:
+    """Sıralı (bm25) sonuç kimliklerini döndüren sorgu."""
+    fts_table = SEARCH_ENTITIES[entity][0]
+    limit_clause = " LIMIT ?" if limit else ""
+    return f"SELECT rowid FROM {fts_table} WHERE {fts_table} MATCH ? ORDER BY rank{limit_clause}"
+
+
+# --- Şema: tablolar, tetikleyiciler ve ilk doldurma ---
+
+def _folded(row: str, column: str) -> str:
+    return f"replace(COALESCE({row}.{column}, ''), 'ı', 'i')"
+
+
+def _index_row(fts_table: str, columns: Sequence[str], row: str) -> str:
+    values = ', '.join(_folded(row, c) for c in columns)
+    return f"INSERT INTO {fts_table} (rowid, {', '.join(columns)}) VALUES ({row}.id, {values})"
+
+
+def create_search_index(conn: sqlite3.Connection, entity: str) -> None:
+    """Varlığın FTS tablosunu ve tetikleyicilerini oluşturur, tabloyu baştan doldurur."""
+    fts_table, source, columns = SEARCH_ENTITIES[entity]
+    column_list = ', '.join(columns)
+    conn.execute(f"DROP TABLE IF EXISTS {fts_table}")
+    conn.execute(
+        f"CREATE VIRTUAL TABLE {fts_table} USING fts5({column_list}, "
+        f"tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+    )
+    delete_old = f"DELETE FROM {fts_table} WHERE rowid = OLD.id"
+    triggers = {
+        f"trg_{fts_table}_ins": (f"AFTER INSERT ON {source}", [_index_row(fts_table, columns, 'NEW')]),
+        f"trg_{fts_table}_del": (f"AFTER DELETE ON {source}", [delete_old]),
+        f"trg_{fts_table}_upd": (f"AFTER UPDATE OF {column_list} ON {source}",
+                                 [delete_old, _index_row(fts_table, columns, 'NEW')]),
+    }
+    for name, (event, statements) in triggers.items():
+        conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+        body = ";\n".join(statements)
+        conn.execute(f"CREATE TRIGGER {name} {event}\nBEGIN\n{body};\nEND")
+    values = ', '.join(_folded(source, c) for c in columns)
+    conn.execute(f"INSERT INTO {fts_table} (rowid, {column_list}) SELECT id, {values} FROM {source}")
+
+
+def rebuild_search_indexes(conn: sqlite3.Connection) -> None:
+    """Tüm arama dizinlerini yeniden oluşturur."""
+    for entity in SEARCH_ENTITIES:
+        create_search_index(conn, entity)
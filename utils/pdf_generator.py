@@ -25,7 +25,7 @@ from reportlab.pdfbase import pdfmetrics
 from reportlab.pdfbase.ttfonts import TTFont
 
 # Import currency converter
-from .currency_converter import get_exchange_rates
+from .currency_converter import rates_on
 
 # Logging yapılandırması
 
@@ -76,13 +76,14 @@ def get_font_names() -> Tuple[str, str]:
 
 # --- STİL VE YARDIMCI ELEMANLAR ---
 
-def convert_to_tl(amount: Decimal, currency: str) -> Decimal:
+def convert_to_tl(amount: Decimal, currency: str, on_date: str | None = None) -> Decimal:
     """
-    Belirtilen para birimindeki tutarı güncel kurlarla TL'ye çevirir.
+    Belirtilen para birimindeki tutarı verilen tarihteki (varsayılan: güncel) kurla TL'ye çevirir.
     
     Args:
         amount (Decimal): Çevrilecek tutar
         currency (str): Para birimi (TL, USD, EUR)
+        on_date (str): Kurun alınacağı tarih ('YYYY-MM-DD'); None ise güncel kur
         
     Returns:
         Decimal: TL cinsinden tutar
@@ -91,7 +92,7 @@ def convert_to_tl(amount: Decimal, currency: str) -> Decimal:
         return amount
     
     try:
-        rates = get_exchange_rates()
+        rates = rates_on(on_date)
         if currency in rates:
             tl_amount = amount * rates[currency]
             logging.info(f"{amount} {currency} = {tl_amount} TL (Kur: {rates[currency]})")
@@ -321,7 +322,8 @@ def _calculate_currency_totals(items: List[Dict[str, Any]]) -> Dict[str, Decimal
     
     return currency_totals
 
-def _create_currency_totals_table(currency_totals: Dict[str, Decimal], vat_rate: Decimal, rates_used: Dict[str, Decimal] = None) -> Table:
+def _create_currency_totals_table(currency_totals: Dict[str, Decimal], vat_rate: Decimal, rates_used: Dict[str, Decimal] = None,
+                                  on_date: str | None = None) -> Table:
     """Para birimi baz\u0131nda toplamlar? ve TL karşılıklarını gösteren tablo oluşturur."""
     font_name, font_name_bold = get_font_names()
     table_data = []
@@ -337,8 +339,7 @@ def _create_currency_totals_table(currency_totals: Dict[str, Decimal], vat_rate:
             if rates_used and currency in rates_used:
                 rate_value = rates_used.get(currency)
             if rate_value is None:
-                rates = get_exchange_rates()
-                rate_value = rates.get(currency, 1)
+                rate_value = rates_on(on_date).get(currency, 1)
             rate = Decimal(str(rate_value))
             amount_tl = (amount * rate).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
             table_data.append([f"Toplam {currency} (TL kar\u015f\u0131l\u0131\u011f\u0131):", f"{amount_tl:,.2f} TL", f"(Kur: {rate:,.4f})"])
@@ -373,7 +374,8 @@ def _create_currency_totals_table(currency_totals: Dict[str, Decimal], vat_rate:
     return totals_table, grand_total_tl
 
 
-def _create_items_table(items: List[Dict[str, Any]], vat_rate: Decimal, currency: str) -> Tuple[Table, Dict[str, Decimal]]:
+def _create_items_table(items: List[Dict[str, Any]], vat_rate: Decimal, currency: str,
+                        on_date: str | None = None) -> Tuple[Table, Dict[str, Decimal]]:
     """\u00dcr\u00fcn/hizmet tablosunu olu\u015fturur ve para birimi baz\u0131nda toplamlar\u0131 d\u00f6nd\u00fcr\u00fcr."""
     styles = get_professional_styles()
     styleN = styles["styleN"]
@@ -394,9 +396,9 @@ def _create_items_table(items: List[Dict[str, Any]], vat_rate: Decimal, currency
         display_price = f"{price_tl:,.2f} TL"
         fx_total = (qty * price)
         rate_value = item.get('exchange_rate')
-        if rate_value is None:
+        if rate_value is None and item_currency != 'TL':
             try:
-                rate_value = get_exchange_rates().get(item_currency, 1.0)
+                rate_value = rates_on(on_date).get(item_currency, 1.0)
             except Exception:
                 rate_value = 1.0
         if item_currency != 'TL':
@@ -657,7 +659,8 @@ def create_professional_invoice_pdf(invoice_data: Dict[str, Any], file_path: str
         original_currency = invoice_data.get('currency', 'TL')
         
         # Para birimi bazında toplamlar ile items table
-        items_table, currency_totals = _create_items_table(invoice_data.get('items', []), vat_rate, original_currency)
+        invoice_date = invoice_data.get('invoice_date')
+        items_table, currency_totals = _create_items_table(invoice_data.get('items', []), vat_rate, original_currency, invoice_date)
         elements.append(items_table)
         elements.append(Spacer(1, 4*mm))
         
@@ -670,7 +673,7 @@ def create_professional_invoice_pdf(invoice_data: Dict[str, Any], file_path: str
                     rates_used[cur] = Decimal(str(item.get('exchange_rate')))
             except Exception:
                 continue
-        totals_table, grand_total_tl = _create_currency_totals_table(currency_totals, vat_rate, rates_used)
+        totals_table, grand_total_tl = _create_currency_totals_table(currency_totals, vat_rate, rates_used, invoice_date)
         elements.append(totals_table)
         elements.append(Spacer(1, 8*mm))
 
@@ -9,13 +9,30 @@ import sqlite3
 import json
 import os
 import time
-import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
 from datetime import datetime, timedelta
 from pathlib import Path
-from typing import Optional, Dict, List, Any
+from typing import Optional, Dict, Iterator, List, Any
 import logging
+
+from utils.database.change_capture import (CHANGES_TABLE_DDL, create_change_capture, import_legacy_queues,
+                                           pending_changes, pending_count, prune_changes, sync_tables,
+                                           table_dependencies)
+from utils.database.cloud_verify import (find_mismatches, hash_columns, local_id_bounds, local_range_hashes,
+                                         register_functions, repair_range, sqlserver_row_expr)
+from utils.database.cloud_pull import (PULL_STATE_TABLE_DDL, common_columns, load_watermark, local_columns,
+                                       local_count, pending_ids, remove_missing, save_watermark,
+                                       schema_signature, upsert_rows)
+from utils.sync_scheduler import SyncScheduler
 logger = logging.getLogger(__name__)
 
+# Aynı anda buluta gönderilen tablo sayısı (Azure bağlantı havuzu boyutuyla uyumlu)
+SYNC_WORKERS = 4
+# Bir tablonun değişiklikleri bu büyüklükte parçalarla gönderilir; her parçadan
+# sonra kuyruk budanır, böylece yarıda kalan senkronizasyon baştan başlamaz.
+SYNC_CHUNK_SIZE = 2000
+
 # Global Azure SQL Manager referansı
 _azure_manager_instance = None
 
@@ -39,7 +56,9 @@ class SyncManager:
         """
         Args:
             database_path: Ana veritabanı dosyası
-            sync_interval: Senkronizasyon aralığı (saniye, varsayılan: 5 dakika)
+            sync_interval: En uzun bekleme (saniye, varsayılan: 5 dakika); değişiklikler
+                olay güdümlü gönderilir, bu aralık başarısız gönderimlerin yeniden
+                deneme süresini ve bildirimsiz değişikliklerin kontrolünü sınırlar
             azure_manager: Azure SQL Manager instance (opsiyonel)
         """
         self.database_path = database_path
@@ -55,8 +74,9 @@ class SyncManager:
         # Senkronizasyon durumu
         self.is_syncing = False
         self.last_sync_time = None
-        self.sync_thread = None
-        self.stop_sync_flag = threading.Event()
+        self.scheduler = SyncScheduler(self)
+        # Bulutta olmayan sütunları loglanmış tablolar (her oturumda bir kez)
+        self._reported_local_only = set()
         
         # Logging
         self.logger = logging.getLogger(__name__)
@@ -87,6 +107,10 @@ class SyncManager:
                 last_error TEXT
             )
         """)
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_sync_queue_pending
+            ON sync_queue (table_name, record_id) WHERE synced = 0
+        """)
         
         # Senkronizasyon geçmişi
         cursor.execute("""
@@ -101,6 +125,17 @@ class SyncManager:
             )
         """)
         
+        # Tablo bazında son senkronizasyon performansı
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS sync_table_stats (
+                table_name TEXT PRIMARY KEY,
+                records INTEGER DEFAULT 0,
+                failed INTEGER DEFAULT 0,
+                seconds REAL DEFAULT 0,
+                synced_at TIMESTAMP
+            )
+        """)
+        
         # Çakışma çözümleri
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS sync_conflicts (
@@ -144,108 +179,28 @@ class SyncManager:
         conn.close()
     
     def _setup_database_triggers(self):
-        """Ana veritabanına değişiklik izleme trigger'larını ekle"""
-        # İzlenecek tablolar
-        tables_to_monitor = [
-            'customers', 'services', 'devices', 'stock_items',
-            'stock_transactions', 'billing', 'payments', 'quotes',
-            'technicians', 'tasks', 'device_sales'
-        ]
-        
-        conn = sqlite3.connect(self.database_path)
-        cursor = conn.cursor()
+        """
+        Ana veritabanına değişiklik izleme trigger'larını ekle
         
-        for table in tables_to_monitor:
-            # Tablonun var olup olmadığını kontrol et
-            cursor.execute("""
-                SELECT name FROM sqlite_master 
-                WHERE type='table' AND name=?
-            """, (table,))
-            
-            if not cursor.fetchone():
-                continue
-            
-            # Her tablo için sync_queue tablosu oluştur
-            cursor.execute(f"""
-                CREATE TABLE IF NOT EXISTS sync_queue_{table} (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    record_id INTEGER NOT NULL,
-                    operation TEXT NOT NULL,
-                    data TEXT,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    synced INTEGER DEFAULT 0,
-                    synced_at TIMESTAMP
-                )
-            """)
-            self.logger.info(f"✅ Sync queue tablosu oluşturuldu: sync_queue_{table}")
-            
-            # INSERT trigger
-            trigger_name = f"sync_after_insert_{table}"
-            cursor.execute(f"""
-                DROP TRIGGER IF EXISTS {trigger_name}
-            """)
-            cursor.execute(f"""
-                CREATE TRIGGER {trigger_name}
-                AFTER INSERT ON {table}
-                FOR EACH ROW
-                BEGIN
-                    INSERT INTO sync_queue_{table} (
-                        record_id, operation, data, created_at
-                    ) VALUES (
-                        NEW.id,
-                        'INSERT',
-                        json_object('table', '{table}', 'id', NEW.id),
-                        datetime('now')
-                    );
-                END
-            """)
-            
-            # UPDATE trigger
-            trigger_name = f"sync_after_update_{table}"
-            cursor.execute(f"""
-                DROP TRIGGER IF EXISTS {trigger_name}
-            """)
-            cursor.execute(f"""
-                CREATE TRIGGER {trigger_name}
-                AFTER UPDATE ON {table}
-                FOR EACH ROW
-                BEGIN
-                    INSERT INTO sync_queue_{table} (
-                        record_id, operation, data, created_at
-                    ) VALUES (
-                        NEW.id,
-                        'UPDATE',
-                        json_object('table', '{table}', 'id', NEW.id),
-                        datetime('now')
-                    );
-                END
-            """)
-            
-            # DELETE trigger
-            trigger_name = f"sync_after_delete_{table}"
-            cursor.execute(f"""
-                DROP TRIGGER IF EXISTS {trigger_name}
-            """)
-            cursor.execute(f"""
-                CREATE TRIGGER {trigger_name}
-                AFTER DELETE ON {table}
-                FOR EACH ROW
-                BEGIN
-                    INSERT INTO sync_queue_{table} (
-                        record_id, operation, data, created_at
-                    ) VALUES (
-                        OLD.id,
-                        'DELETE',
-                        json_object('table', '{table}', 'id', OLD.id),
-                        datetime('now')
-                    );
-                END
-            """)
+        İzlenen tablolar şemadan (TABLE_DEFINITIONS) türetilir; değişiklikler
+        (tablo, kayıt) başına tek satır tutan `sync_changes` kuyruğunda
+        birleştirilir (bkz. utils/database/change_capture.py).
+        """
+        # Ana veritabanı modülü uygulamada zaten yüklüdür
+        from utils.database.connection import TABLE_DEFINITIONS
         
-        conn.commit()
-        conn.close()
+        conn = sqlite3.connect(self.database_path)
+        try:
+            with conn:
+                self.monitored_tables = sync_tables(conn, TABLE_DEFINITIONS)
+                create_change_capture(conn, self.monitored_tables)
+                moved = import_legacy_queues(conn, self.monitored_tables)
+        finally:
+            conn.close()
         
-        self.logger.info(f"Database triggers setup completed for {len(tables_to_monitor)} tables")
+        if moved:
+            self.logger.info(f"{moved} bekleyen değişiklik eski sync kuyruklarından aktarıldı")
+        self.logger.info(f"Database triggers setup completed for {len(self.monitored_tables)} tables")
     
     def add_to_sync_queue(self, table_name: str, record_id: int, 
                           operation: str, data: Dict = None):
@@ -263,19 +218,26 @@ class SyncManager:
         
         data_json = json.dumps(data) if data else None
         
+        # Aynı kayıt için bekleyen değişiklik varsa son işlemle güncellenir
         cursor.execute("""
-            INSERT INTO sync_queue (table_name, record_id, operation, data)
-            VALUES (?, ?, ?, ?)
-        """, (table_name, record_id, operation, data_json))
+            UPDATE sync_queue
+            SET operation = CASE WHEN operation = 'INSERT' AND ? = 'UPDATE' THEN 'INSERT' ELSE ? END,
+                data = ?, created_at = CURRENT_TIMESTAMP
+            WHERE table_name = ? AND record_id = ? AND synced = 0
+        """, (operation, operation, data_json, table_name, record_id))
+        if cursor.rowcount == 0:
+            cursor.execute("""
+                INSERT INTO sync_queue (table_name, record_id, operation, data)
+                VALUES (?, ?, ?, ?)
+            """, (table_name, record_id, operation, data_json))
         
         conn.commit()
         conn.close()
         
         self.logger.debug(f"Added to sync queue: {table_name}.{record_id} ({operation})")
         
-        # Eğer online ise ve otomatik sync aktifse, hemen senkronize et
-        if self.is_auto_sync_enabled() and self.is_online():
-            threading.Thread(target=self._sync_pending_changes, daemon=True).start()
+        # Otomatik sync çalışıyorsa zamanlayıcıyı uyandır (kısa beklemeyle birleştirilerek gönderilir)
+        self.scheduler.notify()
     
     def is_online(self) -> bool:
         """Bulut bağlantısının olup olmadığını kontrol et"""
@@ -323,6 +285,13 @@ class SyncManager:
         count = cursor.fetchone()[0]
         conn.close()
         
+        # Trigger'larla yakalanan değişiklikler
+        conn = sqlite3.connect(self.database_path)
+        try:
+            count += pending_count(conn)
+        finally:
+            conn.close()
+        
         return count
     
     def get_pending_changes(self, limit: int = 100) -> List[Dict]:
@@ -353,15 +322,21 @@ class SyncManager:
         conn.close()
         return changes
     
-    def _sync_pending_changes(self):
-        """Bekleyen değişiklikleri senkronize et"""
+    def _sync_pending_changes(self) -> Optional[dict]:
+        """
+        Bekleyen değişiklikleri senkronize et
+        
+        Returns:
+            Azure SQL gönderiminin sonucu ({'success', 'failed', 'error'});
+            gönderim yapılamadıysa (çevrimdışı, başka gönderim sürüyor) None
+        """
         if self.is_syncing:
             self.logger.info("Sync already in progress, skipping...")
-            return
+            return None
         
         if not self.is_online():
             self.logger.warning("Offline mode - changes queued for later sync")
-            return
+            return None
         
         self.is_syncing = True
         sync_started = datetime.now()
@@ -382,7 +357,8 @@ class SyncManager:
                     self._update_sync_history(sync_id, 'failed', 0, error_message=result.get('error'))
                     self.logger.error(f"❌ Azure SQL sync başarısız: {result.get('error')}")
                 
-                return
+                self.last_sync_time = datetime.now()
+                return result
             
             # Fallback: Eski cloud backup sistemi
             self.logger.info("Using legacy cloud backup (Google Drive/Dropbox)...")
@@ -405,13 +381,10 @@ class SyncManager:
                     conn = sqlite3.connect(self.sync_db_path)
                     cursor = conn.cursor()
                     
-                    for change in pending:
-                        cursor.execute("""
-                            UPDATE sync_queue
-                            SET synced = 1, synced_at = datetime('now')
-                            WHERE id = ?
-                        """, (change['id'],))
-                        synced_count += 1
+                    # Gönderilen değişiklikler kuyrukta tutulmaz
+                    cursor.executemany("DELETE FROM sync_queue WHERE id = ?",
+                                       [(change['id'],) for change in pending])
+                    synced_count = len(pending)
                     
                     conn.commit()
                     conn.close()
@@ -442,85 +415,47 @@ class SyncManager:
     
     def _sync_to_azure_sql(self) -> dict:
         """
-        Sync queue'daki değişiklikleri Azure SQL'e gönder
+        Bekleyen değişiklikleri (sync_changes) Azure SQL'e gönder
+        
+        Tablolar en fazla SYNC_WORKERS iş parçacığında paralel gönderilir.
+        Önce eklenen/güncellenen kayıtlar gönderilir; bir tablo, yabancı
+        anahtarla bağlı olduğu tabloların gönderimi bitmeden başlamaz. Silmeler
+        sonra ters sırayla gönderilir: bir tablonun silmeleri, ona bağlı
+        tabloların silmeleri bitmeden başlamaz. Her kayıt son haliyle bir kez
+        gönderilir; gönderilenler kuyruktan silinir. Yalnızca bulutta da
+        bulunan sütunlar gönderilir (bkz. _cloud_columns).
         
         Returns:
             {'success': int, 'failed': int, 'error': str}
         """
         try:
-            conn = sqlite3.connect(self.database_path)
-            cursor = conn.cursor()
-            
-            # Her tablo için sync_queue'yu kontrol et
-            tables_to_sync = [
-                'customers', 'devices', 'stock_items', 
-                'payments', 'technicians', 'billing',
-                'quotes', 'services', 'tasks', 'device_sales'
-            ]
+            cloud_tables = {name.lower(): info for name, info in self.azure_manager.describe_sync_tables().items()}
+            conn = sqlite3.connect(self.database_path, timeout=30)
+            try:
+                changes = pending_changes(conn)
+                columns = self._cloud_columns(conn, changes, cloud_tables)
+                parents = table_dependencies(conn, changes)
+            finally:
+                conn.close()
+            children = {table: {child for child, deps in parents.items() if table in deps} for table in parents}
             
-            total_success = 0
-            total_failed = 0
+            upserts = {}
+            deletes = {}
+            for table, table_changes in changes.items():
+                for change in table_changes:
+                    (deletes if change[1] == 'DELETE' else upserts).setdefault(table, []).append(change)
             
-            for table in tables_to_sync:
-                # Sync queue tablosu var mı?
-                cursor.execute("""
-                    SELECT name FROM sqlite_master 
-                    WHERE type='table' AND name=?
-                """, (f'sync_queue_{table}',))
-                
-                if not cursor.fetchone():
-                    continue
-                
-                # Bekleyen kayıtları al
-                cursor.execute(f"""
-                    SELECT record_id, operation
-                    FROM sync_queue_{table}
-                    WHERE synced = 0
-                    LIMIT 100
-                """)
-                
-                pending = cursor.fetchall()
-                if not pending:
-                    continue
-                
-                self.logger.info(f"📤 {table}: {len(pending)} kayıt senkronize ediliyor...")
-                
-                # Kayıtları hazırla
-                records_to_sync = []
-                for record_id, operation in pending:
-                    if operation == 'DELETE':
-                        # TODO: DELETE işlemi için ayrı metod
-                        continue
-                    
-                    # Ana tablodan kaydı al
-                    cursor.execute(f"SELECT * FROM {table} WHERE id = ?", (record_id,))
-                    columns = [desc[0] for desc in cursor.description]
-                    row = cursor.fetchone()
-                    
-                    if row:
-                        record = dict(zip(columns, row))
-                        records_to_sync.append(record)
-                
-                if records_to_sync:
-                    # Azure SQL'e gönder
-                    result = self.azure_manager.sync_table_data(table, records_to_sync)
-                    
-                    total_success += result['success']
-                    total_failed += result['failed']
-                    
-                    # Başarılı olanları synced olarak işaretle
-                    if result['success'] > 0:
-                        for record in records_to_sync[:result['success']]:
-                            cursor.execute(f"""
-                                UPDATE sync_queue_{table}
-                                SET synced = 1, synced_at = datetime('now')
-                                WHERE record_id = ?
-                            """, (record['id'],))
-                        
-                        conn.commit()
-                        self.logger.info(f"✅ {table}: {result['success']} kayıt senkronize edildi")
+            stats = {}
+            for jobs, blockers in ((upserts, parents), (deletes, children)):
+                for table_stats in self._sync_tables_ordered(jobs, blockers, columns):
+                    total = stats.setdefault(table_stats['table'], {'table': table_stats['table'], 'records': 0,
+                                                                    'failed': 0, 'seconds': 0.0})
+                    for key in ('records', 'failed', 'seconds'):
+                        total[key] += table_stats[key]
             
-            conn.close()
+            self._record_table_stats(list(stats.values()))
+            total_success = sum(s['records'] for s in stats.values())
+            total_failed = sum(s['failed'] for s in stats.values())
             
             if total_failed > 0:
                 return {
@@ -535,6 +470,165 @@ class SyncManager:
             self.logger.error(f"Azure SQL sync hatası: {e}", exc_info=True)
             return {'success': 0, 'failed': 0, 'error': str(e)}
     
+    def _cloud_columns(self, conn: sqlite3.Connection, changes: Dict[str, list],
+                       cloud_tables: Dict[str, Dict]) -> Dict[str, List[str]]:
+        """
+        Bekleyen değişikliği olan tabloların buluta gönderilecek sütunları
+        (iki tarafta da bulunanlar, 'id' başta).
+        
+        Bulutta bulunmayan (veya id sütunu olmayan) tabloların değişiklikleri
+        gönderilemez; her döngüde yeniden denenmesinler diye uyarıyla
+        kuyruktan çıkarılır ve `changes` içinden silinir.
+        """
+        columns = {}
+        dropped = {}
+        for table in list(changes):
+            cloud = cloud_tables.get(table.lower())
+            local = local_columns(conn, table)
+            table_columns = common_columns(local, cloud['columns']) if cloud else None
+            if table_columns is None:
+                dropped[table] = changes.pop(table)
+                continue
+            columns[table] = table_columns
+            local_only = [c for c in local if c not in table_columns]
+            if local_only and table not in self._reported_local_only:
+                self._reported_local_only.add(table)
+                self.logger.info(f"ℹ️ {table}: bulutta olmayan sütunlar gönderilmiyor: {', '.join(local_only)}")
+        if dropped:
+            with conn:
+                for table, table_changes in dropped.items():
+                    prune_changes(conn, table, [(record_id, version) for record_id, _, version in table_changes])
+            self.logger.warning("⚠️ Bulutta bulunmayan tabloların değişiklikleri gönderilmeden kuyruktan çıkarıldı: "
+                                + ', '.join(f"{table} ({len(c)})" for table, c in sorted(dropped.items())))
+        return columns
+    
+    def _sync_tables_ordered(self, jobs: Dict[str, list], blockers: Dict[str, set],
+                             columns: Dict[str, List[str]]) -> List[Dict]:
+        """
+        Tabloların değişikliklerini paralel gönderir; bir tablo, `blockers`
+        içindeki tabloların gönderimi bitmeden başlamaz.
+        
+        Returns:
+            Tablo başına `_sync_table` sonuçları
+        """
+        stats = []
+        with ThreadPoolExecutor(max_workers=SYNC_WORKERS, thread_name_prefix='azure-sync') as executor:
+            waiting = dict(jobs)
+            running = {}
+            while waiting or running:
+                unfinished = set(waiting) | set(running.values())
+                ready = [table for table in waiting if not blockers.get(table, set()) & unfinished]
+                if not ready and not running:
+                    # Döngüsel bağımlılık: kalanlar sırayla gönderilir
+                    ready = list(waiting)[:1]
+                for table in ready:
+                    running[executor.submit(self._sync_table, table, waiting.pop(table), columns[table])] = table
+                
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    table = running.pop(future)
+                    try:
+                        table_stats = future.result()
+                    except Exception as e:
+                        self.logger.error(f"❌ {table} senkronizasyon hatası: {e}")
+                        table_stats = {'table': table, 'records': 0, 'failed': len(jobs[table]), 'seconds': 0.0}
+                    stats.append(table_stats)
+        return stats
+    
+    def _sync_table(self, table: str, changes: list, columns: List[str]) -> dict:
+        """
+        Bir tablonun bekleyen değişikliklerini parça parça gönderir (iş parçacığında çalışır)
+        
+        Args:
+            columns: Gönderilecek sütunlar ('id' başta; bkz. _cloud_columns)
+        
+        Returns:
+            {'table': str, 'records': int, 'failed': int, 'seconds': float}
+        """
+        started = time.perf_counter()
+        synced_total = 0
+        failed_total = 0
+        self.logger.info(f"📤 {table}: {len(changes)} kayıt senkronize ediliyor...")
+        
+        select_list = ', '.join(f'"{c}"' for c in columns)
+        conn = sqlite3.connect(self.database_path, timeout=30)
+        try:
+            cursor = conn.cursor()
+            for chunk_start in range(0, len(changes), SYNC_CHUNK_SIZE):
+                chunk = changes[chunk_start:chunk_start + SYNC_CHUNK_SIZE]
+                versions = {record_id: version for record_id, _, version in chunk}
+                synced_ids = []
+                
+                # Silinen kayıtlar
+                deleted_ids = [record_id for record_id, operation, _ in chunk if operation == 'DELETE']
+                if deleted_ids:
+                    result = self.azure_manager.delete_table_data(table, deleted_ids)
+                    synced_ids.extend(result['synced_ids'])
+                    failed_total += result['failed']
+                
+                # Eklenen/güncellenen kayıtlar: ana tablodaki son halleri
+                upsert_ids = [record_id for record_id, operation, _ in chunk if operation != 'DELETE']
+                records_to_sync = []
+                for start in range(0, len(upsert_ids), 500):
+                    ids = upsert_ids[start:start + 500]
+                    cursor.execute(f"SELECT {select_list} FROM {table} WHERE id IN ({', '.join('?' * len(ids))})", ids)
+                    records_to_sync.extend(dict(zip(columns, row)) for row in cursor.fetchall())
+                
+                if records_to_sync:
+                    # Azure SQL'e gönder
+                    result = self.azure_manager.sync_table_data(table, records_to_sync)
+                    synced_ids.extend(result['synced_ids'])
+                    failed_total += result['failed']
+                
+                # Ana tabloda artık bulunmayan kayıtların silme değişikliği ayrıca gelir
+                found_ids = {record['id'] for record in records_to_sync}
+                synced_ids.extend(record_id for record_id in upsert_ids if record_id not in found_ids)
+                
+                # Başarılı olanları kuyruktan sil
+                with conn:
+                    prune_changes(conn, table, [(record_id, versions[record_id]) for record_id in synced_ids])
+                synced_total += len(synced_ids)
+        finally:
+            conn.close()
+        
+        seconds = time.perf_counter() - started
+        self.logger.info(f"✅ {table}: {synced_total} kayıt senkronize edildi ({seconds:.1f} sn)")
+        return {'table': table, 'records': synced_total, 'failed': failed_total, 'seconds': seconds}
+    
+    def _record_table_stats(self, stats: list):
+        """Tablo bazında son senkronizasyon performansını kaydet"""
+        if not stats:
+            return
+        conn = sqlite3.connect(self.sync_db_path)
+        try:
+            with conn:
+                conn.executemany("""
+                    INSERT OR REPLACE INTO sync_table_stats (table_name, records, failed, seconds, synced_at)
+                    VALUES (?, ?, ?, ?, datetime('now', 'localtime'))
+                """, [(s['table'], s['records'], s['failed'], s['seconds']) for s in stats])
+        finally:
+            conn.close()
+    
+    def get_table_stats(self) -> List[Dict]:
+        """Tablo bazında son senkronizasyon performansı (kayıt/sn dahil)"""
+        conn = sqlite3.connect(self.sync_db_path)
+        try:
+            rows = conn.execute("""
+                SELECT table_name, records, failed, seconds, synced_at
+                FROM sync_table_stats
+                ORDER BY synced_at DESC, table_name
+            """).fetchall()
+        finally:
+            conn.close()
+        return [{
+            'table_name': table,
+            'records': records,
+            'failed': failed,
+            'seconds': seconds,
+            'rows_per_second': records / seconds if seconds else 0.0,
+            'synced_at': synced_at
+        } for table, records, failed, seconds, synced_at in rows]
+    
     def _create_sync_history(self, sync_type: str, started_at: datetime) -> int:
         """Sync history kaydı oluştur"""
         conn = sqlite3.connect(self.sync_db_path)
@@ -608,43 +702,37 @@ class SyncManager:
         conn.close()
     
     def start_auto_sync(self):
-        """Otomatik senkronizasyonu başlat (background thread)"""
-        if self.sync_thread and self.sync_thread.is_alive():
+        """Otomatik senkronizasyonu başlat (olay güdümlü, tek arka plan iş parçacığı)"""
+        if self.scheduler.is_running():
             self.logger.warning("Auto sync already running")
             return
         
-        self.stop_sync_flag.clear()
-        self.sync_thread = threading.Thread(target=self._auto_sync_loop, daemon=True)
-        self.sync_thread.start()
+        self._watch_local_commits(True)
+        self.scheduler.start()
         
         self.logger.info("Auto sync started")
     
     def stop_auto_sync(self):
         """Otomatik senkronizasyonu durdur"""
-        self.stop_sync_flag.set()
-        if self.sync_thread:
-            self.sync_thread.join(timeout=5)
+        self._watch_local_commits(False)
+        self.scheduler.stop()
         
         self.logger.info("Auto sync stopped")
     
-    def _auto_sync_loop(self):
-        """Otomatik senkronizasyon döngüsü"""
-        while not self.stop_sync_flag.is_set():
-            try:
-                if self.is_auto_sync_enabled():
-                    pending_count = self.get_pending_changes_count()
-                    
-                    if pending_count > 0:
-                        self.logger.info(f"Auto sync: {pending_count} pending changes")
-                        self._sync_pending_changes()
-                
-                # Interval kadar bekle
-                interval = self._get_setting('sync_interval_seconds', self.sync_interval)
-                self.stop_sync_flag.wait(interval)
-            
-            except Exception as e:
-                self.logger.error(f"Auto sync loop error: {e}")
-                self.stop_sync_flag.wait(60)  # Hata durumunda 1 dakika bekle
+    def _watch_local_commits(self, enabled: bool):
+        """Uygulamanın aynı veritabanına yaptığı commit'lerde zamanlayıcıyı hemen uyandır"""
+        try:
+            from utils.database import db_manager
+            if not db_manager.database_path or \
+                    os.path.abspath(db_manager.database_path) != os.path.abspath(self.database_path):
+                return
+            if enabled:
+                db_manager.add_commit_listener(self.scheduler.notify)
+            else:
+                db_manager.remove_commit_listener(self.scheduler.notify)
+        except Exception as e:
+            # Dinleyici olmadan da başka bağlantıların commit'leri data_version ile fark edilir
+            self.logger.debug(f"Commit dinleyicisi eklenemedi: {e}")
     
     def force_sync(self) -> Dict:
         """Manuel senkronizasyon tetikle"""
@@ -672,6 +760,15 @@ class SyncManager:
                 'pending_count': self.get_pending_changes_count()
             }
     
+    def verify_cloud_consistency(self, repair: bool = True) -> List[Dict]:
+        """Yerel veritabanını buluttaki kopyayla karşılaştır (bkz. verify_local_against_azure)"""
+        self.logger.info("🔍 Bulut tutarlılık kontrolü başlatılıyor...")
+        reports = verify_local_against_azure(self.database_path, repair, self.azure_manager)
+        diverged = [r['table'] for r in reports if r['status'] != 'ok']
+        self.logger.info(f"🔍 Tutarlılık kontrolü tamamlandı: {len(reports)} tablo, "
+                         f"{len(diverged)} tabloda fark {diverged}")
+        return reports
+    
     def get_sync_status(self) -> Dict:
         """Senkronizasyon durumunu döndür"""
         status = {
@@ -680,7 +777,8 @@ class SyncManager:
             'auto_sync_enabled': self.is_auto_sync_enabled(),
             'pending_changes': self.get_pending_changes_count(),
             'last_sync_time': self.last_sync_time.isoformat() if self.last_sync_time else None,
-            'sync_interval': self._get_setting('sync_interval_seconds', self.sync_interval)
+            'sync_interval': self._get_setting('sync_interval_seconds', self.sync_interval),
+            'scheduler': self.scheduler.status()
         }
         
         # Son sync geçmişi
@@ -707,6 +805,7 @@ class SyncManager:
         conn.close()
         
         status['recent_history'] = history
+        status['table_stats'] = self.get_table_stats()
         
         return status
     
@@ -785,10 +884,26 @@ def init_sync_manager(database_path: str, sync_interval: int = 300,
     return manager
 
 
-def sync_from_azure_to_local(database_path: str):
+@contextmanager
+def _immediate(conn: sqlite3.Connection) -> Iterator[sqlite3.Connection]:
+    """Yazma kilidini hemen alan kısa bir işlem; hata olursa geri alınır."""
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn
+    except BaseException:
+        conn.rollback()
+        raise
+    conn.commit()
+
+
+def sync_from_azure_to_local(database_path: str, batch_size: int = 1000):
     """
-    Login sonrası Azure'dan local'e veri senkronizasyonu
-    Local database'i temizleyip Azure'daki güncel verileri indirir
+    Login sonrası Azure'dan local'e artımlı veri senkronizasyonu
+    
+    Her tablo için yalnızca son çekmeden bu yana değişen satırlar indirilir
+    (bkz. utils/database/cloud_pull.py). Her parti ayrı ve kısa bir işlemde
+    yazılır; yerel yazma kilidi ağ beklenirken tutulmaz. İlk girişte veya
+    şema değiştiğinde tablo baştan çekilir.
     """
     try:
         azure_manager = get_azure_manager()
@@ -801,45 +916,58 @@ def sync_from_azure_to_local(database_path: str):
             return False
         
         logging.info(f"🔄 Azure'dan local'e sync başlıyor: {azure_manager.current_company}")
+        cloud_tables = {name.lower(): info for name, info in azure_manager.describe_sync_tables().items()}
+        missing = sorted(name for name, info in cloud_tables.items() if info['version_column'] is None)
+        if missing:
+            logging.warning(f"ROWVERSION sütunu olmayan {len(missing)} tablo tam çekilecek "
+                            f"(şema migrasyonu uygulanmamış): {', '.join(missing)}")
         
-        # Sync edilecek tablolar
-        tables = [
-            'users', 'customers', 'devices', 'stock_items', 'stock_categories',
-            'payments', 'quotes', 'invoices', 'technicians', 'cpc_readings', 'service_records'
-        ]
+        # Ana veritabanı modülü uygulamada zaten yüklüdür
+        from utils.database.connection import TABLE_DEFINITIONS
         
-        conn = sqlite3.connect(database_path)
-        cursor = conn.cursor()
-        
-        for table in tables:
-            try:
-                # 1. Local tabloyu temizle
-                cursor.execute(f"DELETE FROM {table}")
-                logging.info(f"  ✅ {table} temizlendi")
-                
-                # 2. Azure'dan verileri çek
-                azure_data = azure_manager.fetch_table_data(table)
+        conn = sqlite3.connect(database_path, timeout=30)
+        try:
+            with conn:
+                conn.execute(PULL_STATE_TABLE_DDL)
+                conn.execute(CHANGES_TABLE_DDL)
+            for table in sync_tables(conn, TABLE_DEFINITIONS):
+                cloud = cloud_tables.get(table.lower())
+                if not cloud:
+                    continue
+                columns = common_columns(local_columns(conn, table), cloud['columns'])
+                if not columns:
+                    continue
+                signature = schema_signature(conn, cloud['columns'])
+                # ROWVERSION sütunu olmayan tablo her seferinde baştan çekilir
+                since = load_watermark(conn, table, signature) if cloud['version_column'] else 0
                 
-                if azure_data and len(azure_data) > 0:
-                    # 3. Local'e ekle
-                    columns = list(azure_data[0].keys())
-                    placeholders = ','.join(['?' for _ in columns])
-                    insert_sql = f"INSERT INTO {table} ({','.join(columns)}) VALUES ({placeholders})"
-                    
-                    for row in azure_data:
-                        values = [row[col] for col in columns]
-                        cursor.execute(insert_sql, values)
-                    
-                    logging.info(f"  ✅ {table}: {len(azure_data)} kayıt indirildi")
-                else:
-                    logging.info(f"  ℹ️ {table}: Azure'da veri yok")
+                # Ağdan okuma yerel yazma kilidi dışında yapılır; her parti kısa bir
+                # işlemde yazılır. Watermark en sonda kaydedilir: yarıda kalan çekme
+                # bir sonraki girişte aynı yerden tekrarlanır.
+                pulled = removed = 0
+                try:
+                    watermark, batches = azure_manager.fetch_changed_rows(
+                        table, columns, cloud['version_column'], since, batch_size)
+                    for rows in batches:
+                        with _immediate(conn):
+                            pulled += upsert_rows(conn, table, columns, rows, pending_ids(conn, table))
                     
-            except Exception as e:
-                logging.error(f"  ❌ {table} sync hatası: {e}")
-                continue
-        
-        conn.commit()
-        conn.close()
+                    cloud_ids = None
+                    if azure_manager.count_rows(table) != local_count(conn, table):
+                        cloud_ids = azure_manager.fetch_ids(table)
+                    with _immediate(conn):
+                        if cloud_ids is not None:
+                            removed = remove_missing(conn, table, cloud_ids, pending_ids(conn, table))
+                        save_watermark(conn, table, watermark, signature)
+                except Exception as e:
+                    logging.error(f"  ❌ {table} sync hatası: {e}")
+                    continue
+                
+                if pulled or removed:
+                    kind = "tam" if since == 0 else "artımlı"
+                    logging.info(f"  ✅ {table}: {pulled} kayıt indirildi, {removed} kayıt silindi ({kind})")
+        finally:
+            conn.close()
         
         logging.info(f"✅ Azure→Local sync tamamlandı: {azure_manager.current_company}")
         return True
@@ -847,3 +975,86 @@ def sync_from_azure_to_local(database_path: str):
     except Exception as e:
         logging.error(f"❌ Azure→Local sync hatası: {e}", exc_info=True)
         return False
+
+
+def verify_local_against_azure(database_path: str, repair: bool = True, azure_manager=None) -> List[Dict]:
+    """
+    Yerel veritabanını Azure'daki kopyayla tam aktarım yapmadan karşılaştır
+    
+    Tablolar id aralıklarının özetleriyle yukarıdan aşağıya karşılaştırılır
+    (bkz. utils/database/cloud_verify.py); tutarlı bir tablo için buluttan
+    birkaç yüz bayt okunur. `repair` açıksa yalnızca tutmayan aralıklar
+    buluttan indirilip yerelde düzeltilir. Gönderilmemiş yerel değişiklikler
+    korunur. Karşılaştırma sırasında yerel yazma kilidi tutulmaz; her tablonun
+    onarımı ayrı ve kısa bir işlemde yazılır.
+    
+    Returns:
+        Tablo başına rapor: {'table', 'status' ('ok' | 'repaired' | 'diverged' | 'error'),
+        'mismatched_ranges', 'written', 'deleted', 'skipped', 'queries', 'hash_rows',
+        'rows_fetched', 'error'}
+    """
+    azure_manager = azure_manager or get_azure_manager()
+    if not azure_manager or not azure_manager.current_company:
+        raise ConnectionError("Azure bağlantısı veya firma yok")
+    
+    # Ana veritabanı modülü uygulamada zaten yüklüdür
+    from utils.database.connection import TABLE_DEFINITIONS
+    
+    reports = []
+    conn = sqlite3.connect(database_path, timeout=30)
+    try:
+        register_functions(conn)
+        conn.execute(CHANGES_TABLE_DDL)
+        conn.commit()
+        for table in sync_tables(conn, TABLE_DEFINITIONS):
+            report = {'table': table, 'status': 'ok', 'mismatched_ranges': 0, 'written': 0, 'deleted': 0,
+                      'skipped': 0, 'queries': 0, 'hash_rows': 0, 'rows_fetched': 0, 'error': None}
+            try:
+                cloud_types = azure_manager.describe_columns(table)
+                columns = hash_columns(local_columns(conn, table), cloud_types) if cloud_types else None
+                if not columns:
+                    continue
+                bounds = [b for b in local_id_bounds(conn, table) + azure_manager.id_bounds(table) if b is not None]
+                if bounds:
+                    # Ağaç taraması ve indirme yazma kilidi alınmadan yapılır
+                    row_expr = sqlserver_row_expr(columns)
+                    mismatches = find_mismatches(
+                        lambda lo, hi, width: local_range_hashes(conn, table, columns, lo, hi, width),
+                        lambda lo, hi, width: azure_manager.range_hashes(table, row_expr, lo, hi, width),
+                        min(bounds), max(bounds), report
+                    )
+                    report['mismatched_ranges'] = len(mismatches)
+                    if mismatches:
+                        report['status'] = 'repaired' if repair else 'diverged'
+                    if mismatches and repair:
+                        names = [name for name, _ in columns]
+                        fetched = []
+                        for lo, hi, expected in mismatches:
+                            rows = azure_manager.fetch_range(table, names, lo, hi)
+                            if len(rows) != expected:
+                                raise ConnectionError(f"{lo}-{hi} aralığı eksik okundu ({len(rows)}/{expected})")
+                            report['rows_fetched'] += len(rows)
+                            fetched.append((lo, hi, rows))
+                        # Tablo kendi kısa işleminde yazılır; bu arada gelen yerel değişiklikler korunur
+                        with _immediate(conn):
+                            skip_ids = pending_ids(conn, table)
+                            for lo, hi, rows in fetched:
+                                report['skipped'] += sum(1 for i in skip_ids if lo <= i <= hi)
+                                written, deleted = repair_range(conn, table, names, rows, lo, hi, skip_ids)
+                                report['written'] += written
+                                report['deleted'] += deleted
+            except Exception as e:
+                if conn.in_transaction:
+                    conn.rollback()
+                report.update(status='error', error=str(e))
+                logging.error(f"  ❌ {table} tutarlılık kontrolü hatası: {e}")
+            
+            if report['status'] != 'ok':
+                logging.info(f"  🔍 {table}: {report['status']}, {report['mismatched_ranges']} aralık, "
+                             f"{report['written']} yazıldı, {report['deleted']} silindi")
+            reports.append(report)
+    finally:
+        conn.close()
+    
+    return reports
+
@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Olay güdümlü senkronizasyon zamanlayıcısı
+
+Bekleyen değişiklikleri tek ve uzun ömürlü bir iş parçacığı buluta gönderir.
+İş parçacığı şu durumlarda uyanır:
+
+- `notify()`: bu süreçte yapılan bir commit (DatabaseManager commit
+  dinleyicisi) veya `SyncManager.add_to_sync_queue`.
+- Ana veritabanının `PRAGMA data_version` değeri değişmiştir; bu, ağ
+  veritabanını paylaşan diğer bilgisayarların commit'lerini yakalar. Boşta
+  kalındıkça bu yoklamanın aralığı uzar.
+
+Art arda gelen değişiklikler tek gönderimde birleştirilir. Son değişiklikten
+sonra kısa bir sessizlik beklenir (debounce), ancak gönderim ilk değişiklikten
+en geç `MAX_DELAY_SECONDS` sonra yapılır. Kuyruk derinse hiç beklenmez;
+gönderimden sonra kuyrukta yeni değişiklik kalmışsa hemen devam edilir.
+Bağlantı yavaşsa (son gönderim uzun sürdüyse) sessizlik süresi uzar ve bir
+gönderimde daha çok değişiklik toplanır. Gönderim başarısız olursa veya
+çevrimdışıysa bekleme her denemede katlanır; en fazla ayarlı senkronizasyon
+aralığı kadar beklenir.
+"""
+
+import logging
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# Son değişiklikten sonra beklenen sessizlik (saniye)
+DEBOUNCE_SECONDS = 2.0
+# İlk değişiklikten sonra gönderimin en geç yapılacağı süre (saniye)
+MAX_DELAY_SECONDS = 10.0
+# Bu kadar bekleyen değişiklik varsa beklemeden gönderilir
+BURST_THRESHOLD = 500
+# Başka süreçlerin commit'leri için data_version yoklama aralığı (saniye)
+MIN_POLL_SECONDS = 2.0
+MAX_POLL_SECONDS = 30.0
+# Başarısız gönderimden sonraki ilk bekleme (saniye); her denemede katlanır
+RETRY_BASE_SECONDS = 15.0
+
+
+class SyncPolicy:
+    """
+    Gönderimin ne zaman yapılacağına karar verir.
+
+    İş parçacığından ve saatten bağımsızdır; tüm zamanlar `time.monotonic()`
+    cinsinden dışarıdan verilir.
+    """
+
+    def __init__(self, max_interval: float = 300.0):
+        self.max_interval = max_interval
+        self.first_change: Optional[float] = None
+        self.last_change: Optional[float] = None
+        self.pending = 0
+        self.last_duration = 0.0
+        self.failures = 0
+        self.retry_at: Optional[float] = None
+        self.poll_interval = MIN_POLL_SECONDS
+
+    @property
+    def has_changes(self) -> bool:
+        return self.first_change is not None
+
+    def on_change(self, now: float, count: int = 1) -> None:
+        """Yeni değişiklik(ler) bildirildi."""
+        if self.first_change is None:
+            self.first_change = now
+        self.last_change = now
+        self.pending += count
+        self.poll_interval = MIN_POLL_SECONDS
+
+    def on_idle_poll(self) -> None:
+        """Yoklamada değişiklik bulunmadı: bir sonraki yoklama daha geç yapılır."""
+        self.poll_interval = min(self.poll_interval * 2, MAX_POLL_SECONDS)
+
+    def debounce(self) -> float:
+        """Son değişiklikten sonra beklenen sessizlik; yavaş bağlantıda uzar."""
+        return min(max(DEBOUNCE_SECONDS, self.last_duration), MAX_DELAY_SECONDS)
+
+    def due_at(self) -> Optional[float]:
+        """Gönderimin yapılacağı an; gönderilecek değişiklik yoksa None."""
+        if self.first_change is None:
+            return None
+        if self.retry_at is not None:
+            return self.retry_at
+        if self.pending >= BURST_THRESHOLD:
+            return self.first_change
+        return min(self.last_change + self.debounce(), self.first_change + MAX_DELAY_SECONDS)
+
+    def on_sync_finished(self, now: float, duration: float, result: Optional[dict], remaining: int) -> None:
+        """
+        Gönderim bitti.
+
+        Args:
+            result: `_sync_pending_changes` sonucu; None ise gönderim yapılamadı
+                (çevrimdışı veya başka bir gönderim sürüyor)
+            remaining: Gönderimden sonra kuyrukta kalan değişiklik sayısı
+        """
+        self.last_duration = duration
+        self.first_change = self.last_change = None
+        self.pending = 0
+        failed = result is None or bool(result.get('failed')) or (bool(result.get('error')) and not result.get('success'))
+        if not remaining:
+            self.failures = 0
+            self.retry_at = None
+            return
+        if failed:
+            self.failures += 1
+            delay = min(RETRY_BASE_SECONDS * 2 ** (self.failures - 1), self.max_interval)
+            self.retry_at = now + delay
+        else:
+            # Gönderim sırasında gelen veya sıradaki parçadaki değişiklikler
+            self.failures = 0
+            self.retry_at = None
+        self.on_change(now, remaining)
+
+
+class SyncScheduler:
+    """
+    `SyncManager` için tek iş parçacıklı, olay güdümlü zamanlayıcı.
+
+    Kullandığı yöntemler: `database_path`, `is_auto_sync_enabled()`,
+    `get_pending_changes_count()`, `_sync_pending_changes()` ve
+    `_get_setting('sync_interval_seconds', ...)`.
+    """
+
+    def __init__(self, manager):
+        self._manager = manager
+        self._policy = SyncPolicy()
+        self._cond = threading.Condition()
+        self._changed = 0
+        self._stopping = False
+        self._thread: Optional[threading.Thread] = None
+
+    def notify(self, count: int = 1) -> None:
+        """Yerel değişiklik bildir (hızlıdır, her commit'te çağrılabilir)."""
+        with self._cond:
+            self._changed += count
+            self._cond.notify()
+
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        if self.is_running():
+            return
+        with self._cond:
+            self._stopping = False
+        self._thread = threading.Thread(target=self._run, name='sync-scheduler', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+        if self._thread:
+            self._thread.join(timeout=timeout)
+        self._thread = None
+
+    def status(self) -> dict:
+        """Zamanlayıcının anlık durumu (arayüzde gösterilir)."""
+        policy = self._policy
+        due = policy.due_at()
+        return {
+            'running': self.is_running(),
+            'next_sync_in': max(0.0, due - time.monotonic()) if due is not None else None,
+            'failures': policy.failures,
+            'last_duration': policy.last_duration,
+        }
+
+    def _max_interval(self) -> float:
+        return float(self._manager._get_setting('sync_interval_seconds', self._manager.sync_interval))
+
+    def _run(self) -> None:
+        policy = self._policy
+        monitor = sqlite3.connect(self._manager.database_path, timeout=30)
+        try:
+            policy.max_interval = self._max_interval()
+            data_version = monitor.execute("PRAGMA data_version").fetchone()[0]
+            # Çevrimdışıyken biriken değişiklikler (ör. bir hafta sahada kalan dizüstü)
+            backlog = self._manager.get_pending_changes_count()
+            if backlog:
+                policy.on_change(time.monotonic(), backlog)
+            safety_at = time.monotonic() + policy.max_interval
+
+            while True:
+                try:
+                    now = time.monotonic()
+                    due = policy.due_at()
+                    wake_at = min(due if due is not None else now + policy.poll_interval,
+                                  now + policy.poll_interval, safety_at)
+                    with self._cond:
+                        if not self._changed and not self._stopping:
+                            self._cond.wait(max(0.0, wake_at - now))
+                        if self._stopping:
+                            return
+                        changed, self._changed = self._changed, 0
+
+                    now = time.monotonic()
+                    version = monitor.execute("PRAGMA data_version").fetchone()[0]
+                    if changed:
+                        policy.on_change(now, changed)
+                    elif version != data_version:
+                        policy.on_change(now)
+                    elif not policy.has_changes and now >= wake_at:
+                        policy.on_idle_poll()
+                    data_version = version
+
+                    if now >= safety_at:
+                        # Bildirimi kaçırılmış değişiklikler için (ör. ayrı kuyruk veritabanı)
+                        policy.max_interval = self._max_interval()
+                        safety_at = now + policy.max_interval
+                        if not policy.has_changes:
+                            count = self._manager.get_pending_changes_count()
+                            if count:
+                                policy.on_change(now, count)
+
+                    due = policy.due_at()
+                    if due is None or now < due:
+                        continue
+
+                    if not self._manager.is_auto_sync_enabled():
+                        policy.on_sync_finished(now, 0.0, {'success': 0, 'failed': 0, 'error': None}, 0)
+                        continue
+
+                    logger.info(f"Otomatik senkronizasyon: ~{policy.pending} değişiklik gönderiliyor")
+                    started = time.monotonic()
+                    try:
+                        result = self._manager._sync_pending_changes()
+                    except Exception as e:
+                        logger.error(f"Otomatik senkronizasyon hatası: {e}")
+                        result = None
+                    remaining = self._manager.get_pending_changes_count()
+                    finished = time.monotonic()
+                    policy.on_sync_finished(finished, finished - started, result, remaining)
+                    # Gönderimin kendi kuyruk budaması yeni değişiklik sayılmaz
+                    data_version = monitor.execute("PRAGMA data_version").fetchone()[0]
+                    if policy.retry_at is not None:
+                        logger.info(f"Senkronizasyon {policy.retry_at - finished:.0f} sn sonra yeniden denenecek "
+                                    f"({remaining} değişiklik bekliyor)")
+                except Exception as e:
+                    logger.error(f"Otomatik senkronizasyon döngüsü hatası: {e}")
+                    with self._cond:
+                        if not self._stopping:
+                            self._cond.wait(60)  # Hata durumunda 1 dakika bekle
+        except Exception as e:
+            logger.error(f"Senkronizasyon zamanlayıcısı durdu: {e}", exc_info=True)
+        finally:
+            monitor.close()
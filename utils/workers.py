@@ -6,6 +6,8 @@ uzun sürebilecek işlemleri ana uygulama arayüzünü (UI) dondurmadan
 ayrı iş parçacıklarında çalıştırmak için sınıflar içerir.
 """
 
+import os
+import multiprocessing
 import smtplib
 import logging
 import unicodedata
@@ -13,9 +15,13 @@ from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from email.mime.base import MIMEBase
 from email import encoders, policy
-from typing import Dict, Any
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional, Tuple
 
-from PyQt6.QtCore import QThread, pyqtSignal
+from PyQt6.QtCore import QObject, QRunnable, QThread, QThreadPool, QTimer, pyqtSignal, pyqtSlot
+
+from utils.database.cpc_billing import ITEM_FAILED, ITEM_READY
 
 def normalize_email_address(email: str) -> str:
     """
@@ -68,10 +74,11 @@ except (ImportError, AttributeError, Exception) as e:
         logging.debug(f"Google Gemini kütüphanesi mevcut değil: {e}")
 
 try:
-    from utils.currency_converter import get_exchange_rates
+    from utils.currency_converter import fetch_tcmb_rates, get_exchange_rates
     CURRENCY_AVAILABLE = True
 except ImportError:
     CURRENCY_AVAILABLE = False
+    fetch_tcmb_rates = None
     get_exchange_rates = None
 
 try:
@@ -286,6 +293,9 @@ class AIThread(BaseThread):
 class CurrencyRateThread(BaseThread):
     """
     Merkez bankasından döviz kurlarını asenkron olarak çeken worker.
+
+    Bugünün bülteniyle birlikte eksik arşiv günlerini de `exchange_rates`
+    tablosuna kaydeder (bkz. `DatabaseManager.sync_exchange_rates`).
     """
     def __init__(self, db_manager, parent=None):
         super().__init__(parent)
@@ -299,8 +309,9 @@ class CurrencyRateThread(BaseThread):
             if not CURRENCY_AVAILABLE:
                 raise ImportError("Döviz kuru modülü veya bağımlılıkları bulunamadı.")
             
-            rates = get_exchange_rates()
-            if rates:
+            self.db.sync_exchange_rates(fetch_tcmb_rates)
+            rates = self.db.get_stored_rates()
+            if len(rates) > 1:
                 self.db.update_exchange_rates(rates)
                 logging.info(f"Güncel kurlar çekildi: USD={rates.get('USD', 'N/A')}, EUR={rates.get('EUR', 'N/A')}")
                 self.task_finished.emit(rates)
@@ -311,3 +322,283 @@ class CurrencyRateThread(BaseThread):
             error_message = f"Kur bilgileri çekilemedi (Ağ Hatası): {e}"
             logging.error(error_message)
             self.task_error.emit(error_message)
+
+
+class CpcBatchInvoiceThread(BaseThread):
+    """
+    Ay sonu toplu CPC faturalamasını yürüten worker.
+
+    Faturalar veritabanında tek işlemde oluşturulur, PDF'ler süreç havuzunda
+    paralel üretilir. Her PDF'in durumu ayrı kaydedildiği için iptal edilen
+    veya çöken bir çalıştırma, aynı `run_id` ile kaldığı yerden sürdürülür.
+    """
+    progress = pyqtSignal(int, int, str)  # tamamlanan, toplam, müşteri adı
+
+    def __init__(self, db_manager, start_date: str, end_date: str, output_dir: str,
+                 run_id: Optional[int] = None, max_workers: Optional[int] = None, parent=None):
+        super().__init__(parent)
+        self.db = db_manager
+        self.start_date = start_date
+        self.end_date = end_date
+        self.output_dir = output_dir
+        self.run_id = run_id
+        self.max_workers = max_workers
+        self._cancelled = False
+
+    def cancel(self) -> None:
+        """Bekleyen PDF'leri iptal eder; üretilmekte olanlar tamamlanır."""
+        self._cancelled = True
+
+    def run(self) -> None:
+        try:
+            if self.run_id is None:
+                # Faturalar bugünün tarihiyle kesilir; o gün geçerli kayıtlı TCMB kuru yoksa başlatılmaz
+                rates = self.db.billing_rates(datetime.now().strftime('%Y-%m-%d'))
+                os.makedirs(self.output_dir, exist_ok=True)
+                self.run_id = self.db.create_cpc_billing_run(self.start_date, self.end_date, rates, self.output_dir)
+                if self.run_id is None:
+                    raise RuntimeError("Faturalar oluşturulamadı, ayrıntılar için log dosyasına bakın.")
+
+            jobs = self.db.get_cpc_billing_run_jobs(self.run_id)
+            total = len(jobs)
+            done = failed = 0
+            self.progress.emit(0, total, "")
+            if jobs:
+                from utils.pdf_generator import create_professional_invoice_pdf
+                with ProcessPoolExecutor(max_workers=self.max_workers, mp_context=multiprocessing.get_context('spawn')) as executor:
+                    futures = {
+                        executor.submit(create_professional_invoice_pdf, job['pdf_data'], job['pdf_path']): job
+                        for job in jobs
+                    }
+                    for future in as_completed(futures):
+                        job = futures[future]
+                        try:
+                            ok, error = future.result(), None
+                        except Exception as e:
+                            ok, error = False, str(e)
+                        if ok:
+                            self.db.set_cpc_billing_run_item_status(job['item_id'], ITEM_READY)
+                            done += 1
+                        else:
+                            self.db.set_cpc_billing_run_item_status(job['item_id'], ITEM_FAILED, error or "PDF oluşturulamadı.")
+                            failed += 1
+                        self.progress.emit(done + failed, total, job['customer_name'])
+                        if self._cancelled:
+                            executor.shutdown(wait=True, cancel_futures=True)
+                            break
+
+            finished = self.db.finish_cpc_billing_run(self.run_id)
+            logging.info(f"Toplu CPC faturalama #{self.run_id}: {done} PDF hazır, {failed} hatalı, tamamlandı={finished}.")
+            self.task_finished.emit({
+                'run_id': self.run_id, 'total': total, 'done': done, 'failed': failed,
+                'cancelled': self._cancelled, 'finished': finished,
+            })
+        except Exception as e:
+            logging.error(f"Toplu CPC faturalama hatası: {e}", exc_info=True)
+            self.task_error.emit(str(e))
+
+
+class _DbTaskSignals(QObject):
+    """Worker havuzundaki görevin sonucunu GUI thread'ine taşır."""
+    done = pyqtSignal(object, int, bool, object)  # anahtar, nesil, başarılı mı, sonuç/hata
+
+
+class _DbTask(QRunnable):
+    """Tek bir veritabanı sorgu fonksiyonunu havuzdaki bir thread'de çalıştırır."""
+
+    def __init__(self, key: Tuple[int, str], generation: int, fn: Callable[..., Any], args: tuple, kwargs: dict):
+        super().__init__()
+        self.setAutoDelete(False)  # Yaşam süresini DbTaskRunner yönetir (tryTake için gerekli)
+        self.key = key
+        self.generation = generation
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.signals = _DbTaskSignals()
+
+    def run(self) -> None:
+        try:
+            result = self.fn(*self.args, **self.kwargs)
+        except Exception as e:
+            logging.error(f"Arka plan veritabanı görevi başarısız ({self.key[1]}): {e}", exc_info=True)
+            self.signals.done.emit(self.key, self.generation, False, e)
+        else:
+            self.signals.done.emit(self.key, self.generation, True, result)
+
+
+class DbTaskRunner(QObject):
+    """
+    Sekmelerin veritabanı sorgularını GUI thread'i dışında çalıştıran görev yürütücü.
+
+    Her görev bir sahip (genellikle sekme) ve bir ad ile gönderilir. Aynı
+    sahip/ad için yeni bir görev gönderildiğinde önceki görev henüz
+    başlamadıysa kuyruktan çıkarılır, başlamışsa sonucu yok sayılır. Böylece
+    filtre kutusuna yazarken veya sekme değiştirirken yalnızca son isteğin
+    sonucu tabloya yansır. Sonuç/hata geri çağrıları GUI thread'inde çalışır.
+
+    Okuma sorguları havuz thread'lerinin kendi SQLite okuma bağlantılarıyla
+    yapılır; thread'ler bağlantıları açık tutabilmek için sonlandırılmaz.
+    """
+    busy_changed = pyqtSignal(bool)
+
+    def __init__(self, max_threads: int = 2, parent=None):
+        super().__init__(parent)
+        self._pool = QThreadPool(self)
+        self._pool.setMaxThreadCount(max_threads)
+        self._pool.setExpiryTimeout(-1)
+        self._generations: Dict[Tuple[int, str], int] = {}
+        self._tasks: Dict[Tuple[int, str], _DbTask] = {}
+        self._callbacks: Dict[Tuple[int, str], Tuple[Optional[Callable], Optional[Callable]]] = {}
+        self._running: Dict[int, _DbTask] = {}  # id(görev) -> görev; sonuç gelene kadar referans tutulur
+
+    def submit(self, owner: QObject, name: str, fn: Callable[..., Any], *args,
+               on_result: Optional[Callable[[Any], None]] = None,
+               on_error: Optional[Callable[[Exception], None]] = None, **kwargs) -> None:
+        """
+        `fn(*args, **kwargs)` çağrısını arka planda çalıştırır.
+
+        Args:
+            owner: Görevin sahibi; sahip yok edilirse görevleri iptal edilir.
+            name: Sahip içindeki görev adı (ör. 'refresh'); aynı adlı eski görevin yerini alır.
+            fn: Worker thread'inde çalışacak fonksiyon. Qt widget'larına dokunmamalıdır.
+            on_result: Başarılı sonuçla GUI thread'inde çağrılır.
+            on_error: Hata nesnesiyle GUI thread'inde çağrılır.
+        """
+        key = (id(owner), name)
+        if key not in self._generations:
+            owner.destroyed.connect(lambda *_, oid=id(owner): self._forget_owner(oid))
+        self._discard_queued(key)
+        generation = self._generations.get(key, 0) + 1
+        self._generations[key] = generation
+
+        task = _DbTask(key, generation, fn, args, kwargs)
+        task.signals.done.connect(self._on_done)
+        self._tasks[key] = task
+        self._callbacks[key] = (on_result, on_error)
+        was_busy = self.is_busy()
+        self._running[id(task)] = task
+        self._pool.start(task)
+        if not was_busy:
+            self.busy_changed.emit(True)
+
+    def cancel(self, owner: QObject, name: Optional[str] = None) -> None:
+        """Sahibin (veya yalnızca `name` adlı) bekleyen görevlerini iptal eder; sonuçları yok sayılır."""
+        oid = id(owner)
+        for key in [k for k in self._generations if k[0] == oid and (name is None or k[1] == name)]:
+            self._discard_queued(key)
+            self._generations[key] += 1
+            self._tasks.pop(key, None)
+            self._callbacks.pop(key, None)
+        self._emit_idle_if_done()
+
+    def is_busy(self) -> bool:
+        return bool(self._running)
+
+    def _discard_queued(self, key: Tuple[int, str]) -> None:
+        task = self._tasks.get(key)
+        if task is not None and self._pool.tryTake(task):
+            self._running.pop(id(task), None)
+
+    def _forget_owner(self, oid: int) -> None:
+        for key in [k for k in self._generations if k[0] == oid]:
+            self._discard_queued(key)
+            self._generations.pop(key, None)
+            self._tasks.pop(key, None)
+            self._callbacks.pop(key, None)
+        self._emit_idle_if_done()
+
+    def _emit_idle_if_done(self) -> None:
+        if not self._running:
+            self.busy_changed.emit(False)
+
+    @pyqtSlot(object, int, bool, object)
+    def _on_done(self, key: Tuple[int, str], generation: int, ok: bool, payload: Any) -> None:
+        task = self._tasks.get(key)
+        finished = [t for t in self._running.values() if t.key == key and t.generation == generation]
+        for t in finished:
+            self._running.pop(id(t), None)
+        if self._generations.get(key) == generation and task is not None and task.generation == generation:
+            self._tasks.pop(key, None)
+            on_result, on_error = self._callbacks.pop(key, (None, None))
+            try:
+                if ok and on_result:
+                    on_result(payload)
+                elif not ok and on_error:
+                    on_error(payload)
+            except Exception as e:
+                logging.error(f"Veritabanı görevi sonucu işlenemedi ({key[1]}): {e}", exc_info=True)
+        if finished:
+            self._emit_idle_if_done()
+
+
+_db_task_runner: Optional[DbTaskRunner] = None
+
+
+def get_db_task_runner() -> DbTaskRunner:
+    """Uygulama genelinde paylaşılan veritabanı görev yürütücüsünü döndürür."""
+    global _db_task_runner
+    if _db_task_runner is None:
+        _db_task_runner = DbTaskRunner()
+    return _db_task_runner
+
+
+class CurrencyService(QObject):
+    """
+    Uygulama genelinde döviz kurlarını sunan servis.
+
+    `rates()` son bilinen kurları her zaman beklemeden döndürür (kayıtlı kurlar
+    veya diskteki son kurlar). Kurlar bir zamanlayıcıyla arka planda
+    `CurrencyRateThread` üzerinden eşitlenir; yeni kurlar geldiğinde
+    `rates_updated` sinyali yayılır. Kurları kullanan sekmeler ağ isteği
+    yapmak yerine bu sinyale bağlanır.
+    """
+    rates_updated = pyqtSignal(object)  # {para birimi: Decimal}
+    refresh_failed = pyqtSignal(str)
+
+    REFRESH_INTERVAL_MS = 60 * 60 * 1000
+
+    def __init__(self, db_manager, parent=None):
+        super().__init__(parent)
+        self.db = db_manager
+        self._thread: Optional[CurrencyRateThread] = None
+        self._timer = QTimer(self)
+        self._timer.timeout.connect(self.refresh)
+
+    def rates(self, on_date: Optional[str] = None) -> Dict[str, Any]:
+        """Verilen tarihte (None ise güncel) geçerli son bilinen kurlar; ağa çıkmaz."""
+        if self.db is not None:
+            return self.db.rates_on(on_date)
+        return get_exchange_rates() if CURRENCY_AVAILABLE else {}
+
+    def start(self, interval_ms: Optional[int] = None) -> None:
+        """İlk eşitlemeyi başlatır ve zamanlayıcıyı kurar."""
+        self._timer.start(interval_ms or self.REFRESH_INTERVAL_MS)
+        self.refresh()
+
+    def stop(self) -> None:
+        self._timer.stop()
+
+    def is_refreshing(self) -> bool:
+        return self._thread is not None and self._thread.isRunning()
+
+    def refresh(self) -> None:
+        """Kur eşitlemesini arka planda başlatır; süren bir eşitleme varsa yenisini başlatmaz."""
+        if self.is_refreshing():
+            return
+        self._thread = CurrencyRateThread(self.db, parent=self)
+        self._thread.task_finished.connect(self.rates_updated)
+        self._thread.task_error.connect(self.refresh_failed)
+        self._thread.start()
+
+
+_currency_service: Optional[CurrencyService] = None
+
+
+def get_currency_service(db_manager=None) -> CurrencyService:
+    """Uygulama genelinde paylaşılan döviz kuru servisini döndürür."""
+    global _currency_service
+    if _currency_service is None:
+        if db_manager is None:
+            from utils.database import db_manager
+        _currency_service = CurrencyService(db_manager)
+    return _currency_service